@@ -4,6 +4,8 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.openapi.utils import get_openapi
 from pydantic import BaseModel
 from typing import List, Optional
+from contextlib import asynccontextmanager
+import asyncio
 import os
 import re
 import subprocess
@@ -45,6 +47,26 @@ except Exception as e:
     logger.error(f"Environment validation failed: {e}", exc_info=True)
     raise
 
+# Start/stop background workers with the application
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from utils.job_queue import advisor_queue, job_queue
+    from utils.telemetry import telemetry, stop_all_sinks
+    from utils.usage_accounting import usage_accountant
+
+    # Signup side effects (Slack, onboarding emails) run here
+    await job_queue.start()
+    # Background advisor runs (POST /advisor/jobs)
+    await advisor_queue.start()
+    telemetry.start()
+    yield
+    await advisor_queue.stop()
+    await job_queue.stop()
+    # Hand the last LLM usage rows to their sink, then flush buffered auth
+    # events, support analytics and usage before the worker exits
+    usage_accountant.flush()
+    await asyncio.to_thread(stop_all_sinks)
+
 # Create FastAPI app with comprehensive OpenAPI documentation
 app = FastAPI(
     title="PropIQ API",
@@ -117,7 +139,8 @@ All endpoints use the `/api/v1` prefix for versioning. Future API versions will
     ],
     openapi_url="/api/v1/openapi.json",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Conditionally set OpenAPI servers based on environment
@@ -266,6 +289,22 @@ try:
 except ImportError as e:
     logger.warning(f"Property Advisor router not available: {e}")
 
+# Import and include batch portfolio analysis router (vectorized underwriting)
+try:
+    from routers.analyses import router as analyses_router
+    app.include_router(analyses_router)
+    logger.info("Batch analysis router registered")
+except ImportError as e:
+    logger.warning(f"Batch analysis router not available: {e}")
+
+# Import and include LLM usage metrics router (Prometheus scrape + per-user usage)
+try:
+    from routers.metrics import router as metrics_router
+    app.include_router(metrics_router)
+    logger.info("LLM usage metrics router registered")
+except ImportError as e:
+    logger.warning(f"Metrics router not available: {e}")
+
 # Import and include Intercom customer messaging router (OPTIONAL - can be removed)
 try:
     from routers.intercom import router as intercom_router
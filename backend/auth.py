@@ -2,12 +2,13 @@
 Authentication endpoints for PropIQ API
 Handles user signup, login with Supabase persistence, bcrypt hashing, and JWT tokens
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends, Header, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, EmailStr, validator, Field
 from typing import Optional
 from datetime import datetime, timedelta
 import os
-import json
+import asyncio
 import jwt
 from config.logging_config import get_logger
 from utils.validators import (
@@ -18,6 +19,10 @@ from utils.validators import (
     PASSWORD_MIN_LENGTH,
     PASSWORD_MAX_LENGTH
 )
+from utils.password_hashing import password_hasher, PasswordHasherBusy
+from utils.jwt_cache import TokenVerifier
+from utils.job_queue import job_queue
+from utils.telemetry import telemetry
 
 logger = get_logger(__name__)
 
@@ -26,26 +31,17 @@ try:
     from database_supabase import (
         create_user,
         get_user_by_email,
+        get_database,
         get_user_by_id,
-        verify_password,
-        update_last_login
+        get_user_projection,
+        update_last_login,
+        update_password_hash
     )
     DATABASE_AVAILABLE = True
 except Exception as e:
     logger.warning(f"Database not available: {e}")
     DATABASE_AVAILABLE = False
 
-# Comet ML setup for logging
-try:
-    from comet_ml import Experiment
-    COMET_API_KEY = os.getenv("COMET_API_KEY")
-    COMET_WORKSPACE = os.getenv("COMET_WORKSPACE", "luntra-ai")
-    COMET_PROJECT = os.getenv("COMET_PROJECT", "luntra-backend")
-    COMET_AVAILABLE = bool(COMET_API_KEY)
-except ImportError:
-    logger.info("Comet ML not installed, skipping ML experiment tracking")
-    COMET_AVAILABLE = False
-
 router = APIRouter(prefix="/api/v1/auth", tags=["authentication"])
 
 # JWT Configuration
@@ -64,6 +60,20 @@ if len(JWT_SECRET) < 32:
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24 * 7  # 7 days
 
+# Retired secrets still accepted for verification during a key rotation
+JWT_PREVIOUS_SECRETS = [
+    s.strip() for s in os.getenv("JWT_PREVIOUS_SECRETS", "").split(",") if s.strip()
+]
+
+# Shared verifier: caches verified claims until `exp` so repeat requests with
+# the same bearer token skip signature verification
+token_verifier = TokenVerifier(
+    JWT_SECRET,
+    JWT_ALGORITHM,
+    previous_secrets=JWT_PREVIOUS_SECRETS,
+    cache_size=int(os.getenv("JWT_CACHE_SIZE", "2048"))
+)
+
 class SignupRequest(BaseModel):
     email: EmailStr = Field(..., description="Valid email address")
     password: str = Field(
@@ -131,42 +141,154 @@ def create_access_token(user_id: str, email: str) -> str:
         "iat": datetime.utcnow()  # Issued at
     }
 
-    token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    token = jwt.encode(payload, token_verifier.signing_secret, algorithm=JWT_ALGORITHM)
     return token
 
-def log_to_comet(event_type: str, data: dict):
-    """Log database operations to Comet ML for monitoring"""
-    if not COMET_AVAILABLE:
-        return
+async def verify_token(
+    request: Request,
+    authorization: Optional[str] = Header(None)
+) -> dict:
+    """
+    Shared FastAPI dependency: verify the Bearer JWT and return its claims
+
+    Verified claims are cached (keyed by a hash of the token) until `exp`, and
+    FastAPI resolves the dependency once per request, so a token is verified
+    at most once per request and usually not at all on repeat requests.
+
+    Usage:
+        @router.get("/me")
+        async def me(token_payload: dict = Depends(verify_token)):
+            return {"user_id": token_payload["sub"]}
+    """
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Authorization header required")
 
     try:
-        experiment = Experiment(
-            api_key=COMET_API_KEY,
-            workspace=COMET_WORKSPACE,
-            project_name=COMET_PROJECT,
-        )
-        experiment.set_name(f"Database {event_type} - {datetime.now().isoformat()}")
-        experiment.add_tags([event_type, "database", "auth", "supabase"])
+        scheme, token = authorization.split()
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Invalid authorization header format")
+
+    if scheme.lower() != "bearer":
+        raise HTTPException(status_code=401, detail="Invalid authentication scheme")
 
-        # Log metrics
-        experiment.log_parameters(data)
+    try:
+        payload = token_verifier.verify(token)
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Token has expired")
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    request.state.token_payload = payload
+    return payload
+
+async def get_current_user(
+    request: Request,
+    token_payload: dict = Depends(verify_token)
+) -> dict:
+    """
+    Shared FastAPI dependency: verified claims plus the user projection
+
+    The projection (no password hash) is fetched once and stored on
+    `request.state.user`, so handlers and helpers in the same request reuse
+    it instead of issuing their own user lookup.
+    """
+    user = getattr(request.state, "user", None)
+    if user is not None:
+        return user
 
-        # Create artifact with detailed log
-        log_file = f"/tmp/database_{event_type}_{datetime.now().timestamp()}.json"
-        with open(log_file, 'w') as f:
-            json.dump(data, f, indent=2, default=str)
+    if not DATABASE_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Database service unavailable")
+
+    user = await run_in_threadpool(get_user_projection, token_payload.get("sub"))
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
 
-        experiment.log_artifact(log_file, f"database_{event_type}.json")
+    request.state.user = user
+    return user
 
-        experiment.end()
+async def current_user_tier(request: Request, user_id: str) -> Optional[str]:
+    """
+    The user's subscription tier, for per-tier limits such as LLM budgets
 
-        # Clean up temp file
-        if os.path.exists(log_file):
-            os.remove(log_file)
+    Reuses the projection on `request.state.user` (see get_current_user) or
+    fetches and stores it. Unlike get_current_user this never fails the
+    request: without a database it returns None (no tier limits apply), and
+    a user with no row or no tier counts as "free".
+    """
+    user = getattr(request.state, "user", None)
+    if user is None:
+        if not DATABASE_AVAILABLE or get_database() is None:
+            return None
+        user = await run_in_threadpool(get_user_projection, user_id)
+        if user:
+            request.state.user = user
+    return (user or {}).get("subscription_tier") or "free"
+
+def log_auth_event(event_type: str, data: dict):
+    """
+    Record an auth event for monitoring (Comet ML / W&B / JSONL)
 
-        logger.debug(f"Logged {event_type} to Comet ML")
+    Never blocks the request: events are buffered and flushed in batches by
+    the telemetry sink's background thread.
+    """
+    telemetry.record(event_type, {**data, "database": "supabase", "category": "auth"})
+
+# ============================================================================
+# BACKGROUND JOBS (executed by utils.job_queue workers, not the request)
+# ============================================================================
+
+@job_queue.handler("auth.log_to_comet")
+def _job_log_to_comet(payload: dict):
+    # Drains jobs enqueued before auth events moved to the telemetry sink
+    log_auth_event(payload["event_type"], payload["data"])
+
+@job_queue.handler("signup.notify_slack")
+def _job_notify_slack(payload: dict):
+    from utils.slack import notify_new_user, SLACK_WEBHOOK_URL
+
+    # Only retry when Slack is configured; a missing webhook is not transient
+    if not notify_new_user(**payload) and SLACK_WEBHOOK_URL:
+        raise RuntimeError("Slack notification failed")
+
+@job_queue.handler("signup.start_onboarding")
+def _job_start_onboarding(payload: dict):
+    from utils.onboarding_campaign import start_onboarding_campaign, SENDGRID_API_KEY
+
+    # The SendGrid client is blocking, so run the campaign on this worker
+    # thread's own event loop rather than the app's
+    result = asyncio.run(start_onboarding_campaign(**payload))
+    logger.info(
+        f"Onboarding campaign started for {payload['user_email']}",
+        extra={
+            "emails_sent": len(result.get('emails_sent', [])),
+            "emails_scheduled": len(result.get('emails_scheduled', []))
+        }
+    )
+
+    if SENDGRID_API_KEY and not result.get("emails_sent"):
+        raise RuntimeError("Onboarding Day 1 email was not sent")
+
+def password_pool_busy_error() -> HTTPException:
+    """503 returned when the bcrypt worker pool queue is full"""
+    return HTTPException(
+        status_code=503,
+        detail="Authentication service is busy, please retry shortly",
+        headers={"Retry-After": "1"}
+    )
+
+async def rehash_password(user_id: str, password: str):
+    """
+    Upgrade a user's password hash to the current bcrypt cost factor
+
+    Runs as a background task after a successful login, so the user never
+    waits for the second bcrypt round.
+    """
+    try:
+        new_hash = await password_hasher.hash(password)
+        if update_password_hash(user_id, new_hash):
+            logger.info(f"Rehashed password for user {user_id} at cost {password_hasher.rounds}")
     except Exception as e:
-        logger.warning(f"Failed to log to Comet ML: {e}")
+        logger.warning(f"Password rehash failed for user {user_id}: {e}")
 
 @router.post("/signup", response_model=UserResponse)
 async def signup(request: SignupRequest):
@@ -176,7 +298,7 @@ async def signup(request: SignupRequest):
     - Validates email uniqueness
     - Hashes password with bcrypt
     - Stores in Supabase
-    - Logs to Comet ML
+    - Records a telemetry event; enqueues Slack notification and onboarding emails
     """
     if not DATABASE_AVAILABLE:
         raise HTTPException(
@@ -192,11 +314,15 @@ async def signup(request: SignupRequest):
         elif request.firstName:
             full_name = request.firstName
 
-        # Create user in Supabase (password will be hashed with bcrypt)
+        # Hash on the bcrypt worker pool so the event loop stays free
+        password_hash = await password_hasher.hash(request.password)
+
+        # Create user in Supabase
         user = create_user(
             email=request.email.lower(),
             password=request.password,
-            full_name=full_name
+            full_name=full_name,
+            password_hash=password_hash
         )
 
         if not user:
@@ -210,51 +336,30 @@ async def signup(request: SignupRequest):
         # Generate JWT access token
         access_token = create_access_token(user_id, request.email.lower())
 
-        # Log to Comet ML
-        log_to_comet("user_signup", {
+        log_auth_event("user_signup", {
             "user_id": user_id,
             "email": request.email.lower(),
             "has_first_name": bool(request.firstName),
             "has_last_name": bool(request.lastName),
             "has_company": bool(request.company),
             "timestamp": datetime.utcnow().isoformat(),
-            "database": "supabase",
             "collection": "users",
             "operation": "create_user",
             "success": True
         })
 
-        # Send Slack notification for new user signup
-        try:
-            from utils.slack import notify_new_user
-            notify_new_user(
-                email=request.email.lower(),
-                name=full_name,
-                tier="free",  # New users start on free tier
-                source="web"
-            )
-        except Exception as e:
-            # Don't fail signup if Slack notification fails
-            logger.warning(f"Slack notification failed: {e}")
-
-        # Start onboarding email campaign
-        try:
-            from utils.onboarding_campaign import start_onboarding_campaign
-            onboarding_result = await start_onboarding_campaign(
-                user_email=request.email.lower(),
-                user_id=user_id,
-                user_name=request.firstName
-            )
-            logger.info(
-                f"Onboarding campaign started for {request.email.lower()}",
-                extra={
-                    "emails_sent": len(onboarding_result.get('emails_sent', [])),
-                    "emails_scheduled": len(onboarding_result.get('emails_scheduled', []))
-                }
-            )
-        except Exception as e:
-            # Don't fail signup if onboarding campaign fails
-            logger.warning(f"Onboarding campaign failed: {e}")
+        # Side effects run on the background job queue; signup only enqueues
+        job_queue.enqueue("signup.notify_slack", {
+            "email": request.email.lower(),
+            "name": full_name,
+            "tier": "free",  # New users start on free tier
+            "source": "web"
+        })
+        job_queue.enqueue("signup.start_onboarding", {
+            "user_email": request.email.lower(),
+            "user_id": user_id,
+            "user_name": request.firstName
+        })
 
         return UserResponse(
             success=True,
@@ -264,6 +369,8 @@ async def signup(request: SignupRequest):
             message="User created successfully"
         )
 
+    except PasswordHasherBusy:
+        raise password_pool_busy_error()
     except Exception as e:
         error_str = str(e)
 
@@ -274,8 +381,7 @@ async def signup(request: SignupRequest):
                 detail="Email already registered"
             )
 
-        # Log error to Comet ML
-        log_to_comet("user_signup_error", {
+        log_auth_event("user_signup_error", {
             "email": request.email.lower(),
             "error": error_str,
             "timestamp": datetime.utcnow().isoformat(),
@@ -288,13 +394,14 @@ async def signup(request: SignupRequest):
         )
 
 @router.post("/login", response_model=UserResponse)
-async def login(request: LoginRequest):
+async def login(request: LoginRequest, background_tasks: BackgroundTasks):
     """
     Authenticate user login
 
-    - Verifies email and password with bcrypt
+    - Verifies email and password with bcrypt (on the worker pool)
+    - Rehashes in the background if the bcrypt cost factor changed
     - Updates last login timestamp
-    - Logs to Comet ML
+    - Records a telemetry event
     """
     if not DATABASE_AVAILABLE:
         raise HTTPException(
@@ -313,7 +420,7 @@ async def login(request: LoginRequest):
             )
 
         # Verify password with bcrypt
-        if not verify_password(request.password, user["password_hash"]):
+        if not await password_hasher.verify(request.password, user["password_hash"]):
             raise HTTPException(
                 status_code=401,
                 detail="Invalid email or password"
@@ -321,13 +428,17 @@ async def login(request: LoginRequest):
 
         # Generate JWT access token
         user_id = user["id"]
+
+        # Transparently upgrade hashes created with an old cost factor
+        if password_hasher.needs_rehash(user["password_hash"]):
+            background_tasks.add_task(rehash_password, user_id, request.password)
         access_token = create_access_token(user_id, request.email.lower())
 
         # Update last login timestamp
         update_last_login(user_id)
 
         # Log successful login
-        log_to_comet("user_login", {
+        log_auth_event("user_login", {
             "user_id": user_id,
             "email": request.email.lower(),
             "timestamp": datetime.utcnow().isoformat(),
@@ -344,8 +455,10 @@ async def login(request: LoginRequest):
 
     except HTTPException:
         raise
+    except PasswordHasherBusy:
+        raise password_pool_busy_error()
     except Exception as e:
-        log_to_comet("user_login_error", {
+        log_auth_event("user_login_error", {
             "email": request.email.lower(),
             "error": str(e),
             "timestamp": datetime.utcnow().isoformat(),
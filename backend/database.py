@@ -7,7 +7,9 @@ import os
 from supabase import create_client, Client
 from typing import Optional, Dict, List
 import bcrypt
-from datetime import datetime
+import threading
+from datetime import datetime, timezone
+from utils.cache import invalidate_user_context
 
 # Initialize Supabase client
 supabase_url = os.getenv("SUPABASE_URL")
@@ -200,6 +202,7 @@ def save_property_analysis(
         "state": location.get("state"),
         "zip_code": analysis_data.get("zip_code")
     }).execute()
+    invalidate_user_context(user_id)
 
     return result.data[0] if result.data else None
 
@@ -267,6 +270,7 @@ def decrement_trial_analyses(user_id: str) -> bool:
         supabase.table("users").update({
             "trial_analyses_remaining": user["trial_analyses_remaining"] - 1
         }).eq("id", user_id).execute()
+        invalidate_user_context(user_id)
         return True
 
     return False
@@ -330,6 +334,7 @@ def create_subscription(user_id: str, stripe_data: Dict) -> Dict:
         "subscription_tier": stripe_data.get("tier", "starter"),
         "subscription_status": stripe_data.get("status", "active")
     }).eq("id", user_id).execute()
+    invalidate_user_context(user_id)
 
     return result.data[0] if result.data else None
 
@@ -377,6 +382,7 @@ def cancel_subscription(user_id: str) -> bool:
     supabase.table("users").update({
         "subscription_status": "canceled"
     }).eq("id", user_id).execute()
+    invalidate_user_context(user_id)
 
     return bool(result.data)
 
@@ -453,32 +459,119 @@ def unsubscribe_email(email: str) -> bool:
 # ANALYTICS & REPORTING
 # ============================================================================
 
-def get_total_users() -> int:
-    """Get total number of users"""
+# Dashboard numbers may be this many seconds old before they are refreshed
+DASHBOARD_STATS_MAX_AGE = int(os.getenv("DASHBOARD_STATS_MAX_AGE", "300"))
+# Callers wait this long for a refresh already in flight before fetching themselves
+DASHBOARD_STATS_WAIT_SECONDS = float(os.getenv("DASHBOARD_STATS_WAIT_SECONDS", "10"))
+
+_dashboard_stats: Dict = {"stats": None, "refreshed_at": None, "inflight": None}
+_dashboard_stats_lock = threading.Lock()
+
+
+def _snapshot_time(value) -> Optional[datetime]:
+    """Parse the view's refreshed_at (ISO timestamp from PostgREST)"""
+    if not value:
+        return None
+    try:
+        refreshed_at = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return refreshed_at if refreshed_at.tzinfo else refreshed_at.replace(tzinfo=timezone.utc)
+
+
+def _fresh_dashboard_stats(max_age_seconds: int) -> Optional[Dict]:
+    """The cached stats if the snapshot itself is within max_age_seconds (caller holds the lock)"""
+    refreshed_at = _dashboard_stats["refreshed_at"]
+    if _dashboard_stats["stats"] is None or refreshed_at is None or max_age_seconds <= 0:
+        return None
+    age = (datetime.now(timezone.utc) - refreshed_at).total_seconds()
+    return _dashboard_stats["stats"] if age < max_age_seconds else None
+
+
+def _fetch_dashboard_stats(max_age_seconds: int) -> Dict:
+    result = supabase.rpc("get_dashboard_stats", {"max_age_seconds": max_age_seconds}).execute()
+    row = result.data[0] if result.data else {}
+    return {
+        "total_users": row.get("total_users", 0),
+        "new_users_24h": row.get("new_users_24h", 0),
+        "total_analyses": row.get("total_analyses", 0),
+        "analyses_24h": row.get("analyses_24h", 0),
+        "active_subscriptions": row.get("active_subscriptions", 0),
+        "support_chats_24h": row.get("support_chats_24h", 0),
+        "refreshed_at": row.get("refreshed_at")
+    }
+
+
+def get_dashboard_stats(max_age_seconds: int = DASHBOARD_STATS_MAX_AGE) -> Dict:
+    """
+    Get every dashboard number in one query
+
+    Reads the single-row dashboard_stats materialized view through the
+    get_dashboard_stats() function (see supabase_migration_dashboard_stats.sql),
+    which only recomputes the counts when the snapshot is older than
+    max_age_seconds. The last result is kept in-process while the snapshot's
+    own refreshed_at is within the window, so freshness is measured once (from
+    the view's refresh time) and the numbers are never older than
+    max_age_seconds. Concurrent callers share one RPC rather than queueing
+    behind it; none of them holds the lock during the network call.
+
+    Args:
+        max_age_seconds: Freshness window (0 forces a refresh)
+
+    Returns:
+        {
+            "total_users": int,
+            "new_users_24h": int,
+            "total_analyses": int,
+            "analyses_24h": int,
+            "active_subscriptions": int,
+            "support_chats_24h": int,
+            "refreshed_at": str
+        }
+    """
     if not supabase:
         raise Exception("Supabase client not initialized")
 
-    result = supabase.table("users").select("id", count="exact").execute()
-    return result.count if hasattr(result, 'count') else 0
+    with _dashboard_stats_lock:
+        cached = _fresh_dashboard_stats(max_age_seconds)
+        if cached is not None:
+            return cached
+        inflight = _dashboard_stats["inflight"]
+        leader = inflight is None
+        if leader:
+            inflight = _dashboard_stats["inflight"] = threading.Event()
+
+    if not leader:
+        # Another caller is already refreshing; use its result unless it is slow
+        if inflight.wait(DASHBOARD_STATS_WAIT_SECONDS):
+            with _dashboard_stats_lock:
+                cached = _fresh_dashboard_stats(max_age_seconds)
+            if cached is not None:
+                return cached
+        return _fetch_dashboard_stats(max_age_seconds)
+
+    try:
+        stats = _fetch_dashboard_stats(max_age_seconds)
+        with _dashboard_stats_lock:
+            _dashboard_stats["stats"] = stats
+            _dashboard_stats["refreshed_at"] = _snapshot_time(stats["refreshed_at"])
+        return stats
+    finally:
+        with _dashboard_stats_lock:
+            _dashboard_stats["inflight"] = None
+        inflight.set()
+
+
+def get_total_users() -> int:
+    """Get total number of users"""
+    return get_dashboard_stats()["total_users"]
 
 
 def get_total_analyses() -> int:
     """Get total number of property analyses"""
-    if not supabase:
-        raise Exception("Supabase client not initialized")
-
-    result = supabase.table("property_analyses").select("id", count="exact").execute()
-    return result.count if hasattr(result, 'count') else 0
+    return get_dashboard_stats()["total_analyses"]
 
 
 def get_active_subscriptions() -> int:
     """Get number of active subscriptions"""
-    if not supabase:
-        raise Exception("Supabase client not initialized")
-
-    result = supabase.table("subscriptions")\
-        .select("id", count="exact")\
-        .eq("status", "active")\
-        .execute()
-
-    return result.count if hasattr(result, 'count') else 0
+    return get_dashboard_stats()["active_subscriptions"]
@@ -8,11 +8,12 @@ Replaces MongoDB with PostgreSQL for better Render compatibility
 """
 import os
 from typing import Optional, Dict, Any
-import bcrypt
 from datetime import datetime
 from supabase import create_client, Client
 from dotenv import load_dotenv
 from config.logging_config import get_logger
+from utils.password_hashing import password_hasher
+from utils.cache import invalidate_user_context
 
 load_dotenv()
 
@@ -39,17 +40,28 @@ except Exception as e:
 # ============================================================================
 
 def hash_password(password: str) -> str:
-    """Hash password using bcrypt"""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    """
+    Hash password using bcrypt (blocking)
+
+    Async handlers should use `await password_hasher.hash(...)` instead so the
+    work runs on the bcrypt worker pool rather than the event loop.
+    """
+    return password_hasher.hash_sync(password)
 
 def verify_password(password: str, hashed_password: str) -> bool:
-    """Verify password against bcrypt hash"""
-    try:
-        return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
-    except Exception:
-        return False
+    """
+    Verify password against bcrypt hash (blocking)
+
+    Async handlers should use `await password_hasher.verify(...)` instead.
+    """
+    return password_hasher.verify_sync(password, hashed_password)
 
-def create_user(email: str, password: str, full_name: Optional[str] = None) -> Dict[str, Any]:
+def create_user(
+    email: str,
+    password: str,
+    full_name: Optional[str] = None,
+    password_hash: Optional[str] = None
+) -> Dict[str, Any]:
     """
     Create a new user in Supabase
 
@@ -57,6 +69,7 @@ def create_user(email: str, password: str, full_name: Optional[str] = None) -> D
         email: User email (unique)
         password: Plain text password (will be hashed)
         full_name: Optional full name
+        password_hash: Pre-computed bcrypt hash of `password` (skips inline hashing)
 
     Returns:
         User data dict
@@ -72,8 +85,9 @@ def create_user(email: str, password: str, full_name: Optional[str] = None) -> D
     if existing.data:
         raise Exception(f"User with email {email} already exists")
 
-    # Hash password
-    password_hash = hash_password(password)
+    # Hash password (unless the caller already did it off the event loop)
+    if not password_hash:
+        password_hash = hash_password(password)
 
     # Create user record
     user_data = {
@@ -117,6 +131,23 @@ def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
         return result.data[0]
     return None
 
+# Columns safe to hand to request handlers (never includes password_hash)
+USER_PROJECTION_COLUMNS = (
+    "id,email,full_name,subscription_tier,subscription_status,"
+    "propiq_usage_count,propiq_usage_limit,created_at"
+)
+
+def get_user_projection(user_id: str) -> Optional[Dict[str, Any]]:
+    """Get the public user projection by ID (no password hash)"""
+    if not supabase:
+        return None
+
+    result = supabase.table("users").select(USER_PROJECTION_COLUMNS).eq("id", user_id).execute()
+
+    if result.data:
+        return result.data[0]
+    return None
+
 def update_last_login(user_id: str) -> bool:
     """Update user's last login timestamp"""
     if not supabase:
@@ -130,6 +161,25 @@ def update_last_login(user_id: str) -> bool:
     except Exception:
         return False
 
+def update_password_hash(user_id: str, password_hash: str) -> bool:
+    """
+    Replace a user's stored password hash
+
+    Used for rehash-on-login when the bcrypt cost factor changes.
+    """
+    if not supabase:
+        return False
+
+    try:
+        supabase.table("users").update({
+            "password_hash": password_hash,
+            "updated_at": datetime.utcnow().isoformat()
+        }).eq("id", user_id).execute()
+        return True
+    except Exception as e:
+        logger.error(f"Failed to update password hash: {e}", exc_info=True)
+        return False
+
 # ============================================================================
 # PROPERTY ANALYSIS FUNCTIONS
 # ============================================================================
@@ -170,6 +220,7 @@ def save_property_analysis(
 
     # Increment user's usage count
     supabase.rpc("increment_propiq_usage", {"user_id_param": user_id}).execute()
+    invalidate_user_context(user_id)
 
     return result.data[0]
 
@@ -280,6 +331,7 @@ def decrement_trial_analyses(user_id: str) -> bool:
     try:
         # Increment usage count via RPC function
         supabase.rpc("increment_propiq_usage", {"user_id_param": user_id}).execute()
+        invalidate_user_context(user_id)
         return True
     except Exception as e:
         logger.error(f"Failed to decrement trial analyses: {e}", exc_info=True)
@@ -347,6 +399,7 @@ def update_user_subscription(
             "propiq_usage_limit": usage_limit,
             "updated_at": datetime.utcnow().isoformat()
         }).eq("id", user_id).execute()
+        invalidate_user_context(user_id)
 
         return True
     except Exception as e:
@@ -398,6 +451,57 @@ def get_conversation_history(conversation_id: str, limit: int = 50) -> list:
 
     return result.data if result.data else []
 
+# ============================================================================
+# ADVISOR SESSION FUNCTIONS
+# ============================================================================
+
+def get_advisor_session(session_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+    """Get a user's property advisor session"""
+    if not supabase:
+        return None
+
+    result = supabase.table("advisor_sessions")\
+        .select("*")\
+        .eq("session_id", session_id)\
+        .eq("user_id", user_id)\
+        .limit(1)\
+        .execute()
+
+    return result.data[0] if result.data else None
+
+def get_advisor_session_by_job(job_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+    """Get the advisor session a background job ran in"""
+    if not supabase:
+        return None
+
+    result = supabase.table("advisor_sessions")\
+        .select("*")\
+        .eq("job_id", job_id)\
+        .eq("user_id", user_id)\
+        .limit(1)\
+        .execute()
+
+    return result.data[0] if result.data else None
+
+def upsert_advisor_session(session_id: str, user_id: str, fields: Dict[str, Any]) -> None:
+    """
+    Create or update an advisor session
+
+    Only the given fields (JSON-serializable) are written; created_at is set
+    by the table default on insert.
+    """
+    if not supabase:
+        raise Exception("Supabase not initialized")
+
+    session_data = {
+        "session_id": session_id,
+        "user_id": user_id,
+        **fields,
+        "updated_at": datetime.utcnow().isoformat()
+    }
+
+    supabase.table("advisor_sessions").upsert(session_data, on_conflict="session_id,user_id").execute()
+
 # ============================================================================
 # HEALTH CHECK
 # ============================================================================
@@ -38,6 +38,9 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             "/auth/signup": (5, 60),  # 5 signups per minute
             "/auth/login": (10, 60),  # 10 login attempts per minute
             "/propiq/analyze": (10, 3600),  # 10 analyses per hour
+            "/api/v1/analyses/batch": (20, 3600),  # 20 batches per hour
+            "/api/v1/analyses/sensitivity": (60, 3600),  # 60 grids per hour
+            "/api/v1/analyses/projections": (60, 3600),  # 60 projections per hour
             "/stripe/create-checkout-session": (5, 60),  # 5 checkout attempts per minute
         }
 
@@ -0,0 +1,546 @@
+"""
+PropIQ Batch Portfolio Analysis
+Score hundreds of properties in one request with the vectorized underwriting
+engine; only the top-ranked deals get an LLM narrative.
+
+Power users analyze 40-60 properties per session, which used to mean one
+request (and one LLM analysis) per property.
+
+Also serves sensitivity grids (one deal over every combination of price,
+rate, rent and vacancy: heatmaps, break-even contours) and multi-year
+projections (amortization, cash flow/equity curves, IRR/NPV), each with
+Excel/CSV table exports.
+"""
+
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional, Dict, Any, AsyncIterator, Literal, Union
+import asyncio
+import json
+import os
+import time
+
+import numpy as np
+
+from config.logging_config import get_logger
+from underwriting import calculate_all_metrics, deal_columns, to_records
+from underwriting.projections import ProjectionAssumptions, project_deals, projection_csv
+from underwriting.sensitivity import (
+    DEFAULT_GRID_METRICS,
+    default_axes,
+    grid_cells,
+    heatmap_csv,
+    json_floats,
+    sensitivity_grid
+)
+from utils.deadline import DeadlineExceeded, request_deadline, within_deadline
+from utils.excel_exporter import OPENPYXL_AVAILABLE, export_projections_to_excel, export_sensitivity_to_excel
+from utils.llm_gateway import llm_gateway
+from utils.prompt_registry import prompt_registry
+from utils.usage_accounting import BudgetExceeded
+
+# JWT auth (shared, cached verification)
+from auth import current_user_tier, verify_token
+
+logger = get_logger(__name__)
+
+router = APIRouter(prefix="/api/v1/analyses", tags=["analyses"])
+
+BATCH_MAX_PROPERTIES = int(os.getenv("BATCH_MAX_PROPERTIES", "5000"))
+BATCH_MAX_NARRATIVES = int(os.getenv("BATCH_MAX_NARRATIVES", "10"))
+BATCH_DEADLINE_SECONDS = float(os.getenv("BATCH_DEADLINE_SECONDS", "60"))
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+SENSITIVITY_MAX_CELLS = int(os.getenv("SENSITIVITY_MAX_CELLS", "250000"))
+PROJECTION_MAX_PROPERTIES = int(os.getenv("PROJECTION_MAX_PROPERTIES", "1000"))
+# Monthly schedules are 12 rows per year per property: only for small requests
+PROJECTION_MAX_SCHEDULE_PROPERTIES = int(os.getenv("PROJECTION_MAX_SCHEDULE_PROPERTIES", "10"))
+
+# Result lines are written in chunks of this many
+NDJSON_CHUNK_ROWS = 500
+
+# ============================================================================
+# MODELS
+# ============================================================================
+
+class BatchProperty(BaseModel):
+    id: Optional[str] = None  # Client reference, echoed back
+    address: Optional[str] = None
+    purchase_price: float
+    monthly_rent: float
+    down_payment_percent: Optional[float] = None
+    interest_rate: Optional[float] = None
+    loan_term: Optional[float] = None
+    annual_property_tax: Optional[float] = None
+    annual_insurance: Optional[float] = None
+    monthly_hoa: Optional[float] = None
+    monthly_utilities: Optional[float] = None
+    monthly_maintenance: Optional[float] = None
+    monthly_vacancy: Optional[float] = None
+    monthly_property_management: Optional[float] = None
+    closing_costs: Optional[float] = None
+    rehab_costs: Optional[float] = None
+
+class BatchAssumptions(BaseModel):
+    """Used for any field a property leaves empty"""
+    down_payment_percent: float = 20
+    interest_rate: float = 7
+    loan_term: float = 30
+    annual_property_tax: float = 0
+    annual_insurance: float = 0
+    monthly_hoa: float = 0
+    monthly_utilities: float = 0
+    monthly_maintenance: float = 0
+    monthly_vacancy: float = 0
+    monthly_property_management: float = 0
+    closing_costs: float = 0
+    rehab_costs: float = 0
+
+class BatchAnalysisRequest(BaseModel):
+    properties: List[BatchProperty] = Field(..., min_length=1)
+    assumptions: BatchAssumptions = BatchAssumptions()
+    top_n: int = Field(5, ge=0)  # Top-ranked deals that get an LLM narrative
+
+class SensitivityRange(BaseModel):
+    start: float
+    stop: float
+    steps: int = Field(11, ge=2, le=201)
+
+class HeatmapSpec(BaseModel):
+    x: str  # Axis across columns
+    y: str  # Axis down rows
+    metric: str = "monthly_cash_flow"
+
+class SensitivityRequest(BaseModel):
+    deal: BatchProperty
+    assumptions: BatchAssumptions = BatchAssumptions()
+    # {field: values or range}, in grid order; default price x rate x rent x vacancy
+    axes: Optional[Dict[str, Union[SensitivityRange, List[float]]]] = None
+    metrics: List[str] = list(DEFAULT_GRID_METRICS)
+    heatmaps: Optional[List[HeatmapSpec]] = None  # Default: axis 2 over axis 1, axis 4 over axis 3
+    break_even_along: Optional[str] = "monthly_rent"  # Axis to solve cash flow = 0 for
+    format: Literal["json", "csv", "xlsx"] = "json"
+
+
+class ProjectionSettings(BaseModel):
+    """Percent per year; see underwriting.projections.ProjectionAssumptions"""
+    years: int = Field(30, ge=1, le=50)
+    rent_growth: float = 3.0
+    expense_growth: float = 2.0
+    appreciation: float = 3.0
+    discount_rate: float = 8.0
+    selling_costs_percent: float = 6.0
+    hold_years: Optional[int] = Field(None, ge=1)
+
+class ProjectionRequest(BaseModel):
+    properties: List[BatchProperty] = Field(..., min_length=1)
+    assumptions: BatchAssumptions = BatchAssumptions()
+    projection: ProjectionSettings = ProjectionSettings()
+    include_schedule: bool = False  # Monthly amortization rows per property
+    format: Literal["json", "csv", "xlsx"] = "json"
+
+
+# ============================================================================
+# NARRATIVES
+# ============================================================================
+
+BATCH_NARRATIVE = prompt_registry.register("analyses.batch_narrative", """You are PropIQ's deal analyst. You receive deterministic underwriting metrics for one rental property, computed by PropIQ's calculator.
+
+Write a 2-3 sentence investment narrative for a busy investor comparing many properties:
+1. The deal's main strength
+2. Its main weakness or risk
+3. One concrete negotiation or due diligence step
+
+Use only the numbers provided. Do not recompute or invent figures. Plain text, no markdown.""")
+
+NARRATIVE_FIELDS = (
+    "monthly_cash_flow",
+    "cap_rate",
+    "cash_on_cash_return",
+    "one_percent_rule",
+    "debt_coverage_ratio",
+    "break_even_occupancy",
+    "total_cash_invested"
+)
+
+
+def narrative_facts(prop: BatchProperty, record: Dict[str, Any], rank: int, total: int) -> str:
+    """Compact per-deal data for the narrative prompt"""
+    lines = [
+        f"Property: {prop.address or prop.id or 'unnamed'}",
+        f"Rank: {rank} of {total}",
+        f"Price: {prop.purchase_price:.0f}",
+        f"Monthly rent: {prop.monthly_rent:.0f}",
+        f"Deal score: {record['deal_score']}/100 ({record['deal_rating']})"
+    ]
+    lines.extend(f"{name}: {record[name]}" for name in NARRATIVE_FIELDS)
+    return "\n".join(lines)
+
+
+async def write_narrative(facts: str, user_id: Optional[str] = None, tier: Optional[str] = None) -> str:
+    response = await llm_gateway.complete(
+        model="gpt-4o-mini",
+        messages=BATCH_NARRATIVE.messages(facts),
+        temperature=0.4,
+        max_tokens=200,
+        usage_tags={"route": "analyses.batch", "stage": "narrative", "user_id": user_id, "tier": tier}
+    )
+    prompt_registry.record(BATCH_NARRATIVE.name, response.usage)
+    return (response.choices[0].message.content or "").strip()
+
+
+# ============================================================================
+# SCORING
+# ============================================================================
+
+def score_batch(request: BatchAnalysisRequest) -> Dict[str, Any]:
+    """
+    Score every property in one vectorized pass and rank them
+
+    Returns:
+        {"records": per-property metrics, "ranks": 1-based rank per property,
+         "order": property indexes best first}
+    """
+    columns = deal_columns(
+        [prop.model_dump(exclude_none=True) for prop in request.properties],
+        defaults=request.assumptions.model_dump()
+    )
+    metrics = calculate_all_metrics(columns)
+
+    # Best deal score first; cash-on-cash breaks ties
+    order = np.lexsort((-metrics["cash_on_cash_return"], -metrics["deal_score"]))
+    ranks = np.empty_like(order)
+    ranks[order] = np.arange(1, len(order) + 1)
+
+    return {"records": to_records(metrics), "ranks": ranks.tolist(), "order": order.tolist()}
+
+
+def _line(payload: Dict[str, Any]) -> str:
+    return json.dumps(payload, separators=(",", ":"), default=str) + "\n"
+
+
+async def stream_batch(
+    request: BatchAnalysisRequest,
+    user_id: Optional[str] = None,
+    tier: Optional[str] = None
+) -> AsyncIterator[str]:
+    """
+    NDJSON lines: one "result" per property (input order), then a "narrative"
+    per top-N deal as each finishes, then "done"
+
+    Narrative calls are accounted to user_id and tier, so the tier's daily
+    budget applies (tags are passed per call, since a generator can't hold a
+    usage_scope() across yields). Once the budget refuses a call, the
+    remaining narratives are skipped.
+    """
+    started = time.perf_counter()
+    properties = request.properties
+    scored = score_batch(request)
+    records, ranks, order = scored["records"], scored["ranks"], scored["order"]
+    scored_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    for offset in range(0, len(records), NDJSON_CHUNK_ROWS):
+        yield "".join(
+            _line({
+                "type": "result",
+                "index": i,
+                "id": properties[i].id,
+                "address": properties[i].address,
+                "rank": ranks[i],
+                "metrics": records[i]
+            })
+            for i in range(offset, min(offset + NDJSON_CHUNK_ROWS, len(records)))
+        )
+
+    top = order[:min(request.top_n, BATCH_MAX_NARRATIVES)]
+    narratives = 0
+    if top and llm_gateway.available:
+        async def narrate(i: int):
+            facts = narrative_facts(properties[i], records[i], ranks[i], len(records))
+            return i, await write_narrative(facts, user_id, tier)
+
+        tasks = [asyncio.ensure_future(narrate(i)) for i in top]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    i, narrative = await next_done
+                except DeadlineExceeded:
+                    raise
+                except BudgetExceeded as e:
+                    logger.info(f"Batch narratives stopped: {e}")
+                    break
+                except Exception as e:
+                    logger.warning(f"Batch narrative failed: {e}")
+                    continue
+                narratives += 1
+                yield _line({"type": "narrative", "index": i, "rank": ranks[i], "narrative": narrative})
+        except DeadlineExceeded:
+            logger.warning(f"Batch narratives cut short by deadline ({narratives}/{len(top)} written)")
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    yield _line({
+        "type": "done",
+        "count": len(records),
+        "top": [{"index": i, "rank": ranks[i], "id": properties[i].id} for i in top],
+        "narratives": narratives,
+        "scored_ms": scored_ms,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+    })
+
+
+# ============================================================================
+# SENSITIVITY
+# ============================================================================
+
+def default_heatmaps(axes: List[str]) -> List[HeatmapSpec]:
+    """Second axis across the first, then fourth across the third"""
+    return [HeatmapSpec(x=axes[i + 1], y=axes[i]) for i in range(0, len(axes) - 1, 2)]
+
+
+def request_axes(request: SensitivityRequest) -> Optional[Dict[str, Any]]:
+    """Axis specs as plain values/dicts (None = default axes)"""
+    if request.axes is None:
+        return None
+    return {
+        field: spec.model_dump() if isinstance(spec, SensitivityRange) else spec
+        for field, spec in request.axes.items()
+    }
+
+
+def build_sensitivity(request: SensitivityRequest) -> Dict[str, Any]:
+    """
+    Evaluate the grid and shape it for the response
+
+    Raises:
+        ValueError: Unknown axis or metric
+    """
+    started = time.perf_counter()
+    deal = request.deal.model_dump(exclude_none=True)
+    defaults = request.assumptions.model_dump()
+    axes = request_axes(request)
+    if axes is None:
+        axes = default_axes({**defaults, **deal})
+
+    grid = sensitivity_grid(deal, axes, metrics=request.metrics, defaults=defaults)
+    heatmaps = [
+        grid.heatmap(spec.metric, spec.x, spec.y)
+        for spec in (request.heatmaps if request.heatmaps is not None else default_heatmaps(list(grid.axes)))
+    ]
+
+    result = {
+        "summary": grid.summary(),
+        "axes": {field: np.round(values, 4).tolist() for field, values in grid.axes.items()},
+        "heatmaps": heatmaps,
+        "break_even": None
+    }
+    along = request.break_even_along
+    if along and along in grid.axes and "monthly_cash_flow" in grid.metrics:
+        result["break_even"] = {
+            "along": along,
+            "metric": "monthly_cash_flow",
+            "over": [field for field in grid.axes if field != along],
+            "values": json_floats(grid.break_even(along))
+        }
+    result["summary"]["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return result
+
+
+def build_projections(request: ProjectionRequest) -> List[Dict[str, Any]]:
+    """
+    Project every property and build its report (CPU-bound: run off the event loop)
+
+    Raises:
+        ValueError: Invalid projection settings
+    """
+    assumptions = ProjectionAssumptions(**request.projection.model_dump())
+    projection = project_deals(
+        [prop.model_dump(exclude_none=True) for prop in request.properties],
+        assumptions,
+        defaults=request.assumptions.model_dump()
+    )
+    return [
+        {
+            "index": i,
+            "id": prop.id,
+            "address": prop.address,
+            **projection.report(i, include_schedule=request.include_schedule)
+        }
+        for i, prop in enumerate(request.properties)
+    ]
+
+
+# ============================================================================
+# ENDPOINTS
+# ============================================================================
+
+@router.post(
+    "/batch",
+    dependencies=[Depends(request_deadline(BATCH_DEADLINE_SECONDS, "batch analysis"))]
+)
+async def analyze_batch(
+    request: BatchAnalysisRequest,
+    http_request: Request,
+    token_payload: dict = Depends(verify_token)
+):
+    """
+    Analyze a portfolio of properties in one request (NDJSON stream)
+
+    Every property is scored with the deterministic underwriting engine (same
+    formulas as the deal calculator); the top_n ranked deals also get a short
+    LLM narrative.
+
+    Lines (application/x-ndjson):
+        {"type": "result", "index", "id", "address", "rank", "metrics"}
+        {"type": "narrative", "index", "rank", "narrative"}
+        {"type": "done", "count", "top", "narratives", "scored_ms", "duration_ms"}
+    """
+    if len(request.properties) > BATCH_MAX_PROPERTIES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(request.properties)} properties (max {BATCH_MAX_PROPERTIES})"
+        )
+
+    user_id = token_payload.get("sub")
+    try:
+        tier = await within_deadline(current_user_tier(http_request, user_id), "user lookup")
+    except DeadlineExceeded:
+        raise HTTPException(status_code=503, detail="Batch analysis is busy, please try again shortly.")
+
+    async def generate():
+        try:
+            async for chunk in stream_batch(request, user_id, tier):
+                yield chunk
+        except Exception as e:
+            logger.error(f"Batch analysis failed: {e}", exc_info=True)
+            yield _line({"type": "error", "detail": "Batch analysis failed"})
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+@router.post("/sensitivity")
+async def analyze_sensitivity(
+    request: SensitivityRequest,
+    token_payload: dict = Depends(verify_token)
+):
+    """
+    Sensitivity grid for one deal (every combination of the axis values)
+
+    Returns heatmap slices (z rows by y, columns by x, other axes held at the
+    deal's own inputs, with the break-even x per row) and the break-even
+    contour along one axis over all the others. format=xlsx (or csv) returns
+    the heatmap tables as a spreadsheet download.
+    """
+    if request.format == "xlsx" and not OPENPYXL_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Excel export unavailable")
+
+    axes = request_axes(request)
+    cells = grid_cells(axes) if axes is not None else None
+    if cells is not None and cells > SENSITIVITY_MAX_CELLS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Grid too large: {cells} cells (max {SENSITIVITY_MAX_CELLS})"
+        )
+
+    try:
+        result = build_sensitivity(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if request.format == "xlsx":
+        workbook = export_sensitivity_to_excel(result["heatmaps"])
+        if workbook is None:
+            raise HTTPException(status_code=500, detail="Excel export failed")
+        return Response(
+            content=workbook,
+            media_type=XLSX_MEDIA_TYPE,
+            headers={"Content-Disposition": 'attachment; filename="propiq-sensitivity.xlsx"'}
+        )
+    if request.format == "csv":
+        return Response(
+            content=heatmap_csv(result["heatmaps"]),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="propiq-sensitivity.csv"'}
+        )
+    return result
+
+
+@router.post("/projections")
+async def project_properties(
+    request: ProjectionRequest,
+    token_payload: dict = Depends(verify_token)
+):
+    """
+    Multi-year projections for one or more properties
+
+    Per property: yearly cash flow, loan balance, equity and total return
+    (with the IRR if sold that year), headline IRR/NPV at the hold year, and
+    optionally the monthly amortization schedule. format=xlsx (or csv)
+    returns the tables as a spreadsheet download.
+    """
+    if request.format == "xlsx" and not OPENPYXL_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Excel export unavailable")
+
+    if len(request.properties) > PROJECTION_MAX_PROPERTIES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many properties: {len(request.properties)} (max {PROJECTION_MAX_PROPERTIES})"
+        )
+    if request.include_schedule and len(request.properties) > PROJECTION_MAX_SCHEDULE_PROPERTIES:
+        raise HTTPException(
+            status_code=413,
+            detail=(
+                f"include_schedule supports at most {PROJECTION_MAX_SCHEDULE_PROPERTIES} properties "
+                f"(got {len(request.properties)})"
+            )
+        )
+
+    started = time.perf_counter()
+    try:
+        results = await asyncio.to_thread(build_projections, request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if request.format == "xlsx":
+        workbook = await asyncio.to_thread(export_projections_to_excel, results)
+        if workbook is None:
+            raise HTTPException(status_code=500, detail="Excel export failed")
+        return Response(
+            content=workbook,
+            media_type=XLSX_MEDIA_TYPE,
+            headers={"Content-Disposition": 'attachment; filename="propiq-projections.xlsx"'}
+        )
+    if request.format == "csv":
+        reports = [(result["id"] or result["address"] or str(result["index"]), result) for result in results]
+        return Response(
+            content=await asyncio.to_thread(projection_csv, reports),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="propiq-projections.csv"'}
+        )
+    return {
+        "count": len(results),
+        "results": results,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+@router.get("/health")
+async def health_check():
+    """Health check for batch analysis"""
+    return {
+        "status": "healthy",
+        "feature": "batch_analysis",
+        "max_properties": BATCH_MAX_PROPERTIES,
+        "max_narratives": BATCH_MAX_NARRATIVES,
+        "max_sensitivity_cells": SENSITIVITY_MAX_CELLS,
+        "max_projection_properties": PROJECTION_MAX_PROPERTIES,
+        "max_projection_schedule_properties": PROJECTION_MAX_SCHEDULE_PROPERTIES,
+        "excel_export": OPENPYXL_AVAILABLE,
+        "narratives_available": llm_gateway.available,
+        "prompts": {
+            name: stats for name, stats in prompt_registry.stats().items()
+            if name.startswith("analyses.")
+        }
+    }
@@ -0,0 +1,53 @@
+"""
+PropIQ LLM Usage Metrics
+Token and cost aggregates by route, advisor stage, tier and model
+(utils.usage_accounting), for Prometheus scraping and for users checking
+their own daily AI usage.
+
+Set METRICS_TOKEN to require "Authorization: Bearer <token>" on /metrics.
+"""
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+import hmac
+import os
+
+from auth import current_user_tier, verify_token
+from utils.usage_accounting import usage_accountant
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# Prometheus text exposition format
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+def verify_metrics_token(authorization: Optional[str] = Header(None)):
+    """Require the scrape token when METRICS_TOKEN is set"""
+    if not METRICS_TOKEN:
+        return
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+
+
+@router.get("", dependencies=[Depends(verify_metrics_token)])
+async def get_metrics(format: str = Query("prometheus", pattern="^(prometheus|json)$")):
+    """
+    LLM usage since process start: calls, prompt/cached/completion tokens and
+    estimated cost per route, stage, tier and model, plus budget refusals and
+    downgrades. No per-user data.
+    """
+    if format == "json":
+        return usage_accountant.snapshot()
+    return PlainTextResponse(usage_accountant.prometheus(), media_type=PROMETHEUS_MEDIA_TYPE)
+
+
+@router.get("/usage/me")
+async def get_my_usage(request: Request, token_payload: dict = Depends(verify_token)):
+    """Today's LLM usage and remaining budget for the current user"""
+    user_id = token_payload.get("sub", "guest")
+    tier = await current_user_tier(request, user_id)
+    return {"success": True, "usage": usage_accountant.user_usage(user_id, tier)}
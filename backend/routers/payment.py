@@ -8,13 +8,13 @@ Handles checkout session creation and subscription management
 ⚠️  This FastAPI router is being phased out - use Convex for all payment operations
 """
 
-from fastapi import APIRouter, HTTPException, Header, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Request
 from pydantic import BaseModel, EmailStr
 import stripe
 import os
-import jwt
 from dotenv import load_dotenv
 from config.logging_config import get_logger
+from auth import verify_token
 
 logger = get_logger(__name__)
 
@@ -36,10 +36,6 @@ stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
 STRIPE_PRICE_ID = os.getenv("STRIPE_PRICE_ID")  # Default price ID from .env
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
 
-# JWT Configuration (must match auth.py)
-JWT_SECRET = os.getenv("JWT_SECRET", "your-secret-key-change-in-production")
-JWT_ALGORITHM = "HS256"
-
 class CheckoutRequest(BaseModel):
     priceId: str  # Stripe price ID for the selected plan
     tier: str  # "starter", "pro", or "elite"
@@ -57,26 +53,6 @@ class SubscriptionStatusResponse(BaseModel):
 class PaymentCheckRequest(BaseModel):
     user_id: str  # or email if you identify users that way
 
-def verify_token(authorization: str = Header(None)) -> dict:
-    """Verify JWT token from Authorization header"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Authorization header required")
-
-    try:
-        scheme, token = authorization.split()
-        if scheme.lower() != "bearer":
-            raise HTTPException(status_code=401, detail="Invalid authentication scheme")
-
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return payload
-
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    except ValueError:
-        raise HTTPException(status_code=401, detail="Invalid authorization header format")
-
 @router.post("/create-checkout-session", response_model=CheckoutResponse)
 async def create_checkout_session(
     request: CheckoutRequest,
@@ -9,53 +9,104 @@ Architecture:
 - Risk Analyst: Investment risk assessment, downside scenarios
 - Action Planner: Creates concrete action plan for making offer
 
+Stages are saved in advisor_sessions with input fingerprints; re-running a
+session recomputes only the stages whose inputs changed.
+
+POST /advisor/jobs runs the same workflow on background workers: the client
+gets a job id at once, then polls GET /advisor/jobs/{job_id} (completed
+stages appear as they finish) or receives a webhook on completion.
+
 This is a PREMIUM feature for Pro/Elite users.
 """
 
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from fastapi import APIRouter, HTTPException, Depends, Request
+from pydantic import BaseModel, ConfigDict
+from fastapi.encoders import jsonable_encoder
+from typing import Awaitable, Callable, List, Optional, Dict, Any, Tuple
+from collections import OrderedDict
 from datetime import datetime
+import copy
+from urllib.parse import urlparse
 import os
 import json
-from openai import AzureOpenAI
-
-# Database
-try:
-    import database_supabase
-    db = database_supabase.db
-    if db is not None:
-        users = db["users"]
-        property_analyses = db["property_analyses"]
-        advisor_sessions = db["advisor_sessions"]
-        DATABASE_AVAILABLE = True
-    else:
-        DATABASE_AVAILABLE = False
-except Exception as e:
-    print(f"⚠️  Database not available: {e}")
-    DATABASE_AVAILABLE = False
-    db = None
-
-# Auth
-try:
-    from auth import verify_token
-except:
-    def verify_token(authorization: str = None):
-        return {"sub": "guest", "email": "guest@propiq.com"}
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import socket
+import uuid
+import requests
+from requests.adapters import HTTPAdapter
+from config.logging_config import get_logger
+from utils.deadline import DeadlineExceeded, deadline_scope, request_deadline, within_deadline
+from utils.job_queue import advisor_queue, job_queue
+from utils.llm_gateway import llm_gateway
+from underwriting import DEFAULT_FINANCING, RiskReport, assumptions_for_horizon, simulate_risk
+from underwriting.facts import DealFacts, deal_facts
+from utils.prompt_data import canonical_json, compare_tokens, pick
+from utils.prompt_registry import prompt_registry
+from utils.structured_output import (
+    SchemaMismatchError,
+    StructuredOutputError,
+    continuation_messages,
+    parse_continued,
+    parse_structured
+)
+from utils.usage_accounting import BudgetExceeded, usage_accountant, usage_scope
+
+logger = get_logger(__name__)
+
+# Database (advisor_sessions table; see AdvisorSessions for the fallback)
+import database_supabase
+
+# Auth (shared, cached verification)
+from auth import current_user_tier, verify_token
 
 router = APIRouter(prefix="/advisor", tags=["property_advisor"])
 
-try:
-    if os.getenv("AZURE_OPENAI_ENDPOINT") and os.getenv("AZURE_OPENAI_KEY"):
-        client = AzureOpenAI(
-            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            api_key=os.getenv("AZURE_OPENAI_KEY"),
-            api_version="2024-02-15-preview"
-        )
-    else:
-        client = None
-except Exception:
-    client = None
+# Model calls go through the shared gateway (one async connection pool)
+
+# Overall time for the four-agent workflow; stages finished by then are returned
+ADVISOR_DEADLINE_SECONDS = float(os.getenv("ADVISOR_DEADLINE_SECONDS", "90"))
+
+# Background jobs (POST /advisor/jobs): no client is waiting, so a longer budget
+ADVISOR_JOB_DEADLINE_SECONDS = float(os.getenv("ADVISOR_JOB_DEADLINE_SECONDS", "300"))
+ADVISOR_MAX_PENDING_JOBS = int(os.getenv("ADVISOR_MAX_PENDING_JOBS", "200"))
+ADVISOR_JOB_HISTORY = int(os.getenv("ADVISOR_JOB_HISTORY", "1000"))  # Job statuses kept for polling
+# Sessions kept in process when there is no database
+ADVISOR_SESSION_HISTORY = int(os.getenv("ADVISOR_SESSION_HISTORY", "1000"))
+ADVISOR_WEBHOOK_SECRET = os.getenv("ADVISOR_WEBHOOK_SECRET")  # Signs webhook bodies when set
+# Development only: allow webhooks to private/loopback hosts (and plain http to them)
+ADVISOR_WEBHOOK_ALLOW_PRIVATE = os.getenv("ADVISOR_WEBHOOK_ALLOW_PRIVATE", "false").lower() == "true"
+
+# Job statuses ("complete"/"partial" match AdvisorResponse.stage)
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETE = "complete"
+JOB_PARTIAL = "partial"
+JOB_FAILED = "failed"
+JOB_STATUSES = (JOB_QUEUED, JOB_RUNNING, JOB_COMPLETE, JOB_PARTIAL, JOB_FAILED)
+
+# Data-message tokens across runs: compact (sent) vs. the old verbose JSON
+PROMPT_TOKEN_TOTALS = {"runs": 0, "before": 0, "after": 0}
+
+# Stages run vs. reused from a previous run of the same session
+STAGE_TOTALS = {"computed": 0, "reused": 0}
+
+# Agent replies: valid as-is, repaired locally, needed a continue call, unusable
+OUTPUT_TOTALS = {"parsed": 0, "repaired": 0, "continued": 0, "failed": 0}
+
+ADVISOR_MODEL = "gpt-4o-mini"
+
+# First next step of a partial response, by why the run stopped
+STOPPED_MESSAGES = {
+    "deadline": "The analysis took longer than expected and was stopped early",
+    "budget": "You have reached today's AI usage limit for your plan",
+    "invalid_output": "An analyst returned an unusable answer, so the analysis was stopped early"
+}
+
+# Returned (429) when the user's daily LLM budget is spent before any stage ran
+BUDGET_DETAIL = "You have reached today's AI usage limit for your plan. It resets at midnight UTC."
 
 # ============================================================================
 # MODELS
@@ -67,6 +118,13 @@ class PropertyInput(BaseModel):
     bedrooms: Optional[int] = None
     bathrooms: Optional[float] = None
     sqft: Optional[int] = None
+    # Underwriting inputs (with asking_price and monthly_rent, enables the risk simulation)
+    monthly_rent: Optional[float] = None
+    down_payment_percent: Optional[float] = None
+    interest_rate: Optional[float] = None
+    loan_term: Optional[int] = None
+    annual_property_tax: Optional[float] = None
+    annual_insurance: Optional[float] = None
 
 class InvestorProfile(BaseModel):
     risk_tolerance: str  # conservative, moderate, aggressive
@@ -89,6 +147,56 @@ class AdvisorResponse(BaseModel):
     timestamp: datetime
 
 
+# Agent reply schemas: the headline field is required (a cut-off reply
+# without it gets a continue call, complete JSON without it fails the stage);
+# other fields are free-form and extras are kept
+
+class AgentOutput(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+class MarketAnalysisOutput(AgentOutput):
+    neighborhood_score: float
+    market_momentum: Optional[Any] = None
+    comparable_properties: Optional[Any] = None
+    price_trends: Optional[Any] = None
+    market_insights: Optional[Any] = None
+    data_sources: Optional[Any] = None
+
+class DealAnalysisOutput(AgentOutput):
+    deal_score: float
+    recommended_offer: Optional[Any] = None
+    financing_recommendations: Optional[Any] = None
+    cash_flow_projection: Optional[Any] = None
+    roi_metrics: Optional[Any] = None
+    scenarios: Optional[Any] = None
+    deal_breakers: Optional[Any] = None
+
+class RiskAssessmentOutput(AgentOutput):
+    overall_risk_score: float
+    risk_category: Optional[Any] = None
+    alignment_with_profile: Optional[Any] = None
+    top_risks: Optional[Any] = None
+    mitigation_plan: Optional[Any] = None
+    monitoring_checklist: Optional[Any] = None
+    exit_triggers: Optional[Any] = None
+
+class ActionPlanOutput(AgentOutput):
+    recommended_action: str
+    offer_strategy: Optional[Any] = None
+    due_diligence_checklist: Optional[Any] = None
+    timeline: Optional[Any] = None
+    team_needed: Optional[Any] = None
+    estimated_costs: Optional[Any] = None
+    success_metrics: Optional[Any] = None
+
+OUTPUT_SCHEMAS = {
+    "market_analysis": MarketAnalysisOutput,
+    "deal_analysis": DealAnalysisOutput,
+    "risk_assessment": RiskAssessmentOutput,
+    "action_plan": ActionPlanOutput
+}
+
+
 # ============================================================================
 # SUB-AGENT PROMPTS
 # ============================================================================
@@ -140,6 +248,9 @@ Analyze the financial viability of the deal and create multiple investment scena
 1. Conservative: Worst-case assumptions (high interest, low rent, high vacancy)
 2. Realistic: Most likely outcome based on market data
 3. Optimistic: Best-case (quick appreciation, high rents, low expenses)
+When Deal Facts are provided, use their scenarios for these three and cite
+them. Do not recompute or invent them. Likewise, base cash_flow_projection
+and IRR on the Deal Facts projection.
 
 **Output Format**:
 Return structured JSON with:
@@ -188,6 +299,11 @@ Return structured JSON with:
 - monitoring_checklist (what to watch for)
 - exit_triggers (when to sell/walk away)
 
+**Quantitative Basis**:
+When a Monte Carlo simulation is provided, base probabilities and the overall
+risk score on its figures (negative cash flow probability, IRR percentiles,
+probability of loss) and cite them. Do not invent probabilities it already gives.
+
 **Important**:
 - Be thorough but not alarmist
 - Provide actionable mitigation strategies
@@ -271,110 +387,360 @@ Guide the investor through a structured advisory process using specialized sub-a
 """
 
 
+# How every agent's data message is laid out (see stage_data)
+DATA_FORMAT_NOTE = """
+**Input Data**:
+Each section is one line of compact JSON (**Section**: {...}). Deal Facts,
+when present, are computed by PropIQ's calculator (metrics, scenarios,
+multi-year projection); treat them as authoritative and do not recompute them.
+Upstream sections hold the key findings of earlier agents.
+"""
+
+# Compiled once; each agent's fixed task sits in its static prompt so only the
+# trailing data message differs between calls
+MARKET_ANALYST = prompt_registry.register(
+    "advisor.market_analyst",
+    MARKET_ANALYST_PROMPT + DATA_FORMAT_NOTE
+    + "\nTask: Provide comprehensive market analysis focusing on investment viability."
+)
+DEAL_ANALYST = prompt_registry.register(
+    "advisor.deal_analyst",
+    DEAL_ANALYST_PROMPT + DATA_FORMAT_NOTE
+    + "\nTask: Create financial scenarios and recommend deal structure."
+)
+RISK_ANALYST = prompt_registry.register(
+    "advisor.risk_analyst",
+    RISK_ANALYST_PROMPT + DATA_FORMAT_NOTE
+    + "\nTask: Provide comprehensive risk assessment aligned with investor's risk tolerance."
+)
+ACTION_PLANNER = prompt_registry.register(
+    "advisor.action_planner",
+    ACTION_PLANNER_PROMPT + DATA_FORMAT_NOTE
+    + "\nTask: Provide step-by-step action plan with timelines and checklists."
+)
+COORDINATOR = prompt_registry.register("advisor.coordinator", COORDINATOR_PROMPT)
+
+
 # ============================================================================
 # SUB-AGENT EXECUTION
 # ============================================================================
 
-async def run_market_analyst(property_data: Dict[str, Any]) -> Dict[str, Any]:
-    """Execute market research analysis"""
-    messages = [
-        {"role": "system", "content": MARKET_ANALYST_PROMPT},
-        {
-            "role": "user",
-            "content": f"""Analyze the market for this property:
+class StageMemo:
+    """
+    Stage outputs of a session's previous run, keyed by input fingerprint
 
-Address: {property_data.get('address')}
-Asking Price: ${property_data.get('asking_price', 'Not provided'):,}
-Property Type: {property_data.get('bedrooms')}bd/{property_data.get('bathrooms')}ba, {property_data.get('sqft', 'Unknown')} sqft
+    A stage's fingerprint covers everything its agent call depends on (prompt,
+    model settings, data message). Since the data message embeds the upstream
+    digests, a changed upstream output changes every downstream fingerprint,
+    while e.g. a profile change leaves the market analysis (which never sees
+    the profile) reusable.
+    """
 
-Provide comprehensive market analysis focusing on investment viability.
-"""
+    def __init__(self, stages: Optional[List[Dict[str, Any]]] = None):
+        self.previous = {
+            stage["stage"]: stage for stage in stages or []
+            if stage.get("fingerprint")
         }
-    ]
-
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+        self.fingerprints: Dict[str, str] = {}
+        self.reused: List[str] = []
+
+    def lookup(self, stage: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """The previous output for this stage if its inputs are unchanged"""
+        self.fingerprints[stage] = fingerprint
+        previous = self.previous.get(stage)
+        if previous is None or previous["fingerprint"] != fingerprint:
+            return None
+        self.reused.append(stage)
+        return previous["output"]
+
+
+def stage_fingerprint(prompt, data: str, temperature: float, max_tokens: int) -> str:
+    """Hash of an agent call's inputs (prompt text, model settings, data message)"""
+    digest = hashlib.sha256()
+    for part in (prompt.name, prompt.text, ADVISOR_MODEL, str(temperature), str(max_tokens), data):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+async def run_agent(
+    prompt,
+    data: str,
+    temperature: float,
+    max_tokens: int,
+    stage: str,
+    memo: Optional[StageMemo] = None
+) -> Dict[str, Any]:
+    """
+    Run one sub-agent: static prompt first, per-request data last, JSON out
+
+    With a memo, an unchanged stage returns its previous output without a call.
+    The reply is validated against the stage's schema; malformed JSON is
+    repaired locally. A reply that is unrepairable, or that repaired cleanly
+    but was cut off at max_tokens (finish_reason "length"), costs a continue
+    call; if the continuation is unusable the repaired reply is kept. Complete
+    JSON of the wrong shape fails the stage at once.
+    """
+    if memo is not None:
+        previous = memo.lookup(stage, stage_fingerprint(prompt, data, temperature, max_tokens))
+        if previous is not None:
+            return previous
+
+    messages = prompt.messages(data)
+    response = await llm_gateway.complete(
+        model=ADVISOR_MODEL,
         messages=messages,
-        temperature=0.3,  # More factual
-        max_tokens=1500,
-        response_format={"type": "json_object"}
+        temperature=temperature,
+        max_tokens=max_tokens,
+        response_format={"type": "json_object"},
+        usage_tags={"stage": stage}
+    )
+    prompt_registry.record(prompt.name, response.usage)
+    content = response.choices[0].message.content or ""
+    finish_reason = getattr(response.choices[0], "finish_reason", None)
+    schema = OUTPUT_SCHEMAS[stage]
+    truncated = None
+
+    try:
+        parsed = parse_structured(content, schema)
+        if parsed.repaired and finish_reason == "length":
+            # Repair closed the brackets, but whatever followed the cut is missing
+            truncated = parsed
+            raise StructuredOutputError("Reply cut off at max_tokens")
+    except SchemaMismatchError as e:
+        # Complete JSON (so not cut off): a continuation would only append to it
+        OUTPUT_TOTALS["failed"] += 1
+        logger.warning(f"{prompt.name} reply has the wrong shape, not continuing: {e}")
+        raise
+    except StructuredOutputError as e:
+        # Cut off or unrepairable JSON: have the model finish this reply
+        # instead of failing the whole run
+        logger.warning(f"{prompt.name} reply unusable (finish_reason={finish_reason}: {e}), asking the model to continue")
+        OUTPUT_TOTALS["continued"] += 1
+        continuation = await llm_gateway.complete(
+            model=ADVISOR_MODEL,
+            messages=continuation_messages(messages, content),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            usage_tags={"stage": stage}
+        )
+        prompt_registry.record(prompt.name, continuation.usage)
+        try:
+            parsed = parse_continued(content, continuation.choices[0].message.content, schema)
+        except StructuredOutputError:
+            if truncated is None:
+                OUTPUT_TOTALS["failed"] += 1
+                raise
+            parsed = truncated
+
+    OUTPUT_TOTALS["repaired" if parsed.repaired else "parsed"] += 1
+    return parsed.data
+
+
+# Upstream output fields the later agents actually use; the rest (comps,
+# sources, checklists) stays in the stage output for the user
+DIGEST_FIELDS = {
+    "market_analysis": ("neighborhood_score", "market_momentum", "price_trends", "market_insights"),
+    "deal_analysis": ("deal_score", "recommended_offer", "financing_recommendations", "roi_metrics", "deal_breakers"),
+    "risk_assessment": (
+        "overall_risk_score", "risk_category", "alignment_with_profile",
+        "top_risks", "mitigation_plan", "exit_triggers"
     )
+}
+
+# Attached from local computation; agents get these numbers via the deal facts
+CALCULATED_KEYS = ("calculated_scenarios", "calculated_projection", "simulation")
+
+# Upstream stages each stage reads, and their labels in the data message
+STAGE_INPUTS = {
+    "market_analysis": (),
+    "deal_analysis": ("market_analysis",),
+    "risk_assessment": ("market_analysis", "deal_analysis"),
+    "action_plan": ("market_analysis", "deal_analysis", "risk_assessment")
+}
+STAGE_LABELS = {
+    "market_analysis": "Market Analysis",
+    "deal_analysis": "Deal Analysis",
+    "risk_assessment": "Risk Assessment"
+}
+
 
-    return json.loads(response.choices[0].message.content)
+def stage_digest(stage: str, output: Dict[str, Any]) -> Dict[str, Any]:
+    """The part of an upstream output later agents need (all of it, minus calculated keys, if unrecognized)"""
+    digest = pick(output, DIGEST_FIELDS[stage])
+    return digest or {key: value for key, value in output.items() if key not in CALCULATED_KEYS}
+
+
+def stage_data(
+    stage: str,
+    property_data: Dict[str, Any],
+    investor_profile: Optional[Dict[str, Any]],
+    upstream: Dict[str, Dict[str, Any]],
+    facts: Optional[DealFacts] = None,
+    extra: Optional[str] = None
+) -> str:
+    """
+    Per-request data message for a stage, one compact canonical line per section
+
+    Deterministic: the same inputs always render the same text.
+    """
+    sections = [("Property", property_data)]
+    if investor_profile is not None:
+        sections.append(("Investor Profile", investor_profile))
+    if facts is not None:
+        sections.append(("Deal Facts", facts.to_dict()))
+    sections.extend((STAGE_LABELS[name], stage_digest(name, upstream[name])) for name in STAGE_INPUTS[stage])
+
+    data = "\n".join(f"**{label}**: {canonical_json(value)}" for label, value in sections)
+    return f"{data}\n{extra}" if extra else data
+
+
+def verbose_stage_data(
+    stage: str,
+    property_data: Dict[str, Any],
+    investor_profile: Optional[Dict[str, Any]],
+    upstream: Dict[str, Dict[str, Any]],
+    extra: Optional[str] = None
+) -> str:
+    """The previous rendering (indented JSON of whole upstream outputs), for the token report"""
+    sections = [("Property", property_data)]
+    sections.extend((STAGE_LABELS[name], upstream[name]) for name in STAGE_INPUTS[stage])
+    if investor_profile is not None:
+        sections.append(("Investor Profile", investor_profile))
+
+    data = "\n".join(f"**{label}**: {json.dumps(value, indent=2, default=str)}" for label, value in sections)
+    return f"{data}\n{extra}" if extra else data
+
+
+def prompt_token_report(
+    stages: List[Dict[str, Any]],
+    property_data: Dict[str, Any],
+    investor_profile: Dict[str, Any],
+    facts: Optional[DealFacts] = None,
+    simulation: Optional[RiskReport] = None
+) -> Dict[str, Any]:
+    """
+    Data-message tokens per completed stage: compact (sent) vs. verbose JSON
+
+    Reused stages sent nothing and are left out.
+
+    Returns:
+        {"stages": {stage: compare_tokens(...)}, "total": {...}}
+    """
+    outputs = {stage["stage"]: stage["output"] for stage in stages}
+    report = {}
+    for stage in (stage["stage"] for stage in stages if not stage.get("reused")):
+        profile = None if stage == "market_analysis" else investor_profile
+        extra = simulation_section(simulation) if stage == "risk_assessment" else None
+        sent = stage_data(stage, property_data, profile, outputs, facts if profile else None, extra)
+        verbose = verbose_stage_data(stage, property_data, profile, outputs, extra)
+        report[stage] = compare_tokens(verbose, sent)
+
+    before = sum(r["before"] for r in report.values())
+    after = sum(r["after"] for r in report.values())
+    total = {
+        "before": before,
+        "after": after,
+        "saved": before - after,
+        "saved_percent": round((before - after) / before * 100, 1) if before else 0.0
+    }
+    PROMPT_TOKEN_TOTALS["runs"] += 1
+    PROMPT_TOKEN_TOTALS["before"] += before
+    PROMPT_TOKEN_TOTALS["after"] += after
+    return {"stages": report, "total": total}
+
+
+async def run_market_analyst(property_data: Dict[str, Any], memo: Optional[StageMemo] = None) -> Dict[str, Any]:
+    """Execute market research analysis"""
+    data = stage_data("market_analysis", property_data, None, {})
+    return await run_agent(
+        MARKET_ANALYST, data, temperature=0.3, max_tokens=1500,  # More factual
+        stage="market_analysis", memo=memo
+    )
 
 
 async def run_deal_analyst(
     property_data: Dict[str, Any],
     market_analysis: Dict[str, Any],
-    investor_profile: Dict[str, Any]
+    investor_profile: Dict[str, Any],
+    facts: Optional[DealFacts] = None,
+    memo: Optional[StageMemo] = None
 ) -> Dict[str, Any]:
-    """Execute financial deal analysis"""
-    messages = [
-        {"role": "system", "content": DEAL_ANALYST_PROMPT},
-        {
-            "role": "user",
-            "content": f"""Analyze this investment deal:
-
-**Property**:
-{json.dumps(property_data, indent=2)}
-
-**Market Analysis**:
-{json.dumps(market_analysis, indent=2)}
-
-**Investor Profile**:
-- Risk Tolerance: {investor_profile.get('risk_tolerance')}
-- Investment Horizon: {investor_profile.get('investment_horizon')}
-- Strategy: {investor_profile.get('strategy')}
-- Available Capital: ${investor_profile.get('available_capital', 'Not provided'):,}
-
-Create financial scenarios and recommend deal structure.
-"""
-        }
-    ]
+    """Execute financial deal analysis (grounded in the deal facts when available)"""
+    upstream = {"market_analysis": market_analysis}
+    data = stage_data("deal_analysis", property_data, investor_profile, upstream, facts)
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=messages,
-        temperature=0.3,
-        max_tokens=2000,
-        response_format={"type": "json_object"}
+    deal_analysis = await run_agent(
+        DEAL_ANALYST, data, temperature=0.3, max_tokens=2000, stage="deal_analysis", memo=memo
     )
+    if facts is not None:
+        deal_analysis["calculated_scenarios"] = facts.scenarios
+        deal_analysis["calculated_projection"] = facts.projection
+    return deal_analysis
+
+
+def underwriting_inputs(property_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Deal inputs for the underwriting engine (None without price and rent)"""
+    if not property_data.get("asking_price") or not property_data.get("monthly_rent"):
+        return None
+    deal = {
+        field: property_data[field] if property_data.get(field) is not None else default
+        for field, default in DEFAULT_FINANCING.items()
+    }
+    deal.update(
+        purchase_price=property_data["asking_price"],
+        monthly_rent=property_data["monthly_rent"],
+        annual_property_tax=property_data.get("annual_property_tax"),
+        annual_insurance=property_data.get("annual_insurance")
+    )
+    return deal
+
+
+def advisor_facts(property_data: Dict[str, Any], investor_profile: Dict[str, Any]) -> Optional[DealFacts]:
+    """Deal facts at the investor's hold period (None without price and rent)"""
+    deal = underwriting_inputs(property_data)
+    if deal is None:
+        return None
+    hold_years = assumptions_for_horizon(investor_profile.get("investment_horizon")).horizon_years
+    return deal_facts(deal, hold_years=hold_years)
+
+
+async def run_risk_simulation(
+    property_data: Dict[str, Any],
+    investor_profile: Dict[str, Any]
+) -> Optional[RiskReport]:
+    """Monte Carlo risk report for the property (None without price and rent)"""
+    deal = underwriting_inputs(property_data)
+    if deal is None:
+        return None
+    assumptions = assumptions_for_horizon(investor_profile.get("investment_horizon"))
+    # CPU-bound (~0.3s); keep it off the event loop
+    return await within_deadline(asyncio.to_thread(simulate_risk, deal, assumptions), "risk simulation")
+
 
-    return json.loads(response.choices[0].message.content)
+def simulation_section(simulation: Optional[RiskReport]) -> Optional[str]:
+    return f"**Monte Carlo Simulation**:\n{simulation.prompt_summary()}" if simulation is not None else None
 
 
 async def run_risk_analyst(
     property_data: Dict[str, Any],
     market_analysis: Dict[str, Any],
     deal_analysis: Dict[str, Any],
-    investor_profile: Dict[str, Any]
+    investor_profile: Dict[str, Any],
+    simulation: Optional[RiskReport] = None,
+    facts: Optional[DealFacts] = None,
+    memo: Optional[StageMemo] = None
 ) -> Dict[str, Any]:
-    """Execute risk assessment"""
-    messages = [
-        {"role": "system", "content": RISK_ANALYST_PROMPT},
-        {
-            "role": "user",
-            "content": f"""Assess investment risks for this deal:
-
-**Property**: {json.dumps(property_data, indent=2)}
-**Market Analysis**: {json.dumps(market_analysis, indent=2)}
-**Deal Analysis**: {json.dumps(deal_analysis, indent=2)}
-**Investor Profile**: {json.dumps(investor_profile, indent=2)}
-
-Provide comprehensive risk assessment aligned with investor's risk tolerance.
-"""
-        }
-    ]
+    """Execute risk assessment (grounded in the Monte Carlo report when available)"""
+    upstream = {"market_analysis": market_analysis, "deal_analysis": deal_analysis}
+    data = stage_data("risk_assessment", property_data, investor_profile, upstream, facts, simulation_section(simulation))
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=messages,
-        temperature=0.3,
-        max_tokens=1500,
-        response_format={"type": "json_object"}
+    risk_analysis = await run_agent(
+        RISK_ANALYST, data, temperature=0.3, max_tokens=1500, stage="risk_assessment", memo=memo
     )
-
-    return json.loads(response.choices[0].message.content)
+    if simulation is not None:
+        risk_analysis["simulation"] = simulation.to_dict()
+    return risk_analysis
 
 
 async def run_action_planner(
@@ -382,58 +748,294 @@ async def run_action_planner(
     market_analysis: Dict[str, Any],
     deal_analysis: Dict[str, Any],
     risk_analysis: Dict[str, Any],
-    investor_profile: Dict[str, Any]
+    investor_profile: Dict[str, Any],
+    facts: Optional[DealFacts] = None,
+    memo: Optional[StageMemo] = None
 ) -> Dict[str, Any]:
     """Create actionable execution plan"""
-    messages = [
-        {"role": "system", "content": ACTION_PLANNER_PROMPT},
-        {
-            "role": "user",
-            "content": f"""Create an action plan for this investment:
-
-**Property**: {json.dumps(property_data, indent=2)}
-**Market**: {json.dumps(market_analysis, indent=2)}
-**Deal**: {json.dumps(deal_analysis, indent=2)}
-**Risks**: {json.dumps(risk_analysis, indent=2)}
-**Investor**: {json.dumps(investor_profile, indent=2)}
-
-Provide step-by-step action plan with timelines and checklists.
-"""
+    upstream = {
+        "market_analysis": market_analysis,
+        "deal_analysis": deal_analysis,
+        "risk_assessment": risk_analysis
+    }
+    data = stage_data("action_plan", property_data, investor_profile, upstream, facts)
+    return await run_agent(
+        ACTION_PLANNER, data, temperature=0.4, max_tokens=2000,  # Slightly creative for planning
+        stage="action_plan", memo=memo
+    )
+
+
+def stage_record(stage: str, agent: str, output: Dict[str, Any], memo: StageMemo) -> Dict[str, Any]:
+    """A completed stage as saved in the session (with its input fingerprint)"""
+    reused = stage in memo.reused
+    STAGE_TOTALS["reused" if reused else "computed"] += 1
+    return {
+        "stage": stage,
+        "agent": agent,
+        "output": output,
+        "fingerprint": memo.fingerprints.get(stage),
+        "reused": reused,
+        "timestamp": datetime.utcnow()
+    }
+
+
+class AdvisorSessions:
+    """
+    Saved advisor sessions: stage records from the last run, and the status
+    of the last background job
+
+    Stored in the Supabase advisor_sessions table (see
+    supabase_migration_advisor_sessions.sql). Without a database they are
+    kept in process instead (bounded, least recently saved evicted first),
+    so re-runs on the same worker still reuse stages. All methods block.
+    """
+
+    def __init__(self, max_sessions: int = ADVISOR_SESSION_HISTORY):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+
+    @property
+    def backend(self) -> str:
+        return "supabase" if database_supabase.get_database() is not None else "memory"
+
+    def get(self, session_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        if self.backend == "supabase":
+            return database_supabase.get_advisor_session(session_id, user_id)
+        return copy.deepcopy(self._sessions.get((session_id, user_id)))
+
+    def get_by_job(self, job_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        if self.backend == "supabase":
+            return database_supabase.get_advisor_session_by_job(job_id, user_id)
+        for session in reversed(self._sessions.values()):
+            if session.get("job_id") == job_id and session["user_id"] == user_id:
+                return copy.deepcopy(session)
+        return None
+
+    def save(self, session_id: str, user_id: str, fields: Dict[str, Any]):
+        """Create or update the session with these fields (created_at set on creation)"""
+        if self.backend == "supabase":
+            database_supabase.upsert_advisor_session(session_id, user_id, jsonable_encoder(fields))
+            return
+        now = datetime.utcnow()
+        session = self._sessions.pop((session_id, user_id), None) or {
+            "session_id": session_id, "user_id": user_id, "created_at": now
         }
-    ]
+        session.update(copy.deepcopy(fields), updated_at=now)
+        self._sessions[(session_id, user_id)] = session
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=messages,
-        temperature=0.4,  # Slightly creative for planning
-        max_tokens=2000,
-        response_format={"type": "json_object"}
-    )
 
-    return json.loads(response.choices[0].message.content)
+advisor_sessions = AdvisorSessions()
+
+
+async def load_stage_memo(session_id: Optional[str], user_id: str) -> StageMemo:
+    """Stages saved by the session's previous run (empty memo for a new session)"""
+    if not session_id:
+        return StageMemo()
+    try:
+        session = await within_deadline(
+            asyncio.to_thread(advisor_sessions.get, session_id, user_id),
+            "session lookup"
+        )
+    except Exception as e:
+        print(f"⚠️  Advisor session lookup failed, running all stages: {e}")
+        return StageMemo()
+    return StageMemo(session.get("stages") if session else None)
 
 
 # ============================================================================
 # MAIN ADVISOR ENDPOINT
 # ============================================================================
 
-@router.post("/analyze", response_model=AdvisorResponse)
+StageCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+async def advisor_workflow(
+    property_data: Dict[str, Any],
+    investor_profile: Dict[str, Any],
+    memo: StageMemo,
+    on_stage: Optional[StageCallback] = None
+) -> Dict[str, Any]:
+    """
+    Run the four agents in order, stopping early if the deadline passes, the
+    user's daily LLM budget runs out or an agent's reply is unusable
+
+    Args:
+        property_data: Property input
+        investor_profile: Investor profile
+        memo: Stages reusable from the session's previous run
+        on_stage: Awaited with each stage record as it completes
+
+    Returns:
+        {"stages": [stage records], "completed": bool,
+         "stopped": None | "deadline" | "budget" | "invalid_output",
+         "token_report": {...}}
+    """
+    # Deal facts computed locally once, shared by every agent
+    facts = advisor_facts(property_data, investor_profile)
+    simulation = None
+    stages = []
+    stopped = None
+
+    async def finish(stage: str, agent: str, output: Dict[str, Any]):
+        record = stage_record(stage, agent, output, memo)
+        stages.append(record)
+        if on_stage is not None:
+            await on_stage(record)
+
+    # Each stage needs the previous ones; if one stops the run, keep what finished
+    try:
+        # Stage 1: Market Analysis
+        print("Running Market Analyst...")
+        market_analysis = await run_market_analyst(property_data, memo)
+        await finish("market_analysis", "Market Analyst", market_analysis)
+
+        # Stage 2: Deal Analysis
+        print("Running Deal Analyst...")
+        deal_analysis = await run_deal_analyst(property_data, market_analysis, investor_profile, facts, memo)
+        await finish("deal_analysis", "Deal Analyst", deal_analysis)
+
+        # Stage 3: Risk Assessment (Monte Carlo first, so the agent has numbers)
+        print("Running Risk Analyst...")
+        simulation = await run_risk_simulation(property_data, investor_profile)
+        risk_analysis = await run_risk_analyst(
+            property_data, market_analysis, deal_analysis, investor_profile, simulation, facts, memo
+        )
+        await finish("risk_assessment", "Risk Analyst", risk_analysis)
+
+        # Stage 4: Action Planning
+        print("Running Action Planner...")
+        action_plan = await run_action_planner(
+            property_data, market_analysis, deal_analysis, risk_analysis, investor_profile, facts, memo
+        )
+        await finish("action_plan", "Action Planner", action_plan)
+    except DeadlineExceeded as e:
+        print(f"⚠️  Advisor cut short after {len(stages)} stage(s): {e}")
+        stopped = "deadline"
+    except BudgetExceeded as e:
+        print(f"⚠️  Advisor stopped after {len(stages)} stage(s): {e}")
+        stopped = "budget"
+    except StructuredOutputError as e:
+        # Already logged and counted by run_agent
+        print(f"⚠️  Advisor stopped after {len(stages)} stage(s), unusable agent reply: {e}")
+        stopped = "invalid_output"
+
+    return {
+        "stages": stages,
+        "completed": stopped is None,
+        "stopped": stopped,
+        "token_report": prompt_token_report(stages, property_data, investor_profile, facts, simulation)
+    }
+
+
+def save_session(
+    session_id: str,
+    user_id: str,
+    property_data: Dict[str, Any],
+    investor_profile: Dict[str, Any],
+    fields: Dict[str, Any]
+):
+    """Save the run's inputs and results on the advisor session"""
+    advisor_sessions.save(session_id, user_id, {
+        "property": property_data,
+        "investor_profile": investor_profile,
+        **fields
+    })
+
+
+def advisor_response(session_id: str, run: Dict[str, Any], memo: StageMemo) -> AdvisorResponse:
+    """The complete (or, if the run stopped early, partial) response for a workflow run"""
+    stages = run["stages"]
+    outputs = {stage["stage"]: stage["output"] for stage in stages}
+
+    if not run["completed"]:
+        done = [stage["agent"] for stage in stages]
+        return AdvisorResponse(
+            success=bool(stages),
+            session_id=session_id,
+            stage="partial",
+            agent_used=", ".join(done) or "None",
+            output={
+                **outputs,
+                "reused_stages": memo.reused,
+                "token_report": run["token_report"]
+            },
+            next_steps=[
+                STOPPED_MESSAGES[run["stopped"]],
+                "Review the completed stages above",
+                "Run the advisor again to complete the remaining stages"
+            ],
+            timestamp=datetime.utcnow()
+        )
+
+    # Return final action plan (most useful for user)
+    return AdvisorResponse(
+        success=True,
+        session_id=session_id,
+        stage="complete",
+        agent_used="All Agents",
+        output={
+            **outputs,
+            "recommendation": outputs["action_plan"].get("recommended_action", "Review analysis"),
+            "reused_stages": memo.reused,
+            "token_report": run["token_report"]
+        },
+        next_steps=[
+            "Review the comprehensive analysis",
+            "Check the action plan timeline",
+            "Verify due diligence checklist",
+            "Consult with your team (agent, inspector, etc.)",
+            "Make go/no-go decision"
+        ],
+        timestamp=datetime.utcnow()
+    )
+
+
+async def user_tier(http_request: Request, user_id: str) -> Optional[str]:
+    """The user's subscription tier (None without a database)"""
+    return await within_deadline(current_user_tier(http_request, user_id), "user lookup")
+
+
+def budget_spent(user_id: str, tier: Optional[str]) -> bool:
+    """True if the user has no LLM budget left today"""
+    return usage_accountant.user_usage(user_id, tier)["remaining_usd"] == 0
+
+
+def new_session_id(session_id: Optional[str]) -> str:
+    """The requested session id, or a fresh one"""
+    if session_id:
+        return session_id
+    from bson import ObjectId
+    return str(ObjectId())
+
+
+@router.post(
+    "/analyze", response_model=AdvisorResponse,
+    dependencies=[Depends(request_deadline(ADVISOR_DEADLINE_SECONDS, "property advisor"))]
+)
 async def run_property_advisor(
     request: AdvisorRequest,
+    http_request: Request,
     token_payload: dict = Depends(verify_token)
 ):
     """
     Multi-agent property investment advisor.
     Premium feature for Pro/Elite users.
+
+    If the request deadline passes, the stages completed so far are saved and
+    returned with stage="partial". For runs that should not hold the
+    connection open, submit a job to POST /advisor/jobs instead.
     """
     user_id = token_payload.get("sub", "guest")
 
     # Check user tier (premium feature)
-    if DATABASE_AVAILABLE:
-        user = users.find_one({"_id": user_id})
-        tier = user.get("subscription", {}).get("tier", "free") if user else "free"
+    try:
+        tier = await user_tier(http_request, user_id)
+    except DeadlineExceeded:
+        raise HTTPException(status_code=503, detail="Property Advisor is busy, please try again shortly.")
 
-    if not client:
+    if not llm_gateway.available:
         raise HTTPException(
             status_code=503,
             detail="Property Advisor temporarily unavailable due to AI system maintenance."
@@ -441,105 +1043,347 @@ async def run_property_advisor(
 
     try:
         # Create or load session
-        from bson import ObjectId
-        session_id = request.session_id or str(ObjectId())
+        session_id = new_session_id(request.session_id)
 
         # Convert Pydantic models to dicts
         property_data = request.property.dict()
         investor_profile = request.investor_profile.dict()
 
-        # Execute multi-agent workflow
-        stages = []
+        # Stages whose inputs are unchanged since the session's last run are reused
+        memo = await load_stage_memo(request.session_id, user_id)
 
-        # Stage 1: Market Analysis
-        print("Running Market Analyst...")
-        market_analysis = await run_market_analyst(property_data)
-        stages.append({
-            "stage": "market_analysis",
-            "agent": "Market Analyst",
-            "output": market_analysis,
-            "timestamp": datetime.utcnow()
-        })
+        # Execute multi-agent workflow (model calls attributed to this user and tier)
+        with usage_scope(route="advisor", user_id=user_id, tier=tier):
+            run = await advisor_workflow(property_data, investor_profile, memo)
+        if run["stopped"] == "budget" and not run["stages"]:
+            raise HTTPException(status_code=429, detail=BUDGET_DETAIL)
 
-        # Stage 2: Deal Analysis
-        print("Running Deal Analyst...")
-        deal_analysis = await run_deal_analyst(property_data, market_analysis, investor_profile)
-        stages.append({
-            "stage": "deal_analysis",
-            "agent": "Deal Analyst",
-            "output": deal_analysis,
-            "timestamp": datetime.utcnow()
+        # Save session (complete or partial); not bounded by the deadline
+        await asyncio.to_thread(save_session, session_id, user_id, property_data, investor_profile, {
+            "stages": run["stages"],
+            "complete": run["completed"],
+            "token_report": run["token_report"]
         })
 
-        # Stage 3: Risk Assessment
-        print("Running Risk Analyst...")
-        risk_analysis = await run_risk_analyst(
-            property_data, market_analysis, deal_analysis, investor_profile
-        )
-        stages.append({
-            "stage": "risk_assessment",
-            "agent": "Risk Analyst",
-            "output": risk_analysis,
-            "timestamp": datetime.utcnow()
-        })
+        return advisor_response(session_id, run, memo)
 
-        # Stage 4: Action Planning
-        print("Running Action Planner...")
-        action_plan = await run_action_planner(
-            property_data, market_analysis, deal_analysis, risk_analysis, investor_profile
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Advisor analysis failed: {str(e)}"
         )
-        stages.append({
-            "stage": "action_plan",
-            "agent": "Action Planner",
-            "output": action_plan,
-            "timestamp": datetime.utcnow()
-        })
 
-        # Save complete session
-        if DATABASE_AVAILABLE:
-            advisor_sessions.update_one(
-                {"session_id": session_id, "user_id": user_id},
-                {
-                    "$set": {
-                        "property": property_data,
-                        "investor_profile": investor_profile,
-                        "stages": stages,
-                        "updated_at": datetime.utcnow()
-                    },
-                    "$setOnInsert": {"created_at": datetime.utcnow()}
-                },
-                upsert=True
-            )
-
-        # Return final action plan (most useful for user)
-        return AdvisorResponse(
-            success=True,
-            session_id=session_id,
-            stage="complete",
-            agent_used="All Agents",
-            output={
-                "market_analysis": market_analysis,
-                "deal_analysis": deal_analysis,
-                "risk_assessment": risk_analysis,
-                "action_plan": action_plan,
-                "recommendation": action_plan.get("recommended_action", "Review analysis")
-            },
-            next_steps=[
-                "Review the comprehensive analysis",
-                "Check the action plan timeline",
-                "Verify due diligence checklist",
-                "Consult with your team (agent, inspector, etc.)",
-                "Make go/no-go decision"
-            ],
-            timestamp=datetime.utcnow()
-        )
 
+# ============================================================================
+# BACKGROUND JOBS
+# ============================================================================
+
+class AdvisorJobRequest(AdvisorRequest):
+    webhook_url: Optional[str] = None  # POSTed the result when the job finishes
+
+
+class AdvisorJobs:
+    """
+    Status of advisor jobs, for polling
+
+    Kept in process (bounded, oldest finished jobs evicted first) and, with a
+    database, mirrored onto the session so any worker can answer a poll.
+    """
+
+    def __init__(self, max_jobs: int = ADVISOR_JOB_HISTORY):
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def create(self, job_id: str, session_id: str, user_id: str) -> Dict[str, Any]:
+        job = {
+            "job_id": job_id,
+            "session_id": session_id,
+            "user_id": user_id,
+            "status": JOB_QUEUED,
+            "stages": [],
+            "output": {},
+            "result": None,
+            "error": None,
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow()
+        }
+        self._jobs[job_id] = job
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._jobs.get(job_id)
+
+    def update(self, job_id: str, **fields) -> Dict[str, Any]:
+        job = self._jobs.get(job_id)
+        if job is None:  # Evicted, or submitted to another worker before a restart
+            job = {"job_id": job_id, "stages": [], "output": {}, "result": None, "error": None}
+            self._jobs[job_id] = job
+        job.update(fields, updated_at=datetime.utcnow())
+        return job
+
+    def counts(self) -> Dict[str, int]:
+        counts = {status: 0 for status in JOB_STATUSES}
+        for job in self._jobs.values():
+            counts[job.get("status", JOB_QUEUED)] += 1
+        return counts
+
+
+advisor_jobs = AdvisorJobs()
+
+
+def job_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    """A job as returned to its owner (stages so far, result once finished)"""
+    return {key: value for key, value in job.items() if key != "user_id"}
+
+
+def mirror_job(job: Dict[str, Any]):
+    """Store the job's status on its session so other workers can serve polls"""
+    if job.get("session_id"):
+        advisor_sessions.save(job["session_id"], job["user_id"], {"job_id": job["job_id"], "job": job_view(job)})
+
+
+def webhook_address(url: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    The address to call a webhook URL at, or why it may not be called
+
+    The URL is user-supplied and fetched from inside our network, so it must
+    be https and every address its host resolves to must be public: private,
+    loopback, link-local (cloud metadata), reserved and other non-global
+    ranges are refused. Resolves DNS (blocking).
+
+    Returns:
+        (address, None) if the URL may be called, else (None, error)
+    """
+    try:
+        parsed = urlparse(url)
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    except ValueError:
+        return None, "webhook_url is not a valid URL"
+    if not parsed.hostname:
+        return None, "webhook_url is not a valid URL"
+    if parsed.scheme != "https" and not (parsed.scheme == "http" and ADVISOR_WEBHOOK_ALLOW_PRIVATE):
+        return None, "webhook_url must be an https URL"
+
+    try:
+        infos = socket.getaddrinfo(parsed.hostname, port, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError):
+        return None, "webhook_url host does not resolve"
+
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not (address.is_global and not address.is_multicast) and not ADVISOR_WEBHOOK_ALLOW_PRIVATE:
+            return None, "webhook_url must point to a public host"
+    return infos[0][4][0].split("%")[0], None
+
+
+def webhook_url_error(url: str) -> Optional[str]:
+    """Why a webhook URL may not be called, or None if it may (see webhook_address)"""
+    return webhook_address(url)[1]
+
+
+def validate_webhook_url(url: str) -> str:
+    """Reject webhook URLs that are not public https endpoints (400)"""
+    error = webhook_url_error(url)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    return url
+
+
+def webhook_signature(body: bytes) -> Optional[str]:
+    """HMAC-SHA256 of the webhook body, if ADVISOR_WEBHOOK_SECRET is set"""
+    if not ADVISOR_WEBHOOK_SECRET:
+        return None
+    return "sha256=" + hmac.new(ADVISOR_WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+
+
+class PinnedHostAdapter(HTTPAdapter):
+    """
+    Transport for a URL rewritten to an already-checked IP address: TLS
+    still sends (SNI) and verifies the certificate for the original hostname
+    """
+
+    def __init__(self, hostname: str, **kwargs):
+        self.hostname = hostname
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs.update(server_hostname=self.hostname, assert_hostname=self.hostname)
+        super().init_poolmanager(*args, **kwargs)
+
+
+def pinned_request(url: str, address: str) -> Tuple[str, Dict[str, str], requests.Session]:
+    """
+    The URL rewritten to connect to `address`, its Host header, and a session
+    that verifies TLS for the original hostname
+
+    Resolving the hostname again when connecting would let DNS that changed
+    since the check (rebinding) send the request to a private address.
+    """
+    parsed = urlparse(url)
+    host = f"[{address}]" if ":" in address else address
+    port = f":{parsed.port}" if parsed.port else ""
+    session = requests.Session()
+    session.mount(f"{parsed.scheme}://", PinnedHostAdapter(parsed.hostname))
+    return (
+        parsed._replace(netloc=f"{host}{port}").geturl(),
+        {"Host": f"{parsed.hostname}{port}"},
+        session
+    )
+
+
+@job_queue.handler("advisor.webhook")
+def deliver_webhook(payload: Dict[str, Any]):
+    """
+    POST a finished job to its webhook (retried with backoff by the job queue)
+
+    The URL is checked again here, since DNS may have changed since it was
+    submitted, and the request goes to the address that was checked. Redirects
+    are not followed (they could point anywhere).
+    """
+    address, error = webhook_address(payload["url"])
+    if error:
+        print(f"⚠️  Webhook for job {payload['body'].get('job_id')} not sent: {error}")
+        return
+
+    body = json.dumps(payload["body"], default=str).encode()
+    url, headers, session = pinned_request(payload["url"], address)
+    headers["Content-Type"] = "application/json"
+    signature = webhook_signature(body)
+    if signature:
+        headers["X-PropIQ-Signature"] = signature
+
+    with session:
+        response = session.post(url, data=body, headers=headers, timeout=10, allow_redirects=False)
+    if response.status_code >= 300:
+        raise RuntimeError(f"Webhook returned {response.status_code}")
+
+
+@advisor_queue.handler("advisor.analyze")
+async def run_advisor_job(payload: Dict[str, Any]):
+    """
+    Execute a submitted advisor run
+
+    Stages are published to the job as they complete. Failures are recorded
+    on the job rather than retried (a re-submission reuses finished stages).
+    """
+    job_id = payload["job_id"]
+    session_id = payload["session_id"]
+    user_id = payload["user_id"]
+    property_data = payload["property"]
+    investor_profile = payload["investor_profile"]
+    job = advisor_jobs.update(
+        job_id, session_id=session_id, user_id=user_id, status=JOB_RUNNING, stages=[], output={}
+    )
+    await asyncio.to_thread(mirror_job, job)
+
+    async def publish(record: Dict[str, Any]):
+        job["stages"].append(record["stage"])
+        job["output"][record["stage"]] = record["output"]
+        job["updated_at"] = datetime.utcnow()
+        await asyncio.to_thread(mirror_job, job)
+
+    try:
+        with deadline_scope(ADVISOR_JOB_DEADLINE_SECONDS, "advisor job"), \
+                usage_scope(route="advisor.jobs", user_id=user_id, tier=payload.get("tier")):
+            memo = await load_stage_memo(session_id, user_id)
+            run = await advisor_workflow(property_data, investor_profile, memo, publish)
+
+        await asyncio.to_thread(save_session, session_id, user_id, property_data, investor_profile, {
+            "stages": run["stages"],
+            "complete": run["completed"],
+            "token_report": run["token_report"]
+        })
+        result = jsonable_encoder(advisor_response(session_id, run, memo))
+        job = advisor_jobs.update(job_id, status=result["stage"], result=result)
     except Exception as e:
+        print(f"⚠️  Advisor job {job_id} failed: {e}")
+        job = advisor_jobs.update(job_id, status=JOB_FAILED, error=f"Advisor analysis failed: {str(e)}")
+
+    await asyncio.to_thread(mirror_job, job)
+    if payload.get("webhook_url"):
+        job_queue.enqueue("advisor.webhook", {"url": payload["webhook_url"], "body": job_view(job)})
+
+
+@router.post("/jobs", status_code=202)
+async def submit_advisor_job(
+    request: AdvisorJobRequest,
+    http_request: Request,
+    token_payload: dict = Depends(verify_token)
+):
+    """
+    Submit an advisor run as a background job
+
+    Returns immediately with a job id. Poll GET /advisor/jobs/{job_id} (stages
+    appear as they finish) or pass webhook_url to be called on completion.
+    """
+    user_id = token_payload.get("sub", "guest")
+
+    if not llm_gateway.available:
         raise HTTPException(
-            status_code=500,
-            detail=f"Advisor analysis failed: {str(e)}"
+            status_code=503,
+            detail="Property Advisor temporarily unavailable due to AI system maintenance."
+        )
+    if request.webhook_url:
+        await asyncio.to_thread(validate_webhook_url, request.webhook_url)
+    try:
+        tier = await user_tier(http_request, user_id)
+    except DeadlineExceeded:
+        raise HTTPException(status_code=503, detail="Property Advisor is busy, please try again shortly.")
+    if budget_spent(user_id, tier):
+        raise HTTPException(status_code=429, detail=BUDGET_DETAIL)
+    if advisor_queue.store.counts(advisor_queue.name)["pending"] >= ADVISOR_MAX_PENDING_JOBS:
+        raise HTTPException(
+            status_code=503,
+            detail="Property Advisor is busy, please try again shortly.",
+            headers={"Retry-After": "30"}
         )
 
+    job_id = uuid.uuid4().hex
+    session_id = new_session_id(request.session_id)
+    job = advisor_jobs.create(job_id, session_id, user_id)
+    advisor_queue.enqueue("advisor.analyze", {
+        "job_id": job_id,
+        "session_id": session_id,
+        "user_id": user_id,
+        "tier": tier,
+        "property": request.property.dict(),
+        "investor_profile": request.investor_profile.dict(),
+        "webhook_url": request.webhook_url
+    })
+
+    return {
+        "success": True,
+        "job_id": job_id,
+        "session_id": session_id,
+        "status": job["status"],
+        "poll_url": f"/advisor/jobs/{job_id}"
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_advisor_job(
+    job_id: str,
+    token_payload: dict = Depends(verify_token)
+):
+    """Status of an advisor job, with the stages completed so far and the final result"""
+    user_id = token_payload.get("sub", "guest")
+
+    job = advisor_jobs.get(job_id)
+    if job is None:
+        session = await asyncio.to_thread(advisor_sessions.get_by_job, job_id, user_id)
+        job = {**session["job"], "user_id": user_id} if session and session.get("job") else None
+
+    if job is None or job.get("user_id") != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return {"success": True, "job": job_view(job)}
+
 
 @router.get("/session/{session_id}")
 async def get_advisor_session(
@@ -547,15 +1391,9 @@ async def get_advisor_session(
     token_payload: dict = Depends(verify_token)
 ):
     """Get previous advisor session"""
-    if not DATABASE_AVAILABLE:
-        raise HTTPException(status_code=503, detail="Database unavailable")
-
     user_id = token_payload.get("sub", "guest")
 
-    session = advisor_sessions.find_one({
-        "session_id": session_id,
-        "user_id": user_id
-    })
+    session = await asyncio.to_thread(advisor_sessions.get, session_id, user_id)
 
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -564,11 +1402,13 @@ async def get_advisor_session(
         "success": True,
         "session": {
             "session_id": session["session_id"],
-            "property": session["property"],
-            "investor_profile": session["investor_profile"],
-            "stages": session["stages"],
-            "created_at": session["created_at"],
-            "updated_at": session["updated_at"]
+            # Inputs and stages are saved when a run finishes; a session
+            # holding only a running job's status has none yet
+            "property": session.get("property"),
+            "investor_profile": session.get("investor_profile"),
+            "stages": session.get("stages") or [],
+            "created_at": session.get("created_at"),
+            "updated_at": session.get("updated_at")
         }
     }
 
@@ -586,7 +1426,22 @@ async def health_check():
             "Action Planner"
         ],
         "premium_only": True,
-        "database": DATABASE_AVAILABLE
+        "session_store": advisor_sessions.backend,
+        "deadline_seconds": ADVISOR_DEADLINE_SECONDS,
+        "stages": STAGE_TOTALS,
+        "agent_outputs": OUTPUT_TOTALS,
+        "jobs": {
+            **advisor_jobs.counts(),
+            "queue": advisor_queue.stats()
+        },
+        "prompt_data_tokens": {
+            **PROMPT_TOKEN_TOTALS,
+            "saved": PROMPT_TOKEN_TOTALS["before"] - PROMPT_TOKEN_TOTALS["after"]
+        },
+        "prompts": {
+            name: stats for name, stats in prompt_registry.stats().items()
+            if name.startswith("advisor.")
+        }
     }
 
 
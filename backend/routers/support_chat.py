@@ -7,47 +7,36 @@ from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import BaseModel, EmailStr
 from typing import List, Optional, Dict, Any
 from datetime import datetime
-import os
-from openai import AzureOpenAI
 from utils.pagination import (
     PaginationParams,
     PaginatedResponse,
     create_pagination_meta
 )
+from utils.chat_engine import (
+    CHAT_DEADLINE_SECONDS,
+    ChatEngine,
+    get_chat_store,
+    get_context_window,
+    get_analytics_sink,
+    sse_response
+)
+from utils.deadline import request_deadline
+
+# Conversation store shared with the enhanced support chat
+chat_store = get_chat_store()
+DATABASE_AVAILABLE = chat_store is not None
+if not DATABASE_AVAILABLE:
+    print("⚠️  Database not available for support chat")
 
-# MongoDB for chat history
-try:
-    from database_supabase import get_database
-    db = get_database()
-    support_chats = db["support_chats"]
-    DATABASE_AVAILABLE = True
-except Exception as e:
-    print(f"⚠️  Database not available for support chat: {e}")
-    DATABASE_AVAILABLE = False
-
-# JWT auth
-try:
-    from auth import verify_token
-except:
-    # Fallback if auth not available
-    def verify_token(authorization: str = None):
-        return {"sub": "guest", "email": "guest@propiq.com"}
+# JWT auth (shared, cached verification)
+from auth import verify_token
 
 router = APIRouter(prefix="/support", tags=["support"])
 
-# Azure OpenAI client (reuse existing configuration)
-# Azure OpenAI client (reuse existing configuration)
-try:
-    if os.getenv("AZURE_OPENAI_ENDPOINT") and os.getenv("AZURE_OPENAI_KEY"):
-        client = AzureOpenAI(
-            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            api_key=os.getenv("AZURE_OPENAI_KEY"),
-            api_version="2024-02-15-preview"
-        )
-    else:
-        client = None
-except Exception:
-    client = None
+MAINTENANCE_MESSAGE = (
+    "I apologize, but our AI support system is currently undergoing maintenance. "
+    "Please try again later or contact human support at support@propiq.com."
+)
 
 # Models
 class ChatMessage(BaseModel):
@@ -64,6 +53,7 @@ class ChatResponse(BaseModel):
     conversation_id: str
     message: str
     response: str
+    partial: bool = False  # Cut short by the request deadline
     timestamp: datetime
 
 class ConversationHistory(BaseModel):
@@ -113,8 +103,21 @@ SUPPORT_AGENT_PROMPT = """You are a helpful customer support agent for PropIQ, a
 - Trial usage → Free users get 3 analyses to try the platform
 """
 
+# Basic support chat: history and persistence, no tools or user context
+chat_engine = ChatEngine(
+    "basic",
+    SUPPORT_AGENT_PROMPT,
+    store=chat_store,
+    context_window=get_context_window(),
+    analytics=get_analytics_sink(),
+    max_tokens=300  # Keep responses concise
+)
+
 
-@router.post("/chat", response_model=ChatResponse)
+@router.post(
+    "/chat", response_model=ChatResponse,
+    dependencies=[Depends(request_deadline(CHAT_DEADLINE_SECONDS, "support chat"))]
+)
 async def send_support_message(
     request: SendMessageRequest,
     token_payload: dict = Depends(verify_token)
@@ -132,105 +135,25 @@ async def send_support_message(
     user_id = token_payload.get("sub", "guest")
     user_email = token_payload.get("email", "guest@propiq.com")
 
-    if not client:
+    if not chat_engine.available:
         return ChatResponse(
             success=False,
             conversation_id=request.conversation_id or "maintenance",
             message=request.message,
-            response="I apologize, but our AI support system is currently undergoing maintenance. Please try again later or contact human support at support@propiq.com.",
+            response=MAINTENANCE_MESSAGE,
             timestamp=datetime.utcnow()
         )
 
     try:
-        # Load conversation history if continuing
-        conversation_history = []
-        conversation_id = request.conversation_id
-
-        if conversation_id and DATABASE_AVAILABLE:
-            # Fetch existing conversation
-            existing_chat = support_chats.find_one({
-                "conversation_id": conversation_id,
-                "user_id": user_id
-            })
-
-            if existing_chat:
-                conversation_history = existing_chat.get("messages", [])
-
-        # If new conversation, generate ID
-        if not conversation_id:
-            from bson import ObjectId
-            conversation_id = str(ObjectId())
-
-        # Build messages for OpenAI
-        messages = [
-            {"role": "system", "content": SUPPORT_AGENT_PROMPT}
-        ]
-
-        # Add conversation history
-        for msg in conversation_history:
-            messages.append({
-                "role": msg.get("role"),
-                "content": msg.get("content")
-            })
-
-        # Add new user message
-        messages.append({
-            "role": "user",
-            "content": request.message
-        })
-
-        # Get AI response
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            temperature=0.7,
-            max_tokens=300  # Keep responses concise
-        )
-
-        ai_response = response.choices[0].message.content
-        timestamp = datetime.utcnow()
-
-        # Save to database
-        if DATABASE_AVAILABLE:
-            # Add user message and AI response to history
-            updated_messages = conversation_history + [
-                {
-                    "role": "user",
-                    "content": request.message,
-                    "timestamp": timestamp
-                },
-                {
-                    "role": "assistant",
-                    "content": ai_response,
-                    "timestamp": timestamp
-                }
-            ]
-
-            # Upsert conversation
-            support_chats.update_one(
-                {
-                    "conversation_id": conversation_id,
-                    "user_id": user_id
-                },
-                {
-                    "$set": {
-                        "user_email": user_email,
-                        "messages": updated_messages,
-                        "updated_at": timestamp
-                    },
-                    "$setOnInsert": {
-                        "created_at": timestamp
-                    }
-                },
-                upsert=True
-            )
+        turn = await chat_engine.respond(user_id, user_email, request.message, request.conversation_id)
 
         return ChatResponse(
             success=True,
-            conversation_id=conversation_id,
+            conversation_id=turn.conversation_id,
             message=request.message,
-            response=ai_response,
-            timestamp=timestamp
+            response=turn.response,
+            partial=turn.partial,
+            timestamp=turn.timestamp
         )
 
     except Exception as e:
@@ -240,6 +163,32 @@ async def send_support_message(
         )
 
 
+@router.post(
+    "/chat/stream",
+    dependencies=[Depends(request_deadline(CHAT_DEADLINE_SECONDS, "support chat"))]
+)
+async def stream_support_message(
+    request: SendMessageRequest,
+    token_payload: dict = Depends(verify_token)
+):
+    """
+    Send a message to the support agent and stream the reply (Server-Sent Events)
+
+    Events are JSON objects: start (conversation_id), delta (text), done.
+    """
+    if not chat_engine.available:
+        raise HTTPException(status_code=503, detail=MAINTENANCE_MESSAGE)
+
+    return sse_response(
+        chat_engine.stream(
+            token_payload.get("sub", "guest"),
+            token_payload.get("email", "guest@propiq.com"),
+            request.message,
+            request.conversation_id
+        )
+    )
+
+
 @router.get("/history/{conversation_id}", response_model=ConversationHistory)
 async def get_conversation_history(
     conversation_id: str,
@@ -260,11 +209,8 @@ async def get_conversation_history(
 
     user_id = token_payload.get("sub", "guest")
 
-    # Fetch conversation
-    chat = support_chats.find_one({
-        "conversation_id": conversation_id,
-        "user_id": user_id
-    })
+    # Fetch conversation header, then its messages
+    chat = chat_store.get_header(conversation_id, user_id)
 
     if not chat:
         raise HTTPException(status_code=404, detail="Conversation not found")
@@ -277,7 +223,7 @@ async def get_conversation_history(
                 content=msg.get("content"),
                 timestamp=msg.get("timestamp")
             )
-            for msg in chat.get("messages", [])
+            for msg in chat_store.all_messages(conversation_id, user_id)
         ],
         created_at=chat.get("created_at"),
         updated_at=chat.get("updated_at")
@@ -311,27 +257,17 @@ async def list_user_conversations(
     # Create pagination params
     pagination = PaginationParams(page=page, page_size=page_size)
 
-    # Get total count for pagination metadata
-    total_count = support_chats.count_documents({"user_id": user_id})
-
-    # Fetch paginated conversations for this user
-    conversations = list(support_chats.find(
-        {"user_id": user_id},
-        sort=[("updated_at", -1)],
-        skip=pagination.skip,
-        limit=pagination.limit
-    ))
-
-    # Format conversation summaries
+    # Summaries only (count, preview, timestamps) via the (user_id, updated_at) index
+    total_count = chat_store.count_conversations(user_id)
     conversation_summaries = [
         ConversationSummary(
-            conversation_id=chat["conversation_id"],
-            created_at=chat.get("created_at"),
-            updated_at=chat.get("updated_at"),
-            message_count=len(chat.get("messages", [])),
-            last_message=chat.get("messages", [])[-1].get("content", "") if chat.get("messages") else ""
+            conversation_id=summary["conversation_id"],
+            created_at=summary["created_at"],
+            updated_at=summary["updated_at"],
+            message_count=summary["message_count"],
+            last_message=summary["last_message"]
         )
-        for chat in conversations
+        for summary in chat_store.list_summaries(user_id, skip=pagination.skip, limit=pagination.limit)
     ]
 
     # Create pagination metadata
@@ -352,11 +288,12 @@ async def list_user_conversations(
 @router.get("/health")
 async def health_check():
     """Health check for support chat system"""
-    has_openai = client is not None
+    has_openai = chat_engine.available
 
     return {
         "status": "healthy" if has_openai else "degraded",
         "openai_configured": has_openai,
         "database_available": DATABASE_AVAILABLE,
-        "model": "gpt-4o-mini"
+        "features": chat_engine.features,
+        "model": chat_engine.model
     }
@@ -5,60 +5,44 @@ Implements Google ADK best practices with Azure OpenAI
 
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
 import os
-import json
-from openai import AzureOpenAI
-
-# MongoDB for chat history and user data
+from utils.chat_engine import (
+    CHAT_DEADLINE_SECONDS,
+    ChatEngine,
+    get_support_db,
+    get_chat_store,
+    get_context_window,
+    get_analytics_sink,
+    sse_response
+)
+from utils.deadline import request_deadline
+from utils.tool_executor import ToolExecutor
+from utils.cache import two_tier_cache, support_context_key, invalidate_user_context, CACHE_TTL
+from utils.faq_cache import FaqCache
+from utils.prompt_registry import prompt_registry
+
+# Database handles shared with the basic support chat
 try:
-    import database_supabase
-    db = database_supabase.db
-    if db is not None:
-        support_chats = db["support_chats"]
+    db = get_support_db()
+    chat_store = get_chat_store()
+    if db is not None and chat_store is not None:
         users = db["users"]
         property_analyses = db["property_analyses"]
         support_tickets = db["support_tickets"]
-        support_analytics = db["support_analytics"]
         DATABASE_AVAILABLE = True
     else:
         DATABASE_AVAILABLE = False
 except Exception as e:
     print(f"⚠️  Database not available for support chat: {e}")
     DATABASE_AVAILABLE = False
-    db = None
-
-# JWT auth
-try:
-    from auth import verify_token
-except:
-    def verify_token(authorization: str = None):
-        return {"sub": "guest", "email": "guest@propiq.com"}
 
-# W&B for analytics
-try:
-    import wandb
-    WANDB_AVAILABLE = wandb.api.api_key is not None
-except:
-    WANDB_AVAILABLE = False
+# JWT auth (shared, cached verification)
+from auth import verify_token
 
 router = APIRouter(prefix="/support", tags=["support"])
 
-# Azure OpenAI client
-# Azure OpenAI client
-try:
-    if os.getenv("AZURE_OPENAI_ENDPOINT") and os.getenv("AZURE_OPENAI_KEY"):
-        client = AzureOpenAI(
-            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            api_key=os.getenv("AZURE_OPENAI_KEY"),
-            api_version="2024-02-15-preview"
-        )
-    else:
-        client = None
-except Exception:
-    client = None
-
 # ============================================================================
 # MODELS
 # ============================================================================
@@ -78,8 +62,10 @@ class ChatResponse(BaseModel):
     conversation_id: str
     message: str
     response: str
+    partial: bool = False  # Cut short by the request deadline
     tools_used: List[str] = []
     user_context: Optional[Dict[str, Any]] = None
+    faq_match: Optional[str] = None  # FAQ entry ID when answered from cache
     timestamp: datetime
 
 
@@ -87,21 +73,38 @@ class ChatResponse(BaseModel):
 # RECOMMENDATION #3: SESSION STATE MANAGEMENT
 # ============================================================================
 
+TIER_CONFIG = {
+    "free": {"limit": 5, "price": 0},
+    "starter": {"limit": 20, "price": 29},
+    "pro": {"limit": 100, "price": 79},
+    "elite": {"limit": -1, "price": 199}  # -1 = unlimited
+}
+
+
 def get_tier_config(tier: str) -> Dict[str, int]:
     """Get PropIQ limits for tier"""
-    tiers = {
-        "free": {"limit": 5, "price": 0},
-        "starter": {"limit": 20, "price": 29},
-        "pro": {"limit": 100, "price": 79},
-        "elite": {"limit": -1, "price": 199}  # -1 = unlimited
-    }
-    return tiers.get(tier, tiers["free"])
+    return TIER_CONFIG.get(tier, TIER_CONFIG["free"])
+
+
+def plans_summary() -> str:
+    """One line per plan with its price and analysis limit (from TIER_CONFIG)"""
+    lines = []
+    for tier, config in TIER_CONFIG.items():
+        if config["price"] == 0:
+            lines.append(f"- {tier.title()}: {config['limit']} analyses to try the platform")
+        else:
+            limit = "unlimited analyses" if config["limit"] == -1 else f"{config['limit']} analyses per month"
+            lines.append(f"- {tier.title()} (${config['price']}/mo): {limit}")
+    return "\n".join(lines)
 
 
 async def load_user_context(user_id: str, user_email: str) -> Dict[str, Any]:
     """
     Load user context at session start (ADK pattern)
     This replaces the static system prompt with personalized context
+
+    Without a database (or on a lookup error) the context is a placeholder
+    marked "fallback": True; its numbers are not the user's.
     """
     if not DATABASE_AVAILABLE:
         return {
@@ -113,7 +116,8 @@ async def load_user_context(user_id: str, user_email: str) -> Dict[str, Any]:
             "propiq_limit": 5,
             "recent_analyses": [],
             "account_status": "active",
-            "join_date": "Unknown"
+            "join_date": "Unknown",
+            "fallback": True
         }
 
     try:
@@ -172,7 +176,8 @@ async def load_user_context(user_id: str, user_email: str) -> Dict[str, Any]:
         return {
             "user_id": user_id,
             "user_email": user_email,
-            "error": str(e)
+            "error": str(e),
+            "fallback": True
         }
 
 
@@ -379,6 +384,7 @@ def apply_promotional_credit(
         )
 
         if result.modified_count > 0:
+            invalidate_user_context(user_id)
             return {
                 "success": True,
                 "message": f"Applied {credit_amount} analysis credits to your account",
@@ -511,14 +517,31 @@ TOOL_FUNCTIONS = {
     "apply_promotional_credit": apply_promotional_credit
 }
 
+# Concurrent tool execution; read-only lookups are memoized per request. The
+# write tools (tickets, demos, credits) are not idempotent, so a timed-out call
+# tells the model not to retry rather than risk a duplicate.
+tool_executor = ToolExecutor(
+    TOOL_FUNCTIONS,
+    read_only={"check_subscription_status", "get_analysis_history"},
+    timeouts={"create_support_ticket": 10, "apply_promotional_credit": 10}
+)
+
 
 # ============================================================================
 # RECOMMENDATION #3: ENHANCED PROMPTS (TWO-TIER STRUCTURE)
 # ============================================================================
 
+def remaining_analyses(user_context: Dict[str, Any]) -> int:
+    """Analyses left this month (-1 = unlimited), derived from the limit if not stored"""
+    if "propiq_remaining" in user_context:
+        return user_context["propiq_remaining"]
+    limit = user_context.get("propiq_limit", 5)
+    return max(0, limit - user_context.get("propiq_used", 0)) if limit > 0 else -1
+
+
 def build_global_context(user_context: Dict[str, Any]) -> str:
     """Build global context prompt from user data (ADK pattern)"""
-    remaining = user_context.get("propiq_remaining", 0)
+    remaining = remaining_analyses(user_context)
     if remaining == -1:
         remaining_text = "unlimited analyses available"
     else:
@@ -607,11 +630,190 @@ You have access to these tools to ACTUALLY HELP users (don't just talk, use them
 """
 
 
+async def get_support_context(user_id: str, user_email: str) -> Tuple[Dict[str, Any], str]:
+    """
+    Get user context and the rendered global context prompt, cached per user
+
+    Chat turns arrive seconds apart and the profile rarely changes between
+    them, so both are cached in the two-tier cache and dropped on writes that
+    change them (see invalidate_user_context).
+
+    Returns:
+        (user_context, global_context)
+    """
+    key = support_context_key(user_id)
+    cached_context = two_tier_cache.get(key)
+    if cached_context is not None:
+        return cached_context["user_context"], cached_context["global_context"]
+
+    user_context = await load_user_context(user_id, user_email)
+    global_context = build_global_context(user_context)
+
+    # Fallback contexts (no database, lookup error) are not worth caching
+    if not user_context.get("fallback"):
+        two_tier_cache.set(key, {
+            "user_context": user_context,
+            "global_context": global_context
+        }, ttl=CACHE_TTL["support_context"])
+
+    return user_context, global_context
+
+
+# ============================================================================
+# FAQ ANSWER CACHE
+# ============================================================================
+
+FAQ_CACHE_ENABLED = os.getenv("FAQ_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+
+# Curated answers only: LLM answers are never learned into the cache, since
+# they may contain one user's account details
+SUPPORT_FAQ = [
+    {
+        "id": "pricing",
+        "questions": [
+            "How much does PropIQ cost?",
+            "What are your pricing plans?",
+            "What plans do you offer?",
+            "How much is a subscription?",
+            "What is the price of each plan?",
+            "How much does the Pro plan cost?"
+        ],
+        "answers": {
+            "*": (
+                f"PropIQ has {len(TIER_CONFIG)} plans:\n{plans_summary()}\n\n"
+                "You're currently on {tier_display}. You can change plans anytime in Settings → Subscription."
+            )
+        }
+    },
+    {
+        "id": "usage_remaining",
+        "questions": [
+            "How many analyses do I have left?",
+            "How many analyses can I still run?",
+            "What is my analysis limit?",
+            "How many analyses have I used?",
+            "How many analyses remaining this month?"
+        ],
+        "answers": {
+            "*": (
+                "Hi {user_name}! On the {tier_display} plan you've used {analyses_used} of "
+                "{analyses_limit} analyses, so you have {analyses_remaining} left this month. "
+                "Need more? You can upgrade anytime in Settings → Subscription."
+            ),
+            "elite": (
+                "Hi {user_name}! You're on Elite, so your analyses are unlimited - "
+                "you've run {analyses_used} so far this month."
+            )
+        }
+    },
+    {
+        "id": "export",
+        "questions": [
+            "How do I export an analysis?",
+            "Can I download my analysis as a PDF?",
+            "How do I save a report as PDF?",
+            "How do I print an analysis?"
+        ],
+        "answers": {
+            "*": (
+                "Open the analysis and click Export PDF to download a report. "
+                "You can also use your browser's Print → Save as PDF from the analysis page."
+            )
+        }
+    },
+    {
+        "id": "upgrade",
+        "questions": [
+            "How do I upgrade my plan?",
+            "How can I change my subscription?",
+            "I want to upgrade",
+            "How do I switch to Pro?"
+        ],
+        "answers": {
+            "*": (
+                "You can upgrade anytime in Settings → Subscription. You're on {tier_display} now; "
+                "the new plan's analysis limit applies as soon as the upgrade completes."
+            ),
+            "elite": "You're already on Elite, our top plan with unlimited analyses - there's nothing to upgrade!"
+        }
+    },
+    {
+        "id": "how_to_analyze",
+        "questions": [
+            "How do I analyze a property?",
+            "How do I run an analysis?",
+            "How do I start a property analysis?",
+            "How does the analysis work?"
+        ],
+        "answers": {
+            "*": (
+                "Enter the property address (and optionally price, down payment and rate) on the "
+                "analysis page, then run the analysis. You'll get location insights, financial "
+                "projections and an investment recommendation."
+            )
+        }
+    }
+]
+
+faq_cache = FaqCache()
+for faq in SUPPORT_FAQ:
+    faq_cache.add(faq["id"], faq["questions"], faq["answers"])
+
+
+def faq_slots(user_context: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Personalization values for FAQ answer templates
+
+    A fallback context has no real account data, so it fills no slots:
+    personalized entries (usage, plan) then miss and go to the model, and
+    only generic answers are served from the cache.
+    """
+    if user_context.get("fallback"):
+        return {}
+    limit = user_context.get("propiq_limit", 5)
+    remaining = remaining_analyses(user_context)
+    return {
+        "user_name": user_context.get("user_name", "there"),
+        "tier_display": user_context.get("tier", "free").title(),
+        "analyses_used": user_context.get("propiq_used", 0),
+        "analyses_limit": "unlimited" if limit == -1 else limit,
+        "analyses_remaining": "unlimited" if remaining == -1 else remaining
+    }
+
+
+# ============================================================================
+# CHAT ENGINE
+# ============================================================================
+
+# Same engine as the basic chat, with user context, tools and FAQ answers
+chat_engine = ChatEngine(
+    "enhanced",
+    SUPPORT_INSTRUCTION,
+    store=chat_store if DATABASE_AVAILABLE else None,
+    context_loader=get_support_context,
+    context_window=get_context_window(),
+    tools=SUPPORT_TOOLS,
+    tool_executor=tool_executor,
+    faq_cache=faq_cache if FAQ_CACHE_ENABLED else None,
+    faq_slots=faq_slots,
+    analytics=get_analytics_sink(),
+    max_tokens=500
+)
+
+MAINTENANCE_MESSAGE = (
+    "I apologize, but our AI support system is currently undergoing maintenance. "
+    "Please try again later."
+)
+
+
 # ============================================================================
 # MAIN CHAT ENDPOINT
 # ============================================================================
 
-@router.post("/chat/enhanced", response_model=ChatResponse)
+@router.post(
+    "/chat/enhanced", response_model=ChatResponse,
+    dependencies=[Depends(request_deadline(CHAT_DEADLINE_SECONDS, "support chat"))]
+)
 async def send_support_message_enhanced(
     request: SendMessageRequest,
     token_payload: dict = Depends(verify_token)
@@ -622,170 +824,30 @@ async def send_support_message_enhanced(
     """
     user_id = token_payload.get("sub", "guest")
     user_email = token_payload.get("email", "guest@propiq.com")
-    start_time = datetime.utcnow()
 
-    if not client:
+    if not chat_engine.available:
         return ChatResponse(
             success=False,
             conversation_id=request.conversation_id or "maintenance",
             message=request.message,
-            response="I apologize, but our AI support system is currently undergoing maintenance. Please try again later.",
-            timestamp=start_time
+            response=MAINTENANCE_MESSAGE,
+            timestamp=datetime.utcnow()
         )
 
     try:
-        # STEP 1: Load user context (session state)
-        user_context = await load_user_context(user_id, user_email)
-
-        # STEP 2: Load conversation history
-        conversation_history = []
-        conversation_id = request.conversation_id
-
-        if conversation_id and DATABASE_AVAILABLE:
-            existing_chat = support_chats.find_one({
-                "conversation_id": conversation_id,
-                "user_id": user_id
-            })
-            if existing_chat:
-                conversation_history = existing_chat.get("messages", [])
-
-        if not conversation_id:
-            from bson import ObjectId
-            conversation_id = str(ObjectId())
-
-        # STEP 3: Build messages with two-tier prompts
-        global_context = build_global_context(user_context)
-
-        messages = [
-            {
-                "role": "system",
-                "content": global_context + "\n\n" + SUPPORT_INSTRUCTION
-            }
-        ]
-
-        # Add conversation history
-        for msg in conversation_history:
-            messages.append({
-                "role": msg.get("role"),
-                "content": msg.get("content")
-            })
-
-        # Add user message
-        messages.append({
-            "role": "user",
-            "content": request.message
-        })
-
-        # STEP 4: Call OpenAI with function calling
-        tools_used = []
-        max_iterations = 5  # Prevent infinite loops
-
-        for iteration in range(max_iterations):
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                tools=SUPPORT_TOOLS,
-                tool_choice="auto",
-                temperature=0.7,
-                max_tokens=500
-            )
-
-            assistant_message = response.choices[0].message
-
-            # Check if we're done
-            if assistant_message.tool_calls is None:
-                # No more tool calls, we have final response
-                ai_response = assistant_message.content
-                break
-
-            # Execute tool calls
-            messages.append(assistant_message)  # Add assistant message with tool calls
-
-            for tool_call in assistant_message.tool_calls:
-                function_name = tool_call.function.name
-                function_args = json.loads(tool_call.function.arguments)
-
-                # Execute the function
-                if function_name in TOOL_FUNCTIONS:
-                    tools_used.append(function_name)
-                    function_response = TOOL_FUNCTIONS[function_name](**function_args)
-
-                    # Add function response to messages
-                    messages.append({
-                        "role": "tool",
-                        "tool_call_id": tool_call.id,
-                        "name": function_name,
-                        "content": json.dumps(function_response)
-                    })
-        else:
-            # Max iterations reached
-            ai_response = "I'm having trouble processing your request. Let me create a support ticket for human assistance."
-            tools_used.append("create_support_ticket")
-
-        timestamp = datetime.utcnow()
-        duration_ms = int((timestamp - start_time).total_seconds() * 1000)
-
-        # STEP 5: Save to database
-        if DATABASE_AVAILABLE:
-            updated_messages = conversation_history + [
-                {
-                    "role": "user",
-                    "content": request.message,
-                    "timestamp": timestamp
-                },
-                {
-                    "role": "assistant",
-                    "content": ai_response,
-                    "tools_used": tools_used,
-                    "timestamp": timestamp
-                }
-            ]
-
-            support_chats.update_one(
-                {"conversation_id": conversation_id, "user_id": user_id},
-                {
-                    "$set": {
-                        "user_email": user_email,
-                        "messages": updated_messages,
-                        "updated_at": timestamp
-                    },
-                    "$setOnInsert": {"created_at": timestamp}
-                },
-                upsert=True
-            )
-
-            # Log analytics
-            support_analytics.insert_one({
-                "user_id": user_id,
-                "conversation_id": conversation_id,
-                "query": request.message,
-                "response": ai_response,
-                "tools_used": tools_used,
-                "duration_ms": duration_ms,
-                "tier": user_context.get("tier"),
-                "created_at": timestamp
-            })
-
-        # STEP 6: Log to W&B
-        if WANDB_AVAILABLE:
-            wandb.log({
-                "event": "support_chat_enhanced",
-                "user_tier": user_context.get("tier"),
-                "tools_used_count": len(tools_used),
-                "tools": ",".join(tools_used),
-                "duration_ms": duration_ms,
-                "message_length": len(request.message),
-                "response_length": len(ai_response)
-            })
+        # Context -> FAQ cache -> budgeted history -> model + tools -> save
+        turn = await chat_engine.respond(user_id, user_email, request.message, request.conversation_id)
 
         return ChatResponse(
             success=True,
-            conversation_id=conversation_id,
+            conversation_id=turn.conversation_id,
             message=request.message,
-            response=ai_response,
-            tools_used=tools_used,
-            user_context=user_context,
-            timestamp=timestamp
+            response=turn.response,
+            partial=turn.partial,
+            tools_used=turn.tools_used,
+            user_context=turn.user_context,
+            faq_match=turn.faq_match,
+            timestamp=turn.timestamp
         )
 
     except Exception as e:
@@ -795,17 +857,48 @@ async def send_support_message_enhanced(
         )
 
 
+@router.post(
+    "/chat/enhanced/stream",
+    dependencies=[Depends(request_deadline(CHAT_DEADLINE_SECONDS, "support chat"))]
+)
+async def stream_support_message_enhanced(
+    request: SendMessageRequest,
+    token_payload: dict = Depends(verify_token)
+):
+    """
+    Enhanced support chat, streamed as Server-Sent Events
+
+    Events are JSON objects: start (conversation_id, faq_match), delta (text),
+    tool (a tool call finished), done (final response and tools used).
+    """
+    if not chat_engine.available:
+        raise HTTPException(status_code=503, detail=MAINTENANCE_MESSAGE)
+
+    return sse_response(
+        chat_engine.stream(
+            token_payload.get("sub", "guest"),
+            token_payload.get("email", "guest@propiq.com"),
+            request.message,
+            request.conversation_id
+        )
+    )
+
+
 @router.get("/health/enhanced")
 async def health_check_enhanced():
     """Health check for enhanced support system"""
+    analytics = get_analytics_sink()
     return {
         "status": "healthy",
         "features": {
-            "function_calling": True,
+            **chat_engine.features,
             "session_state": True,
-            "analytics": WANDB_AVAILABLE,
             "database": DATABASE_AVAILABLE
         },
+        "faq_cache": faq_cache.stats(),
+        "analytics_buffer": analytics.stats(),
+        "llm": chat_engine.gateway.stats(),
+        "prompt": prompt_registry.stats().get(chat_engine.prompt.name),
         "tools_available": list(TOOL_FUNCTIONS.keys()),
-        "model": "gpt-4o-mini"
+        "model": chat_engine.model
     }
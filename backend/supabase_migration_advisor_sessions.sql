@@ -0,0 +1,48 @@
+-- ============================================================================
+-- Supabase Migration: Property advisor sessions
+-- ============================================================================
+-- routers/property_advisor_multiagent.py saves each advisor run's stages
+-- (with input fingerprints) per session, so re-running a session recomputes
+-- only the stages whose inputs changed. Background jobs also mirror their
+-- status here so any worker can answer a poll.
+--
+-- Run this in Supabase SQL Editor:
+-- 1. Go to https://supabase.com/dashboard/project/yvaujsbktvkzoxfzeimn/sql
+-- 2. Paste this SQL and click "Run"
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS advisor_sessions (
+    id BIGSERIAL PRIMARY KEY,
+
+    -- user_id is the token subject: not always a users row (e.g. "guest")
+    session_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+
+    -- Inputs of the last run
+    property JSONB,
+    investor_profile JSONB,
+
+    -- Stage records (stage, agent, output, fingerprint, reused, timestamp)
+    stages JSONB NOT NULL DEFAULT '[]'::jsonb,
+    complete BOOLEAN NOT NULL DEFAULT FALSE,
+    token_report JSONB,
+
+    -- Last background job run in this session
+    job_id TEXT,
+    job JSONB,
+
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+
+    -- Upsert target
+    UNIQUE (session_id, user_id)
+);
+
+-- Job polls answered from another worker
+CREATE INDEX IF NOT EXISTS idx_advisor_sessions_job ON advisor_sessions(job_id, user_id);
+
+-- Written with the service key only
+ALTER TABLE advisor_sessions ENABLE ROW LEVEL SECURITY;
+
+-- Verify
+SELECT COUNT(*) FROM advisor_sessions;
@@ -0,0 +1,69 @@
+-- ============================================================================
+-- Supabase Migration: Dashboard stats summary
+-- ============================================================================
+-- Admin pages and the daily intelligence report used to run one full-table
+-- COUNT(*) per number (users, analyses, subscriptions, chats). This migration
+-- adds a single-row materialized view holding every dashboard number, plus a
+-- function that returns it and refreshes it only when it is older than the
+-- caller's freshness window.
+--
+-- Run this in Supabase SQL Editor:
+-- 1. Go to https://supabase.com/dashboard/project/yvaujsbktvkzoxfzeimn/sql
+-- 2. Paste this SQL and click "Run"
+-- ============================================================================
+
+-- Indexes so the 24h windows are range scans instead of table scans
+CREATE INDEX IF NOT EXISTS idx_users_created ON users(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_property_analyses_created ON property_analyses(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_support_chats_created ON support_chats(created_at DESC);
+
+-- ============================================================================
+-- SUMMARY VIEW (one row)
+-- ============================================================================
+DROP MATERIALIZED VIEW IF EXISTS dashboard_stats;
+
+CREATE MATERIALIZED VIEW dashboard_stats AS
+SELECT
+    1 AS id,
+    (SELECT COUNT(*) FROM users) AS total_users,
+    (SELECT COUNT(*) FROM users WHERE created_at >= NOW() - INTERVAL '24 hours') AS new_users_24h,
+    (SELECT COUNT(*) FROM property_analyses) AS total_analyses,
+    (SELECT COUNT(*) FROM property_analyses WHERE created_at >= NOW() - INTERVAL '24 hours') AS analyses_24h,
+    (SELECT COUNT(*) FROM subscriptions WHERE status = 'active') AS active_subscriptions,
+    (SELECT COUNT(*) FROM support_chats WHERE created_at >= NOW() - INTERVAL '24 hours') AS support_chats_24h,
+    NOW() AS refreshed_at;
+
+-- Required for REFRESH ... CONCURRENTLY (readers are never blocked)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_dashboard_stats_id ON dashboard_stats(id);
+
+-- ============================================================================
+-- HELPER FUNCTIONS
+-- ============================================================================
+
+-- Force a refresh (e.g. from pg_cron or an admin action)
+CREATE OR REPLACE FUNCTION refresh_dashboard_stats()
+RETURNS void AS $$
+BEGIN
+    REFRESH MATERIALIZED VIEW CONCURRENTLY dashboard_stats;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Return all dashboard numbers in one call, refreshing first only if the
+-- snapshot is older than max_age_seconds
+CREATE OR REPLACE FUNCTION get_dashboard_stats(max_age_seconds INTEGER DEFAULT 300)
+RETURNS SETOF dashboard_stats AS $$
+BEGIN
+    IF (SELECT refreshed_at FROM dashboard_stats WHERE id = 1)
+        < NOW() - make_interval(secs => max_age_seconds) THEN
+        REFRESH MATERIALIZED VIEW CONCURRENTLY dashboard_stats;
+    END IF;
+
+    RETURN QUERY SELECT * FROM dashboard_stats WHERE id = 1;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Optional: keep the snapshot warm every 5 minutes (requires pg_cron)
+-- SELECT cron.schedule('refresh-dashboard-stats', '*/5 * * * *', 'SELECT refresh_dashboard_stats()');
+
+-- Verify
+SELECT * FROM get_dashboard_stats(0);
@@ -0,0 +1,41 @@
+-- ============================================================================
+-- Supabase Migration: LLM usage rows
+-- ============================================================================
+-- utils/usage_accounting.py aggregates every model call in memory and writes
+-- one row per user/route/stage/tier/model per flush (every
+-- LLM_USAGE_FLUSH_SECONDS, or sooner under load). Rows are additive: sum
+-- them for totals over any period.
+--
+-- Run this in Supabase SQL Editor:
+-- 1. Go to https://supabase.com/dashboard/project/yvaujsbktvkzoxfzeimn/sql
+-- 2. Paste this SQL and click "Run"
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS llm_usage (
+    id BIGSERIAL PRIMARY KEY,
+    recorded_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+
+    -- Attribution (user_id is the token subject: not always a users row, e.g. "guest")
+    user_id TEXT,
+    route TEXT NOT NULL DEFAULT '',
+    stage TEXT NOT NULL DEFAULT '',
+    tier TEXT,
+    model TEXT NOT NULL,
+
+    -- Totals for the flush window
+    calls INTEGER NOT NULL DEFAULT 0,
+    prompt_tokens BIGINT NOT NULL DEFAULT 0,
+    cached_tokens BIGINT NOT NULL DEFAULT 0,
+    completion_tokens BIGINT NOT NULL DEFAULT 0,
+    cost_usd NUMERIC(14, 8) NOT NULL DEFAULT 0
+);
+
+-- Per-user spend over time, and cost by route/model over time
+CREATE INDEX IF NOT EXISTS idx_llm_usage_user_recorded ON llm_usage(user_id, recorded_at DESC);
+CREATE INDEX IF NOT EXISTS idx_llm_usage_recorded ON llm_usage(recorded_at DESC);
+
+-- Written with the service key only
+ALTER TABLE llm_usage ENABLE ROW LEVEL SECURITY;
+
+-- Verify
+SELECT COUNT(*) FROM llm_usage;
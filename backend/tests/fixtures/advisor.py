@@ -0,0 +1,66 @@
+"""
+Sample property advisor inputs and agent outputs, and scripted completions
+for a workflow run (see tests/fixtures/llm_gateway.py)
+"""
+
+import json
+
+from tests.fixtures.llm_gateway import completion
+
+PROPERTY = {
+    "address": "1 Main St, Austin, TX",
+    "asking_price": 300000,
+    "bedrooms": 3,
+    "bathrooms": 2,
+    "sqft": 1500,
+    "monthly_rent": 2500,
+    "annual_property_tax": 3600,
+    "annual_insurance": 1200
+}
+
+PROFILE = {
+    "risk_tolerance": "moderate",
+    "investment_horizon": "medium (3-7yr)",
+    "strategy": "rental",
+    "available_capital": 80000
+}
+
+# Agent outputs shaped like real ones: findings plus bulky supporting detail
+MARKET = {
+    "neighborhood_score": 72,
+    "market_momentum": "stable",
+    "price_trends": {"1yr": 3.1, "3yr": 11.4, "5yr": 24.0},
+    "market_insights": ["Strong rental demand near the university", "Inventory up 8% year over year"],
+    "comparable_properties": [
+        {"address": f"{100 + i} Oak St", "price": 290000 + i * 5000, "dom": 20 + i, "sqft": 1400 + i * 25}
+        for i in range(8)
+    ],
+    "data_sources": ["MLS", "Census ACS", "Zillow Observed Rent Index", "County assessor"]
+}
+DEAL_ANALYSIS = {
+    "deal_score": 55,
+    "recommended_offer": {"price": 285000, "terms": "20% down, 30-year fixed"},
+    "financing_recommendations": "Conventional 30-year fixed",
+    "roi_metrics": {"cap_rate": 7.8, "coc": 4.9},
+    "cash_flow_projection": [{"year": y, "monthly_cf": 250 + 40 * y} for y in range(1, 6)],
+    "scenarios": {"conservative": {"cf": -150}, "realistic": {"cf": 250}, "optimistic": {"cf": 500}},
+    "deal_breakers": []
+}
+RISK = {
+    "overall_risk_score": 45,
+    "risk_category": "moderate",
+    "alignment_with_profile": True,
+    "top_risks": ["Rate resets", "Vacancy", "Capex", "Insurance costs", "Tax reassessment"],
+    "mitigation_plan": ["Fix the rate", "Hold 6 months reserves"],
+    "monitoring_checklist": ["Monthly rent roll", "Quarterly comps", "Annual tax bill", "Insurance renewals"],
+    "exit_triggers": ["Two consecutive negative cash flow quarters"]
+}
+ACTION = {"recommended_action": "negotiate", "timeline": ["Week 1: inspection"]}
+
+ALL_STAGES = ["market_analysis", "deal_analysis", "risk_assessment", "action_plan"]
+
+
+def responses(count):
+    """Scripted completions for the last `count` stages"""
+    outputs = (MARKET, DEAL_ANALYSIS, RISK, ACTION)[4 - count:]
+    return [completion(json.dumps(output)) for output in outputs]
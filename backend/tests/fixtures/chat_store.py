@@ -0,0 +1,8 @@
+"""A ChatStore on in-memory collections (see memory_collection.py)"""
+
+from tests.fixtures.memory_collection import MemoryCollection
+from utils.chat_store import ChatStore
+
+
+def make_store(**kwargs):
+    return ChatStore(MemoryCollection(), MemoryCollection(), **kwargs)
@@ -0,0 +1,17 @@
+"""Helpers for running utils.job_queue queues in tests"""
+
+import asyncio
+
+from utils.job_queue import JobQueue
+
+
+async def drain(queue: JobQueue, until, timeout: float = 3.0):
+    """Run the queue until `until()` is true"""
+    await queue.start()
+    try:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not until() and loop.time() < deadline:
+            await asyncio.sleep(0.01)
+    finally:
+        await queue.stop()
@@ -0,0 +1,49 @@
+"""
+Scripted stand-in for utils.llm_gateway.llm_gateway, plus builders for the
+OpenAI-style completions and stream chunks it returns (no API key or
+network needed in unit tests)
+
+Install it where the code under test looks the gateway up, e.g.
+`monkeypatch.setattr(advisor, "llm_gateway", FakeGateway([completion("{}")]))`;
+`requests` records the keyword arguments of every call.
+"""
+
+import json
+from types import SimpleNamespace
+
+
+def tool_call(call_id, name, **arguments):
+    return SimpleNamespace(
+        id=call_id,
+        function=SimpleNamespace(name=name, arguments=json.dumps(arguments))
+    )
+
+
+def completion(content=None, tool_calls=None):
+    message = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def chunk(content=None, tool_calls=None):
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+
+
+class FakeGateway:
+    """Scripted LLM gateway: one response (or chunk list) per model call"""
+
+    available = True
+
+    def __init__(self, responses=None, streams=None):
+        self.responses = list(responses or [])
+        self.streams = list(streams or [])
+        self.requests = []
+
+    async def complete(self, **kwargs):
+        self.requests.append(kwargs)
+        return self.responses.pop(0)
+
+    async def stream(self, **kwargs):
+        self.requests.append(kwargs)
+        for item in self.streams.pop(0):
+            yield item
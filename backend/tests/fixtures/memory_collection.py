@@ -0,0 +1,127 @@
+"""
+In-memory stand-in for the subset of the pymongo Collection API used by
+the chat/analytics code paths (no MongoDB server needed in unit tests)
+
+Supported:
+- Filters: equality, $gte/$lte/$gt/$lt/$in/$exists
+- Projections: inclusion, exclusion, $slice
+- Updates: $set, $setOnInsert, $inc, $push
+"""
+
+import copy
+from typing import Any, Dict, List, Optional
+
+
+def _matches(doc: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    for key, cond in query.items():
+        present = key in doc
+        value = doc.get(key)
+        if isinstance(cond, dict) and any(k.startswith("$") for k in cond):
+            for op, arg in cond.items():
+                if op == "$exists" and present != bool(arg):
+                    return False
+                if op == "$gte" and not (present and value >= arg):
+                    return False
+                if op == "$gt" and not (present and value > arg):
+                    return False
+                if op == "$lte" and not (present and value <= arg):
+                    return False
+                if op == "$lt" and not (present and value < arg):
+                    return False
+                if op == "$in" and value not in arg:
+                    return False
+        elif value != cond:
+            return False
+    return True
+
+
+def _project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+
+    slices = {k: v["$slice"] for k, v in projection.items() if isinstance(v, dict) and "$slice" in v}
+    for key, count in slices.items():
+        if isinstance(doc.get(key), list):
+            doc[key] = doc[key][count:] if count < 0 else doc[key][:count]
+
+    flags = {k: v for k, v in projection.items() if k not in slices}
+    included = [k for k, v in flags.items() if v and k != "_id"]
+    if included:
+        keep = set(included) | set(slices) | ({"_id"} if flags.get("_id", 1) else set())
+        doc = {k: v for k, v in doc.items() if k in keep}
+    else:
+        for key, value in flags.items():
+            if not value:
+                doc.pop(key, None)
+    return doc
+
+
+class MemoryCollection:
+    """Tiny pymongo-like collection backed by a list"""
+
+    def __init__(self):
+        self.docs: List[Dict[str, Any]] = []
+        self.indexes: List[Any] = []
+        self._next_id = 1
+
+    def create_index(self, keys, **kwargs):
+        self.indexes.append((keys, kwargs))
+
+    def insert_one(self, doc: Dict[str, Any]):
+        doc = copy.deepcopy(doc)
+        doc.setdefault("_id", self._next_id)
+        self._next_id += 1
+        self.docs.append(doc)
+
+    def insert_many(self, docs: List[Dict[str, Any]], ordered: bool = True):
+        for doc in docs:
+            self.insert_one(doc)
+
+    def find(self, query=None, projection=None, sort=None, skip=0, limit=0):
+        results = [d for d in self.docs if _matches(d, query or {})]
+        for key, direction in reversed(sort or []):
+            results.sort(key=lambda d: d.get(key), reverse=direction < 0)
+        results = results[skip:]
+        if limit:
+            results = results[:limit]
+        return [_project(d, projection) for d in results]
+
+    def find_one(self, query=None, projection=None):
+        results = self.find(query, projection, limit=1)
+        return results[0] if results else None
+
+    def count_documents(self, query):
+        return sum(1 for d in self.docs if _matches(d, query))
+
+    def _apply(self, doc: Dict[str, Any], update: Dict[str, Any], inserting: bool):
+        for key, value in update.get("$set", {}).items():
+            doc[key] = copy.deepcopy(value)
+        if inserting:
+            for key, value in update.get("$setOnInsert", {}).items():
+                doc[key] = copy.deepcopy(value)
+        for key, value in update.get("$inc", {}).items():
+            doc[key] = doc.get(key, 0) + value
+        for key, value in update.get("$push", {}).items():
+            doc.setdefault(key, []).append(copy.deepcopy(value))
+
+    def _upsert_target(self, query, update, upsert):
+        for doc in self.docs:
+            if _matches(doc, query):
+                self._apply(doc, update, inserting=False)
+                return doc
+        if not upsert:
+            return None
+        doc = {k: v for k, v in query.items() if not isinstance(v, dict)}
+        self._apply(doc, update, inserting=True)
+        self.insert_one(doc)
+        return self.docs[-1]
+
+    def update_one(self, query, update, upsert: bool = False):
+        self._upsert_target(query, update, upsert)
+
+    def find_one_and_update(self, query, update, upsert=False, return_document=False, projection=None):
+        before = next((copy.deepcopy(d) for d in self.docs if _matches(d, query)), None)
+        doc = self._upsert_target(query, update, upsert)
+        result = doc if return_document else before
+        return _project(result, projection) if result is not None else None
@@ -0,0 +1,85 @@
+"""
+In-memory stand-in for the subset of the Supabase client used by
+database_supabase (no Supabase project needed in unit tests)
+
+Install it as `database_supabase.supabase`. Supported:
+- table(name).select(columns).eq(column, value)...limit(n).execute()
+- table(name).insert(row or rows).execute()
+- table(name).upsert(row, on_conflict="a,b").execute() (updates only the
+  given columns of an existing row; new rows get a created_at default)
+
+`reads` counts select queries per table.
+"""
+
+import copy
+from collections import Counter
+from datetime import datetime
+from types import SimpleNamespace
+
+
+class TableQuery:
+    """One supabase.table(name) query"""
+
+    def __init__(self, tables, name):
+        self.tables = tables
+        self.name = name
+        self.rows = tables.rows.setdefault(name, [])
+        self.columns = "*"
+        self.filters = []
+        self.count = None
+        self.write = None
+
+    def select(self, columns="*", count=None):
+        # Handlers only ever get the public user projection
+        assert self.name != "users" or columns == "*" or "password_hash" not in columns
+        self.columns = columns
+        return self
+
+    def eq(self, column, value):
+        self.filters.append((column, value))
+        return self
+
+    def limit(self, count):
+        self.count = count
+        return self
+
+    def insert(self, rows):
+        self.write = ("insert", rows if isinstance(rows, list) else [rows], [])
+        return self
+
+    def upsert(self, row, on_conflict=""):
+        self.write = ("upsert", [row], [column for column in on_conflict.split(",") if column])
+        return self
+
+    def execute(self):
+        if self.write:
+            return SimpleNamespace(data=[copy.deepcopy(self._write(row)) for row in self.write[1]])
+
+        self.tables.reads[self.name] += 1
+        matched = [row for row in self.rows if all(row.get(c) == v for c, v in self.filters)]
+        if self.columns != "*":
+            names = [name.strip() for name in self.columns.split(",")]
+            matched = [{name: row.get(name) for name in names} for row in matched]
+        return SimpleNamespace(data=copy.deepcopy(matched[:self.count]))
+
+    def _write(self, row):
+        action, _, keys = self.write
+        if action == "upsert":
+            for existing in self.rows:
+                if all(existing.get(key) == row.get(key) for key in keys):
+                    existing.update(copy.deepcopy(row))
+                    return existing
+        created = {"created_at": datetime.utcnow().isoformat(), **copy.deepcopy(row)}
+        self.rows.append(created)
+        return created
+
+
+class SupabaseTables:
+    """Answers supabase.table(name) queries from in-memory rows"""
+
+    def __init__(self, **tables):
+        self.rows = {name: [dict(row) for row in rows] for name, rows in tables.items()}
+        self.reads = Counter()
+
+    def table(self, name):
+        return TableQuery(self, name)
@@ -0,0 +1,139 @@
+"""
+Unit tests for the advisor's deal facts and compact prompt data
+Tests canonical rendering, deal facts, stage digests, and the token report
+"""
+
+import asyncio
+import json
+
+import numpy as np
+import pytest
+from routers import property_advisor_multiagent as advisor
+from tests.fixtures.advisor import ACTION, DEAL_ANALYSIS, MARKET, PROFILE, PROPERTY, RISK
+from tests.fixtures.llm_gateway import FakeGateway, completion
+from underwriting import analyze_deal
+from underwriting.facts import deal_facts
+from utils.prompt_data import canonical_json, canonicalize, compare_tokens
+
+DEAL = {
+    "purchase_price": 300000,
+    "monthly_rent": 2500,
+    "down_payment_percent": 20,
+    "interest_rate": 7,
+    "loan_term": 30,
+    "annual_property_tax": 3600,
+    "annual_insurance": 1200
+}
+
+
+class TestCanonicalJson:
+    """Test the compact canonical rendering"""
+
+    def test_compact_and_sorted(self):
+        assert canonical_json({"b": 1, "a": {"d": 2, "c": 3}}) == '{"a":{"c":3,"d":2},"b":1}'
+
+    def test_drops_empties_keeps_falsy_values(self):
+        assert canonicalize({"none": None, "blank": "", "list": [], "zero": 0, "no": False}) == {"zero": 0, "no": False}
+
+    def test_rounds_floats(self):
+        assert canonicalize({"rate": 7.2999999, "price": 300000.0, "nan": float("nan")}) == {"rate": 7.3, "price": 300000}
+        assert canonicalize(np.float64(1.234)) == 1.23
+
+    def test_deterministic(self):
+        first = canonical_json({"x": 1.0, "y": [1, {"b": 2, "a": 1}]})
+        second = canonical_json({"y": [1, {"a": 1, "b": 2}], "x": 1})
+        assert first == second
+
+    def test_compare_tokens(self):
+        report = compare_tokens(json.dumps(MARKET, indent=2), canonical_json(MARKET))
+        assert report["after"] < report["before"]
+        assert report["saved"] == report["before"] - report["after"]
+
+
+class TestDealFacts:
+    """Test locally computed deal facts"""
+
+    def test_facts_match_calculator(self):
+        facts = deal_facts(DEAL, hold_years=5)
+        compact = facts.to_dict()
+        assert compact["metrics"]["monthly_cash_flow"] == analyze_deal(DEAL)["monthly_cash_flow"]
+        assert compact["projection"]["exit_year"] == 5
+        assert set(compact["scenarios"]) == {"conservative", "realistic", "optimistic"}
+        assert set(compact["projection"]["by_year"]) == {"y1", "y3", "y5", "y10", "y30"}
+
+    def test_advisor_facts_need_price_and_rent(self):
+        assert advisor.advisor_facts({"address": "1 Main St"}, PROFILE) is None
+        facts = advisor.advisor_facts(PROPERTY, PROFILE)
+        assert facts.projection["summary"]["exit_year"] == 5
+
+
+class TestStageData:
+    """Test what each agent receives"""
+
+    def test_digest_keeps_findings_only(self):
+        digest = advisor.stage_digest("market_analysis", MARKET)
+        assert "comparable_properties" not in digest
+        assert digest["neighborhood_score"] == 72
+
+    def test_unrecognized_output_drops_calculated_keys(self):
+        digest = advisor.stage_digest("deal_analysis", {"summary": "ok", "calculated_scenarios": {"x": 1}})
+        assert digest == {"summary": "ok"}
+
+    def test_one_compact_line_per_section(self):
+        facts = advisor.advisor_facts(PROPERTY, PROFILE)
+        upstream = {"market_analysis": MARKET, "deal_analysis": DEAL_ANALYSIS}
+        data = advisor.stage_data("risk_assessment", PROPERTY, PROFILE, upstream, facts)
+
+        labels = [line.split(":", 1)[0] for line in data.splitlines()]
+        assert labels == ["**Property**", "**Investor Profile**", "**Deal Facts**", "**Market Analysis**", "**Deal Analysis**"]
+        for line in data.splitlines():
+            json.loads(line.split(": ", 1)[1])
+
+    def test_market_stage_handles_missing_price(self):
+        data = advisor.stage_data("market_analysis", {"address": "1 Main St", "asking_price": None}, None, {})
+        assert data == '**Property**: {"address":"1 Main St"}'
+
+
+class TestAdvisorRun:
+    """Test the four agent stages with scripted completions"""
+
+    @pytest.fixture
+    def run(self, monkeypatch):
+        gateway = FakeGateway([completion(json.dumps(output)) for output in (MARKET, DEAL_ANALYSIS, RISK, ACTION)])
+        monkeypatch.setattr(advisor, "llm_gateway", gateway)
+
+        async def workflow():
+            facts = advisor.advisor_facts(PROPERTY, PROFILE)
+            market = await advisor.run_market_analyst(PROPERTY)
+            deal = await advisor.run_deal_analyst(PROPERTY, market, PROFILE, facts)
+            simulation = await advisor.run_risk_simulation(PROPERTY, PROFILE)
+            risk = await advisor.run_risk_analyst(PROPERTY, market, deal, PROFILE, simulation, facts)
+            action = await advisor.run_action_planner(PROPERTY, market, deal, risk, PROFILE, facts)
+            outputs = zip(("market_analysis", "deal_analysis", "risk_assessment", "action_plan"), (market, deal, risk, action))
+            stages = [{"stage": stage, "output": output} for stage, output in outputs]
+            return stages, advisor.prompt_token_report(stages, PROPERTY, PROFILE, facts, simulation)
+
+        stages, report = asyncio.run(workflow())
+        return gateway, stages, report
+
+    def test_agents_get_facts_and_digests(self, run):
+        gateway, stages, _ = run
+
+        risk_data = gateway.requests[2]["messages"][-1]["content"]
+        assert "**Deal Facts**" in risk_data
+        assert "**Monte Carlo Simulation**" in risk_data
+        assert "Oak St" not in risk_data  # Comps stay out of downstream prompts
+        planner_data = gateway.requests[3]["messages"][-1]["content"]
+        assert "monitoring_checklist" not in planner_data
+        assert "calculated_projection" in stages[1]["output"]
+
+    def test_token_report(self, run):
+        gateway, _, report = run
+
+        assert set(report["stages"]) == {"market_analysis", "deal_analysis", "risk_assessment", "action_plan"}
+        # The report re-renders exactly what was sent
+        sent = gateway.requests[3]["messages"][-1]["content"]
+        assert report["stages"]["action_plan"]["after"] == compare_tokens("", sent)["after"]
+        for stage in ("risk_assessment", "action_plan"):
+            assert report["stages"][stage]["after"] < report["stages"][stage]["before"]
+        assert report["total"]["saved_percent"] > 30
@@ -0,0 +1,302 @@
+"""
+Unit tests for background advisor jobs
+Tests submission, polling with partial stages, failures, and webhooks
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import database_supabase
+from auth import verify_token
+from routers import property_advisor_multiagent as advisor
+from tests.fixtures.advisor import ALL_STAGES, PROFILE, PROPERTY, responses
+from tests.fixtures.job_queue import drain
+from tests.fixtures.llm_gateway import FakeGateway
+from tests.fixtures.supabase_tables import SupabaseTables
+from utils.job_queue import MemoryJobStore
+
+USER = {"sub": "u1"}
+
+# What each test hostname resolves to
+DNS = {
+    "example.com": ["93.184.216.34"],
+    "internal.example.com": ["93.184.216.34", "10.0.0.5"],
+    "mapped.example.com": ["::ffff:127.0.0.1"],
+}
+
+
+class ObservingGateway(FakeGateway):
+    """Records which stages the job had published when each agent was called"""
+
+    def __init__(self, responses, job_id):
+        super().__init__(responses)
+        self.job_id = job_id
+        self.published = []
+
+    async def complete(self, **kwargs):
+        self.published.append(list(advisor.advisor_jobs.get(self.job_id)["stages"]))
+        return await super().complete(**kwargs)
+
+
+@pytest.fixture(autouse=True)
+def dns(monkeypatch):
+    """Resolve hostnames from DNS (and IP literals as themselves) without the network"""
+    def getaddrinfo(host, port, *args, **kwargs):
+        try:
+            addresses = DNS[host]
+        except KeyError:
+            if not host[:1].isdigit() and ":" not in host:
+                raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+            addresses = [host]
+        return [(socket.AF_INET6 if ":" in a else socket.AF_INET, socket.SOCK_STREAM, 6, "", (a, port))
+                for a in addresses]
+
+    monkeypatch.setattr(advisor.socket, "getaddrinfo", getaddrinfo)
+
+
+@pytest.fixture
+def queues(monkeypatch):
+    monkeypatch.setattr(advisor.advisor_queue, "store", MemoryJobStore())
+    monkeypatch.setattr(advisor.advisor_queue, "poll_interval", 0.05)
+    monkeypatch.setattr(advisor.job_queue, "store", MemoryJobStore())
+    monkeypatch.setattr(advisor, "advisor_jobs", advisor.AdvisorJobs())
+    monkeypatch.setattr(advisor, "llm_gateway", FakeGateway())
+    monkeypatch.setattr(database_supabase, "supabase", SupabaseTables())
+
+
+@pytest.fixture
+def client(queues):
+    app = FastAPI()
+    app.include_router(advisor.router)
+    app.dependency_overrides[verify_token] = lambda: USER
+    return TestClient(app)
+
+
+def submit(client, **extra):
+    response = client.post("/advisor/jobs", json={
+        "property": PROPERTY, "investor_profile": PROFILE, "session_id": "s1", **extra
+    })
+    assert response.status_code == 202, response.text
+    return response.json()
+
+
+def run_jobs(job_id):
+    """Run the advisor workers until the job finishes"""
+    finished = lambda: advisor.advisor_jobs.get(job_id)["status"] not in (advisor.JOB_QUEUED, advisor.JOB_RUNNING)
+    asyncio.run(drain(advisor.advisor_queue, finished, timeout=10))
+
+
+class TestSubmit:
+    """Test POST /advisor/jobs"""
+
+    def test_returns_job_at_once(self, client):
+        submitted = submit(client)
+        assert submitted["status"] == "queued"
+        assert submitted["session_id"] == "s1"
+        assert submitted["poll_url"] == f"/advisor/jobs/{submitted['job_id']}"
+        assert advisor.advisor_queue.stats()["counts"]["pending"] == 1
+
+    def test_rejects_plain_http_webhook(self, client):
+        response = client.post("/advisor/jobs", json={
+            "property": PROPERTY, "investor_profile": PROFILE, "webhook_url": "http://example.com/hook"
+        })
+        assert response.status_code == 400
+
+    @pytest.mark.parametrize("url", [
+        "https://10.1.2.3/hook",
+        "https://127.0.0.1/hook",
+        "https://169.254.169.254/latest/meta-data",
+        "https://[::1]/hook",
+        "https://internal.example.com/hook",
+        "https://mapped.example.com/hook",
+        "https://unknown.invalid/hook",
+        "https://0.0.0.0/hook",
+    ])
+    def test_rejects_non_public_webhook(self, client, url):
+        response = client.post("/advisor/jobs", json={
+            "property": PROPERTY, "investor_profile": PROFILE, "webhook_url": url
+        })
+        assert response.status_code == 400
+        assert advisor.advisor_queue.stats()["counts"]["pending"] == 0
+
+    def test_private_webhook_allowed_in_development(self, client, monkeypatch):
+        monkeypatch.setattr(advisor, "ADVISOR_WEBHOOK_ALLOW_PRIVATE", True)
+        submit(client, webhook_url="http://127.0.0.1:8080/hook")
+
+    def test_backpressure(self, client, monkeypatch):
+        monkeypatch.setattr(advisor, "ADVISOR_MAX_PENDING_JOBS", 1)
+        submit(client)
+        response = client.post("/advisor/jobs", json={"property": PROPERTY, "investor_profile": PROFILE})
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "30"
+
+
+class TestPolling:
+    """Test GET /advisor/jobs/{job_id}"""
+
+    def test_stages_published_as_they_finish(self, client, monkeypatch):
+        job_id = submit(client)["job_id"]
+        gateway = ObservingGateway(responses(4), job_id)
+        monkeypatch.setattr(advisor, "llm_gateway", gateway)
+
+        run_jobs(job_id)
+
+        assert gateway.published == [ALL_STAGES[:i] for i in range(4)]
+        job = client.get(f"/advisor/jobs/{job_id}").json()["job"]
+        assert job["status"] == "complete"
+        assert job["stages"] == ALL_STAGES
+        assert job["result"]["stage"] == "complete"
+        assert job["result"]["output"]["recommendation"] == "negotiate"
+        assert "user_id" not in job
+
+    def test_failure_recorded(self, client):
+        job_id = submit(client)["job_id"]  # Gateway has no scripted responses
+        run_jobs(job_id)
+
+        job = client.get(f"/advisor/jobs/{job_id}").json()["job"]
+        assert job["status"] == "failed"
+        assert job["error"].startswith("Advisor analysis failed")
+
+    def test_session_readable_while_job_runs(self, client):
+        job_id = submit(client)["job_id"]
+        advisor.mirror_job(advisor.advisor_jobs.update(job_id, status=advisor.JOB_RUNNING))
+
+        response = client.get("/advisor/session/s1")
+        assert response.status_code == 200, response.text
+        session = response.json()["session"]
+        assert session["property"] is None
+        assert session["stages"] == []
+        assert session["created_at"]
+
+    def test_session_writes_off_event_loop(self, client, monkeypatch):
+        threads = []
+        for name in ("mirror_job", "save_session"):
+            write = getattr(advisor, name)
+            monkeypatch.setattr(advisor, name, lambda *args, write=write: (
+                threads.append(threading.current_thread() is threading.main_thread()), write(*args)
+            ))
+        job_id = submit(client)["job_id"]
+        monkeypatch.setattr(advisor, "llm_gateway", FakeGateway(responses(4)))
+        run_jobs(job_id)
+
+        assert len(threads) == 7  # Running, four stages, save, finished
+        assert not any(threads)
+
+    def test_jobs_are_private(self, client):
+        job_id = submit(client)["job_id"]
+        client.app.dependency_overrides[verify_token] = lambda: {"sub": "u2"}
+        assert client.get(f"/advisor/jobs/{job_id}").status_code == 404
+        assert client.get("/advisor/jobs/unknown").status_code == 404
+
+
+class TestWebhook:
+    """Test completion webhooks"""
+
+    def test_enqueued_on_completion(self, client, monkeypatch):
+        job_id = submit(client, webhook_url="https://example.com/hook")["job_id"]
+        monkeypatch.setattr(advisor, "llm_gateway", FakeGateway(responses(4)))
+        run_jobs(job_id)
+
+        delivery = advisor.job_queue.store.claim(advisor.job_queue.name, float("inf"))
+        assert delivery.name == "advisor.webhook"
+        assert delivery.payload["url"] == "https://example.com/hook"
+        assert delivery.payload["body"]["status"] == "complete"
+        assert delivery.payload["body"]["job_id"] == job_id
+
+    def test_delivery_signed(self, monkeypatch):
+        sent = {}
+
+        class Response:
+            status_code = 200
+
+        def post(session, url, data, headers, timeout, allow_redirects):
+            sent.update(url=url, data=data, headers=headers, allow_redirects=allow_redirects)
+            return Response()
+
+        monkeypatch.setattr(advisor.requests.Session, "post", post)
+        monkeypatch.setattr(advisor, "ADVISOR_WEBHOOK_SECRET", "secret")
+        advisor.deliver_webhook({"url": "https://example.com/hook", "body": {"job_id": "j1"}})
+
+        assert json.loads(sent["data"]) == {"job_id": "j1"}
+        expected = hmac.new(b"secret", sent["data"], hashlib.sha256).hexdigest()
+        assert sent["headers"]["X-PropIQ-Signature"] == f"sha256={expected}"
+        assert sent["allow_redirects"] is False
+
+    def test_sent_to_checked_address(self, monkeypatch):
+        sent = {}
+
+        class Response:
+            status_code = 204
+
+        def post(session, url, headers, **kwargs):
+            adapter = session.get_adapter(url)
+            sent.update(url=url, host=headers["Host"], pool=adapter.poolmanager.connection_pool_kw)
+            return Response()
+
+        monkeypatch.setattr(advisor.requests.Session, "post", post)
+        advisor.deliver_webhook({"url": "https://example.com:8443/hook?x=1", "body": {}})
+
+        assert sent["url"] == "https://93.184.216.34:8443/hook?x=1"
+        assert sent["host"] == "example.com:8443"
+        assert sent["pool"]["server_hostname"] == "example.com"
+        assert sent["pool"]["assert_hostname"] == "example.com"
+
+    def test_pinned_request_reaches_checked_host(self, monkeypatch):
+        # A real request: "hook.test" only resolves through the checked address
+        received = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                received.append((self.headers["Host"], self.rfile.read(int(self.headers["Content-Length"]))))
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=server.handle_request)
+        thread.start()
+        monkeypatch.setattr(advisor, "ADVISOR_WEBHOOK_ALLOW_PRIVATE", True)
+        monkeypatch.setitem(DNS, "hook.test", ["127.0.0.1"])
+        try:
+            advisor.deliver_webhook({"url": f"http://hook.test:{server.server_port}/hook", "body": {"job_id": "j1"}})
+        finally:
+            thread.join(timeout=5)
+            server.server_close()
+
+        assert received == [(f"hook.test:{server.server_port}", b'{"job_id": "j1"}')]
+
+    def test_redirect_not_followed(self, monkeypatch):
+        class Response:
+            status_code = 302
+
+        monkeypatch.setattr(advisor.requests.Session, "post", lambda *args, **kwargs: Response())
+        with pytest.raises(RuntimeError):
+            advisor.deliver_webhook({"url": "https://example.com/hook", "body": {}})
+
+    def test_rebound_host_not_called(self, monkeypatch):
+        # Resolved publicly at submission, privately by delivery time
+        calls = []
+        monkeypatch.setitem(DNS, "example.com", ["192.168.1.10"])
+        monkeypatch.setattr(advisor.requests.Session, "post", lambda *args, **kwargs: calls.append(args))
+
+        advisor.deliver_webhook({"url": "https://example.com/hook", "body": {"job_id": "j1"}})
+        assert calls == []
+
+    def test_failed_delivery_raises_for_retry(self, monkeypatch):
+        class Response:
+            status_code = 502
+
+        monkeypatch.setattr(advisor.requests.Session, "post", lambda *args, **kwargs: Response())
+        with pytest.raises(RuntimeError):
+            advisor.deliver_webhook({"url": "https://example.com/hook", "body": {}})
@@ -0,0 +1,185 @@
+"""
+Unit tests for incremental advisor re-runs
+Tests stage fingerprints, the stage memo, and which stages a re-run recomputes
+"""
+
+import json
+import uuid
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import database_supabase
+from auth import verify_token
+from routers import property_advisor_multiagent as advisor
+from tests.fixtures.advisor import ALL_STAGES, DEAL_ANALYSIS, MARKET, PROFILE, PROPERTY, responses
+from tests.fixtures.llm_gateway import FakeGateway, completion
+from tests.fixtures.supabase_tables import SupabaseTables
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    """The advisor_sessions table"""
+    tables = SupabaseTables()
+    monkeypatch.setattr(database_supabase, "supabase", tables)
+    return tables.rows.setdefault("advisor_sessions", [])
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    gateway = FakeGateway(responses(4))
+    monkeypatch.setattr(advisor, "llm_gateway", gateway)
+    return gateway
+
+
+@pytest.fixture
+def client(sessions, gateway):
+    app = FastAPI()
+    app.include_router(advisor.router)
+    app.dependency_overrides[verify_token] = lambda: {"sub": "u1"}
+    return TestClient(app)
+
+
+def analyze(client, property_data=PROPERTY, profile=PROFILE, session_id="s1"):
+    response = client.post("/advisor/analyze", json={
+        "property": property_data, "investor_profile": profile, "session_id": session_id
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+class TestStageMemo:
+    """Test fingerprint lookups"""
+
+    def test_fingerprint_covers_prompt_and_data(self):
+        base = advisor.stage_fingerprint(advisor.MARKET_ANALYST, "data", 0.3, 1500)
+        assert base == advisor.stage_fingerprint(advisor.MARKET_ANALYST, "data", 0.3, 1500)
+        assert base != advisor.stage_fingerprint(advisor.MARKET_ANALYST, "data!", 0.3, 1500)
+        assert base != advisor.stage_fingerprint(advisor.DEAL_ANALYST, "data", 0.3, 1500)
+        assert base != advisor.stage_fingerprint(advisor.MARKET_ANALYST, "data", 0.4, 1500)
+
+    def test_lookup(self):
+        memo = advisor.StageMemo([
+            {"stage": "market_analysis", "fingerprint": "abc", "output": MARKET},
+            {"stage": "deal_analysis", "output": DEAL_ANALYSIS}  # Saved before fingerprints
+        ])
+        assert memo.lookup("market_analysis", "abc") == MARKET
+        assert memo.lookup("deal_analysis", "abc") is None
+        assert memo.lookup("risk_assessment", "def") is None
+        assert memo.reused == ["market_analysis"]
+        assert memo.fingerprints["risk_assessment"] == "def"
+
+
+class TestIncrementalRuns:
+    """Test re-runs of a saved session"""
+
+    def test_first_run_saves_fingerprints(self, client, sessions, gateway):
+        output = analyze(client)["output"]
+        assert output["reused_stages"] == []
+        assert len(gateway.requests) == 4
+
+        [saved] = sessions
+        assert (saved["session_id"], saved["user_id"]) == ("s1", "u1")
+        assert [stage["stage"] for stage in saved["stages"]] == ALL_STAGES
+        assert all(stage["fingerprint"] and not stage["reused"] for stage in saved["stages"])
+        json.dumps(saved)  # Stored as JSON
+
+    def test_unchanged_rerun_makes_no_calls(self, client, gateway):
+        first = analyze(client)["output"]
+        second = analyze(client)["output"]
+
+        assert len(gateway.requests) == 4
+        assert second["reused_stages"] == ALL_STAGES
+        assert second["action_plan"] == first["action_plan"]
+        assert second["token_report"]["total"]["after"] == 0
+
+    def test_profile_change_keeps_market_analysis(self, client, gateway):
+        analyze(client)
+        gateway.responses = responses(3)
+        output = analyze(client, profile={**PROFILE, "risk_tolerance": "aggressive"})["output"]
+
+        assert len(gateway.requests) == 7
+        assert output["reused_stages"] == ["market_analysis"]
+        assert set(output["token_report"]["stages"]) == set(ALL_STAGES[1:])
+
+    def test_price_change_reruns_everything(self, client, gateway):
+        analyze(client)
+        gateway.responses = responses(4)
+        output = analyze(client, property_data={**PROPERTY, "asking_price": 280000})["output"]
+
+        assert len(gateway.requests) == 8
+        assert output["reused_stages"] == []
+
+    def test_sessions_are_per_user(self, client, gateway, sessions):
+        analyze(client)
+        sessions[0]["user_id"] = "someone-else"
+        gateway.responses = responses(4)
+
+        assert analyze(client)["output"]["reused_stages"] == []
+        assert len(gateway.requests) == 8
+
+
+class TestUnusableReplies:
+    """Test a run stopped by an agent reply of the wrong shape"""
+
+    def test_finished_stages_returned_and_saved(self, client, sessions, gateway):
+        gateway.responses = [
+            completion(json.dumps(MARKET)),
+            completion(json.dumps({**DEAL_ANALYSIS, "deal_score": "55/100"}))
+        ]
+        result = analyze(client)
+
+        assert result["stage"] == "partial"
+        assert result["success"] is True
+        assert result["output"]["market_analysis"] == MARKET
+        assert "deal_analysis" not in result["output"]
+        assert "unusable" in result["next_steps"][0]
+
+        [saved] = sessions
+        assert [stage["stage"] for stage in saved["stages"]] == ["market_analysis"]
+        assert saved["complete"] is False
+
+
+class TestSessionStore:
+    """Test where sessions are kept"""
+
+    def test_rerun_reuses_stages_without_database(self, monkeypatch, gateway):
+        # The module's own store, with no Supabase client configured
+        monkeypatch.setattr(database_supabase, "supabase", None)
+        app = FastAPI()
+        app.include_router(advisor.router)
+        app.dependency_overrides[verify_token] = lambda: {"sub": "u1"}
+        client = TestClient(app)
+        session_id = f"s-{uuid.uuid4().hex}"
+
+        analyze(client, session_id=session_id)
+        second = analyze(client, session_id=session_id)["output"]
+
+        assert advisor.advisor_sessions.backend == "memory"
+        assert second["reused_stages"] == ALL_STAGES
+        assert len(gateway.requests) == 4
+
+    def test_memory_store_is_bounded(self, monkeypatch):
+        monkeypatch.setattr(database_supabase, "supabase", None)
+        sessions = advisor.AdvisorSessions(max_sessions=2)
+        for session_id in ("a", "b", "c"):
+            sessions.save(session_id, "u1", {"stages": []})
+        sessions.save("b", "u1", {"complete": True})
+        sessions.save("d", "u1", {"stages": []})
+
+        assert sessions.get("a", "u1") is None
+        assert sessions.get("c", "u1") is None
+        assert sessions.get("b", "u1")["complete"] is True
+        assert sessions.get("b", "u2") is None
+
+    def test_table_upsert_keeps_created_at(self, sessions):
+        store = advisor.AdvisorSessions()
+        store.save("s1", "u1", {"stages": []})
+        created_at = sessions[0]["created_at"]
+        store.save("s1", "u1", {"complete": True})
+
+        [saved] = sessions
+        assert saved["created_at"] == created_at
+        assert saved["complete"] is True
+        assert store.get("s1", "u1")["stages"] == []
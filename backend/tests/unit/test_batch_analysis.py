@@ -0,0 +1,135 @@
+"""
+Unit tests for the batch portfolio analysis endpoint
+Tests vectorized scoring, ranking, NDJSON streaming, and top-N narratives
+"""
+
+import json
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import database_supabase
+from auth import verify_token
+from routers import analyses
+from routers.analyses import BatchAnalysisRequest, score_batch
+from tests.fixtures.llm_gateway import FakeGateway, completion
+from tests.fixtures.supabase_tables import SupabaseTables
+from underwriting import analyze_deal
+from utils.usage_accounting import BudgetExceeded
+
+GOOD = {"id": "good", "address": "1 Main St", "purchase_price": 120000, "monthly_rent": 2400}
+FAIR = {"id": "fair", "address": "2 Main St", "purchase_price": 220000, "monthly_rent": 2300}
+POOR = {"id": "poor", "address": "3 Main St", "purchase_price": 400000, "monthly_rent": 2000}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(database_supabase, "supabase", SupabaseTables(users=[{"id": "u1", "subscription_tier": "starter"}]))
+    app = FastAPI()
+    app.include_router(analyses.router)
+    app.dependency_overrides[verify_token] = lambda: {"sub": "u1", "email": "u1@example.com"}
+    return TestClient(app)
+
+
+def post_batch(client, payload):
+    response = client.post("/api/v1/analyses/batch", json=payload)
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+class TestScoring:
+    """Test vectorized scoring and ranking"""
+
+    def test_ranks_best_first(self):
+        scored = score_batch(BatchAnalysisRequest(properties=[POOR, GOOD, FAIR]))
+        assert scored["order"] == [1, 2, 0]
+        assert scored["ranks"] == [3, 1, 2]
+
+    def test_assumptions_fill_missing_fields(self):
+        """Test batch results match the single-deal engine with the same inputs"""
+        request = BatchAnalysisRequest(
+            properties=[GOOD],
+            assumptions={"interest_rate": 6.5, "annual_property_tax": 1800}
+        )
+        expected = analyze_deal({
+            "purchase_price": 120000, "monthly_rent": 2400, "down_payment_percent": 20,
+            "interest_rate": 6.5, "loan_term": 30, "annual_property_tax": 1800
+        })
+        assert score_batch(request)["records"][0] == expected
+
+    def test_property_values_override_assumptions(self):
+        request = BatchAnalysisRequest(properties=[{**GOOD, "interest_rate": 0}], assumptions={"interest_rate": 7})
+        record = score_batch(request)["records"][0]
+        assert record["monthly_pi"] == round(96000 / 360, 2)
+
+
+class TestEndpoint:
+    """Test the NDJSON stream"""
+
+    def test_streams_one_result_per_property(self, client, monkeypatch):
+        monkeypatch.setattr(analyses, "llm_gateway", FakeGateway())
+        analyses.llm_gateway.available = False
+
+        lines = post_batch(client, {"properties": [POOR, GOOD, FAIR]})
+
+        results = [line for line in lines if line["type"] == "result"]
+        assert [r["id"] for r in results] == ["poor", "good", "fair"]
+        assert [r["rank"] for r in results] == [3, 1, 2]
+        assert lines[-1]["type"] == "done"
+        assert lines[-1]["count"] == 3
+        assert lines[-1]["narratives"] == 0
+
+    def test_narratives_only_for_top_n(self, client, monkeypatch):
+        gateway = FakeGateway([completion("Strong cash flow."), completion("Thin margins.")])
+        monkeypatch.setattr(analyses, "llm_gateway", gateway)
+
+        lines = post_batch(client, {"properties": [POOR, GOOD, FAIR], "top_n": 2})
+
+        narratives = [line for line in lines if line["type"] == "narrative"]
+        assert sorted(n["rank"] for n in narratives) == [1, 2]
+        assert len(gateway.requests) == 2
+        # Static prompt first, per-deal facts last
+        messages = gateway.requests[0]["messages"]
+        assert messages[0]["content"] == analyses.BATCH_NARRATIVE.text
+        assert "Deal score:" in messages[1]["content"]
+        assert [t["id"] for t in lines[-1]["top"]] == ["good", "fair"]
+        # Accounted to the user's tier, so its daily budget applies
+        assert gateway.requests[0]["usage_tags"]["user_id"] == "u1"
+        assert gateway.requests[0]["usage_tags"]["tier"] == "starter"
+
+    def test_narratives_stop_when_budget_spent(self, client, monkeypatch):
+        class SpentGateway(FakeGateway):
+            async def complete(self, **kwargs):
+                self.requests.append(kwargs)
+                raise BudgetExceeded("u1", "starter", 0.1, 0.1)
+
+        gateway = SpentGateway()
+        monkeypatch.setattr(analyses, "llm_gateway", gateway)
+
+        lines = post_batch(client, {"properties": [POOR, GOOD, FAIR], "top_n": 3})
+        assert lines[-1]["type"] == "done"
+        assert lines[-1]["narratives"] == 0
+        assert not any(line["type"] == "narrative" for line in lines)
+
+    def test_rejects_oversized_batch(self, client, monkeypatch):
+        monkeypatch.setattr(analyses, "BATCH_MAX_PROPERTIES", 2)
+        response = client.post("/api/v1/analyses/batch", json={"properties": [POOR, GOOD, FAIR]})
+        assert response.status_code == 413
+
+    def test_thousands_of_rows_per_second(self, client, monkeypatch):
+        monkeypatch.setattr(analyses, "llm_gateway", FakeGateway())
+        analyses.llm_gateway.available = False
+        properties = [
+            {"id": str(i), "purchase_price": 100000 + i * 50, "monthly_rent": 900 + i % 1500}
+            for i in range(5000)
+        ]
+
+        started = time.perf_counter()
+        lines = post_batch(client, {"properties": properties, "top_n": 0})
+        elapsed = time.perf_counter() - started
+
+        assert lines[-1]["count"] == 5000
+        assert elapsed < 5.0
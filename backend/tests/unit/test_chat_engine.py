@@ -0,0 +1,220 @@
+"""
+Unit tests for the shared support chat engine
+Tests the model/tool loop, FAQ short-circuit, persistence, and streaming
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+from tests.fixtures.chat_store import make_store
+from tests.fixtures.llm_gateway import FakeGateway, chunk, completion, tool_call
+from utils.chat_engine import SUPPORT_ANALYTICS_EVENT, SUPPORT_METRICS_EVENT, ChatEngine
+from utils.context_window import ContextWindow
+from utils.faq_cache import FaqCache
+from utils.tool_executor import ToolExecutor
+
+
+def tool_fragment(index, call_id=None, name=None, arguments=None):
+    return SimpleNamespace(
+        index=index,
+        id=call_id,
+        function=SimpleNamespace(name=name, arguments=arguments)
+    )
+
+
+class RecordingSink:
+    def __init__(self):
+        self.backends = ["recording"]
+        self.events = []
+
+    def record(self, event_type, data=None):
+        self.events.append((event_type, data))
+        return True
+
+
+def lookup_plan(user_id):
+    return {"tier": "pro", "user_id": user_id}
+
+
+def make_executor():
+    return ToolExecutor({"check_subscription_status": lookup_plan}, read_only={"check_subscription_status"})
+
+
+class TestRespond:
+    """Test blocking chat turns"""
+
+    def test_basic_turn_persists_messages(self):
+        """Test a plain turn calls the model once and saves both messages"""
+        gateway = FakeGateway([completion("Go to Settings.")])
+        store = make_store()
+        engine = ChatEngine("basic", "You are support.", gateway=gateway, store=store)
+
+        turn = asyncio.run(engine.respond("u1", "u1@example.com", "How do I upgrade?", "c1"))
+
+        assert turn.response == "Go to Settings."
+        assert [m["role"] for m in gateway.requests[0]["messages"]] == ["system", "user"]
+        assert "tools" not in gateway.requests[0]
+        saved = store.all_messages(turn.conversation_id, "u1")
+        assert [m["content"] for m in saved] == ["How do I upgrade?", "Go to Settings."]
+
+    def test_history_sent_on_follow_up(self):
+        """Test an existing conversation includes earlier messages"""
+        gateway = FakeGateway([completion("First."), completion("Second.")])
+        engine = ChatEngine("basic", "You are support.", gateway=gateway, store=make_store())
+
+        async def run():
+            await engine.respond("u1", "u1@example.com", "Hi", "c1")
+            await engine.respond("u1", "u1@example.com", "Again", "c1")
+
+        asyncio.run(run())
+        contents = [m["content"] for m in gateway.requests[1]["messages"]]
+        assert contents == ["You are support.", "Hi", "First.", "Again"]
+
+    def test_tool_loop(self):
+        """Test tool calls are executed and fed back before the final answer"""
+        gateway = FakeGateway([
+            completion(tool_calls=[tool_call("c1", "check_subscription_status", user_id="u1")]),
+            completion("You're on Pro.")
+        ])
+        engine = ChatEngine(
+            "enhanced",
+            "You are support.",
+            gateway=gateway,
+            tools=[{"type": "function", "function": {"name": "check_subscription_status"}}],
+            tool_executor=make_executor()
+        )
+
+        turn = asyncio.run(engine.respond("u1", "u1@example.com", "What plan am I on?", "c1"))
+
+        assert turn.response == "You're on Pro."
+        assert turn.tools_used == ["check_subscription_status"]
+        assert gateway.requests[0]["tool_choice"] == "auto"
+        assert gateway.requests[1]["messages"][-1]["role"] == "tool"
+
+    def test_user_context_after_static_prompt(self):
+        """Test static instructions come first and the user's context last"""
+        gateway = FakeGateway([completion("Hi Sam.")])
+
+        async def load(user_id, user_email):
+            return {"tier": "pro"}, "Customer: Sam"
+
+        engine = ChatEngine("enhanced", "You are support.", gateway=gateway, context_loader=load)
+        turn = asyncio.run(engine.respond("u1", "u1@example.com", "Hello", "c1"))
+
+        messages = gateway.requests[0]["messages"]
+        assert [m["content"] for m in messages] == ["You are support.", "Customer: Sam", "Hello"]
+        assert turn.user_context == {"tier": "pro"}
+
+
+class TestContextWindowHistory:
+    """Test history loading with a token-budgeted context window"""
+
+    def seed(self, store, turns):
+        for n in range(turns):
+            store.append_messages("c1", "u1", None, [
+                {"role": "user", "content": f"q{n}"},
+                {"role": "assistant", "content": f"a{n}"}
+            ])
+
+    def test_short_turns_beyond_history_window_kept(self):
+        """Test more messages than CHAT_HISTORY_WINDOW are sent while they fit the budget"""
+        store = make_store()
+        self.seed(store, 15)  # 30 short messages, well under the token budget
+        gateway = FakeGateway([completion("ok")])
+        engine = ChatEngine("basic", "You are support.", gateway=gateway, store=store,
+                            context_window=ContextWindow(budget_tokens=3000))
+
+        asyncio.run(engine.respond("u1", "u1@example.com", "next", "c1"))
+
+        contents = [m["content"] for m in gateway.requests[0]["messages"]]
+        assert contents[1:3] == ["q0", "a0"]
+        assert len(contents) == 32
+
+    def test_fold_covers_every_message_without_gaps(self):
+        """Test a fold summarizes the oldest messages instead of skipping past them"""
+        store = make_store()
+        self.seed(store, 15)
+        folded = []
+
+        def summarizer(previous, messages):
+            folded.extend(m["content"] for m in messages)
+            return "summary"
+
+        gateway = FakeGateway([completion("ok")])
+        engine = ChatEngine("basic", "You are support.", gateway=gateway, store=store,
+                            context_window=ContextWindow(budget_tokens=120, summarizer=summarizer))
+
+        asyncio.run(engine.respond("u1", "u1@example.com", "next", "c1"))
+
+        sent = [m["content"] for m in gateway.requests[0]["messages"][2:-1]]
+        assert folded[:2] == ["q0", "a0"]
+        assert folded + sent == [f"{role}{n}" for n in range(15) for role in ("q", "a")]
+        header = store.get_header("c1", "u1")
+        assert header["summary_through_seq"] == len(folded) - 1
+
+
+class TestFaq:
+    """Test the FAQ short-circuit"""
+
+    def test_faq_hit_skips_model(self):
+        faq = FaqCache()
+        faq.add("pricing", ["How much does PropIQ cost?"], {"*": "From $29/month."})
+        gateway = FakeGateway()
+        sink = RecordingSink()
+        engine = ChatEngine("enhanced", "You are support.", gateway=gateway, faq_cache=faq, analytics=sink)
+
+        turn = asyncio.run(engine.respond("u1", "u1@example.com", "How much does PropIQ cost?", "c1"))
+
+        assert turn.response == "From $29/month."
+        assert turn.faq_match == "pricing"
+        assert gateway.requests == []
+        assert [e[0] for e in sink.events] == [SUPPORT_ANALYTICS_EVENT, SUPPORT_METRICS_EVENT]
+        assert sink.events[1][1]["faq_cache_hit"] is True
+
+
+class TestStream:
+    """Test streaming chat turns"""
+
+    def test_stream_yields_deltas_and_saves(self):
+        gateway = FakeGateway(streams=[[chunk("Go to "), chunk("Settings.")]])
+        store = make_store()
+        engine = ChatEngine("basic", "You are support.", gateway=gateway, store=store)
+
+        async def run():
+            return [e async for e in engine.stream("u1", "u1@example.com", "How do I upgrade?", "c1")]
+
+        events = asyncio.run(run())
+
+        assert [e["type"] for e in events] == ["start", "delta", "delta", "done"]
+        assert events[-1]["response"] == "Go to Settings."
+        assert events[0]["conversation_id"] == "c1"
+        saved = store.all_messages("c1", "u1")
+        assert saved[-1]["content"] == "Go to Settings."
+
+    def test_stream_assembles_tool_call_fragments(self):
+        """Test tool calls split across chunks are reassembled and executed"""
+        gateway = FakeGateway(streams=[
+            [
+                chunk(tool_calls=[tool_fragment(0, "c1", "check_subscription_status", '{"user_')]),
+                chunk(tool_calls=[tool_fragment(0, arguments='id": "u1"}')])
+            ],
+            [chunk("You're on Pro.")]
+        ])
+        engine = ChatEngine(
+            "enhanced",
+            "You are support.",
+            gateway=gateway,
+            tools=[{"type": "function", "function": {"name": "check_subscription_status"}}],
+            tool_executor=make_executor()
+        )
+
+        async def run():
+            return [e async for e in engine.stream("u1", "u1@example.com", "What plan am I on?", "c1")]
+
+        events = asyncio.run(run())
+
+        assert {"type": "tool", "name": "check_subscription_status"} in events
+        tool_message = gateway.requests[1]["messages"][-1]
+        assert json.loads(tool_message["content"])["tier"] == "pro"
+        assert events[-1]["tools_used"] == ["check_subscription_status"]
@@ -0,0 +1,201 @@
+"""
+Unit tests for append-only support chat storage
+Tests header counters, bounded history windows, and legacy conversation reads
+"""
+
+from datetime import datetime
+
+import pytest
+
+from tests.fixtures.memory_collection import MemoryCollection
+from utils.chat_store import ChatStore
+
+
+@pytest.fixture
+def store():
+    return ChatStore(MemoryCollection(), MemoryCollection(), history_window=4)
+
+
+def turn(n):
+    return [
+        {"role": "user", "content": f"question {n}"},
+        {"role": "assistant", "content": f"answer {n}"}
+    ]
+
+
+class TestAppend:
+    """Test appending turns"""
+
+    def test_creates_header_and_rows(self, store):
+        """Test first turn upserts the header and inserts one row per message"""
+        header = store.append_messages("c1", "u1", "u1@example.com", turn(1))
+
+        assert header["message_count"] == 2
+        assert header["last_message"] == "answer 1"
+        assert header["user_email"] == "u1@example.com"
+        assert "created_at" in header
+        assert [m["seq"] for m in store.messages.docs] == [0, 1]
+
+    def test_never_rewrites_existing_rows(self, store):
+        """Test later turns insert new rows and leave old ones untouched"""
+        store.append_messages("c1", "u1", None, turn(1))
+        first_rows = [dict(d) for d in store.messages.docs]
+
+        store.append_messages("c1", "u1", None, turn(2))
+
+        assert store.messages.docs[:2] == first_rows
+        assert [m["seq"] for m in store.messages.docs] == [0, 1, 2, 3]
+        assert store.get_header("c1", "u1")["message_count"] == 4
+
+    def test_header_has_no_messages_array(self, store):
+        """Test the header stays small (no embedded messages)"""
+        store.append_messages("c1", "u1", None, turn(1))
+        assert "messages" not in store.chats.docs[0]
+
+    def test_long_message_preview_truncated(self, store):
+        """Test the header keeps only a preview of the last message"""
+        store.append_messages("c1", "u1", None, [{"role": "assistant", "content": "x" * 1000}])
+        assert len(store.get_header("c1", "u1")["last_message"]) == 200
+
+    def test_empty_append_rejected(self, store):
+        """Test appending nothing is an error"""
+        with pytest.raises(ValueError):
+            store.append_messages("c1", "u1", None, [])
+
+
+class TestReads:
+    """Test history reads"""
+
+    def test_recent_messages_bounded(self, store):
+        """Test the prompt window returns only the newest messages, oldest first"""
+        for n in range(5):
+            store.append_messages("c1", "u1", None, turn(n))
+
+        recent = store.recent_messages("c1", "u1")
+        assert [m["content"] for m in recent] == ["question 3", "answer 3", "question 4", "answer 4"]
+
+    def test_messages_scoped_to_user(self, store):
+        """Test another user's conversation is not readable"""
+        store.append_messages("c1", "u1", None, turn(1))
+        assert store.recent_messages("c1", "u2") == []
+        assert store.get_header("c1", "u2") is None
+
+    def test_unsummarized_messages_beyond_window(self, store):
+        """Test every message after the summary is returned, beyond the history window"""
+        for n in range(5):
+            store.append_messages("c1", "u1", None, turn(n))
+
+        assert len(store.unsummarized_messages("c1", "u1")) == 10
+        after = store.unsummarized_messages("c1", "u1", after_seq=5)
+        assert [m["content"] for m in after] == ["question 3", "answer 3", "question 4", "answer 4"]
+
+    def test_unsummarized_messages_capped(self, store):
+        """Test the read stays bounded when nothing is being summarized"""
+        store.unsummarized_limit = 6
+        for n in range(5):
+            store.append_messages("c1", "u1", None, turn(n))
+
+        rows = store.unsummarized_messages("c1", "u1")
+        assert [m["content"] for m in rows][0] == "question 2"  # Newest six, oldest first
+        assert len(rows) == 6
+        assert len(store.unsummarized_messages("c1", "u1", after_seq=0, limit=3)) == 3
+
+    def test_all_messages_paged(self, store):
+        """Test full history paging in sequence order"""
+        for n in range(3):
+            store.append_messages("c1", "u1", None, turn(n))
+
+        assert len(store.all_messages("c1", "u1")) == 6
+        page = store.all_messages("c1", "u1", skip=2, limit=2)
+        assert [m["content"] for m in page] == ["question 1", "answer 1"]
+
+
+class TestSummaries:
+    """Test the conversation list read path"""
+
+    def test_list_newest_first(self, store):
+        store.append_messages("a", "u1", None, turn(1), timestamp=datetime(2024, 1, 1))
+        store.append_messages("b", "u1", None, turn(1), timestamp=datetime(2024, 1, 2))
+        store.append_messages("a", "u1", None, turn(2), timestamp=datetime(2024, 1, 3))
+        store.append_messages("c", "u2", None, turn(1))
+
+        summaries = store.list_summaries("u1")
+
+        assert [s["conversation_id"] for s in summaries] == ["a", "b"]
+        assert summaries[0]["message_count"] == 4
+        assert summaries[0]["last_message"] == "answer 2"
+        assert store.count_conversations("u1") == 2
+
+    def test_list_paged(self, store):
+        for day in range(1, 6):
+            store.append_messages(f"c{day}", "u1", None, turn(day), timestamp=datetime(2024, 1, day))
+
+        page = store.list_summaries("u1", skip=2, limit=2)
+        assert [s["conversation_id"] for s in page] == ["c3", "c2"]
+
+    def test_list_index_created(self, store):
+        store.ensure_indexes()
+        assert [("user_id", 1), ("updated_at", -1)] in [keys for keys, _ in store.chats.indexes]
+
+
+class TestLegacyConversations:
+    """Test conversations stored with an embedded messages array"""
+
+    @pytest.fixture
+    def legacy_store(self, store):
+        store.chats.insert_one({
+            "conversation_id": "old",
+            "user_id": "u1",
+            "messages": [
+                {"role": "user", "content": "legacy q", "timestamp": datetime(2024, 1, 1)},
+                {"role": "assistant", "content": "legacy a", "timestamp": datetime(2024, 1, 1)}
+            ],
+            "created_at": datetime(2024, 1, 1),
+            "updated_at": datetime(2024, 1, 1)
+        })
+        return store
+
+    def test_legacy_history_readable(self, legacy_store):
+        """Test legacy messages are returned before appended rows"""
+        legacy_store.append_messages("old", "u1", None, turn(1))
+
+        contents = [m["content"] for m in legacy_store.all_messages("old", "u1")]
+        assert contents == ["legacy q", "legacy a", "question 1", "answer 1"]
+
+    def test_recent_window_includes_legacy_tail(self, legacy_store):
+        """Test the window is topped up from the legacy array"""
+        legacy_store.append_messages("old", "u1", None, turn(1))
+        legacy_store.append_messages("old", "u1", None, [{"role": "user", "content": "question 2"}])
+
+        recent = legacy_store.recent_messages("old", "u1")
+        assert [m["content"] for m in recent] == ["legacy a", "question 1", "answer 1", "question 2"]
+
+    def test_unsummarized_includes_legacy_until_folded(self, legacy_store):
+        """Test legacy messages count as unsummarized until a summary covers them"""
+        legacy_store.append_messages("old", "u1", None, turn(1))
+
+        contents = [m["content"] for m in legacy_store.unsummarized_messages("old", "u1")]
+        assert contents == ["legacy q", "legacy a", "question 1", "answer 1"]
+        assert len(legacy_store.unsummarized_messages("old", "u1", after_seq=-1)) == 2
+
+    def test_header_excludes_legacy_array_by_default(self, legacy_store):
+        """Test header reads do not pull the embedded array"""
+        assert "messages" not in legacy_store.get_header("old", "u1")
+
+    def test_summary_counts_legacy_messages(self, legacy_store):
+        """Test legacy conversations are listed with their embedded messages counted"""
+        summaries = legacy_store.list_summaries("u1")
+
+        assert summaries[0]["message_count"] == 2
+        assert summaries[0]["last_message"] == "legacy a"
+        assert "messages" not in summaries[0]
+
+    def test_legacy_backfill_runs_once(self, legacy_store):
+        """Test a legacy header is backfilled once, then appended turns add to it"""
+        assert legacy_store.backfill_legacy_summaries("u1") == 1
+        assert legacy_store.backfill_legacy_summaries("u1") == 0
+
+        legacy_store.append_messages("old", "u1", None, turn(1))
+        [summary] = legacy_store.list_summaries("u1")
+        assert summary["message_count"] == 4
+        assert summary["last_message"] == "answer 1"
@@ -0,0 +1,127 @@
+"""
+Unit tests for the token-budgeted conversation context
+Tests budget enforcement, recent-turn retention, and rolling summarization
+"""
+
+from utils.context_window import ContextWindow, SUMMARY_PREFIX
+from utils.tokens import count_message_tokens, count_tokens
+
+
+def history(turns, words=40):
+    """Build sequenced user/assistant history with ~words per message"""
+    rows = []
+    for n in range(turns):
+        rows.append({"role": "user", "content": f"question {n} " + "word " * words, "seq": 2 * n})
+        rows.append({"role": "assistant", "content": f"answer {n} " + "word " * words, "seq": 2 * n + 1})
+    return rows
+
+
+class RecordingSummarizer:
+    """Summarizer that records what it was asked to fold"""
+
+    def __init__(self, text="short summary"):
+        self.calls = []
+        self.text = text
+
+    def __call__(self, previous_summary, messages):
+        self.calls.append((previous_summary, [m["content"] for m in messages]))
+        return self.text
+
+
+class TestTokenCounting:
+    """Test token counting helpers"""
+
+    def test_empty_text(self):
+        assert count_tokens("") == 0
+
+    def test_message_overhead_counted(self):
+        """Test chat format overhead is included"""
+        messages = [{"role": "user", "content": "hello"}]
+        assert count_message_tokens(messages) > count_tokens("hello")
+
+
+class TestWithinBudget:
+    """Test short conversations are passed through unchanged"""
+
+    def test_all_history_kept(self):
+        window = ContextWindow(budget_tokens=5000, summarizer=RecordingSummarizer())
+        context = window.build("system", history(2), "new question")
+
+        assert [m["role"] for m in context.messages] == ["system", "user", "assistant", "user", "assistant", "user"]
+        assert context.messages[-1]["content"] == "new question"
+        assert context.summary_updated is False
+        assert context.history_folded == 0
+
+    def test_dynamic_context_goes_last(self):
+        """Test per-request context sits after history, before the new message"""
+        context = ContextWindow(budget_tokens=5000).build(
+            "system", history(1), "q", dynamic_context="Customer: Sam"
+        )
+
+        assert context.messages[0]["content"] == "system"
+        assert [m["content"] for m in context.messages[-2:]] == ["Customer: Sam", "q"]
+
+    def test_seq_not_sent_to_model(self):
+        """Test storage fields are stripped from prompt messages"""
+        context = ContextWindow(budget_tokens=5000).build("system", history(1), "q")
+        assert all(set(m) == {"role", "content"} for m in context.messages)
+
+
+class TestOverBudget:
+    """Test long conversations are trimmed and summarized"""
+
+    def test_prompt_fits_budget(self):
+        """Test the prompt never exceeds the budget"""
+        summarizer = RecordingSummarizer()
+        window = ContextWindow(budget_tokens=400, summarizer=summarizer)
+
+        context = window.build("system prompt", history(10), "new question")
+
+        assert context.prompt_tokens <= 400
+        assert context.messages[0]["content"] == "system prompt"
+        assert context.messages[-1]["content"] == "new question"
+
+    def test_keeps_most_recent_turns(self):
+        """Test the newest history survives and the oldest is folded"""
+        summarizer = RecordingSummarizer()
+        window = ContextWindow(budget_tokens=400, summarizer=summarizer)
+
+        context = window.build("system", history(10), "new question")
+        contents = [m["content"] for m in context.messages]
+
+        assert any(c.startswith("answer 9") for c in contents)
+        assert not any(c.startswith("question 0") for c in contents)
+        assert summarizer.calls[0][1][0].startswith("question 0")
+
+    def test_summary_inserted_and_tracked(self):
+        """Test the summary is sent and its coverage recorded"""
+        window = ContextWindow(budget_tokens=400, summarizer=RecordingSummarizer("they asked about billing"))
+
+        context = window.build("system", history(10), "new question")
+
+        assert context.summary_updated is True
+        assert context.messages[1]["content"] == SUMMARY_PREFIX + "they asked about billing"
+        assert context.summary_through_seq == context.history_folded - 1
+
+    def test_already_summarized_messages_skipped(self):
+        """Test messages covered by the stored summary are not replayed or re-folded"""
+        summarizer = RecordingSummarizer()
+        window = ContextWindow(budget_tokens=5000, summarizer=summarizer)
+
+        context = window.build("system", history(3), "q", summary="earlier", summary_through_seq=3)
+        contents = [m["content"] for m in context.messages]
+
+        assert not any(c.startswith("question 0") or c.startswith("answer 1") for c in contents)
+        assert any(c.startswith("question 2") for c in contents)
+        assert summarizer.calls == []
+
+    def test_summarizer_failure_drops_old_turns(self):
+        """Test a failing summarizer still yields an in-budget prompt"""
+        def broken(previous, messages):
+            raise RuntimeError("model unavailable")
+
+        window = ContextWindow(budget_tokens=400, summarizer=broken)
+        context = window.build("system", history(10), "new question")
+
+        assert context.prompt_tokens <= 400
+        assert context.summary_updated is False
@@ -0,0 +1,207 @@
+"""
+Unit tests for dashboard stats
+Tests the cached stats snapshot in database.py and the daily report's
+Supabase RPC / MongoDB aggregation paths
+"""
+
+import importlib.util
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import ModuleType, SimpleNamespace
+
+import pytest
+
+import database
+
+REPORT_PATH = Path(__file__).resolve().parents[3] / "vibe-marketing" / "daily_intelligence.py"
+
+
+def snapshot(age_seconds=0, **counts):
+    refreshed_at = datetime.now(timezone.utc) - timedelta(seconds=age_seconds)
+    return {"total_users": 10, "analyses_24h": 2, **counts, "refreshed_at": refreshed_at.isoformat()}
+
+
+class FakeSupabase:
+    """Records get_dashboard_stats RPCs and returns scripted rows"""
+
+    def __init__(self, rows, delay=0.0):
+        self.rows = list(rows)
+        self.delay = delay
+        self.calls = []
+
+    def rpc(self, name, params):
+        self.calls.append((name, params))
+        row = self.rows.pop(0) if len(self.rows) > 1 else self.rows[0]
+
+        def execute():
+            time.sleep(self.delay)
+            return SimpleNamespace(data=[row])
+
+        return SimpleNamespace(execute=execute)
+
+
+@pytest.fixture
+def supabase(monkeypatch):
+    monkeypatch.setattr(database, "_dashboard_stats", {"stats": None, "refreshed_at": None, "inflight": None})
+
+    def install(rows, delay=0.0):
+        fake = FakeSupabase(rows, delay)
+        monkeypatch.setattr(database, "supabase", fake)
+        return fake
+
+    return install
+
+
+class TestDashboardStats:
+    """Test get_dashboard_stats() caching"""
+
+    def test_reads_rpc_once_while_snapshot_fresh(self, supabase):
+        fake = supabase([snapshot(age_seconds=10)])
+
+        first = database.get_dashboard_stats(300)
+        assert database.get_total_users() == 10
+        assert first["analyses_24h"] == 2
+        assert first["active_subscriptions"] == 0  # Missing columns default to 0
+        assert fake.calls == [("get_dashboard_stats", {"max_age_seconds": 300})]
+
+    def test_freshness_measured_from_snapshot_refresh(self, supabase):
+        # The view was already 250s old when fetched: only 50s of reuse are left
+        fake = supabase([snapshot(age_seconds=250), snapshot(age_seconds=0, total_users=11)])
+
+        database.get_dashboard_stats(300)
+        database.get_dashboard_stats(300)
+        assert len(fake.calls) == 1
+        assert database.get_dashboard_stats(240)["total_users"] == 11
+        assert len(fake.calls) == 2
+
+    def test_zero_max_age_forces_refresh(self, supabase):
+        fake = supabase([snapshot()])
+        database.get_dashboard_stats(0)
+        database.get_dashboard_stats(0)
+        assert len(fake.calls) == 2
+
+    def test_missing_refresh_time_not_cached(self, supabase):
+        fake = supabase([{"total_users": 3}])
+        database.get_dashboard_stats(300)
+        database.get_dashboard_stats(300)
+        assert len(fake.calls) == 2
+
+    def test_concurrent_callers_share_one_rpc(self, supabase):
+        fake = supabase([snapshot()], delay=0.2)
+        results = []
+
+        def read():
+            results.append(database.get_dashboard_stats(300))
+
+        threads = [threading.Thread(target=read) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(fake.calls) == 1
+        assert len(results) == 5
+        assert database._dashboard_stats["inflight"] is None
+
+    def test_slow_refresh_does_not_block_others_indefinitely(self, supabase, monkeypatch):
+        monkeypatch.setattr(database, "DASHBOARD_STATS_WAIT_SECONDS", 0.05)
+        fake = supabase([snapshot()], delay=0.3)
+        leader = threading.Thread(target=database.get_dashboard_stats, args=(300,))
+        leader.start()
+        time.sleep(0.05)
+
+        started = time.monotonic()
+        database.get_dashboard_stats(300)  # Gives up waiting and fetches itself
+        leader.join()
+        assert len(fake.calls) == 2
+        assert time.monotonic() - started < 0.6
+
+    def test_failed_refresh_releases_waiters(self, supabase):
+        fake = supabase([snapshot()])
+        fake.rpc = lambda name, params: SimpleNamespace(execute=lambda: (_ for _ in ()).throw(RuntimeError("down")))
+
+        with pytest.raises(RuntimeError):
+            database.get_dashboard_stats(300)
+        assert database._dashboard_stats["inflight"] is None
+
+
+@pytest.fixture
+def report(monkeypatch):
+    spec = importlib.util.spec_from_file_location("daily_intelligence", REPORT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setattr(module, "SUPABASE_URL", "https://project.supabase.co")
+    monkeypatch.setattr(module, "SUPABASE_KEY", "service-key")
+    return module
+
+
+class FakeMongoCollection:
+    def __init__(self, counts, total):
+        self.counts = counts
+        self.total = total
+        self.pipelines = []
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        return [{"_id": source, "count": count} for source, count in self.counts.items()]
+
+    def estimated_document_count(self):
+        return self.total
+
+
+class TestDailyReport:
+    """Test the daily report's stats sources"""
+
+    def test_supabase_rpc(self, report, monkeypatch):
+        sent = {}
+
+        class Response:
+            def raise_for_status(self):
+                pass
+
+            def json(self):
+                return [{"new_users_24h": 4, "analyses_24h": 9, "total_users": 120, "support_chats_24h": 3,
+                         "refreshed_at": "2026-10-18T09:00:00+00:00"}]
+
+        def post(url, headers, json, timeout):
+            sent.update(url=url, headers=headers, json=json)
+            return Response()
+
+        monkeypatch.setattr(report.requests, "post", post)
+        stats = report.fetch_dashboard_stats()
+
+        assert sent["url"] == "https://project.supabase.co/rest/v1/rpc/get_dashboard_stats"
+        assert sent["json"] == {"max_age_seconds": report.DASHBOARD_STATS_MAX_AGE}
+        assert sent["headers"]["Authorization"] == "Bearer service-key"
+        assert stats == {"new_users": 4, "analyses": 9, "total_users": 120, "support_chats": 3,
+                         "refreshed_at": "2026-10-18T09:00:00+00:00"}
+
+    def test_supabase_rpc_error_reported(self, report, monkeypatch):
+        def post(*args, **kwargs):
+            raise ConnectionError("unreachable")
+
+        monkeypatch.setattr(report.requests, "post", post)
+        stats = report.fetch_dashboard_stats()
+        assert stats["error"] == "unreachable"
+        assert stats["new_users"] == 0
+
+    def test_mongodb_single_aggregation(self, report, monkeypatch):
+        users = FakeMongoCollection({"new_users": 5, "analyses": 7}, total=300)
+        pymongo = ModuleType("pymongo")
+        pymongo.MongoClient = lambda uri: SimpleNamespace(get_database=lambda: SimpleNamespace(users=users))
+        monkeypatch.setitem(sys.modules, "pymongo", pymongo)
+
+        stats = report.fetch_mongodb_data()
+
+        assert stats == {"new_users": 5, "analyses": 7, "total_users": 300, "support_chats": 0}
+        pipeline = users.pipelines[0]
+        assert len(users.pipelines) == 1
+        assert [stage["$unionWith"]["coll"] for stage in pipeline if "$unionWith" in stage] == [
+            "property_analyses", "support_chats"
+        ]
+        assert pipeline[-1] == {"$group": {"_id": "$source", "count": {"$sum": 1}}}
+        since = pipeline[0]["$match"]["created_at"]["$gte"]
+        assert timedelta(hours=23) < datetime.now() - since < timedelta(hours=25)
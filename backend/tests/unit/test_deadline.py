@@ -0,0 +1,187 @@
+"""
+Unit tests for request-scoped deadlines
+Tests deadline scoping, bounded awaits, and propagation into the LLM gateway,
+tool executor and chat engine
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from tests.fixtures.chat_store import make_store
+from tests.fixtures.llm_gateway import FakeGateway, chunk, completion, tool_call
+from utils.chat_engine import DEADLINE_MESSAGE, ChatEngine
+from utils.deadline import (
+    DeadlineExceeded,
+    current_deadline,
+    deadline_scope,
+    remaining_time,
+    request_deadline,
+    within_deadline
+)
+from utils.llm_gateway import LLMGateway
+from utils.tool_executor import ToolExecutor
+
+
+class SlowGateway(FakeGateway):
+    """Gateway whose calls take longer than any test deadline"""
+
+    async def complete(self, **kwargs):
+        self.requests.append(kwargs)
+        await within_deadline(asyncio.sleep(5), "LLM call")
+
+
+class TestDeadline:
+    """Test deadline scoping and bounded awaits"""
+
+    def test_no_deadline_by_default(self):
+        assert current_deadline() is None
+        assert remaining_time(7) == 7
+
+    def test_scope_caps_remaining_time(self):
+        with deadline_scope(1) as deadline:
+            assert current_deadline() is deadline
+            assert remaining_time(10) <= 1
+            assert remaining_time(0.1) == 0.1
+        assert current_deadline() is None
+
+    def test_inner_scope_cannot_extend_outer(self):
+        with deadline_scope(0.5) as outer:
+            with deadline_scope(60) as inner:
+                assert inner is outer
+
+    def test_within_deadline_raises(self):
+        async def run():
+            with deadline_scope(0.05):
+                await within_deadline(asyncio.sleep(1), "sleep")
+
+        with pytest.raises(DeadlineExceeded):
+            asyncio.run(run())
+
+    def test_own_timeout_is_not_a_deadline(self):
+        """Test a per-operation timeout shorter than the deadline stays a plain timeout"""
+        async def run():
+            with deadline_scope(5):
+                await within_deadline(asyncio.sleep(1), "sleep", timeout=0.05)
+
+        with pytest.raises(asyncio.TimeoutError) as exc_info:
+            asyncio.run(run())
+        assert not isinstance(exc_info.value, DeadlineExceeded)
+
+    def test_route_dependency_reaches_endpoint_and_threads(self):
+        app = FastAPI()
+
+        @app.get("/work", dependencies=[Depends(request_deadline(7, "work"))])
+        async def work():
+            in_thread = await asyncio.to_thread(current_deadline)
+            return {"seconds": current_deadline().seconds, "thread": in_thread is current_deadline()}
+
+        assert TestClient(app).get("/work").json() == {"seconds": 7, "thread": True}
+
+
+class TestPropagation:
+    """Test the gateway, tool executor and chat engine honor the deadline"""
+
+    def test_gateway_caps_http_timeout(self):
+        calls = []
+
+        async def create(**kwargs):
+            calls.append(kwargs)
+            return completion("ok")
+
+        gateway = LLMGateway(endpoint="https://example", api_key="key", timeout=60)
+        gateway._async_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+        async def run():
+            with deadline_scope(2):
+                await gateway.complete(model="m", messages=[])
+
+        asyncio.run(run())
+        assert calls[0]["timeout"] <= 2
+
+    def test_gateway_refuses_after_deadline(self):
+        gateway = LLMGateway(endpoint="https://example", api_key="key")
+        gateway._async_client = SimpleNamespace()  # never reached
+
+        async def run():
+            with deadline_scope(0):
+                await gateway.complete(model="m", messages=[])
+
+        with pytest.raises(DeadlineExceeded):
+            asyncio.run(run())
+        assert gateway.stats()["deadline_exceeded"] == 1
+
+    def test_tool_timeout_capped(self):
+        def slow():
+            import time
+            time.sleep(0.5)
+            return {"ok": True}
+
+        session = ToolExecutor({"slow": slow}, default_timeout=5).session()
+
+        async def run():
+            with deadline_scope(0.05):
+                return await session.run("t1", "slow", "{}")
+
+        result = asyncio.run(run())
+        assert result.timed_out
+
+    def test_engine_returns_partial_turn(self):
+        """Test a model call past the deadline yields a saved partial reply"""
+        store = make_store()
+        engine = ChatEngine("basic", "You are support.", gateway=SlowGateway(), store=store)
+
+        async def run():
+            with deadline_scope(0.05):
+                return await engine.respond("u1", "u1@example.com", "Hello", "c1")
+
+        turn = asyncio.run(run())
+        assert turn.partial
+        assert turn.response == DEADLINE_MESSAGE
+        saved = store.all_messages("c1", "u1")
+        assert saved[-1]["partial"] is True
+
+    def test_engine_keeps_tools_run_before_deadline(self):
+        gateway = FakeGateway([completion(tool_calls=[tool_call("t1", "check_subscription_status", user_id="u1")])])
+
+        async def complete(**kwargs):
+            if gateway.responses:
+                return await FakeGateway.complete(gateway, **kwargs)
+            await within_deadline(asyncio.sleep(5), "LLM call")
+
+        gateway.complete = complete
+        engine = ChatEngine(
+            "enhanced",
+            "You are support.",
+            gateway=gateway,
+            tools=[{"type": "function", "function": {"name": "check_subscription_status"}}],
+            tool_executor=ToolExecutor({"check_subscription_status": lambda user_id: {"tier": "pro"}})
+        )
+
+        async def run():
+            with deadline_scope(0.2):
+                return await engine.respond("u1", "u1@example.com", "What plan am I on?", "c1")
+
+        turn = asyncio.run(run())
+        assert turn.partial
+        assert turn.tools_used == ["check_subscription_status"]
+
+    def test_stream_keeps_text_already_sent(self):
+        class StallingGateway(FakeGateway):
+            async def stream(self, **kwargs):
+                yield chunk("Go to ")
+                await within_deadline(asyncio.sleep(5), "LLM stream")
+
+        engine = ChatEngine("basic", "You are support.", gateway=StallingGateway(), store=make_store())
+
+        async def run():
+            with deadline_scope(0.1):
+                return [e async for e in engine.stream("u1", "u1@example.com", "How do I upgrade?", "c1")]
+
+        events = asyncio.run(run())
+        assert [e["type"] for e in events] == ["start", "delta", "done"]
+        assert events[-1]["partial"] is True
+        assert events[-1]["response"] == "Go to "
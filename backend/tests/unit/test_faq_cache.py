@@ -0,0 +1,194 @@
+"""
+Unit tests for the semantic FAQ answer cache
+Tests similarity matching, per-tier answers, slot filling, and stats
+"""
+
+import asyncio
+
+import pytest
+
+from utils.faq_cache import FaqCache, HashingVectorizer
+
+
+def build_cache(threshold=0.6):
+    cache = FaqCache(threshold=threshold)
+    cache.add(
+        "pricing",
+        questions=["How much does PropIQ cost?", "What are your pricing plans?"],
+        answers={"*": "Plans start at $29/month."}
+    )
+    cache.add(
+        "usage_remaining",
+        questions=["How many analyses do I have left?", "What is my remaining analysis count?"],
+        answers={
+            "*": "Hi {user_name}, you have {analyses_remaining} analyses left.",
+            "elite": "Hi {user_name}, Elite includes unlimited analyses."
+        }
+    )
+    return cache
+
+
+class TestVectorizer:
+    """Test the hashed n-gram embedding"""
+
+    def test_unit_norm(self):
+        vector = HashingVectorizer().transform("How much does it cost?")
+        assert abs(float((vector @ vector)) - 1.0) < 1e-5
+
+    def test_stopwords_only_is_empty(self):
+        """Test text with no content words embeds to zero"""
+        assert not HashingVectorizer().transform("how do I").any()
+
+
+class TestLookup:
+    """Test cache hits and misses"""
+
+    def test_paraphrase_hits(self):
+        """Test a reworded question is served from the cache"""
+        match = build_cache().lookup("how much does it cost", tier="free")
+
+        assert match is not None
+        assert match.entry_id == "pricing"
+        assert match.score >= 0.6
+
+    def test_unrelated_question_misses(self):
+        """Test an unrelated question goes to the model"""
+        assert build_cache().lookup("why did my payment fail", tier="free") is None
+
+    @pytest.mark.parametrize("message", [
+        "pricing is broken",
+        "why can't I see the pricing plans",
+        "how many analyses do I have left? they aren’t updating",
+        "I was charged twice, how much does PropIQ cost?"
+    ])
+    def test_problem_reports_miss(self, message):
+        """Test problem reports and negations go to the model even on an FAQ topic"""
+        cache = build_cache()
+        assert cache.lookup(message, slots={"user_name": "Sam", "analyses_remaining": 3}) is None
+        assert cache.stats()["problem_skips"] == 1
+
+    def test_extra_intent_misses(self):
+        """Test a message asking more than the FAQ covers goes to the model"""
+        cache = build_cache()
+        slots = {"user_name": "Sam", "analyses_remaining": 3}
+        message = "How many analyses do I have left, and please email me my invoices"
+        assert cache.lookup(message, slots=slots) is None
+        assert cache.stats()["coverage_misses"] >= 1
+        assert cache.lookup("How many analyses do I have left?", slots=slots) is not None
+
+    def test_threshold_respected(self):
+        assert build_cache(threshold=0.99).lookup("how much does it cost") is None
+
+    def test_empty_cache(self):
+        assert FaqCache().lookup("pricing") is None
+
+
+class TestAnswers:
+    """Test per-tier templates and personalization"""
+
+    def test_slots_filled(self):
+        match = build_cache().lookup(
+            "how many analyses left",
+            tier="pro",
+            slots={"user_name": "Sam", "analyses_remaining": 88}
+        )
+        assert match.answer == "Hi Sam, you have 88 analyses left."
+
+    def test_tier_variant(self):
+        """Test a tier-specific answer replaces the default"""
+        match = build_cache().lookup("how many analyses left", tier="elite", slots={"user_name": "Sam"})
+        assert "unlimited" in match.answer
+
+    def test_missing_slot_is_miss(self):
+        """Test an unfillable template falls through instead of rendering braces"""
+        cache = build_cache()
+        assert cache.lookup("how many analyses left", tier="pro", slots={"user_name": "Sam"}) is None
+        assert cache.stats()["slot_misses"] == 1
+
+    def test_readd_replaces_entry(self):
+        cache = build_cache()
+        cache.add("pricing", questions=["What does it cost?"], answers={"*": "From $29."})
+
+        assert len(cache) == 2
+        assert cache.lookup("what does it cost").answer == "From $29."
+        assert "What are your pricing plans?" not in cache._row_question
+
+    def test_entry_requires_questions_and_answers(self):
+        with pytest.raises(ValueError):
+            FaqCache().add("empty", questions=[], answers={"*": "x"})
+
+
+class TestStats:
+    """Test hit accounting"""
+
+    def test_counts(self):
+        cache = build_cache()
+        cache.lookup("pricing plans")
+        cache.lookup("is the API down")
+
+        stats = cache.stats()
+        assert stats["lookups"] == 2
+        assert stats["hits"] == 1
+        assert stats["hit_ratio"] == 0.5
+        assert stats["entry_hits"]["pricing"] == 1
+
+
+class TestSupportSlots:
+    """Test FAQ slots built from the enhanced chat's user context"""
+
+    @pytest.fixture
+    def support(self):
+        from routers import support_chat_enhanced
+        return support_chat_enhanced
+
+    def test_derives_remaining_without_stored_count(self, support):
+        """Test a context without propiq_remaining answers from limit - used"""
+        slots = support.faq_slots({"user_name": "Sam", "tier": "free", "propiq_limit": 5, "propiq_used": 2})
+        assert slots["analyses_used"] == 2
+        assert slots["analyses_limit"] == 5
+        assert slots["analyses_remaining"] == 3
+
+        match = support.faq_cache.lookup("How many analyses do I have left?", slots=slots)
+        assert "you have 3 left" in match.answer
+
+    def test_fallback_context_gets_no_personalized_answers(self, support):
+        """Test the no-database placeholder context never fills usage or plan answers"""
+        context = asyncio.run(support.load_user_context("u1", "u1@example.com"))
+        assert context["fallback"]
+        slots = support.faq_slots(context)
+
+        assert support.faq_cache.lookup("How many analyses do I have left?", slots=slots) is None
+        assert support.faq_cache.lookup("What plans do you offer?", slots=slots) is None
+        assert support.faq_cache.lookup("How do I run an analysis?", slots=slots).entry_id == "how_to_analyze"
+
+    @pytest.mark.parametrize("message", [
+        "download pdf not working",
+        "pricing is broken",
+        "How many analyses do I have left? Also I want a refund for last month",
+        "the pdf export keeps timing out for my analysis"
+    ])
+    def test_support_faq_leaves_problems_to_the_model(self, support, message):
+        slots = support.faq_slots({"user_name": "Sam", "tier": "pro", "propiq_limit": 100, "propiq_used": 3})
+        assert support.faq_cache.lookup(message, tier="pro", slots=slots) is None
+
+    def test_support_faq_answers_plain_questions(self, support):
+        slots = support.faq_slots({"user_name": "Sam", "tier": "pro"})
+        assert support.faq_cache.lookup("What plans do you offer?", slots=slots).entry_id == "pricing"
+        assert support.faq_cache.lookup("How can I download my analysis as a PDF?").entry_id == "export"
+
+    def test_pricing_answer_built_from_tier_config(self, support, monkeypatch):
+        slots = support.faq_slots({"tier": "pro"})
+        answer = support.faq_cache.lookup("How much does PropIQ cost?", slots=slots).answer
+        for tier, config in support.TIER_CONFIG.items():
+            assert tier.title() in answer
+            if config["price"]:
+                assert f"${config['price']}/mo" in answer
+
+        monkeypatch.setitem(support.TIER_CONFIG, "pro", {"limit": 150, "price": 89})
+        assert "- Pro ($89/mo): 150 analyses per month" in support.plans_summary()
+
+    def test_unlimited_and_stored_remaining(self, support):
+        """Test unlimited plans, overuse, and an explicit stored remaining count"""
+        assert support.faq_slots({"propiq_limit": -1, "propiq_used": 40})["analyses_remaining"] == "unlimited"
+        assert support.faq_slots({"propiq_limit": 20, "propiq_used": 25})["analyses_remaining"] == 0
+        assert support.faq_slots({"propiq_limit": 20, "propiq_remaining": 7})["analyses_remaining"] == 7
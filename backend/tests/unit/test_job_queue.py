@@ -0,0 +1,136 @@
+"""
+Unit tests for the background job queue
+Tests execution, retries with backoff, dead-lettering and durability
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from tests.fixtures.job_queue import drain
+from utils.job_queue import JobQueue, MemoryJobStore, SQLiteJobStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryJobStore()
+    return SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+
+
+class TestExecution:
+    """Test jobs run with their payload"""
+
+    def test_sync_handler_runs_off_loop(self, store):
+        """Test sync handlers receive the payload on a worker thread"""
+        queue = JobQueue("test", store=store, workers=2, poll_interval=0.05)
+        seen = []
+
+        @queue.handler("greet")
+        def greet(payload):
+            seen.append((payload["name"], threading.current_thread() is threading.main_thread()))
+
+        async def run():
+            queue.enqueue("greet", {"name": "ada"})
+            await drain(queue, lambda: seen)
+
+        asyncio.run(run())
+        assert seen == [("ada", False)]
+        assert queue.stats()["counts"]["pending"] == 0
+        assert queue.stats()["jobs"]["greet"]["runs"] == 1
+
+    def test_async_handler_awaited(self, store):
+        """Test coroutine handlers are awaited"""
+        queue = JobQueue("test", store=store, poll_interval=0.05)
+        seen = []
+
+        @queue.handler("ping")
+        async def ping(payload):
+            seen.append(payload)
+
+        async def run():
+            queue.enqueue("ping", {"n": 1})
+            await drain(queue, lambda: seen)
+
+        asyncio.run(run())
+        assert seen == [{"n": 1}]
+
+
+class TestRetries:
+    """Test retry and dead-letter behaviour"""
+
+    def test_retry_then_succeed(self, store):
+        """Test a failing job is retried until it succeeds"""
+        queue = JobQueue("test", store=store, retry_backoff=0.01, poll_interval=0.02)
+        attempts = []
+
+        @queue.handler("flaky")
+        def flaky(payload):
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise RuntimeError("transient")
+
+        async def run():
+            queue.enqueue("flaky")
+            await drain(queue, lambda: queue.stats().get("jobs", {}).get("flaky", {}).get("runs") == 3)
+
+        asyncio.run(run())
+        stats = queue.stats()["jobs"]["flaky"]
+        assert len(attempts) == 3
+        assert stats["failures"] == 2
+        assert stats["dead_lettered"] == 0
+
+    def test_dead_letter_after_max_attempts(self, store):
+        """Test jobs that keep failing are dead-lettered and can be requeued"""
+        queue = JobQueue("test", store=store, max_attempts=2, retry_backoff=0.01, poll_interval=0.02)
+
+        @queue.handler("broken")
+        def broken(payload):
+            raise ValueError("boom")
+
+        async def run():
+            queue.enqueue("broken")
+            await drain(queue, lambda: queue.stats()["counts"]["dead"] == 1)
+
+        asyncio.run(run())
+        dead = queue.dead_letters()
+        assert len(dead) == 1
+        assert dead[0]["attempts"] == 2
+        assert "boom" in dead[0]["last_error"]
+        assert queue.requeue_dead(dead[0]["id"]) is True
+        assert queue.stats()["counts"]["pending"] == 1
+
+    def test_unknown_job_dead_lettered_immediately(self, store):
+        """Test jobs without a handler are not retried"""
+        queue = JobQueue("test", store=store, poll_interval=0.02)
+
+        async def run():
+            queue.enqueue("missing")
+            await drain(queue, lambda: queue.stats()["counts"]["dead"] == 1)
+
+        asyncio.run(run())
+        assert queue.dead_letters()[0]["attempts"] == 1
+
+
+class TestDurability:
+    """Test SQLite persistence"""
+
+    def test_jobs_survive_reopen(self, tmp_path):
+        """Test pending and interrupted jobs are picked up by a new process"""
+        path = str(tmp_path / "jobs.sqlite3")
+        first = SQLiteJobStore(path)
+        JobQueue("test", store=first).enqueue("later", {"x": 1})
+
+        # Simulate a crash mid-job: claimed but never completed
+        interrupted = JobQueue("test", store=first)
+        interrupted.enqueue("interrupted", {"x": 2})
+        first.claim("test", float("inf"))
+
+        queue = JobQueue("test", store=SQLiteJobStore(path), poll_interval=0.02)
+        seen = []
+        queue.register("later", lambda payload: seen.append(payload["x"]))
+        queue.register("interrupted", lambda payload: seen.append(payload["x"]))
+
+        asyncio.run(drain(queue, lambda: len(seen) == 2))
+        assert sorted(seen) == [1, 2]
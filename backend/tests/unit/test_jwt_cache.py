@@ -0,0 +1,97 @@
+"""
+Unit tests for the verified-JWT cache
+Tests caching until exp, LRU eviction, and key rotation
+"""
+
+import time
+
+import jwt
+import pytest
+
+from utils.jwt_cache import TokenVerifier, VerifiedTokenCache
+
+SECRET = "a" * 64
+NEW_SECRET = "b" * 64
+
+
+def make_token(secret: str = SECRET, ttl: int = 3600, sub: str = "user-1") -> str:
+    now = int(time.time())
+    return jwt.encode({"sub": sub, "iat": now, "exp": now + ttl}, secret, algorithm="HS256")
+
+
+class TestVerifiedTokenCache:
+    """Test the LRU itself"""
+
+    def test_expired_entries_are_dropped(self):
+        """Test claims are not served past their exp"""
+        cache = VerifiedTokenCache()
+        cache.put("tok", {"sub": "u", "exp": time.time() + 0.05})
+        assert cache.get("tok") is not None
+        time.sleep(0.1)
+        assert cache.get("tok") is None
+
+    def test_tokens_without_exp_are_not_cached(self):
+        """Test claims without exp never enter the cache"""
+        cache = VerifiedTokenCache()
+        cache.put("tok", {"sub": "u"})
+        assert cache.stats()["size"] == 0
+
+    def test_lru_eviction(self):
+        """Test least recently used entries are evicted first"""
+        cache = VerifiedTokenCache(max_size=2)
+        exp = time.time() + 60
+        cache.put("a", {"exp": exp})
+        cache.put("b", {"exp": exp})
+        cache.get("a")
+        cache.put("c", {"exp": exp})
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        assert cache.get("c") is not None
+
+
+class TestTokenVerifier:
+    """Test verification, caching and rotation"""
+
+    def test_second_verify_is_a_cache_hit(self):
+        """Test repeat verification of the same token hits the cache"""
+        verifier = TokenVerifier(SECRET)
+        token = make_token()
+        assert verifier.verify(token)["sub"] == "user-1"
+        assert verifier.verify(token)["sub"] == "user-1"
+        stats = verifier.cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+
+    def test_invalid_signature_rejected(self):
+        """Test tokens signed with an unknown secret are rejected"""
+        verifier = TokenVerifier(SECRET)
+        with pytest.raises(jwt.InvalidTokenError):
+            verifier.verify(make_token(secret="c" * 64))
+
+    def test_expired_token_rejected(self):
+        """Test expired tokens raise ExpiredSignatureError"""
+        verifier = TokenVerifier(SECRET)
+        with pytest.raises(jwt.ExpiredSignatureError):
+            verifier.verify(make_token(ttl=-10))
+
+    def test_previous_secret_still_accepted_after_rotation(self):
+        """Test tokens issued before a rotation keep working"""
+        verifier = TokenVerifier(SECRET)
+        old_token = make_token(SECRET)
+        verifier.verify(old_token)
+
+        verifier.rotate(NEW_SECRET)
+        assert verifier.signing_secret == NEW_SECRET
+        assert verifier.cache.stats()["size"] == 0
+        assert verifier.verify(old_token)["sub"] == "user-1"
+        assert verifier.verify(make_token(NEW_SECRET))["sub"] == "user-1"
+
+    def test_retired_secret_rejected(self):
+        """Test rotating with no previous secrets invalidates old tokens, even cached ones"""
+        verifier = TokenVerifier(SECRET)
+        old_token = make_token(SECRET)
+        verifier.verify(old_token)
+
+        verifier.rotate(NEW_SECRET, previous_secrets=[])
+        with pytest.raises(jwt.InvalidTokenError):
+            verifier.verify(old_token)
@@ -0,0 +1,108 @@
+"""
+Unit tests for the bcrypt worker pool
+Tests hashing/verification off the event loop, rehash detection, and queue limits
+"""
+
+import asyncio
+import threading
+
+import bcrypt
+import pytest
+
+from utils.password_hashing import PasswordHasher, PasswordHasherBusy
+
+
+@pytest.fixture
+def hasher():
+    """Low-cost hasher so tests stay fast"""
+    h = PasswordHasher(rounds=4, max_workers=2, max_pending=8)
+    yield h
+    h.shutdown()
+
+
+class TestHashAndVerify:
+    """Test async hash/verify round trips"""
+
+    def test_hash_then_verify(self, hasher):
+        """Test a hash produced on the pool verifies on the pool"""
+        async def run():
+            hashed = await hasher.hash("ValidPass1")
+            return hashed, await hasher.verify("ValidPass1", hashed)
+
+        hashed, ok = asyncio.run(run())
+        assert hashed.startswith("$2b$04$")
+        assert ok is True
+
+    def test_wrong_password_rejected(self, hasher):
+        """Test a wrong password does not verify"""
+        hashed = hasher.hash_sync("ValidPass1")
+        assert asyncio.run(hasher.verify("WrongPass1", hashed)) is False
+
+    def test_malformed_hash_rejected(self, hasher):
+        """Test a malformed stored hash fails closed instead of raising"""
+        assert asyncio.run(hasher.verify("ValidPass1", "not-a-hash")) is False
+
+    def test_runs_off_event_loop_thread(self, hasher):
+        """Test bcrypt work executes on a pool thread, not the loop thread"""
+        seen = {}
+
+        def probe():
+            seen["thread"] = threading.current_thread().name
+            return True
+
+        async def run():
+            seen["loop"] = threading.current_thread().name
+            return await hasher._submit(probe)
+
+        asyncio.run(run())
+        assert seen["thread"].startswith("bcrypt")
+        assert seen["thread"] != seen["loop"]
+
+
+class TestRehash:
+    """Test cost-factor upgrade detection"""
+
+    def test_same_cost_needs_no_rehash(self, hasher):
+        """Test hashes at the configured cost are kept"""
+        assert hasher.needs_rehash(hasher.hash_sync("ValidPass1")) is False
+
+    def test_different_cost_needs_rehash(self, hasher):
+        """Test hashes at another cost are flagged for upgrade"""
+        old_hash = bcrypt.hashpw(b"ValidPass1", bcrypt.gensalt(rounds=5)).decode()
+        assert hasher.needs_rehash(old_hash) is True
+
+    def test_unparseable_hash_not_flagged(self, hasher):
+        """Test empty or unknown hash formats are not flagged"""
+        assert hasher.needs_rehash(None) is False
+        assert hasher.needs_rehash("") is False
+        assert hasher.needs_rehash("plaintext") is False
+
+
+class TestQueueLimits:
+    """Test bounded queue depth and metrics"""
+
+    def test_rejects_when_queue_full(self):
+        """Test submissions beyond max_pending raise PasswordHasherBusy"""
+        hasher = PasswordHasher(rounds=4, max_workers=1, max_pending=2)
+        gate = threading.Event()
+
+        async def run():
+            blocked = [
+                asyncio.ensure_future(hasher._submit(gate.wait))
+                for _ in range(2)
+            ]
+            await asyncio.sleep(0.05)
+            with pytest.raises(PasswordHasherBusy):
+                await hasher.hash("ValidPass1")
+            gate.set()
+            await asyncio.gather(*blocked)
+
+        try:
+            asyncio.run(run())
+            stats = hasher.stats()
+            assert stats["rejected"] == 1
+            assert stats["completed"] == 2
+            assert stats["peak_queue_depth"] == 2
+            assert stats["queue_depth"] == 0
+        finally:
+            hasher.shutdown()
@@ -0,0 +1,244 @@
+"""
+Unit tests for multi-year projections
+Tests amortization, calculator parity, IRR/NPV, batch shape, and the PDF/CSV/advisor outputs
+"""
+
+import asyncio
+import csv
+import io
+import time
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from auth import verify_token
+from routers import analyses
+from underwriting import (
+    ProjectionAssumptions,
+    amortization_schedule,
+    analyze_deal,
+    monthly_mortgage_payment,
+    project_deal,
+    project_deals,
+    projection_csv
+)
+from underwriting.projections import npv
+
+DEAL = {
+    "purchase_price": 300000,
+    "monthly_rent": 2500,
+    "down_payment_percent": 20,
+    "interest_rate": 7,
+    "loan_term": 30,
+    "annual_property_tax": 3600,
+    "annual_insurance": 1200,
+    "monthly_maintenance": 150,
+    "closing_costs": 6000
+}
+
+
+@pytest.fixture(scope="module")
+def projection():
+    return project_deal(DEAL)
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(analyses.router)
+    app.dependency_overrides[verify_token] = lambda: {"sub": "u1", "email": "u1@example.com"}
+    return TestClient(app)
+
+
+class TestAmortization:
+    """Test the closed-form monthly schedule"""
+
+    def test_schedule_pays_off_loan(self):
+        schedule = amortization_schedule([240000, 240000], [7, 7], [30, 15], 360)
+        payment = monthly_mortgage_payment(240000, 7, 30)
+
+        assert schedule["balance"].shape == (2, 360)
+        np.testing.assert_allclose(schedule["payment"][0], payment)
+        np.testing.assert_allclose(schedule["interest"] + schedule["principal"], schedule["payment"])
+        assert schedule["principal"][0].sum() == pytest.approx(240000)
+        assert schedule["balance"][0, -1] == pytest.approx(0, abs=1e-6)
+        # 15-year loan: paid off at month 180, nothing due after
+        assert schedule["balance"][1, 179] == pytest.approx(0, abs=1e-6)
+        assert not schedule["payment"][1, 180:].any()
+
+    def test_first_month_interest(self):
+        schedule = amortization_schedule([240000], [6], [30], 12)
+        assert schedule["interest"][0, 0] == pytest.approx(1200)
+
+    def test_zero_rate_loan(self):
+        schedule = amortization_schedule([120000], [0], [10], 120)
+        np.testing.assert_allclose(schedule["payment"], 1000)
+        assert not schedule["interest"].any()
+
+
+class TestProjection:
+    """Test yearly curves and returns"""
+
+    def test_year_one_matches_calculator(self, projection):
+        metrics = analyze_deal(DEAL)
+        year1 = projection.yearly_records(0)[0]
+        assert year1["cash_flow"] == metrics["annual_cash_flow"]
+        assert year1["monthly_rent"] == 2500
+        assert year1["debt_service"] == pytest.approx(metrics["monthly_pi"] * 12, abs=0.1)
+
+    def test_growth_and_equity(self, projection):
+        yearly = projection.yearly
+        assert yearly["monthly_rent"][0, 1] == pytest.approx(2500 * 1.03)
+        assert yearly["property_value"][0, 0] == pytest.approx(309000)
+        assert yearly["loan_balance"][0, -1] == pytest.approx(0, abs=1e-6)
+        assert np.all(np.diff(yearly["equity"][0]) > 0)
+
+    def test_irr_zeroes_npv(self, projection):
+        """Test the IRR at each exit year discounts its own flows to zero"""
+        yearly = projection.yearly
+        for exit_year in (1, 5, 10, 30):
+            flows = np.concatenate([[-projection.cash_invested[0]], yearly["cash_flow"][0, :exit_year]])
+            flows[-1] += yearly["sale_proceeds"][0, exit_year - 1]
+            rate = projection.irr_by_exit[0, exit_year - 1] * 100
+            assert npv(flows, rate) == pytest.approx(0, abs=1e-4)
+            assert projection.npv_by_exit[0, exit_year - 1] == pytest.approx(npv(flows, 8))
+
+    def test_npv_known_value(self):
+        assert npv(np.array([-100.0, 110.0]), 10) == pytest.approx(0)
+
+    def test_hold_years(self):
+        held = project_deal(DEAL, ProjectionAssumptions(hold_years=5))
+        summary = held.summary(0)
+        assert summary["exit_year"] == 5
+        assert summary["irr"] == round(held.irr_by_exit[0, 4] * 100, 2)
+        with pytest.raises(ValueError):
+            ProjectionAssumptions(years=10, hold_years=20)
+
+    def test_batch_rows_match_single_deals(self):
+        deals = [DEAL, {**DEAL, "loan_term": 15, "monthly_rent": 2800}, {**DEAL, "down_payment_percent": 100}]
+        batch = project_deals(deals)
+        for i, deal in enumerate(deals):
+            single = project_deal(deal)
+            np.testing.assert_allclose(batch.yearly["equity"][i], single.yearly["equity"][0])
+            np.testing.assert_allclose(batch.irr_by_exit[i], single.irr_by_exit[0], equal_nan=True)
+
+    def test_thousand_properties_fast(self):
+        deals = [{**DEAL, "purchase_price": 200000 + i * 100, "loan_term": 15 + 15 * (i % 2)} for i in range(1000)]
+        started = time.perf_counter()
+        batch = project_deals(deals)
+        assert batch.schedule["balance"].shape == (1000, 360)
+        assert batch.irr_by_exit.shape == (1000, 30)
+        assert time.perf_counter() - started < 1.0
+
+
+class TestOutputs:
+    """Test the shared records in PDF, CSV, and advisor outputs"""
+
+    def test_report_and_schedule(self, projection):
+        report = projection.report(0, include_schedule=True)
+        assert len(report["yearly"]) == 30
+        assert len(report["schedule"]) == 360
+        assert report["schedule"][0]["interest"] == 1400.0
+
+    def test_csv(self, projection):
+        rows = list(csv.reader(io.StringIO(projection_csv([("home", projection.report(0))]))))
+        assert rows[0][:3] == ["property", "year", "monthly_rent"]
+        assert len(rows) == 31
+        assert rows[1][0] == "home"
+
+    def test_feeds_analysis_csv_export(self, projection):
+        from utils.excel_exporter import export_to_csv
+
+        exported = export_to_csv({"address": "1 Main St", "projections": projection.report(0)})
+        assert "Projections" in exported
+        assert "year,monthly_rent,gross_income" in exported
+
+    def test_pdf_projection_page(self, projection):
+        from utils.pdf_generator import PDFGenerator
+
+        html = PDFGenerator()._generate_html({"address": "1 Main St", "projections": projection.report(0)}, None)
+        assert "Long-Term Projections" in html
+        assert "Page 4" in html
+        assert "Long-Term Projections" not in PDFGenerator()._generate_html({"address": "1 Main St"}, None)
+
+    def test_advisor_projection_uses_hold_period(self):
+        from routers.property_advisor_multiagent import advisor_facts
+
+        facts = advisor_facts({"asking_price": 300000, "monthly_rent": 2500}, {"investment_horizon": "short"})
+        assert facts.projection["summary"]["exit_year"] == 3
+        assert len(facts.projection["yearly"]) == 30
+
+
+class TestEndpoint:
+    """Test POST /api/v1/analyses/projections"""
+
+    def test_json(self, client):
+        response = client.post("/api/v1/analyses/projections", json={
+            "properties": [{"id": "a", "purchase_price": 300000, "monthly_rent": 2500}],
+            "projection": {"years": 10, "hold_years": 5}
+        })
+        assert response.status_code == 200, response.text
+        result = response.json()["results"][0]
+        assert result["id"] == "a"
+        assert len(result["yearly"]) == 10
+        assert result["summary"]["exit_year"] == 5
+        assert "schedule" not in result
+
+    def test_csv(self, client):
+        response = client.post("/api/v1/analyses/projections", json={
+            "properties": [{"id": "a", "purchase_price": 300000, "monthly_rent": 2500}],
+            "format": "csv"
+        })
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+
+    def test_xlsx_needs_openpyxl(self, client, monkeypatch):
+        monkeypatch.setattr(analyses, "OPENPYXL_AVAILABLE", False)
+        response = client.post("/api/v1/analyses/projections", json={
+            "properties": [{"purchase_price": 300000, "monthly_rent": 2500}],
+            "format": "xlsx"
+        })
+        assert response.status_code == 503
+
+    def test_rejects_bad_requests(self, client, monkeypatch):
+        response = client.post("/api/v1/analyses/projections", json={
+            "properties": [{"purchase_price": 300000, "monthly_rent": 2500}],
+            "projection": {"years": 5, "hold_years": 10}
+        })
+        assert response.status_code == 400
+
+        monkeypatch.setattr(analyses, "PROJECTION_MAX_PROPERTIES", 1)
+        response = client.post("/api/v1/analyses/projections", json={
+            "properties": [{"purchase_price": 1, "monthly_rent": 1}] * 2
+        })
+        assert response.status_code == 413
+
+    def test_schedule_only_for_small_requests(self, client, monkeypatch):
+        monkeypatch.setattr(analyses, "PROJECTION_MAX_SCHEDULE_PROPERTIES", 1)
+        payload = {"properties": [{"purchase_price": 300000, "monthly_rent": 2500}], "include_schedule": True}
+        response = client.post("/api/v1/analyses/projections", json=payload)
+        assert response.status_code == 200
+        assert len(response.json()["results"][0]["schedule"]) == 360
+
+        payload["properties"] *= 2
+        assert client.post("/api/v1/analyses/projections", json=payload).status_code == 413
+
+    def test_projection_runs_off_the_event_loop(self, client, monkeypatch):
+        loops = []
+        project = analyses.project_deals
+
+        def spy(*args, **kwargs):
+            try:
+                loops.append(asyncio.get_running_loop())
+            except RuntimeError:
+                loops.append(None)
+            return project(*args, **kwargs)
+
+        monkeypatch.setattr(analyses, "project_deals", spy)
+        response = client.post("/api/v1/analyses/projections", json={
+            "properties": [{"purchase_price": 300000, "monthly_rent": 2500}]
+        })
+        assert response.status_code == 200
+        assert loops == [None]
@@ -0,0 +1,75 @@
+"""
+Unit tests for the prompt registry
+Tests static prefix compilation, message layout, and cache accounting
+"""
+
+from types import SimpleNamespace
+
+from utils.prompt_registry import PromptRegistry, cacheable_prefix_tokens
+
+
+def usage(prompt_tokens, cached_tokens=None):
+    details = SimpleNamespace(cached_tokens=cached_tokens) if cached_tokens is not None else None
+    return SimpleNamespace(prompt_tokens=prompt_tokens, prompt_tokens_details=details)
+
+
+class TestCompile:
+    """Test prompt compilation"""
+
+    def test_text_normalized(self):
+        """Test whitespace differences do not change the sent bytes"""
+        registry = PromptRegistry()
+        a = registry.register("a", "You are support.   \nBe brief.\n\n")
+        b = registry.register("b", "\nYou are support.\nBe brief.")
+        assert a.text == b.text
+
+    def test_tokens_precomputed(self):
+        prompt = PromptRegistry().register("a", "You are support.")
+        assert prompt.tokens > 0
+
+    def test_static_first_dynamic_last(self):
+        prompt = PromptRegistry().register("a", "You are support.")
+        messages = prompt.messages("Address: 1 Main St")
+
+        assert messages[0] == {"role": "system", "content": "You are support."}
+        assert messages[-1] == {"role": "user", "content": "Address: 1 Main St"}
+
+
+class TestCacheAccounting:
+    """Test cache-eligible and observed cached ratios"""
+
+    def test_cacheable_prefix_rounding(self):
+        assert cacheable_prefix_tokens(1000) == 0
+        assert cacheable_prefix_tokens(1024) == 1024
+        assert cacheable_prefix_tokens(1300) == 1280
+
+    def test_short_prompt_not_cache_eligible(self):
+        registry = PromptRegistry()
+        registry.register("a", "You are support.")
+        registry.record("a", usage(100))
+
+        stats = registry.stats()["a"]
+        assert stats["cache_eligible_ratio"] == 0.0
+        assert stats["cached_ratio"] is None
+
+    def test_long_prompt_ratios(self):
+        registry = PromptRegistry()
+        prompt = registry.register("a", "word " * 1500)
+        registry.record("a", usage(prompt.tokens * 2, cached_tokens=prompt.cacheable_tokens))
+
+        stats = registry.stats()["a"]
+        assert 0.45 < stats["static_ratio"] <= 0.5
+        assert 0 < stats["cache_eligible_ratio"] <= stats["static_ratio"]
+        assert stats["cached_ratio"] == stats["cache_eligible_ratio"]
+
+    def test_local_count_when_usage_missing(self):
+        registry = PromptRegistry()
+        registry.register("a", "You are support.")
+        registry.record("a", prompt_tokens=40)
+
+        assert registry.stats()["a"]["avg_prompt_tokens"] == 40
+
+    def test_unknown_prompt_ignored(self):
+        registry = PromptRegistry()
+        registry.record("missing", usage(10))
+        assert registry.stats() == {}
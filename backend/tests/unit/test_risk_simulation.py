@@ -0,0 +1,158 @@
+"""
+Unit tests for the Monte Carlo risk simulation
+Tests IRR, distributions, reproducibility, calculator parity, and the advisor hook
+"""
+
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from underwriting import analyze_deal
+from underwriting.risk import (
+    Distribution,
+    RiskAssumptions,
+    assumptions_for_horizon,
+    irr,
+    loan_balance,
+    simulate_risk
+)
+
+DEAL = {
+    "purchase_price": 300000,
+    "monthly_rent": 2500,
+    "down_payment_percent": 20,
+    "interest_rate": 7,
+    "loan_term": 30,
+    "annual_property_tax": 3600,
+    "annual_insurance": 1200,
+    "monthly_maintenance": 150,
+    "monthly_property_management": 200,
+    "closing_costs": 6000
+}
+
+# No uncertainty: every path is the calculator's base case
+CERTAIN = RiskAssumptions(
+    rent_growth=Distribution.fixed(0),
+    expense_growth=Distribution.fixed(0),
+    vacancy=Distribution.fixed(0),
+    rate_change=Distribution.fixed(0),
+    capex_probability=0.0,
+    appreciation=Distribution.fixed(0),
+    paths=1000
+)
+
+
+class TestKernels:
+    """Test IRR and amortization kernels"""
+
+    def test_irr_known_values(self):
+        flows = np.array([
+            [-100, 10, 10, 110],
+            [-100, 0, 0, 133.1],
+            [-100, 5, 5, 5],
+            [100, 10, 10, 10]  # No sign change
+        ])
+        result = irr(flows)
+        np.testing.assert_allclose(result[:2], [0.1, 0.1], rtol=1e-9)
+        # NPV at the reported IRR is zero
+        periods = np.arange(4)
+        assert abs((flows[2] / (1 + result[2]) ** periods).sum()) < 1e-6
+        assert np.isnan(result[3])
+
+    def test_irr_of_losing_paths(self):
+        flows = np.array([
+            [-66000, -9600, -9500, -9000, 8800],  # Money back, far below what went in
+            [-100, -10, -10, 0, 0],  # Nothing ever comes back
+        ])
+        result = irr(flows)
+        periods = np.arange(5)
+        assert -1 < result[0] < -0.5
+        assert abs((flows[0] / (1 + result[0]) ** periods).sum()) < 1e-3
+        assert result[1] == -1.0
+
+    def test_loan_fully_repaid_at_term(self):
+        from underwriting import monthly_mortgage_payment
+        payment = monthly_mortgage_payment(240000, 7, 30)
+        assert loan_balance(240000, 7, payment, 360) == pytest.approx(0, abs=1e-6)
+        assert loan_balance(240000, 0, 1000, 12) == 228000
+
+
+class TestDistributions:
+    """Test assumption specs"""
+
+    def test_from_dict(self):
+        assert Distribution.from_dict({"kind": "normal", "mean": 3, "std": 2}) == Distribution.normal(3, 2)
+        assert Distribution.from_dict({"kind": "triangular", "low": 1, "mode": 2, "high": 5}).c == 5
+
+    def test_unknown_kind(self):
+        with pytest.raises(ValueError):
+            Distribution.from_dict({"kind": "pareto"})
+
+    def test_horizon_mapping(self):
+        assert assumptions_for_horizon("short (1-3yr)").horizon_years == 3
+        assert assumptions_for_horizon("long").horizon_years == 10
+        assert assumptions_for_horizon(None, paths=10).paths == 10
+
+
+class TestSimulation:
+    """Test the simulation end to end"""
+
+    def test_certain_world_matches_calculator(self):
+        report = simulate_risk(DEAL, CERTAIN)
+        expected = analyze_deal(DEAL)["annual_cash_flow"]
+        assert report.year1_cash_flow_percentiles["p5"] == pytest.approx(expected, abs=1)
+        assert report.year1_cash_flow_percentiles["p95"] == pytest.approx(expected, abs=1)
+
+    def test_reproducible_with_seed(self):
+        first = simulate_risk(DEAL, RiskAssumptions(paths=5000))
+        second = simulate_risk(DEAL, RiskAssumptions(paths=5000))
+        assert first.irr_percentiles == second.irr_percentiles
+        assert first.prob_loss == second.prob_loss
+
+    def test_negative_cash_flow_deal(self):
+        report = simulate_risk({**DEAL, "monthly_rent": 1500}, CERTAIN)
+        assert report.prob_negative_cash_flow_year1 == 1.0
+
+    def test_weak_deal_keeps_worst_paths(self):
+        report = simulate_risk({**DEAL, "monthly_rent": 1200}, RiskAssumptions(paths=20000))
+        assert report.irr_undefined_share == 0
+        assert report.irr_percentiles["p5"] < -10
+
+    def test_downside_percentiles_are_ordered(self):
+        report = simulate_risk(DEAL, RiskAssumptions(paths=20000))
+        irrs = [report.irr_percentiles[k] for k in ("p5", "p25", "p50", "p75", "p95")]
+        assert irrs == sorted(irrs)
+        assert 0 <= report.prob_negative_cash_flow_year1 <= report.prob_negative_cash_flow_any_year <= 1
+
+    def test_hundred_thousand_paths_under_a_second(self):
+        started = time.perf_counter()
+        report = simulate_risk(DEAL)
+        assert report.paths == 100_000
+        assert time.perf_counter() - started < 1.0
+
+    def test_prompt_summary(self):
+        summary = simulate_risk(DEAL, RiskAssumptions(paths=2000)).prompt_summary()
+        assert "2,000 paths" in summary
+        assert "IRR: p5" in summary
+        assert "appreciation_pct" in summary
+
+
+class TestAdvisorHook:
+    """Test the advisor's risk stage inputs"""
+
+    def test_simulation_needs_price_and_rent(self):
+        from routers.property_advisor_multiagent import run_risk_simulation, underwriting_inputs
+
+        assert underwriting_inputs({"address": "1 Main St", "asking_price": 300000}) is None
+        deal = underwriting_inputs({"asking_price": 300000, "monthly_rent": 2500, "interest_rate": 6})
+        assert deal["purchase_price"] == 300000
+        assert deal["interest_rate"] == 6
+        assert deal["loan_term"] == 30
+
+        report = asyncio.run(run_risk_simulation(
+            {"asking_price": 300000, "monthly_rent": 2500},
+            {"investment_horizon": "short"}
+        ))
+        assert report.horizon_years == 3
@@ -0,0 +1,207 @@
+"""
+Unit tests for sensitivity grids
+Tests grid/calculator parity, break-even contours, heatmaps, scenarios, and the endpoint
+"""
+
+import asyncio
+import csv
+import io
+import time
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from auth import verify_token
+from routers import analyses
+from tests.fixtures.llm_gateway import FakeGateway, completion
+from underwriting import analyze_deal, default_axes, heatmap_csv, scenario_matrix, sensitivity_grid
+from underwriting.sensitivity import crossing, grid_cells
+
+DEAL = {
+    "purchase_price": 300000,
+    "monthly_rent": 2500,
+    "down_payment_percent": 20,
+    "interest_rate": 7,
+    "loan_term": 30,
+    "annual_property_tax": 3600,
+    "annual_insurance": 1200,
+    "monthly_maintenance": 150
+}
+
+
+@pytest.fixture(scope="module")
+def grid():
+    return sensitivity_grid(DEAL)
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(analyses.router)
+    app.dependency_overrides[verify_token] = lambda: {"sub": "u1", "email": "u1@example.com"}
+    return TestClient(app)
+
+
+def cell_deal(grid, index):
+    """The calculator inputs for one grid cell"""
+    deal = dict(DEAL)
+    for field, i in zip(grid.axes, index):
+        deal[field] = float(grid.axes[field][i])
+    deal["monthly_vacancy"] = deal["monthly_rent"] * deal.pop("vacancy_rate") / 100
+    return deal
+
+
+class TestGrid:
+    """Test the broadcasted grid"""
+
+    def test_default_axes_size(self, grid):
+        assert grid.shape == (21, 17, 21, 7)
+        assert grid.cells == 52479
+        assert grid.metrics["monthly_cash_flow"].shape == grid.shape
+
+    def test_cells_match_calculator(self, grid):
+        rng = np.random.default_rng(0)
+        for _ in range(25):
+            index = tuple(int(rng.integers(n)) for n in grid.shape)
+            expected = analyze_deal(cell_deal(grid, index))
+            assert grid.metrics["monthly_cash_flow"][index] == pytest.approx(expected["monthly_cash_flow"], abs=0.01)
+            assert grid.metrics["cap_rate"][index] == pytest.approx(expected["cap_rate"], abs=0.01)
+            assert grid.metrics["deal_score"][index] == expected["deal_score"]
+
+    def test_unknown_axis_and_metric(self):
+        with pytest.raises(ValueError):
+            sensitivity_grid(DEAL, {"square_feet": [1, 2]})
+        with pytest.raises(ValueError):
+            sensitivity_grid(DEAL, {"monthly_rent": [2000, 3000]}, metrics=["irr"])
+
+    def test_range_spec(self):
+        small = sensitivity_grid(DEAL, {"interest_rate": {"start": 5, "stop": 7, "steps": 5}})
+        assert small.axes["interest_rate"].tolist() == [5, 5.5, 6, 6.5, 7]
+        assert grid_cells({"a": {"start": 0, "stop": 1, "steps": 4}, "b": [1, 2, 3]}) == 12
+
+    def test_hundreds_of_thousands_of_cells_fast(self):
+        axes = {**default_axes(DEAL), "purchase_price": np.linspace(240000, 360000, 81)}
+        started = time.perf_counter()
+        big = sensitivity_grid(DEAL, axes)
+        assert big.cells > 200000
+        assert time.perf_counter() - started < 1.0
+
+
+class TestBreakEven:
+    """Test break-even contours"""
+
+    def test_crossing(self):
+        values = np.array([[-2.0, -1.0, 1.0, 3.0], [1.0, 2.0, 3.0, 4.0]])
+        result = crossing(values, np.array([0.0, 1.0, 2.0, 3.0]))
+        assert result[0] == pytest.approx(1.5)
+        assert np.isnan(result[1])
+
+    def test_break_even_rent_zeroes_cash_flow(self, grid):
+        rents = grid.break_even("monthly_rent")
+        assert rents.shape == (21, 17, 7)
+        # Cash flow is linear in rent, so the interpolated rent is exact
+        i, j, k = 10, 8, 2
+        deal = cell_deal(grid, (i, j, 0, k))
+        deal["monthly_rent"] = float(rents[i, j, k])
+        deal["monthly_vacancy"] = deal["monthly_rent"] * float(grid.axes["vacancy_rate"][k]) / 100
+        assert analyze_deal(deal)["monthly_cash_flow"] == pytest.approx(0, abs=0.01)
+
+    def test_break_even_rises_with_rate(self, grid):
+        rents = grid.break_even("monthly_rent")[10, :, 0]
+        finite = rents[~np.isnan(rents)]
+        assert np.all(np.diff(finite) > 0)
+
+
+class TestHeatmap:
+    """Test heatmap slices and export"""
+
+    def test_slice_held_at_base_case(self, grid):
+        heatmap = grid.heatmap("monthly_cash_flow", x="interest_rate", y="purchase_price")
+        assert len(heatmap["z"]) == 21 and len(heatmap["z"][0]) == 17
+        assert heatmap["held"] == {"monthly_rent": 2500.0, "vacancy_rate": 0.0}
+        assert heatmap["z"][10][8] == analyze_deal(DEAL)["monthly_cash_flow"]
+
+    def test_fixed_values(self, grid):
+        heatmap = grid.heatmap("deal_score", x="vacancy_rate", y="monthly_rent", fixed={"interest_rate": 5})
+        assert heatmap["held"]["interest_rate"] == 5.0
+
+    def test_csv_table(self, grid):
+        heatmap = grid.heatmap("monthly_cash_flow", x="vacancy_rate", y="monthly_rent")
+        rows = list(csv.reader(io.StringIO(heatmap_csv([heatmap]))))
+        assert rows[0][0] == "held"
+        assert rows[1][1:-1] == [str(v) for v in heatmap["x"]["values"]]
+        assert len(rows) == 2 + 21
+
+    def test_feeds_analysis_csv_export(self, grid):
+        from utils.excel_exporter import export_to_csv
+
+        heatmap = grid.heatmap("monthly_cash_flow", x="interest_rate", y="purchase_price")
+        exported = export_to_csv({"address": "1 Main St", "sensitivity": [heatmap]})
+        assert "Sensitivity" in exported
+        assert "monthly_cash_flow: purchase_price \\ interest_rate" in exported
+
+
+class TestScenarios:
+    """Test the calculator scenario matrix"""
+
+    def test_realistic_matches_calculator(self):
+        scenarios = scenario_matrix(DEAL)
+        expected = analyze_deal({**DEAL, "monthly_vacancy": 125})
+        assert scenarios["realistic"]["monthly_cash_flow"] == expected["monthly_cash_flow"]
+        cash_flows = [scenarios[name]["monthly_cash_flow"] for name in ("conservative", "realistic", "optimistic")]
+        assert cash_flows == sorted(cash_flows)
+
+    def test_deal_analyst_gets_scenarios(self, monkeypatch):
+        from routers import property_advisor_multiagent as advisor
+
+        from underwriting.facts import deal_facts
+
+        gateway = FakeGateway([completion('{"deal_score": 60}')])
+        monkeypatch.setattr(advisor, "llm_gateway", gateway)
+        facts = deal_facts(DEAL)
+
+        result = asyncio.run(advisor.run_deal_analyst(
+            {"asking_price": 300000}, {}, {"available_capital": 80000}, facts
+        ))
+
+        assert result["calculated_scenarios"] == scenario_matrix(DEAL)
+        assert '"conservative":' in gateway.requests[0]["messages"][-1]["content"]
+
+
+class TestEndpoint:
+    """Test POST /api/v1/analyses/sensitivity"""
+
+    def test_default_grid(self, client):
+        response = client.post("/api/v1/analyses/sensitivity", json={"deal": DEAL})
+        assert response.status_code == 200, response.text
+        body = response.json()
+        assert body["summary"]["cells"] == 52479
+        assert [(h["x"]["field"], h["y"]["field"]) for h in body["heatmaps"]] == [
+            ("interest_rate", "purchase_price"), ("vacancy_rate", "monthly_rent")
+        ]
+        assert body["break_even"]["over"] == ["purchase_price", "interest_rate", "vacancy_rate"]
+
+    def test_csv_download(self, client):
+        response = client.post("/api/v1/analyses/sensitivity", json={"deal": DEAL, "format": "csv"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert "attachment" in response.headers["content-disposition"]
+
+    def test_xlsx_needs_openpyxl(self, client, monkeypatch):
+        monkeypatch.setattr(analyses, "OPENPYXL_AVAILABLE", False)
+        response = client.post("/api/v1/analyses/sensitivity", json={"deal": DEAL, "format": "xlsx"})
+        assert response.status_code == 503
+
+    def test_rejects_bad_requests(self, client, monkeypatch):
+        response = client.post("/api/v1/analyses/sensitivity", json={"deal": DEAL, "axes": {"sqft": [1, 2]}})
+        assert response.status_code == 400
+
+        monkeypatch.setattr(analyses, "SENSITIVITY_MAX_CELLS", 100)
+        response = client.post("/api/v1/analyses/sensitivity", json={
+            "deal": DEAL,
+            "axes": {"monthly_rent": {"start": 2000, "stop": 3000, "steps": 11},
+                     "interest_rate": {"start": 5, "stop": 8, "steps": 11}}
+        })
+        assert response.status_code == 413
@@ -0,0 +1,162 @@
+"""
+Unit tests for structured model output
+Tests JSON repair, schema validation, and the advisor's continue-call fallback
+"""
+
+import asyncio
+import json
+
+import pytest
+from pydantic import BaseModel, ConfigDict
+
+from routers import property_advisor_multiagent as advisor
+from tests.fixtures.advisor import MARKET, PROPERTY
+from tests.fixtures.llm_gateway import FakeGateway, completion
+from utils.structured_output import (
+    SchemaMismatchError,
+    StructuredOutputError,
+    continuation_messages,
+    loads,
+    parse_continued,
+    parse_structured,
+    repair_json
+)
+
+
+class Output(BaseModel):
+    model_config = ConfigDict(extra="allow")
+    score: float
+
+
+class TestRepairJson:
+    """Test repair of malformed and truncated replies"""
+
+    @pytest.mark.parametrize("text, expected", [
+        ('{"score": 70, "notes": "strong dem', {"score": 70, "notes": "strong dem"}),
+        ('{"score": 70, "notes"', {"score": 70}),
+        ('{"score": 70, "trend": 3.', {"score": 70}),
+        ('{"score": 70, "comps": [{"price": 1}, {"pri', {"score": 70, "comps": [{"price": 1}, {}]}),
+        ('{"score": 70, "tags": ["a", "b",', {"score": 70, "tags": ["a", "b"]}),
+        ('```json\n{"score": 70}\n```', {"score": 70}),
+        ('Here you go: {"score": 70} Let me know!', {"score": 70}),
+        ('{"note": "say \\"hi\\"", "path": "C:\\\\', {"note": 'say "hi"', "path": "C:\\"}),
+        ('{"note": "caf\\u00', {"note": "caf"}),
+        ('{"a": {', {"a": {}})
+    ])
+    def test_repairs(self, text, expected):
+        assert loads(repair_json(text)) == expected
+
+    def test_nothing_to_repair(self):
+        assert repair_json("I cannot help with that") is None
+        assert repair_json('{"a": 1]') is None
+
+
+class TestParseStructured:
+    """Test validation against a schema"""
+
+    def test_valid_reply(self):
+        result = parse_structured('{"score": "70", "extra": [1]}', Output)
+        assert result.data == {"score": 70.0, "extra": [1]}
+        assert not result.repaired
+
+    def test_truncated_reply_repaired(self):
+        result = parse_structured('{"score": 70, "insights": ["Low inventory", "Rising re', Output)
+        assert result.data == {"score": 70, "insights": ["Low inventory", "Rising re"]}
+        assert result.repaired
+
+    def test_missing_required_field(self):
+        with pytest.raises(SchemaMismatchError):
+            parse_structured('{"notes": "no score"}', Output)
+        with pytest.raises(StructuredOutputError) as error:
+            parse_structured('{"notes": "cut off before the sc', Output)
+        assert not isinstance(error.value, SchemaMismatchError)  # Incomplete, worth continuing
+        with pytest.raises(StructuredOutputError):
+            parse_structured("", Output)
+
+    def test_continuation(self):
+        partial = '{"notes": "cut off", "sco'
+        assert parse_continued(partial, 're": 70}', Output).data == {"notes": "cut off", "score": 70}
+        # The model started over instead of continuing
+        assert parse_continued(partial, '{"score": 60}', Output).data == {"score": 60}
+
+    def test_continuation_messages(self):
+        messages = continuation_messages([{"role": "user", "content": "go"}], '{"a"')
+        assert messages[1] == {"role": "assistant", "content": '{"a"'}
+        assert messages[2]["role"] == "user"
+
+
+class TestAdvisorAgents:
+    """Test agent replies in the advisor"""
+
+    def run_market(self, monkeypatch, replies):
+        gateway = FakeGateway([completion(reply) for reply in replies])
+        monkeypatch.setattr(advisor, "llm_gateway", gateway)
+        return asyncio.run(advisor.run_market_analyst(PROPERTY)), gateway
+
+    def test_truncated_reply_repaired_without_call(self, monkeypatch):
+        reply = json.dumps(MARKET)[:-40]
+        output, gateway = self.run_market(monkeypatch, [reply])
+        assert output["neighborhood_score"] == 72
+        assert len(gateway.requests) == 1
+
+    def test_unrepairable_reply_continued(self, monkeypatch):
+        reply = json.dumps({"market_momentum": "stable", "neighborhood_score": 72})
+        cut = reply.index("neighborhood") + 5
+        output, gateway = self.run_market(monkeypatch, [reply[:cut], reply[cut:]])
+
+        assert output == {"market_momentum": "stable", "neighborhood_score": 72}
+        assert len(gateway.requests) == 2
+        assert gateway.requests[1]["messages"][-2] == {"role": "assistant", "content": reply[:cut]}
+        assert "response_format" not in gateway.requests[1]
+
+    def test_wrong_shape_fails_without_continuing(self, monkeypatch):
+        monkeypatch.setitem(advisor.OUTPUT_TOTALS, "failed", 0)
+        gateway = FakeGateway([completion(json.dumps({"market_momentum": "stable"}))])
+        monkeypatch.setattr(advisor, "llm_gateway", gateway)
+
+        with pytest.raises(SchemaMismatchError):
+            asyncio.run(advisor.run_market_analyst(PROPERTY))
+        assert len(gateway.requests) == 1
+        assert advisor.OUTPUT_TOTALS["failed"] == 1
+
+    def test_cut_off_reply_continued(self, monkeypatch):
+        reply = json.dumps({"market_momentum": "stable", "neighborhood_score": 72})
+        cut = reply.index("neighborhood") - 2
+        first = completion(reply[:cut])
+        first.choices[0].finish_reason = "length"
+        gateway = FakeGateway([first, completion(reply[cut:])])
+        monkeypatch.setattr(advisor, "llm_gateway", gateway)
+
+        output = asyncio.run(advisor.run_market_analyst(PROPERTY))
+        assert output["neighborhood_score"] == 72
+        assert len(gateway.requests) == 2
+
+    def test_unusable_reply_raises(self, monkeypatch):
+        with pytest.raises(StructuredOutputError):
+            self.run_market(monkeypatch, ["Sorry, I can't", "help with that"])
+
+    def test_repaired_cut_off_reply_continued(self, monkeypatch):
+        reply = json.dumps(MARKET)
+        cut = reply.index("comparable_properties") - 3
+        first = completion(reply[:cut])
+        first.choices[0].finish_reason = "length"
+        gateway = FakeGateway([first, completion(reply[cut:])])
+        monkeypatch.setattr(advisor, "llm_gateway", gateway)
+
+        output = asyncio.run(advisor.run_market_analyst(PROPERTY))
+        assert output == MARKET
+        assert len(gateway.requests) == 2
+
+    def test_repaired_reply_kept_if_continuation_unusable(self, monkeypatch):
+        monkeypatch.setitem(advisor.OUTPUT_TOTALS, "failed", 0)
+        reply = json.dumps(MARKET)
+        cut = reply.index("comparable_properties") - 3
+        first = completion(reply[:cut])
+        first.choices[0].finish_reason = "length"
+        gateway = FakeGateway([first, completion("Sorry, I can't continue")])
+        monkeypatch.setattr(advisor, "llm_gateway", gateway)
+
+        output = asyncio.run(advisor.run_market_analyst(PROPERTY))
+        assert output["neighborhood_score"] == 72
+        assert "comparable_properties" not in output
+        assert advisor.OUTPUT_TOTALS["failed"] == 0
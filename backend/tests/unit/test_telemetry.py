@@ -0,0 +1,241 @@
+"""
+Unit tests for the batched telemetry sink
+Tests buffering, batch flushing, bounded memory, and backend isolation
+"""
+
+import json
+import threading
+from types import SimpleNamespace
+
+from tests.fixtures.memory_collection import MemoryCollection
+from utils.telemetry import (
+    CollectionBackend,
+    JsonlBackend,
+    SupabaseTableBackend,
+    TelemetrySink,
+    stop_all_sinks
+)
+
+
+class RecordingBackend:
+    """Backend that keeps every batch it receives"""
+
+    name = "recording"
+
+    def __init__(self):
+        self.batches = []
+        self.closed = False
+        self.written = threading.Event()
+
+    def write_batch(self, events):
+        self.batches.append(list(events))
+        self.written.set()
+
+    def close(self):
+        self.closed = True
+
+
+class CountingCollection(MemoryCollection):
+    """MemoryCollection that counts insert_many calls"""
+
+    def __init__(self):
+        super().__init__()
+        self.bulk_calls = 0
+
+    def insert_many(self, docs, ordered=True):
+        self.bulk_calls += 1
+        super().insert_many(docs, ordered=ordered)
+
+
+class FailingBackend:
+    """Backend that always raises"""
+
+    name = "failing"
+
+    def write_batch(self, events):
+        raise RuntimeError("backend down")
+
+    def close(self):
+        pass
+
+
+class TestBuffering:
+    """Test events are buffered instead of written inline"""
+
+    def test_record_does_not_write(self):
+        """Test record() only buffers until flush"""
+        backend = RecordingBackend()
+        sink = TelemetrySink([backend], batch_size=100, flush_interval=60)
+
+        sink.record("user_login", {"user_id": "u1"})
+
+        assert backend.batches == []
+        assert sink.stats()["buffered"] == 1
+        sink.stop()
+
+    def test_flush_writes_one_batch(self):
+        """Test flush sends all buffered events in a single batch"""
+        backend = RecordingBackend()
+        sink = TelemetrySink([backend], batch_size=100, flush_interval=60)
+
+        for i in range(5):
+            sink.record("user_login", {"user_id": f"u{i}"})
+
+        assert sink.flush() == 5
+        assert len(backend.batches) == 1
+        assert [e["user_id"] for e in backend.batches[0]] == ["u0", "u1", "u2", "u3", "u4"]
+        assert backend.batches[0][0]["event"] == "user_login"
+        sink.stop()
+
+    def test_no_backends_discards(self):
+        """Test a sink without backends accepts nothing"""
+        sink = TelemetrySink([])
+        assert sink.record("user_login", {}) is False
+        assert sink.stats()["buffered"] == 0
+
+
+class TestFlushTriggers:
+    """Test background and shutdown flushing"""
+
+    def test_batch_size_wakes_flush_thread(self):
+        """Test reaching batch_size flushes without waiting for the interval"""
+        backend = RecordingBackend()
+        sink = TelemetrySink([backend], batch_size=3, flush_interval=60)
+
+        for i in range(3):
+            sink.record("user_signup", {"n": i})
+
+        assert backend.written.wait(timeout=5)
+        sink.stop()
+        assert sum(len(b) for b in backend.batches) == 3
+
+    def test_stop_flushes_and_closes(self):
+        """Test stop() drains the buffer and closes backends"""
+        backend = RecordingBackend()
+        sink = TelemetrySink([backend], batch_size=100, flush_interval=60)
+
+        sink.record("user_login", {"user_id": "u1"})
+        sink.stop()
+
+        assert sum(len(b) for b in backend.batches) == 1
+        assert backend.closed is True
+        assert sink.stats()["buffered"] == 0
+
+
+class TestBoundedMemory:
+    """Test the buffer never grows past max_buffer"""
+
+    def test_oldest_events_dropped(self):
+        """Test overflow drops the oldest events and counts them"""
+        backend = RecordingBackend()
+        sink = TelemetrySink([backend], batch_size=1000, flush_interval=60, max_buffer=3)
+
+        for i in range(5):
+            sink.record("user_login", {"n": i})
+
+        stats = sink.stats()
+        assert stats["buffered"] == 3
+        assert stats["dropped"] == 2
+
+        sink.flush()
+        assert [e["n"] for e in backend.batches[0]] == [2, 3, 4]
+        sink.stop()
+
+
+class TestBackends:
+    """Test backend isolation and the JSONL backend"""
+
+    def test_failing_backend_does_not_block_others(self):
+        """Test one backend raising still lets the others receive the batch"""
+        good = RecordingBackend()
+        sink = TelemetrySink([FailingBackend(), good], batch_size=100, flush_interval=60)
+
+        sink.record("user_login", {"user_id": "u1"})
+        sink.flush()
+
+        assert len(good.batches) == 1
+        assert sink.stats()["backend_errors"] == {"failing": 1}
+        sink.stop()
+
+    def test_jsonl_backend_appends_lines(self, tmp_path):
+        """Test JSONL backend writes one JSON object per event"""
+        path = tmp_path / "events.jsonl"
+        sink = TelemetrySink([JsonlBackend(str(path))], batch_size=100, flush_interval=60)
+
+        sink.record("user_signup", {"user_id": "u1"})
+        sink.record("user_login", {"user_id": "u1"})
+        sink.stop()
+
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [e["event"] for e in lines] == ["user_signup", "user_login"]
+
+    def test_collection_backend_bulk_inserts(self):
+        """Test a batch becomes one insert_many of plain rows"""
+        collection = CountingCollection()
+        sink = TelemetrySink([CollectionBackend(collection)], batch_size=100, flush_interval=60)
+
+        for i in range(5):
+            sink.record("support_analytics", {"user_id": f"u{i}"})
+        sink.flush()
+
+        assert collection.bulk_calls == 1
+        assert [d["user_id"] for d in collection.docs] == ["u0", "u1", "u2", "u3", "u4"]
+        assert "event" not in collection.docs[0]
+        sink.stop()
+
+    def test_supabase_backend_bulk_inserts(self):
+        """Test a batch becomes one insert into the table"""
+        inserts = []
+
+        class Client:
+            def table(self, name):
+                return SimpleNamespace(insert=lambda rows: SimpleNamespace(
+                    execute=lambda: inserts.append((name, rows))
+                ))
+
+        sink = TelemetrySink([SupabaseTableBackend(Client(), "llm_usage")], batch_size=100, flush_interval=60)
+        for i in range(3):
+            sink.record("llm_usage", {"user_id": f"u{i}"})
+        sink.flush()
+
+        [(table, rows)] = inserts
+        assert table == "llm_usage"
+        assert [r["user_id"] for r in rows] == ["u0", "u1", "u2"]
+        assert "event" not in rows[0] and "recorded_at" in rows[0]
+        sink.stop()
+
+    def test_event_types_route_events(self):
+        """Test backends with event_types only receive those events"""
+        collection = MemoryCollection()
+        everything = RecordingBackend()
+        sink = TelemetrySink(
+            [CollectionBackend(collection, event_types={"support_analytics"}), everything],
+            batch_size=100,
+            flush_interval=60
+        )
+
+        sink.record("support_analytics", {"query": "hi"})
+        sink.record("support_chat_enhanced", {"duration_ms": 12})
+        sink.flush()
+
+        assert [d["query"] for d in collection.docs] == ["hi"]
+        assert len(everything.batches[0]) == 2
+        sink.stop()
+
+
+class TestShutdown:
+    """Test the shutdown hook"""
+
+    def test_stop_all_sinks_flushes_everything(self):
+        first, second = RecordingBackend(), RecordingBackend()
+        sinks = [
+            TelemetrySink([backend], batch_size=100, flush_interval=60)
+            for backend in (first, second)
+        ]
+        for sink in sinks:
+            sink.record("support_analytics", {"n": 1})
+
+        stop_all_sinks()
+
+        assert len(first.batches) == 1 and len(second.batches) == 1
+        assert first.closed and second.closed
@@ -0,0 +1,210 @@
+"""
+Unit tests for the async tool executor
+Tests concurrent execution, timeouts, memoization, and error handling
+"""
+
+import asyncio
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+from utils.tool_executor import ToolExecutor
+
+
+def call(call_id, name, **arguments):
+    """Build an OpenAI-style tool call object"""
+    return SimpleNamespace(
+        id=call_id,
+        function=SimpleNamespace(name=name, arguments=json.dumps(arguments))
+    )
+
+
+class CountingTools:
+    """Tool functions that count invocations"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def check_subscription_status(self, user_id):
+        with self.lock:
+            self.calls.append(("check_subscription_status", user_id))
+        time.sleep(self.delay)
+        return {"tier": "pro", "user_id": user_id}
+
+    def create_support_ticket(self, user_id, issue_description):
+        with self.lock:
+            self.calls.append(("create_support_ticket", user_id))
+        time.sleep(self.delay)
+        return {"success": True}
+
+    def executor(self, **kwargs):
+        return ToolExecutor(
+            {
+                "check_subscription_status": self.check_subscription_status,
+                "create_support_ticket": self.create_support_ticket
+            },
+            read_only={"check_subscription_status"},
+            **kwargs
+        )
+
+
+class TestConcurrency:
+    """Test calls from one turn run concurrently"""
+
+    def test_calls_overlap(self):
+        """Test N slow calls take about one call's time, not N"""
+        tools = CountingTools(delay=0.2)
+        session = tools.executor().session()
+
+        started = time.perf_counter()
+        results = asyncio.run(session.run_calls([
+            call("1", "check_subscription_status", user_id="a"),
+            call("2", "check_subscription_status", user_id="b"),
+            call("3", "create_support_ticket", user_id="a", issue_description="x")
+        ]))
+        elapsed = time.perf_counter() - started
+
+        assert elapsed < 0.5
+        assert [r.tool_call_id for r in results] == ["1", "2", "3"]
+        assert all("error" not in r.content for r in results)
+
+    def test_messages_formatted_for_openai(self):
+        """Test tool results serialize to tool messages"""
+        session = CountingTools().executor().session()
+        [result] = asyncio.run(session.run_calls([call("1", "check_subscription_status", user_id="a")]))
+
+        message = result.to_message()
+        assert message["role"] == "tool"
+        assert message["tool_call_id"] == "1"
+        assert json.loads(message["content"])["tier"] == "pro"
+
+
+class TestMemoization:
+    """Test request-scoped memoization of read-only tools"""
+
+    def test_same_args_run_once(self):
+        """Test duplicate read-only calls share one execution"""
+        tools = CountingTools(delay=0.05)
+        session = tools.executor().session()
+
+        async def run():
+            first = await session.run_calls([
+                call("1", "check_subscription_status", user_id="a"),
+                call("2", "check_subscription_status", user_id="a")
+            ])
+            second = await session.run_calls([call("3", "check_subscription_status", user_id="a")])
+            return first + second
+
+        results = asyncio.run(run())
+        assert tools.calls == [("check_subscription_status", "a")]
+        assert [r.cached for r in results] == [False, True, True]
+
+    def test_sessions_do_not_share_memo(self):
+        """Test a new request re-runs the tool"""
+        tools = CountingTools()
+        executor = tools.executor()
+
+        for _ in range(2):
+            asyncio.run(executor.session().run_calls([call("1", "check_subscription_status", user_id="a")]))
+
+        assert len(tools.calls) == 2
+
+    def test_write_invalidates_memo(self):
+        """Test a side-effecting call clears memoized reads"""
+        tools = CountingTools()
+        session = tools.executor().session()
+
+        async def run():
+            await session.run_calls([call("1", "check_subscription_status", user_id="a")])
+            await session.run_calls([call("2", "create_support_ticket", user_id="a", issue_description="x")])
+            await session.run_calls([call("3", "check_subscription_status", user_id="a")])
+
+        asyncio.run(run())
+        assert [c[0] for c in tools.calls].count("check_subscription_status") == 2
+
+    def test_write_tools_never_memoized(self):
+        """Test side-effecting tools run every time"""
+        tools = CountingTools()
+        session = tools.executor().session()
+
+        asyncio.run(session.run_calls([
+            call("1", "create_support_ticket", user_id="a", issue_description="x"),
+            call("2", "create_support_ticket", user_id="a", issue_description="x")
+        ]))
+        assert len(tools.calls) == 2
+
+
+class TestFailures:
+    """Test timeouts and bad calls"""
+
+    def test_timeout_returns_error(self):
+        """Test a slow tool is cut off and reported"""
+        tools = CountingTools(delay=0.5)
+        session = tools.executor(default_timeout=0.05).session()
+
+        [result] = asyncio.run(session.run_calls([call("1", "check_subscription_status", user_id="a")]))
+
+        assert result.timed_out is True
+        assert "timed out" in result.content["error"]
+
+    def test_write_timeout_not_retryable(self):
+        """Test a timed-out write tool tells the model not to retry (it is still running)"""
+        tools = CountingTools(delay=0.3)
+        session = tools.executor(default_timeout=0.05).session()
+
+        [result] = asyncio.run(session.run_calls([
+            call("1", "create_support_ticket", user_id="a", issue_description="x")
+        ]))
+
+        assert result.timed_out is True
+        assert result.content["retryable"] is False
+        assert result.content["status"] == "processing"
+        assert "try again" not in result.content["error"]
+
+    def test_idempotent_write_timeout_retryable(self):
+        """Test writes declared idempotent keep the retry hint"""
+        tools = CountingTools(delay=0.3)
+        session = tools.executor(default_timeout=0.05, idempotent={"create_support_ticket"}).session()
+
+        [result] = asyncio.run(session.run_calls([
+            call("1", "create_support_ticket", user_id="a", issue_description="x")
+        ]))
+        assert result.content["retryable"] is True
+
+    def test_unknown_tool(self):
+        """Test unknown tools still produce a response message"""
+        session = CountingTools().executor().session()
+        [result] = asyncio.run(session.run_calls([call("1", "delete_account", user_id="a")]))
+
+        assert result.known is False
+        assert "Unknown tool" in result.content["error"]
+
+    def test_bad_arguments(self):
+        """Test malformed or unexpected arguments return errors"""
+        tools = CountingTools()
+        session = tools.executor().session()
+
+        async def run():
+            return (
+                await session.run("1", "check_subscription_status", "{not json"),
+                await session.run("2", "check_subscription_status", {"account": "a"})
+            )
+
+        bad_json, bad_args = asyncio.run(run())
+        assert "Invalid arguments" in bad_json.content["error"]
+        assert "Invalid arguments" in bad_args.content["error"]
+        assert tools.calls == []  # Rejected before the tool runs
+
+    def test_type_error_inside_tool_not_reported_as_bad_arguments(self):
+        """Test a TypeError raised by the tool body is reported as a tool failure"""
+        def broken(user_id):
+            return None + 1
+
+        session = ToolExecutor({"broken": broken}).session()
+        result = asyncio.run(session.run("1", "broken", {"user_id": "a"}))
+
+        assert "Invalid arguments" not in result.content["error"]
+        assert "unsupported operand" in result.content["error"]
@@ -0,0 +1,116 @@
+"""
+Unit tests for the two-tier (in-process + Redis) cache
+Tests tier promotion, expiry, invalidation, and per-user context keys
+"""
+
+import time
+
+from utils.cache import TwoTierCache, support_context_key
+
+
+class DictCache:
+    """Stand-in for the Redis-backed Cache (same get/set/delete interface)"""
+
+    def __init__(self):
+        self.data = {}
+        self.gets = 0
+
+    def get(self, key):
+        self.gets += 1
+        return self.data.get(key)
+
+    def set(self, key, value, ttl=3600):
+        self.data[key] = value
+        return True
+
+    def delete(self, key):
+        return self.data.pop(key, None) is not None
+
+
+class TestTiers:
+    """Test L1/L2 lookups"""
+
+    def test_l1_hit_skips_l2(self):
+        """Test repeated reads are served in-process"""
+        l2 = DictCache()
+        cache = TwoTierCache(l2=l2)
+        cache.set("k", {"v": 1})
+
+        assert cache.get("k") == {"v": 1}
+        assert cache.get("k") == {"v": 1}
+        assert l2.gets == 0
+        assert cache.stats()["l1_hits"] == 2
+
+    def test_l2_hit_promoted_to_l1(self):
+        """Test values written by another worker are promoted on first read"""
+        l2 = DictCache()
+        l2.data["k"] = {"v": 2}
+        cache = TwoTierCache(l2=l2)
+
+        assert cache.get("k") == {"v": 2}
+        assert cache.get("k") == {"v": 2}
+        assert l2.gets == 1
+        assert cache.stats()["l2_hits"] == 1
+
+    def test_l1_expires(self):
+        """Test L1 entries are re-read from L2 after l1_ttl"""
+        l2 = DictCache()
+        cache = TwoTierCache(l2=l2, l1_ttl=0.05)
+        cache.set("k", {"v": 1})
+
+        l2.data["k"] = {"v": 2}  # another worker updated it
+        time.sleep(0.06)
+
+        assert cache.get("k") == {"v": 2}
+
+    def test_l1_bounded(self):
+        """Test L1 evicts least recently used entries"""
+        cache = TwoTierCache(l2=DictCache(), l1_max_size=2)
+        for key in ("a", "b", "c"):
+            cache.set(key, key)
+
+        assert cache.stats()["l1_size"] == 2
+        assert "a" not in cache._l1
+
+
+class TestInvalidation:
+    """Test delete and get_or_set"""
+
+    def test_delete_clears_both_tiers(self):
+        l2 = DictCache()
+        cache = TwoTierCache(l2=l2)
+        cache.set("k", {"v": 1})
+
+        cache.delete("k")
+
+        assert cache.get("k") is None
+        assert "k" not in l2.data
+
+    def test_get_or_set_loads_once(self):
+        """Test the loader only runs on a miss"""
+        cache = TwoTierCache(l2=DictCache())
+        calls = []
+
+        def load():
+            calls.append(1)
+            return {"tier": "pro"}
+
+        assert cache.get_or_set("k", load) == {"tier": "pro"}
+        assert cache.get_or_set("k", load) == {"tier": "pro"}
+        assert len(calls) == 1
+
+    def test_none_not_cached(self):
+        """Test a None result is recomputed next time"""
+        cache = TwoTierCache(l2=DictCache())
+        calls = []
+
+        def load():
+            calls.append(1)
+            return None
+
+        cache.get_or_set("k", load)
+        cache.get_or_set("k", load)
+        assert len(calls) == 2
+
+    def test_support_context_key(self):
+        assert support_context_key("abc") == "user:abc:support_context"
@@ -0,0 +1,136 @@
+"""
+Unit tests for the vectorized underwriting engine
+Tests parity with the frontend calculator (calculatorUtils.ts) and batch behavior
+"""
+
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from underwriting import (
+    RATINGS,
+    analyze_deal,
+    calculate_all_metrics,
+    calculate_deal_score,
+    deal_columns,
+    monthly_mortgage_payment,
+    to_records
+)
+
+# Inputs and calculateAllMetrics outputs produced by the TS calculator
+PARITY = json.loads((Path(__file__).parent.parent / "fixtures" / "underwriting_parity.json").read_text())
+CASES = PARITY["cases"]
+
+
+# calculatorUtils.ts CalculatedMetrics name -> backend metric name
+TS_METRICS = {
+    "monthlyPI": "monthly_pi",
+    "monthlyPITI": "monthly_piti",
+    "monthlyTotalExpenses": "monthly_total_expenses",
+    "monthlyCashFlow": "monthly_cash_flow",
+    "annualGrossIncome": "annual_gross_income",
+    "annualOperatingExpenses": "annual_operating_expenses",
+    "annualNOI": "annual_noi",
+    "annualCashFlow": "annual_cash_flow",
+    "annualDebtService": "annual_debt_service",
+    "totalCashInvested": "total_cash_invested",
+    "loanAmount": "loan_amount",
+    "capRate": "cap_rate",
+    "cashOnCashReturn": "cash_on_cash_return",
+    "onePercentRule": "one_percent_rule",
+    "grm": "grm",
+    "debtCoverageRatio": "debt_coverage_ratio",
+    "operatingExpenseRatio": "operating_expense_ratio",
+    "breakEvenOccupancy": "break_even_occupancy",
+    "dealScore": "deal_score"
+}
+
+
+@pytest.fixture(scope="module")
+def metrics():
+    return calculate_all_metrics(deal_columns([case["inputs"] for case in CASES]))
+
+
+class TestParity:
+    """Test the NumPy kernels reproduce calculateAllMetrics exactly"""
+
+    @pytest.mark.parametrize("ts_name", sorted(TS_METRICS))
+    def test_metric_matches_calculator(self, metrics, ts_name):
+        expected = np.array([case["expected"][ts_name] for case in CASES], dtype=np.float64)
+        np.testing.assert_allclose(metrics[TS_METRICS[ts_name]], expected, rtol=1e-9, atol=1e-9)
+
+    def test_ratings_match_calculator(self, metrics):
+        records = to_records(metrics)
+        for case, record in zip(CASES, records):
+            assert record["deal_rating"] == case["expected"]["dealRating"], case["name"]
+            assert record["recommendation"] == case["expected"]["recommendation"], case["name"]
+
+    def test_fixture_covers_every_rating(self):
+        assert {case["expected"]["dealRating"] for case in CASES} == {rating for rating, _ in RATINGS}
+
+
+class TestKernels:
+    """Test individual kernels and edge cases"""
+
+    def test_mortgage_payment(self):
+        payment = monthly_mortgage_payment([240000, 240000, 0, 120000], [7, 0, 7, 6], [30, 30, 30, 0])
+        np.testing.assert_allclose(payment, [1596.7259884300377, 666.6666666666666, 0, 0])
+
+    def test_score_thresholds_are_inclusive(self):
+        scores, ratings = calculate_deal_score([500, 499.99], [10, 9.99], [12, 11.99], [1.0, 0.99])
+        assert scores.tolist() == [100, 30 + 25 + 15 + 7]
+        assert [RATINGS[i][0] for i in ratings] == ["Excellent", "Good"]
+
+    def test_nan_earns_no_points(self):
+        scores, _ = calculate_deal_score([np.nan], [np.nan], [np.nan], [np.nan])
+        assert scores.tolist() == [0]
+
+    def test_scalar_inputs_broadcast(self):
+        """Test one varying column with shared assumptions"""
+        metrics = calculate_all_metrics({
+            "purchase_price": np.array([200000, 250000, 300000]),
+            "down_payment_percent": 20,
+            "interest_rate": 7,
+            "loan_term": 30,
+            "monthly_rent": 2500
+        })
+        assert metrics["cap_rate"].shape == (3,)
+        assert metrics["cap_rate"][0] > metrics["cap_rate"][2]
+
+    def test_camel_and_snake_case_inputs_agree(self):
+        camel = analyze_deal(CASES[0]["inputs"])
+        snake_inputs = {
+            "purchase_price": 300000, "down_payment_percent": 20, "interest_rate": 7, "loan_term": 30,
+            "monthly_rent": 2500, "annual_property_tax": 3600, "annual_insurance": 1200,
+            "monthly_maintenance": 150, "monthly_vacancy": 125, "monthly_property_management": 200,
+            "closing_costs": 6000
+        }
+        assert analyze_deal(snake_inputs) == camel
+
+    def test_records_are_json_ready(self):
+        record = analyze_deal(CASES[0]["inputs"])
+        json.dumps(record)
+        assert isinstance(record["deal_score"], int)
+        assert record["monthly_pi"] == 1596.73
+
+    def test_large_batch_is_fast(self):
+        rng = np.random.default_rng(0)
+        n = 100_000
+        inputs = {
+            "purchase_price": rng.uniform(50_000, 1_000_000, n),
+            "down_payment_percent": rng.choice([5, 10, 20, 25], n),
+            "interest_rate": rng.uniform(3, 9, n),
+            "loan_term": rng.choice([15, 30], n),
+            "monthly_rent": rng.uniform(500, 8000, n),
+            "annual_property_tax": rng.uniform(500, 15000, n)
+        }
+
+        started = time.perf_counter()
+        metrics = calculate_all_metrics(inputs)
+        elapsed = time.perf_counter() - started
+
+        assert metrics["deal_score"].shape == (n,)
+        assert elapsed < 1.0
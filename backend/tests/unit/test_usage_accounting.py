@@ -0,0 +1,426 @@
+"""
+Unit tests for LLM usage accounting
+Tests pricing, attribution tags, budgets, batched usage rows, the gateway
+hook-up, budget handling in the advisor and chat, and /metrics
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import database_supabase
+import utils.llm_gateway as gateway_module
+from auth import verify_token
+from routers import metrics
+from routers import property_advisor_multiagent as advisor
+from tests.fixtures.advisor import PROFILE, PROPERTY, responses
+from tests.fixtures.chat_store import make_store
+from tests.fixtures.llm_gateway import FakeGateway, chunk, completion
+from tests.fixtures.supabase_tables import SupabaseTables
+from utils.chat_engine import BUDGET_MESSAGE, ChatEngine
+from utils.llm_gateway import LLMGateway
+from utils.telemetry import SupabaseTableBackend, TelemetrySink
+from utils.usage_accounting import (
+    BudgetExceeded,
+    UsageAccountant,
+    get_usage_sink,
+    parse_budgets,
+    token_cost,
+    usage_counts,
+    usage_scope,
+    usage_tags
+)
+
+
+class RecordingBackend:
+    name = "recording"
+
+    def __init__(self):
+        self.events = []
+
+    def write_batch(self, events):
+        self.events.extend(events)
+
+    def close(self):
+        pass
+
+
+class BudgetGateway(FakeGateway):
+    """Scripted gateway that refuses every call after the first `allowed`"""
+
+    def __init__(self, responses=None, allowed=0):
+        super().__init__(responses)
+        self.allowed = allowed
+
+    async def complete(self, **kwargs):
+        if len(self.requests) >= self.allowed:
+            raise BudgetExceeded("u1", "free", 0.02, 0.02)
+        return await super().complete(**kwargs)
+
+    async def stream(self, **kwargs):
+        raise BudgetExceeded("u1", "free", 0.02, 0.02)
+        yield
+
+
+def usage(prompt_tokens, completion_tokens, cached_tokens=0):
+    return SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=cached_tokens)
+    )
+
+
+def make_accountant(**kwargs):
+    backend = RecordingBackend()
+    sink = TelemetrySink([backend], name="test-usage")
+    accountant = UsageAccountant(sink=sink, **{"flush_interval": 3600, "flush_rows": 100, **kwargs})
+    return accountant, sink, backend
+
+
+@pytest.fixture
+def users(monkeypatch):
+    """Install a users table for the real tier lookup (auth.current_user_tier)"""
+    def install(*rows):
+        table = SupabaseTables(users=rows)
+        monkeypatch.setattr(database_supabase, "supabase", table)
+        return table
+
+    monkeypatch.setattr(database_supabase, "supabase", None)
+    return install
+
+
+class TestPricing:
+    """Test cost of a call"""
+
+    def test_token_cost(self):
+        assert token_cost("gpt-4o-mini", 1000, 1000) == pytest.approx(0.00075)
+        assert token_cost("gpt-4o", 1000, 0) == pytest.approx(0.0025)
+
+    def test_cached_tokens_billed_at_cached_rate(self):
+        assert token_cost("gpt-4o-mini", 1000, 0, cached_tokens=1000) == pytest.approx(0.000075)
+
+    def test_versioned_and_unknown_models(self):
+        assert token_cost("gpt-4o-2024-08-06", 1000, 0) == token_cost("gpt-4o", 1000, 0)
+        assert token_cost("gpt-4o-mini-2024-07-18", 1000, 0) == token_cost("gpt-4o-mini", 1000, 0)
+        assert token_cost("some-deployment", 1000, 0) == token_cost("gpt-4o-mini", 1000, 0)
+
+    def test_usage_counts(self):
+        assert usage_counts(usage(120, 30, 64)) == (120, 64, 30)
+        assert usage_counts(SimpleNamespace(prompt_tokens=5, completion_tokens=None)) == (5, 0, 0)
+
+
+class TestScopes:
+    """Test attribution tags"""
+
+    def test_nested_scopes_and_call_tags(self):
+        assert usage_tags() == {}
+        with usage_scope(route="advisor", user_id="u1", tier=None):
+            with usage_scope(route="advisor.jobs"):
+                assert usage_tags({"stage": "deal_analysis"}) == {
+                    "route": "advisor.jobs", "user_id": "u1", "stage": "deal_analysis"
+                }
+            assert usage_tags() == {"route": "advisor", "user_id": "u1"}
+        assert usage_tags() == {}
+
+
+class TestBudgets:
+    """Test per-user daily budgets"""
+
+    def test_budgets_are_opt_in(self):
+        assert parse_budgets("") == {}
+        assert parse_budgets("free:0.02, elite:2") == {"free": 0.02, "elite": 2.0}
+        assert UsageAccountant(sink=TelemetrySink([])).user_usage("u1", "free")["budget_usd"] is None
+
+    def test_no_budget_without_user_or_listed_tier(self):
+        accountant, _, _ = make_accountant(budgets={"free": 0.0})
+        assert accountant.admit("gpt-4o", {"tier": "free"}) == "gpt-4o"
+        assert accountant.admit("gpt-4o", {"user_id": "u1", "tier": "enterprise"}) == "gpt-4o"
+
+    def test_downgrade_then_refuse(self):
+        accountant, _, _ = make_accountant(budgets={"free": 0.01}, downgrade_at=0.5)
+        tags = {"user_id": "u1", "tier": "free"}
+
+        assert accountant.admit("gpt-4o", tags) == "gpt-4o"
+        accountant.record("gpt-4o", 2400, 0, tags=tags)  # $0.006
+        assert accountant.admit("gpt-4o", tags) == "gpt-4o-mini"
+        assert accountant.admit("gpt-4o-mini", tags) == "gpt-4o-mini"
+
+        accountant.record("gpt-4o", 1600, 0, tags=tags)  # $0.010
+        with pytest.raises(BudgetExceeded):
+            accountant.admit("gpt-4o-mini", tags)
+        # Other users are unaffected
+        assert accountant.admit("gpt-4o", {"user_id": "u2", "tier": "free"}) == "gpt-4o"
+        assert accountant.snapshot()["budget"] == {"refused": 1, "downgraded": 1, "users_today": 1}
+
+    def test_user_usage(self):
+        accountant, _, _ = make_accountant(budgets={"pro": 0.5})
+        accountant.record("gpt-4o-mini", 1000, 1000, tags={"user_id": "u1", "tier": "pro"})
+
+        mine = accountant.user_usage("u1", "pro")
+        assert mine["calls"] == 1
+        assert mine["cost_usd"] == pytest.approx(0.00075)
+        assert mine["remaining_usd"] == pytest.approx(0.49925)
+        assert accountant.user_usage("u1")["remaining_usd"] is None
+
+
+class TestRecording:
+    """Test aggregation and batched usage rows"""
+
+    def test_rows_aggregated_per_user_route_stage(self):
+        accountant, sink, backend = make_accountant()
+        tags = {"route": "advisor", "stage": "market_analysis", "user_id": "u1", "tier": "pro"}
+        accountant.record("gpt-4o-mini", 100, 50, 20, tags)
+        accountant.record("gpt-4o-mini", 200, 50, 0, tags)
+        accountant.record("gpt-4o-mini", 10, 5, 0, {"route": "analyses.batch"})
+
+        assert accountant.flush() == 2
+        sink.flush()
+        rows = {event["route"]: event for event in backend.events}
+        assert rows["advisor"]["event"] == "llm_usage"
+        assert rows["advisor"]["calls"] == 2
+        assert rows["advisor"]["prompt_tokens"] == 300
+        assert rows["advisor"]["cached_tokens"] == 20
+        assert rows["advisor"]["completion_tokens"] == 100
+        assert rows["advisor"]["user_id"] == "u1"
+        assert rows["analyses.batch"]["user_id"] is None
+        assert accountant.flush() == 0
+
+    def test_flush_when_rows_pile_up(self):
+        accountant, sink, backend = make_accountant(flush_rows=2)
+        accountant.record("gpt-4o-mini", 1, 1, tags={"user_id": "u1"})
+        assert sink.stats()["recorded"] == 0
+        accountant.record("gpt-4o-mini", 1, 1, tags={"user_id": "u2"})
+        assert sink.stats()["recorded"] == 2
+
+    def test_default_sink_writes_llm_usage_table(self, monkeypatch):
+        client = SimpleNamespace(table=lambda name: name)
+        monkeypatch.setattr(database_supabase, "supabase", client)
+        monkeypatch.delenv("LLM_USAGE_JSONL_PATH", raising=False)
+        get_usage_sink.cache_clear()
+        try:
+            [backend] = get_usage_sink().backends
+            assert isinstance(backend, SupabaseTableBackend)
+            assert (backend.client, backend.table) == (client, "llm_usage")
+        finally:
+            get_usage_sink().stop()
+            get_usage_sink.cache_clear()
+
+    def test_snapshot_and_prometheus(self):
+        accountant, _, _ = make_accountant()
+        accountant.record("gpt-4o", 1000, 100, tags={"route": "advisor", "stage": "deal_analysis", "tier": "elite"})
+
+        snapshot = accountant.snapshot()
+        assert snapshot["usage"][0]["model"] == "gpt-4o"
+        assert snapshot["total_cost_usd"] == pytest.approx(0.0035)
+
+        text = accountant.prometheus()
+        assert "# TYPE propiq_llm_cost_usd_total counter" in text
+        assert 'propiq_llm_prompt_tokens_total{route="advisor",stage="deal_analysis",tier="elite",model="gpt-4o"} 1000' in text
+        assert "propiq_llm_budget_refused_total 0" in text
+
+
+class TestGateway:
+    """Test accounting of calls made through the LLM gateway"""
+
+    @pytest.fixture
+    def accountant(self, monkeypatch):
+        accountant, _, _ = make_accountant(budgets={"free": 0.01})
+        monkeypatch.setattr(gateway_module, "usage_accountant", accountant)
+        return accountant
+
+    def make_gateway(self, create):
+        gateway = LLMGateway(endpoint="https://example", api_key="key")
+        gateway._async_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        return gateway
+
+    def test_complete_recorded_with_tags(self, accountant):
+        calls = []
+
+        async def create(**kwargs):
+            calls.append(kwargs)
+            return SimpleNamespace(choices=[], usage=usage(1000, 200, 400))
+
+        gateway = self.make_gateway(create)
+
+        async def run():
+            with usage_scope(route="advisor", user_id="u1", tier="free"):
+                await gateway.complete(model="gpt-4o-mini", messages=[], usage_tags={"stage": "action_plan"})
+
+        asyncio.run(run())
+        assert "usage_tags" not in calls[0]
+        row = accountant.snapshot()["usage"][0]
+        assert (row["route"], row["stage"], row["tier"], row["model"]) == ("advisor", "action_plan", "free", "gpt-4o-mini")
+        assert row["cached_tokens"] == 400
+        assert accountant.user_usage("u1", "free")["calls"] == 1
+        assert gateway.stats()["prompt_tokens"] == 1000
+
+    def test_stream_without_usage_estimated(self, accountant):
+        async def create(**kwargs):
+            async def chunks():
+                yield chunk("Hello there")
+            return chunks()
+
+        gateway = self.make_gateway(create)
+
+        async def run():
+            messages = [{"role": "user", "content": "Hi"}]
+            return [c async for c in gateway.stream(model="gpt-4o-mini", messages=messages, usage_tags={"route": "support.basic"})]
+
+        asyncio.run(run())
+        row = accountant.snapshot()["usage"][0]
+        assert row["route"] == "support.basic"
+        assert row["prompt_tokens"] > 0 and row["completion_tokens"] > 0
+
+    def test_refused_without_a_call(self, accountant):
+        accountant.record("gpt-4o", 4000, 0, tags={"user_id": "u1", "tier": "free"})
+
+        async def create(**kwargs):
+            raise AssertionError("Budget should refuse before calling the model")
+
+        gateway = self.make_gateway(create)
+        with pytest.raises(BudgetExceeded):
+            asyncio.run(gateway.complete(
+                model="gpt-4o", messages=[], usage_tags={"user_id": "u1", "tier": "free"}
+            ))
+
+
+class TestAdvisorBudget:
+    """Test the advisor when the user's budget runs out"""
+
+    @pytest.fixture
+    def client(self, monkeypatch, users):
+        users()
+        app = FastAPI()
+        app.include_router(advisor.router)
+        app.dependency_overrides[verify_token] = lambda: {"sub": "u1"}
+        return TestClient(app)
+
+    def analyze(self, client):
+        return client.post("/advisor/analyze", json={
+            "property": PROPERTY, "investor_profile": PROFILE, "session_id": "s1"
+        })
+
+    def test_stages_tagged(self, client, monkeypatch):
+        gateway = FakeGateway(responses(4))
+        monkeypatch.setattr(advisor, "llm_gateway", gateway)
+
+        assert self.analyze(client).status_code == 200
+        assert [r["usage_tags"]["stage"] for r in gateway.requests] == [
+            "market_analysis", "deal_analysis", "risk_assessment", "action_plan"
+        ]
+
+    def test_partial_when_budget_runs_out(self, client, monkeypatch):
+        monkeypatch.setattr(advisor, "llm_gateway", BudgetGateway(responses(4), allowed=2))
+
+        body = self.analyze(client).json()
+        assert body["stage"] == "partial"
+        assert set(body["output"]) >= {"market_analysis", "deal_analysis"}
+        assert "usage limit" in body["next_steps"][0]
+
+    def test_429_when_nothing_ran(self, client, monkeypatch):
+        monkeypatch.setattr(advisor, "llm_gateway", BudgetGateway())
+        response = self.analyze(client)
+        assert response.status_code == 429
+        assert response.json()["detail"] == advisor.BUDGET_DETAIL
+
+    def test_job_refused_when_budget_spent(self, client, monkeypatch, users):
+        accountant, _, _ = make_accountant(budgets={"free": 0.01})
+        accountant.record("gpt-4o", 4000, 0, tags={"user_id": "u1", "tier": "free"})
+        monkeypatch.setattr(advisor, "usage_accountant", accountant)
+        monkeypatch.setattr(advisor, "llm_gateway", FakeGateway())
+        table = users({"id": "u1", "subscription_tier": "free"})
+
+        response = client.post("/advisor/jobs", json={"property": PROPERTY, "investor_profile": PROFILE})
+        assert response.status_code == 429
+        assert table.reads["users"] == 1
+
+    def test_run_tagged_with_stored_tier(self, client, monkeypatch, users):
+        tags = []
+
+        class TaggingGateway(FakeGateway):
+            async def complete(self, **kwargs):
+                tags.append(usage_tags())
+                return await super().complete(**kwargs)
+
+        monkeypatch.setattr(advisor, "llm_gateway", TaggingGateway(responses(4)))
+        users({"id": "u1", "subscription_tier": "elite"})
+
+        assert self.analyze(client).status_code == 200
+        assert {t["tier"] for t in tags} == {"elite"}
+
+
+class TestChatBudget:
+    """Test support chat when the user's budget runs out"""
+
+    def test_turn_tagged(self):
+        gateway = FakeGateway([completion("Go to Settings.")])
+        engine = ChatEngine("basic", "You are support.", gateway=gateway, store=make_store())
+
+        asyncio.run(engine.respond("u1", "u1@example.com", "How do I upgrade?", "c1"))
+        assert gateway.requests[0]["usage_tags"] == {"route": "support.basic", "user_id": "u1", "tier": None}
+
+    def test_respond_replies_with_budget_message(self):
+        engine = ChatEngine("basic", "You are support.", gateway=BudgetGateway(), store=make_store())
+        turn = asyncio.run(engine.respond("u1", "u1@example.com", "Hi", "c1"))
+        assert turn.response == BUDGET_MESSAGE
+        assert not turn.partial
+
+    def test_stream_replies_with_budget_message(self):
+        engine = ChatEngine("basic", "You are support.", gateway=BudgetGateway(), store=make_store())
+
+        async def run():
+            return [e async for e in engine.stream("u1", "u1@example.com", "Hi", "c1")]
+
+        events = asyncio.run(run())
+        assert events[1] == {"type": "delta", "content": BUDGET_MESSAGE}
+        assert events[-1]["response"] == BUDGET_MESSAGE
+
+
+class TestMetricsEndpoint:
+    """Test GET /metrics and /metrics/usage/me"""
+
+    @pytest.fixture
+    def client(self, monkeypatch, users):
+        accountant, _, _ = make_accountant(budgets={"pro": 0.5})
+        accountant.record("gpt-4o-mini", 1000, 100, tags={"route": "advisor", "user_id": "u1", "tier": "pro"})
+        monkeypatch.setattr(metrics, "usage_accountant", accountant)
+        app = FastAPI()
+        app.include_router(metrics.router)
+        app.dependency_overrides[verify_token] = lambda: {"sub": "u1"}
+        return TestClient(app)
+
+    def test_prometheus_text(self, client):
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "propiq_llm_calls_total" in response.text
+        assert "u1" not in response.text
+
+    def test_json(self, client):
+        body = client.get("/metrics", params={"format": "json"}).json()
+        assert body["usage"][0]["calls"] == 1
+        assert client.get("/metrics", params={"format": "xml"}).status_code == 422
+
+    def test_scrape_token(self, client, monkeypatch):
+        monkeypatch.setattr(metrics, "METRICS_TOKEN", "secret")
+        assert client.get("/metrics").status_code == 401
+        assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+        assert client.get("/metrics", headers={"Authorization": "Bearer secret"}).status_code == 200
+
+    def test_my_usage(self, client):
+        usage = client.get("/metrics/usage/me").json()["usage"]
+        assert usage["calls"] == 1
+        assert usage["budget_usd"] is None  # Tier unknown without a database
+
+    def test_my_usage_with_stored_tier(self, client, users):
+        users({"id": "u1", "subscription_tier": "pro"})
+        usage = client.get("/metrics/usage/me").json()["usage"]
+        assert usage["tier"] == "pro"
+        assert usage["budget_usd"] == 0.5
+
+    def test_user_without_row_is_free(self, client, users):
+        users()
+        assert client.get("/metrics/usage/me").json()["usage"]["tier"] == "free"
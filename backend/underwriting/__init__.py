@@ -0,0 +1,66 @@
+"""
+PropIQ Underwriting Package
+Deterministic deal math (NumPy, vectorized over batches of deals)
+"""
+
+from underwriting.metrics import (
+    DEAL_FIELDS,
+    DEFAULT_FINANCING,
+    RATINGS,
+    deal_columns,
+    monthly_mortgage_payment,
+    calculate_deal_score,
+    calculate_all_metrics,
+    to_records,
+    analyze_deal
+)
+from underwriting.risk import (
+    Distribution,
+    RiskAssumptions,
+    RiskReport,
+    simulate_risk,
+    assumptions_for_horizon
+)
+from underwriting.sensitivity import (
+    SensitivityGrid,
+    sensitivity_grid,
+    default_axes,
+    scenario_matrix,
+    heatmap_csv
+)
+from underwriting.projections import (
+    Projection,
+    ProjectionAssumptions,
+    amortization_schedule,
+    project_deals,
+    project_deal,
+    projection_csv
+)
+
+__all__ = [
+    "DEAL_FIELDS",
+    "DEFAULT_FINANCING",
+    "RATINGS",
+    "deal_columns",
+    "monthly_mortgage_payment",
+    "calculate_deal_score",
+    "calculate_all_metrics",
+    "to_records",
+    "analyze_deal",
+    "Distribution",
+    "RiskAssumptions",
+    "RiskReport",
+    "simulate_risk",
+    "assumptions_for_horizon",
+    "SensitivityGrid",
+    "sensitivity_grid",
+    "default_axes",
+    "scenario_matrix",
+    "heatmap_csv",
+    "Projection",
+    "ProjectionAssumptions",
+    "amortization_schedule",
+    "project_deals",
+    "project_deal",
+    "projection_csv"
+]
@@ -0,0 +1,113 @@
+"""
+Deal facts for the advisor agents
+
+One structured object with everything the underwriting engine can compute
+locally for a deal (calculator metrics, scenario matrix, multi-year
+projection), built once per advisor run and handed to every agent in compact
+form instead of each agent re-deriving (or re-reading) the numbers.
+
+Usage:
+    from underwriting.facts import deal_facts
+
+    facts = deal_facts(deal, hold_years=5)
+    facts.to_dict()       # compact facts for prompts
+    facts.scenarios       # full scenario records (API output)
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Optional
+
+from underwriting.metrics import analyze_deal
+from underwriting.projections import ProjectionAssumptions, project_deal
+from underwriting.sensitivity import VACANCY_RATE, scenario_matrix
+
+INPUT_FIELDS = (
+    "purchase_price",
+    "monthly_rent",
+    "down_payment_percent",
+    "interest_rate",
+    "loan_term",
+    "annual_property_tax",
+    "annual_insurance"
+)
+
+METRIC_FIELDS = (
+    "monthly_cash_flow",
+    "cap_rate",
+    "cash_on_cash_return",
+    "debt_coverage_ratio",
+    "one_percent_rule",
+    "break_even_occupancy",
+    "monthly_piti",
+    "loan_amount",
+    "total_cash_invested",
+    "deal_score",
+    "deal_rating"
+)
+
+SCENARIO_FIELDS = (
+    "monthly_rent",
+    "interest_rate",
+    VACANCY_RATE,
+    "monthly_cash_flow",
+    "cash_on_cash_return",
+    "cap_rate",
+    "deal_score"
+)
+
+PROJECTION_SUMMARY_FIELDS = ("exit_year", "irr", "npv", "discount_rate", "equity_multiple", "best_exit_year")
+PROJECTION_YEAR_FIELDS = ("monthly_cash_flow", "loan_balance", "equity", "total_return")
+PROJECTION_YEARS = (1, 3, 5, 10, 30)
+
+
+@dataclass
+class DealFacts:
+    """Locally computed facts for one deal"""
+    inputs: Dict[str, Any]
+    metrics: Dict[str, Any]  # analyze_deal record
+    scenarios: Dict[str, Dict[str, Any]]  # scenario_matrix records
+    projection: Dict[str, Any]  # Projection.report
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The facts agents need, without the full tables"""
+        yearly = {row["year"]: row for row in self.projection["yearly"]}
+        return {
+            "inputs": {field: self.inputs.get(field) for field in INPUT_FIELDS},
+            "metrics": {field: self.metrics[field] for field in METRIC_FIELDS},
+            "scenarios": {
+                name: {field: record[field] for field in SCENARIO_FIELDS}
+                for name, record in self.scenarios.items()
+            },
+            "projection": {
+                **{field: self.projection["summary"][field] for field in PROJECTION_SUMMARY_FIELDS},
+                "by_year": {
+                    f"y{year}": {field: yearly[year][field] for field in PROJECTION_YEAR_FIELDS}
+                    for year in PROJECTION_YEARS if year in yearly
+                }
+            }
+        }
+
+
+def deal_facts(
+    deal: Mapping[str, Any],
+    hold_years: Optional[int] = None,
+    projection: Optional[ProjectionAssumptions] = None
+) -> DealFacts:
+    """
+    Compute the facts for a deal
+
+    Args:
+        deal: Deal inputs (snake_case, see DEAL_FIELDS)
+        hold_years: Exit year for the headline IRR/NPV
+        projection: Projection settings (default: 30 years, calculator growth rates)
+
+    Returns:
+        DealFacts
+    """
+    projection = projection or ProjectionAssumptions(hold_years=hold_years)
+    return DealFacts(
+        inputs=dict(deal),
+        metrics=analyze_deal(deal),
+        scenarios=scenario_matrix(deal),
+        projection=project_deal(deal, projection).report(0)
+    )
@@ -0,0 +1,287 @@
+"""
+Vectorized deal metrics for PropIQ underwriting
+
+NumPy port of the frontend calculator (frontend/src/utils/calculatorUtils.ts:
+calculateAllMetrics, calculateDealScore). Every function works on arrays of
+deals at once, so scoring one deal or ten thousand is the same call, and the
+numbers match what users see in the calculator.
+
+Formulas follow the TS code exactly, including its conventions:
+- annual debt service is PITI x 12 (taxes and insurance included), so DSCR
+  and break-even occupancy count taxes/insurance on both sides
+- GRM is price / (monthly rent x 12)
+- a zero denominator gives 0, not inf/NaN
+
+Usage:
+    from underwriting import deal_columns, calculate_all_metrics, to_records
+
+    columns = deal_columns([
+        {"purchasePrice": 300000, "downPaymentPercent": 20, "interestRate": 7,
+         "loanTerm": 30, "monthlyRent": 2500, "annualPropertyTax": 3600, ...},
+        ...
+    ])
+    metrics = calculate_all_metrics(columns)   # dict of arrays
+    metrics["deal_score"]                      # array of 0-100 scores
+    to_records(metrics)                        # one dict per deal
+"""
+
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+ArrayLike = Any
+
+# Input fields (snake_case) and the calculator's camelCase names
+DEAL_FIELDS: Dict[str, str] = {
+    "purchase_price": "purchasePrice",
+    "down_payment_percent": "downPaymentPercent",
+    "interest_rate": "interestRate",
+    "loan_term": "loanTerm",
+    "monthly_rent": "monthlyRent",
+    "annual_property_tax": "annualPropertyTax",
+    "annual_insurance": "annualInsurance",
+    "monthly_hoa": "monthlyHOA",
+    "monthly_utilities": "monthlyUtilities",
+    "monthly_maintenance": "monthlyMaintenance",
+    "monthly_vacancy": "monthlyVacancy",
+    "monthly_property_management": "monthlyPropertyManagement",
+    "closing_costs": "closingCosts",
+    "rehab_costs": "rehabCosts"
+}
+
+# Financing assumed when a caller only knows price and rent
+DEFAULT_FINANCING: Dict[str, float] = {
+    "down_payment_percent": 20,
+    "interest_rate": 7,
+    "loan_term": 30
+}
+
+MONTHLY_OPERATING_FIELDS = (
+    "monthly_hoa",
+    "monthly_utilities",
+    "monthly_maintenance",
+    "monthly_vacancy",
+    "monthly_property_management"
+)
+
+# Deal score tables: (thresholds, points); a value >= thresholds[i] earns points[i + 1]
+CASH_FLOW_POINTS = ((0, 100, 300, 500), (0, 10, 20, 30, 40))
+CAP_RATE_POINTS = ((4, 6, 8, 10), (0, 10, 20, 25, 30))
+CASH_ON_CASH_POINTS = ((6, 8, 10, 12), (0, 5, 10, 15, 20))
+ONE_PERCENT_POINTS = ((0.6, 0.8, 1.0), (0, 4, 7, 10))
+
+# Ratings by score band (index = np.digitize(score, RATING_THRESHOLDS))
+RATING_THRESHOLDS = (35, 50, 65, 80)
+RATINGS: Tuple[Tuple[str, str], ...] = (
+    ("Avoid", "Not recommended. Negative cash flow or very poor returns."),
+    ("Poor", "Weak investment metrics. Consider passing unless you can significantly improve terms."),
+    ("Fair", "Marginal deal. Look for ways to improve cash flow or reduce purchase price."),
+    ("Good", "Solid investment with good fundamentals. Consider negotiating better terms."),
+    ("Excellent", "Strong investment opportunity. Proceed with thorough due diligence.")
+)
+
+
+# ============================================================================
+# INPUTS
+# ============================================================================
+
+def deal_columns(
+    deals: Sequence[Mapping[str, Any]],
+    defaults: Optional[Mapping[str, Any]] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Turn a list of deals into one float64 array per input field
+
+    Accepts snake_case or the calculator's camelCase keys; missing or null
+    values come from defaults (snake_case), else 0.
+
+    Args:
+        deals: Deal input dicts
+        defaults: Shared assumptions, e.g. {"interest_rate": 7, "loan_term": 30}
+
+    Returns:
+        {field: array of len(deals)}
+    """
+    defaults = defaults or {}
+    columns = {}
+    for field, camel in DEAL_FIELDS.items():
+        fallback = defaults.get(field) or 0.0
+        values = []
+        for deal in deals:
+            value = deal.get(field)
+            if value is None:
+                value = deal.get(camel)
+            values.append(fallback if value is None else value)
+        columns[field] = np.asarray(values, dtype=np.float64)
+    return columns
+
+
+def _column(inputs: Mapping[str, ArrayLike], field: str) -> np.ndarray:
+    return np.asarray(inputs.get(field, 0.0), dtype=np.float64)
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray, scale: float = 1.0) -> np.ndarray:
+    """numerator / denominator * scale, 0 where the denominator is 0"""
+    numerator, denominator = np.broadcast_arrays(numerator, denominator)
+    out = np.zeros(numerator.shape, dtype=np.float64)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out * scale
+
+
+# ============================================================================
+# KERNELS
+# ============================================================================
+
+def monthly_mortgage_payment(principal: ArrayLike, annual_rate: ArrayLike, years: ArrayLike) -> np.ndarray:
+    """
+    Monthly principal & interest (calculateMonthlyMortgagePayment)
+
+    Args:
+        principal: Loan amount
+        annual_rate: Annual interest rate in percent (7 = 7%)
+        years: Loan term in years
+    """
+    principal = np.asarray(principal, dtype=np.float64)
+    annual_rate = np.asarray(annual_rate, dtype=np.float64)
+    years = np.asarray(years, dtype=np.float64)
+
+    payments = years * 12
+    rate = annual_rate / 100 / 12
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        growth = np.power(1 + rate, payments)
+        amortized = principal * (rate * growth) / (growth - 1)
+        interest_free = principal / payments
+
+    payment = np.where(rate == 0, interest_free, amortized)
+    return np.where((principal == 0) | (years == 0), 0.0, payment)
+
+
+def _points(values: np.ndarray, table: Tuple[Tuple[float, ...], Tuple[int, ...]]) -> np.ndarray:
+    thresholds, points = table
+    earned = np.asarray(points)[np.digitize(values, thresholds)]
+    # NaN fails every comparison in the TS code, so it earns nothing
+    return np.where(np.isnan(values), 0, earned)
+
+
+def calculate_deal_score(
+    monthly_cash_flow: ArrayLike,
+    cap_rate: ArrayLike,
+    cash_on_cash_return: ArrayLike,
+    one_percent_rule: ArrayLike,
+    debt_coverage_ratio: ArrayLike = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Deal score, 0-100 (calculateDealScore)
+
+    Cash flow 40 + cap rate 30 + cash-on-cash 20 + 1% rule 10. DSCR is
+    accepted for signature parity but, as in the calculator, not scored.
+
+    Returns:
+        (scores, rating indexes into RATINGS)
+    """
+    scores = (
+        _points(np.asarray(monthly_cash_flow, dtype=np.float64), CASH_FLOW_POINTS)
+        + _points(np.asarray(cap_rate, dtype=np.float64), CAP_RATE_POINTS)
+        + _points(np.asarray(cash_on_cash_return, dtype=np.float64), CASH_ON_CASH_POINTS)
+        + _points(np.asarray(one_percent_rule, dtype=np.float64), ONE_PERCENT_POINTS)
+    )
+    return scores, np.digitize(scores, RATING_THRESHOLDS)
+
+
+def calculate_all_metrics(inputs: Mapping[str, ArrayLike]) -> Dict[str, np.ndarray]:
+    """
+    Every calculator metric for a batch of deals (calculateAllMetrics)
+
+    Args:
+        inputs: {field: scalar or array} using DEAL_FIELDS names (see deal_columns)
+
+    Returns:
+        {metric: array}, plus "rating_index" (into RATINGS)
+    """
+    price = _column(inputs, "purchase_price")
+    rent = _column(inputs, "monthly_rent")
+    annual_tax = _column(inputs, "annual_property_tax")
+    annual_insurance = _column(inputs, "annual_insurance")
+
+    down_payment = price * (_column(inputs, "down_payment_percent") / 100)
+    loan_amount = price - down_payment
+    total_cash_invested = down_payment + _column(inputs, "closing_costs") + _column(inputs, "rehab_costs")
+
+    monthly_pi = monthly_mortgage_payment(loan_amount, _column(inputs, "interest_rate"), _column(inputs, "loan_term"))
+    monthly_piti = monthly_pi + annual_tax / 12 + annual_insurance / 12
+
+    monthly_operating = sum(_column(inputs, field) for field in MONTHLY_OPERATING_FIELDS)
+    monthly_total_expenses = monthly_piti + monthly_operating
+    monthly_cash_flow = rent - monthly_total_expenses
+
+    annual_gross_income = rent * 12
+    annual_debt_service = monthly_piti * 12
+    annual_operating_expenses = monthly_operating * 12 + annual_tax + annual_insurance
+    annual_noi = annual_gross_income - annual_operating_expenses
+    annual_cash_flow = monthly_cash_flow * 12
+
+    cap_rate = _ratio(annual_noi, price, 100)
+    cash_on_cash_return = _ratio(annual_cash_flow, total_cash_invested, 100)
+    one_percent_rule = _ratio(rent, price, 100)
+    debt_coverage_ratio = _ratio(annual_noi, annual_debt_service)
+
+    deal_score, rating_index = calculate_deal_score(
+        monthly_cash_flow, cap_rate, cash_on_cash_return, one_percent_rule, debt_coverage_ratio
+    )
+
+    metrics = {
+        "monthly_pi": monthly_pi,
+        "monthly_piti": monthly_piti,
+        "monthly_total_expenses": monthly_total_expenses,
+        "monthly_cash_flow": monthly_cash_flow,
+        "annual_gross_income": annual_gross_income,
+        "annual_operating_expenses": annual_operating_expenses,
+        "annual_noi": annual_noi,
+        "annual_cash_flow": annual_cash_flow,
+        "annual_debt_service": annual_debt_service,
+        "total_cash_invested": total_cash_invested,
+        "loan_amount": loan_amount,
+        "cap_rate": cap_rate,
+        "cash_on_cash_return": cash_on_cash_return,
+        "one_percent_rule": one_percent_rule,
+        "grm": _ratio(price, rent * 12),
+        "debt_coverage_ratio": debt_coverage_ratio,
+        "operating_expense_ratio": _ratio(annual_operating_expenses, annual_gross_income, 100),
+        "break_even_occupancy": _ratio(annual_debt_service + annual_operating_expenses, annual_gross_income, 100),
+        "deal_score": deal_score,
+        "rating_index": rating_index
+    }
+    # Scalar inputs broadcast to the batch size
+    size = np.broadcast(*metrics.values()).shape
+    return {name: np.broadcast_to(values, size) for name, values in metrics.items()}
+
+
+# ============================================================================
+# OUTPUT
+# ============================================================================
+
+def to_records(metrics: Mapping[str, np.ndarray], decimals: int = 2) -> List[Dict[str, Any]]:
+    """
+    One plain dict per deal (JSON-ready), with deal_rating and recommendation
+
+    Args:
+        metrics: Output of calculate_all_metrics
+        decimals: Rounding for money/ratio values
+    """
+    names = [name for name in metrics if name not in ("rating_index", "deal_score")]
+    rounded = {name: np.round(metrics[name], decimals).tolist() for name in names}
+    scores = metrics["deal_score"].astype(int).tolist()
+    ratings = metrics["rating_index"].tolist()
+
+    records = []
+    for i, score in enumerate(scores):
+        record = {name: values[i] for name, values in rounded.items()}
+        rating, recommendation = RATINGS[ratings[i]]
+        record.update(deal_score=score, deal_rating=rating, recommendation=recommendation)
+        records.append(record)
+    return records
+
+
+def analyze_deal(deal: Mapping[str, Any]) -> Dict[str, Any]:
+    """Metrics for a single deal (snake_case or camelCase inputs)"""
+    return to_records(calculate_all_metrics(deal_columns([deal])))[0]
@@ -0,0 +1,345 @@
+"""
+Multi-year projections for PropIQ underwriting
+
+Full monthly amortization schedules and year-by-year cash flow / equity
+curves (up to 30 years) for many properties at once, as 2-D arrays
+(properties x months, properties x years). The schedule is closed form and
+yearly totals are reshaped sums, so there is no Python loop over months.
+
+IRR and NPV are computed for every possible exit year in one vectorized
+solve (risk.irr), giving a return curve per property.
+
+Compared with generate5YearProjections in calculatorUtils.ts:
+- year 1 is the calculator's base case (growth starts in year 2), so year 1
+  cash flow matches the deal calculator
+- the loan balance comes from the real amortization schedule, not equal
+  principal payments
+
+The same records feed the PDF report, the CSV (Excel) export and the
+advisor's Deal Analyst.
+
+Usage:
+    from underwriting.projections import project_deal
+
+    projection = project_deal(deal)
+    projection.yearly["equity"]          # (1, 30) array
+    projection.report(0)                 # {"summary", "yearly"} for JSON/PDF
+"""
+
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+import csv
+import io
+
+import numpy as np
+
+from underwriting.metrics import calculate_all_metrics, deal_columns, monthly_mortgage_payment
+from underwriting.risk import irr, loan_balance
+
+# Years shown in compact tables (PDF, prompts)
+HIGHLIGHT_YEARS = (1, 2, 3, 4, 5, 10, 15, 20, 25, 30)
+
+YEARLY_FIELDS = (
+    "monthly_rent",
+    "gross_income",
+    "operating_expenses",
+    "noi",
+    "debt_service",
+    "interest_paid",
+    "principal_paid",
+    "cash_flow",
+    "monthly_cash_flow",
+    "cumulative_cash_flow",
+    "loan_balance",
+    "property_value",
+    "equity",
+    "total_return",
+    "sale_proceeds"
+)
+
+
+@dataclass(frozen=True)
+class ProjectionAssumptions:
+    """Growth rates in percent per year (calculator defaults: 3 / 2 / 3)"""
+    years: int = 30
+    rent_growth: float = 3.0
+    expense_growth: float = 2.0
+    appreciation: float = 3.0
+    discount_rate: float = 8.0  # For NPV
+    selling_costs_percent: float = 6.0
+    hold_years: Optional[int] = None  # Exit year for the headline IRR/NPV (default: years)
+
+    def __post_init__(self):
+        if not 1 <= self.years <= 50:
+            raise ValueError("Projection years must be between 1 and 50")
+        if self.hold_years is not None and not 1 <= self.hold_years <= self.years:
+            raise ValueError("hold_years must be between 1 and years")
+
+    @property
+    def exit_year(self) -> int:
+        return self.hold_years or self.years
+
+
+# ============================================================================
+# KERNELS
+# ============================================================================
+
+def amortization_schedule(
+    principal: Any,
+    annual_rate: Any,
+    years: Any,
+    months: int
+) -> Dict[str, np.ndarray]:
+    """
+    Monthly amortization for many loans at once
+
+    Args:
+        principal: (n,) loan amounts
+        annual_rate: (n,) annual rates in percent
+        years: (n,) loan terms in years
+        months: Schedule length (payments stop after each loan's term)
+
+    Returns:
+        {"payment", "interest", "principal", "balance"}: (n, months) arrays,
+        balance at the end of each month
+    """
+    principal = np.atleast_1d(np.asarray(principal, dtype=np.float64))[:, None]
+    annual_rate = np.atleast_1d(np.asarray(annual_rate, dtype=np.float64))[:, None]
+    term_months = np.atleast_1d(np.asarray(years, dtype=np.float64))[:, None] * 12
+    payment = monthly_mortgage_payment(principal, annual_rate, term_months / 12)
+
+    month = np.arange(1, months + 1, dtype=np.float64)[None, :]
+    balance = loan_balance(principal, annual_rate, payment, np.minimum(month, term_months))
+    balance = np.where(term_months > 0, balance, 0.0)
+    opening = np.concatenate([np.broadcast_to(principal, (balance.shape[0], 1)), balance[:, :-1]], axis=1)
+    opening = np.where(term_months > 0, opening, 0.0)
+
+    interest = opening * annual_rate / 100 / 12
+    principal_paid = opening - balance
+    return {
+        "payment": interest + principal_paid,
+        "interest": interest,
+        "principal": principal_paid,
+        "balance": balance
+    }
+
+
+def npv(flows: np.ndarray, annual_rate: float) -> np.ndarray:
+    """NPV of each row of a (..., periods) cash flow array, period 0 undiscounted"""
+    flows = np.asarray(flows, dtype=np.float64)
+    discount = (1 + annual_rate / 100) ** -np.arange(flows.shape[-1], dtype=np.float64)
+    return flows @ discount
+
+
+def _yearly(monthly: np.ndarray) -> np.ndarray:
+    """(n, years * 12) -> (n, years) totals"""
+    return monthly.reshape(monthly.shape[0], -1, 12).sum(axis=2)
+
+
+# ============================================================================
+# PROJECTION
+# ============================================================================
+
+@dataclass
+class Projection:
+    """Schedules and curves for a batch of properties"""
+    assumptions: ProjectionAssumptions
+    cash_invested: np.ndarray  # (n,)
+    schedule: Dict[str, np.ndarray]  # (n, months)
+    yearly: Dict[str, np.ndarray]  # (n, years)
+    irr_by_exit: np.ndarray  # (n, years), fraction; NaN without a solution
+    npv_by_exit: np.ndarray  # (n, years)
+    equity_multiple: np.ndarray  # (n,) at the exit year
+
+    @property
+    def count(self) -> int:
+        return len(self.cash_invested)
+
+    @property
+    def irr(self) -> np.ndarray:
+        return self.irr_by_exit[:, self.assumptions.exit_year - 1]
+
+    @property
+    def npv(self) -> np.ndarray:
+        return self.npv_by_exit[:, self.assumptions.exit_year - 1]
+
+    def yearly_records(self, index: int, decimals: int = 2) -> List[Dict[str, Any]]:
+        """One dict per year for one property"""
+        rows = {name: np.round(self.yearly[name][index], decimals).tolist() for name in YEARLY_FIELDS}
+        irrs = self.irr_by_exit[index]
+        return [
+            {
+                "year": year + 1,
+                **{name: values[year] for name, values in rows.items()},
+                "irr_if_sold": None if np.isnan(irrs[year]) else round(float(irrs[year]) * 100, 2)
+            }
+            for year in range(self.assumptions.years)
+        ]
+
+    def amortization_records(self, index: int, decimals: int = 2) -> List[Dict[str, Any]]:
+        """Monthly amortization rows for one property (until the loan is repaid)"""
+        rows = {name: np.round(values[index], decimals).tolist() for name, values in self.schedule.items()}
+        payments = self.schedule["payment"][index]
+        last = int(np.flatnonzero(payments > 0)[-1]) + 1 if (payments > 0).any() else 0
+        return [
+            {"month": month + 1, **{name: values[month] for name, values in rows.items()}}
+            for month in range(last)
+        ]
+
+    def summary(self, index: int) -> Dict[str, Any]:
+        """Headline returns for one property"""
+        exit_year = self.assumptions.exit_year
+        best = self.irr_by_exit[index]
+        best_year = int(np.nanargmax(best)) + 1 if np.isfinite(best).any() else None
+        value = float(self.irr[index])
+        return {
+            "exit_year": exit_year,
+            "cash_invested": round(float(self.cash_invested[index]), 2),
+            "irr": None if np.isnan(value) else round(value * 100, 2),
+            "npv": round(float(self.npv[index]), 2),
+            "discount_rate": self.assumptions.discount_rate,
+            "equity_multiple": round(float(self.equity_multiple[index]), 2),
+            "equity_at_exit": round(float(self.yearly["equity"][index, exit_year - 1]), 2),
+            "best_exit_year": best_year,
+            "assumptions": asdict(self.assumptions)
+        }
+
+    def report(self, index: int, include_schedule: bool = False) -> Dict[str, Any]:
+        """JSON-ready projection for one property (API, PDF, advisor)"""
+        result = {"summary": self.summary(index), "yearly": self.yearly_records(index)}
+        if include_schedule:
+            result["schedule"] = self.amortization_records(index)
+        return result
+
+
+def project_deals(
+    deals: Sequence[Mapping[str, Any]],
+    assumptions: Optional[ProjectionAssumptions] = None,
+    defaults: Optional[Mapping[str, Any]] = None
+) -> Projection:
+    """
+    Project a batch of deals year by year
+
+    Args:
+        deals: Deal inputs (snake_case or camelCase, see deal_columns)
+        assumptions: Growth, discounting and exit settings
+        defaults: Assumptions for fields a deal leaves empty
+
+    Returns:
+        Projection with (properties x months) and (properties x years) arrays
+    """
+    assumptions = assumptions or ProjectionAssumptions()
+    columns = deal_columns(deals, defaults)
+    base = calculate_all_metrics(columns)
+    years = assumptions.years
+    n = len(deals)
+
+    schedule = amortization_schedule(base["loan_amount"], columns["interest_rate"], columns["loan_term"], years * 12)
+
+    year = np.arange(years, dtype=np.float64)[None, :]
+    rent_factor = (1 + assumptions.rent_growth / 100) ** year
+    expense_factor = (1 + assumptions.expense_growth / 100) ** year
+
+    monthly_rent = columns["monthly_rent"][:, None] * rent_factor
+    gross_income = monthly_rent * 12
+    operating_expenses = base["annual_operating_expenses"][:, None] * expense_factor
+    noi = gross_income - operating_expenses
+    debt_service = _yearly(schedule["payment"])
+    cash_flow = noi - debt_service
+
+    balance = schedule["balance"][:, 11::12]
+    property_value = columns["purchase_price"][:, None] * (1 + assumptions.appreciation / 100) ** (year + 1)
+    equity = property_value - balance
+    cumulative = np.cumsum(cash_flow, axis=1)
+    cash_invested = np.asarray(base["total_cash_invested"], dtype=np.float64)
+    sale_proceeds = property_value * (1 - assumptions.selling_costs_percent / 100) - balance
+
+    # Flows for every exit year at once: (n, exit years, periods)
+    held = np.tri(years, dtype=bool)  # [exit, year]: year <= exit
+    flows = np.zeros((n, years, years + 1))
+    flows[:, :, 0] = -cash_invested[:, None]
+    flows[:, :, 1:] = np.where(held[None], cash_flow[:, None, :], 0.0)
+    flows[:, np.arange(years), np.arange(years) + 1] += sale_proceeds
+
+    irr_by_exit = irr(flows.reshape(n * years, years + 1)).reshape(n, years)
+    npv_by_exit = npv(flows, assumptions.discount_rate)
+
+    exit_index = assumptions.exit_year - 1
+    returned = cumulative[:, exit_index] + sale_proceeds[:, exit_index]
+    equity_multiple = np.divide(
+        returned, cash_invested, out=np.zeros(n), where=cash_invested != 0
+    )
+
+    return Projection(
+        assumptions=assumptions,
+        cash_invested=cash_invested,
+        schedule=schedule,
+        yearly={
+            "monthly_rent": monthly_rent,
+            "gross_income": gross_income,
+            "operating_expenses": operating_expenses,
+            "noi": noi,
+            "debt_service": debt_service,
+            "interest_paid": _yearly(schedule["interest"]),
+            "principal_paid": _yearly(schedule["principal"]),
+            "cash_flow": cash_flow,
+            "monthly_cash_flow": cash_flow / 12,
+            "cumulative_cash_flow": cumulative,
+            "loan_balance": balance,
+            "property_value": property_value,
+            "equity": equity,
+            "total_return": cumulative + equity - cash_invested[:, None],
+            "sale_proceeds": sale_proceeds
+        },
+        irr_by_exit=irr_by_exit,
+        npv_by_exit=npv_by_exit,
+        equity_multiple=equity_multiple
+    )
+
+
+def project_deal(deal: Mapping[str, Any], assumptions: Optional[ProjectionAssumptions] = None) -> Projection:
+    """Projection for a single deal (index 0)"""
+    return project_deals([deal], assumptions)
+
+
+# ============================================================================
+# OUTPUT
+# ============================================================================
+
+def highlight_rows(yearly: Sequence[Mapping[str, Any]], years: Sequence[int] = HIGHLIGHT_YEARS) -> List[Mapping[str, Any]]:
+    """The yearly records for the highlight years that exist"""
+    wanted = set(years)
+    return [row for row in yearly if row["year"] in wanted]
+
+
+def projection_summary(report: Mapping[str, Any]) -> str:
+    """Compact projection table for agent prompts"""
+    s = report["summary"]
+    irr_text = "n/a" if s["irr"] is None else f"{s['irr']}%"
+    lines = [
+        f"Hold {s['exit_year']} years: IRR {irr_text}, NPV @ {s['discount_rate']}% ${s['npv']:,.0f}, "
+        f"equity multiple {s['equity_multiple']}x, best exit year {s['best_exit_year']}",
+        "year: monthly CF, loan balance, equity, total return"
+    ]
+    for row in highlight_rows(report["yearly"]):
+        lines.append(
+            f"{row['year']}: ${row['monthly_cash_flow']:,.0f}, ${row['loan_balance']:,.0f}, "
+            f"${row['equity']:,.0f}, ${row['total_return']:,.0f}"
+        )
+    return "\n".join(lines)
+
+
+def projection_csv(reports: Sequence[Tuple[str, Mapping[str, Any]]]) -> str:
+    """
+    Yearly projection tables as CSV (opens in Excel)
+
+    Args:
+        reports: (property label, Projection.report(...)) pairs
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["property", "year", *YEARLY_FIELDS, "irr_if_sold"])
+    for label, report in reports:
+        for row in report["yearly"]:
+            writer.writerow([label, row["year"], *(row[name] for name in YEARLY_FIELDS), row["irr_if_sold"]])
+    return buffer.getvalue()
@@ -0,0 +1,387 @@
+"""
+Monte Carlo risk simulation for PropIQ underwriting
+
+The Risk Analyst agent used to label risks "low/medium/high" with nothing to
+base them on. simulate_risk() runs a deal through 10^5 sampled futures (rent
+growth, expense growth, vacancy, a rate reset, capex shocks and appreciation)
+in one vectorized NumPy pass and reports downside percentiles, the chance of
+negative cash flow and the IRR distribution. A fixed seed makes every report
+reproducible.
+
+Base-year numbers come from underwriting.metrics, so year 1 matches the deal
+calculator.
+
+Usage:
+    from underwriting.risk import RiskAssumptions, Distribution, simulate_risk
+
+    report = simulate_risk(
+        {"purchase_price": 300000, "monthly_rent": 2500, "down_payment_percent": 20,
+         "interest_rate": 7, "loan_term": 30, "annual_property_tax": 3600},
+        RiskAssumptions(horizon_years=7, vacancy=Distribution.triangular(3, 6, 15))
+    )
+    report.irr_percentiles["p5"]          # 5th percentile IRR (%)
+    report.prompt_summary()                # compact text for the risk agent
+"""
+
+import time
+from dataclasses import asdict, dataclass, field, replace
+from typing import Any, Dict, Mapping, Optional
+
+import numpy as np
+
+from underwriting.metrics import calculate_all_metrics, deal_columns, monthly_mortgage_payment
+
+PERCENTILES = (5, 10, 25, 50, 75, 95)
+
+
+# ============================================================================
+# ASSUMPTIONS
+# ============================================================================
+
+@dataclass(frozen=True)
+class Distribution:
+    """
+    A sampled assumption (values in the assumption's own units, e.g. percent)
+
+    kind: "fixed" (a), "normal" (mean a, std b), "uniform" (low a, high b),
+    "triangular" (low a, mode b, high c)
+    """
+    kind: str
+    a: float
+    b: float = 0.0
+    c: float = 0.0
+
+    @classmethod
+    def fixed(cls, value: float) -> "Distribution":
+        return cls("fixed", value)
+
+    @classmethod
+    def normal(cls, mean: float, std: float) -> "Distribution":
+        return cls("normal", mean, std)
+
+    @classmethod
+    def uniform(cls, low: float, high: float) -> "Distribution":
+        return cls("uniform", low, high)
+
+    @classmethod
+    def triangular(cls, low: float, mode: float, high: float) -> "Distribution":
+        return cls("triangular", low, mode, high)
+
+    @classmethod
+    def from_dict(cls, spec: Mapping[str, Any]) -> "Distribution":
+        """
+        Build from an API-style spec
+
+        {"kind": "normal", "mean": 3, "std": 2}, {"kind": "uniform", "low": 1, "high": 4},
+        {"kind": "triangular", "low": 2, "mode": 5, "high": 12}, {"kind": "fixed", "value": 0}
+        """
+        kind = spec.get("kind")
+        if kind == "fixed":
+            return cls.fixed(spec["value"])
+        if kind == "normal":
+            return cls.normal(spec["mean"], spec["std"])
+        if kind == "uniform":
+            return cls.uniform(spec["low"], spec["high"])
+        if kind == "triangular":
+            return cls.triangular(spec["low"], spec["mode"], spec["high"])
+        raise ValueError(f"Unknown distribution kind: {kind}")
+
+    def sample(self, rng: np.random.Generator, size) -> np.ndarray:
+        if self.kind == "fixed":
+            return np.full(size, self.a, dtype=np.float64)
+        if self.kind == "normal":
+            return rng.normal(self.a, self.b, size)
+        if self.kind == "uniform":
+            return rng.uniform(self.a, self.b, size)
+        if self.kind == "triangular":
+            return rng.triangular(self.a, self.b, self.c, size)
+        raise ValueError(f"Unknown distribution kind: {self.kind}")
+
+    def describe(self) -> str:
+        if self.kind == "fixed":
+            return f"{self.a:g}"
+        if self.kind == "normal":
+            return f"normal(mean {self.a:g}, sd {self.b:g})"
+        if self.kind == "uniform":
+            return f"uniform({self.a:g}-{self.b:g})"
+        return f"triangular({self.a:g}/{self.b:g}/{self.c:g})"
+
+
+@dataclass(frozen=True)
+class RiskAssumptions:
+    """Sampled and fixed assumptions for one simulation (percent units)"""
+    rent_growth: Distribution = Distribution.normal(3.0, 2.0)  # % per year
+    expense_growth: Distribution = Distribution.normal(2.5, 1.0)  # % per year
+    vacancy: Distribution = Distribution.triangular(2.0, 5.0, 12.0)  # % of gross rent, per year
+    rate_change: Distribution = Distribution.normal(0.0, 1.25)  # Rate points at the reset/refinance year
+    rate_reset_year: Optional[int] = 5  # None: rate fixed for the whole term
+    capex_probability: float = 0.10  # Chance of a capex shock in any year
+    capex_cost: Distribution = Distribution.uniform(1.0, 4.0)  # % of purchase price per shock
+    appreciation: Distribution = Distribution.normal(3.0, 5.0)  # % per year
+    selling_costs_percent: float = 6.0
+    horizon_years: int = 10
+    paths: int = 100_000
+    seed: int = 42
+
+
+# ============================================================================
+# KERNELS
+# ============================================================================
+
+def loan_balance(principal: Any, annual_rate: Any, payment: Any, months: Any) -> np.ndarray:
+    """Remaining balance after `months` payments of `payment` (closed form)"""
+    principal = np.asarray(principal, dtype=np.float64)
+    monthly_rate = np.asarray(annual_rate, dtype=np.float64) / 100 / 12
+    months = np.asarray(months, dtype=np.float64)
+
+    growth = np.power(1 + monthly_rate, months)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        amortized = principal * growth - payment * (growth - 1) / monthly_rate
+    balance = np.where(monthly_rate == 0, principal - payment * months, amortized)
+    return np.maximum(balance, 0.0)
+
+
+def irr(flows: np.ndarray, guess: float = 0.08, max_iterations: int = 50, tolerance: float = 1e-10) -> np.ndarray:
+    """
+    Annual IRR for each row of a (paths, periods) cash flow matrix
+
+    Vectorized Newton's method on the discount factor v = 1 / (1 + irr), with
+    NPV(v) = sum(flow_t * v^t) evaluated by Horner's rule. Rows that never get
+    money back (no positive flow: a total loss) are -1 (-100%), so the worst
+    outcomes stay in the percentiles. Rows Newton misses (it can overshoot on
+    deeply negative IRRs) are bisected; rows with no outflow, or no root in
+    the solver's range, are NaN.
+
+    Returns:
+        IRR per row as a fraction (0.08 = 8%)
+    """
+    flows = np.asarray(flows, dtype=np.float64)
+    v = np.full(flows.shape[0], 1 / (1 + guess))
+    result = np.full(flows.shape[0], np.nan)
+
+    has_outflow = flows.min(axis=1) < 0
+    has_inflow = flows.max(axis=1) > 0
+    result[has_outflow & ~has_inflow] = -1.0
+    active = np.flatnonzero(has_outflow & has_inflow)
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for _ in range(max_iterations):
+            if active.size == 0:
+                break
+            x = v[active]
+            rows = flows[active]
+            npv = rows[:, -1].copy()
+            slope = np.zeros_like(x)
+            for t in range(flows.shape[1] - 2, -1, -1):
+                slope = slope * x + npv
+                npv = npv * x + rows[:, t]
+            step = npv / slope
+
+            # Keep 1 + irr positive (IRR between -99.99% and +999,900%)
+            x = np.clip(x - step, 1e-4, 1e4)
+            v[active] = x
+
+            converged = np.abs(step) < tolerance
+            result[active[converged]] = 1 / x[converged] - 1
+            # Diverged (NaN/inf step) rows stop here as NaN
+            active = active[~converged & np.isfinite(step)]
+
+    missed = np.flatnonzero(has_outflow & has_inflow & np.isnan(result))
+    if missed.size:
+        result[missed] = _bisect_irr(flows[missed])
+    return result
+
+
+def _npv(flows: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """NPV of each row at discount factor v (Horner's rule)"""
+    npv = flows[:, -1].copy()
+    for t in range(flows.shape[1] - 2, -1, -1):
+        npv = npv * v + flows[:, t]
+    return npv
+
+
+def _bisect_irr(flows: np.ndarray, iterations: int = 64) -> np.ndarray:
+    """IRR by bisection on log(v) over Newton's range; NaN where NPV does not change sign"""
+    lo = np.full(flows.shape[0], np.log(1e-4))
+    hi = np.full(flows.shape[0], np.log(1e4))
+    with np.errstate(over="ignore", invalid="ignore"):
+        npv_lo = _npv(flows, np.exp(lo))
+        bracketed = np.sign(npv_lo) != np.sign(_npv(flows, np.exp(hi)))
+        for _ in range(iterations):
+            mid = (lo + hi) / 2
+            npv_mid = _npv(flows, np.exp(mid))
+            same = np.sign(npv_mid) == np.sign(npv_lo)
+            lo = np.where(same, mid, lo)
+            npv_lo = np.where(same, npv_mid, npv_lo)
+            hi = np.where(same, hi, mid)
+    return np.where(bracketed, 1 / np.exp((lo + hi) / 2) - 1, np.nan)
+
+
+def _percentiles(values: np.ndarray, scale: float = 1.0, decimals: int = 2) -> Dict[str, Optional[float]]:
+    finite = values[np.isfinite(values)]
+    if finite.size == 0:
+        return {f"p{p}": None for p in PERCENTILES}
+    points = np.percentile(finite, PERCENTILES) * scale
+    return {f"p{p}": round(float(v), decimals) for p, v in zip(PERCENTILES, points)}
+
+
+# ============================================================================
+# SIMULATION
+# ============================================================================
+
+@dataclass
+class RiskReport:
+    """Summary of one Monte Carlo run (money in $, rates in %)"""
+    paths: int
+    horizon_years: int
+    seed: int
+    prob_negative_cash_flow_year1: float
+    prob_negative_cash_flow_any_year: float
+    prob_loss: float
+    irr_percentiles: Dict[str, Optional[float]]
+    irr_mean: Optional[float]
+    irr_undefined_share: float
+    year1_cash_flow_percentiles: Dict[str, Optional[float]]
+    worst_year_cash_flow_percentiles: Dict[str, Optional[float]]
+    total_profit_percentiles: Dict[str, Optional[float]]
+    assumptions: Dict[str, Any] = field(default_factory=dict)
+    duration_ms: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def prompt_summary(self) -> str:
+        """Compact facts for an LLM prompt"""
+        def pct(values: Dict[str, Optional[float]], keys=("p5", "p25", "p50", "p75", "p95"), unit="%") -> str:
+            return ", ".join(
+                f"{k} {'n/a' if values[k] is None else (f'{values[k]:.1f}%' if unit == '%' else f'${values[k]:,.0f}')}"
+                for k in keys
+            )
+
+        lines = [
+            f"Monte Carlo simulation: {self.paths:,} paths, {self.horizon_years}-year hold, seed {self.seed}",
+            f"P(negative cash flow, year 1): {self.prob_negative_cash_flow_year1:.1%}",
+            f"P(negative cash flow in at least one year): {self.prob_negative_cash_flow_any_year:.1%}",
+            f"P(losing money over the hold, after sale): {self.prob_loss:.1%}",
+            f"IRR: {pct(self.irr_percentiles)}",
+            f"Year-1 cash flow: {pct(self.year1_cash_flow_percentiles, ('p5', 'p50', 'p95'), '$')}",
+            f"Worst-year cash flow: {pct(self.worst_year_cash_flow_percentiles, ('p5', 'p50'), '$')}",
+            f"Total profit incl. sale: {pct(self.total_profit_percentiles, ('p5', 'p50', 'p95'), '$')}",
+            "Assumptions: " + "; ".join(f"{k} {v}" for k, v in self.assumptions.items())
+        ]
+        return "\n".join(lines)
+
+
+def simulate_risk(deal: Mapping[str, Any], assumptions: Optional[RiskAssumptions] = None) -> RiskReport:
+    """
+    Simulate a deal's cash flows and sale across many sampled futures
+
+    Args:
+        deal: One deal's inputs (snake_case or camelCase, as deal_columns)
+        assumptions: Distributions and settings (defaults: RiskAssumptions())
+
+    Returns:
+        RiskReport
+    """
+    started = time.perf_counter()
+    a = assumptions or RiskAssumptions()
+    rng = np.random.default_rng(a.seed)
+    paths, years = a.paths, a.horizon_years
+
+    columns = deal_columns([deal])
+    base = {name: float(values[0]) for name, values in calculate_all_metrics(columns).items()}
+    price = float(columns["purchase_price"][0])
+    rate0 = float(columns["interest_rate"][0])
+    term_years = float(columns["loan_term"][0])
+    loan = base["loan_amount"]
+    payment0 = base["monthly_pi"]
+
+    def growth_path(distribution: Distribution) -> np.ndarray:
+        # Year 1 is the base year; growth applies from year 2
+        rates = distribution.sample(rng, (paths, years - 1)) / 100
+        return np.concatenate([np.ones((paths, 1)), np.cumprod(1 + rates, axis=1)], axis=1)
+
+    # Income and operating expenses (the deal's own vacancy line is replaced by sampled vacancy)
+    vacancy = np.clip(a.vacancy.sample(rng, (paths, years)) / 100, 0.0, 1.0)
+    income = base["annual_gross_income"] * growth_path(a.rent_growth) * (1 - vacancy)
+    base_opex = base["annual_operating_expenses"] - float(columns["monthly_vacancy"][0]) * 12
+    opex = base_opex * growth_path(a.expense_growth)
+
+    # Debt service: fixed payment, re-amortized at a shifted rate after the reset year
+    year_index = np.arange(1, years + 1)
+    debt_service = np.broadcast_to(np.where(year_index <= term_years, payment0 * 12, 0.0), (paths, years)).copy()
+    reset = a.rate_reset_year
+    if loan > 0 and reset is not None and reset < min(years, term_years):
+        new_rate = np.maximum(rate0 + a.rate_change.sample(rng, paths), 0.0)
+        balance_at_reset = float(loan_balance(loan, rate0, payment0, reset * 12))
+        remaining_years = term_years - reset
+        new_payment = monthly_mortgage_payment(balance_at_reset, new_rate, remaining_years)
+        after = (year_index > reset) & (year_index <= term_years)
+        debt_service[:, after] = (new_payment * 12)[:, None]
+        months_after = min(years, term_years) * 12 - reset * 12
+        exit_balance = loan_balance(balance_at_reset, new_rate, new_payment, months_after)
+    else:
+        exit_balance = np.full(paths, float(loan_balance(loan, rate0, payment0, min(years, term_years) * 12)))
+
+    # Capex shocks
+    shocks = rng.random((paths, years)) < a.capex_probability
+    capex = np.where(shocks, a.capex_cost.sample(rng, (paths, years)) / 100 * price, 0.0)
+
+    cash_flow = income - opex - debt_service - capex
+
+    # Sale at the end of the hold
+    value = price * np.prod(1 + a.appreciation.sample(rng, (paths, years)) / 100, axis=1)
+    proceeds = value * (1 - a.selling_costs_percent / 100) - exit_balance
+
+    invested = base["total_cash_invested"]
+    flows = np.concatenate([np.full((paths, 1), -invested), cash_flow], axis=1)
+    flows[:, -1] += proceeds
+    irrs = irr(flows)
+    total_profit = cash_flow.sum(axis=1) + proceeds - invested
+
+    finite_irr = irrs[np.isfinite(irrs)]
+    return RiskReport(
+        paths=paths,
+        horizon_years=years,
+        seed=a.seed,
+        prob_negative_cash_flow_year1=round(float(np.mean(cash_flow[:, 0] < 0)), 4),
+        prob_negative_cash_flow_any_year=round(float(np.mean((cash_flow < 0).any(axis=1))), 4),
+        prob_loss=round(float(np.mean(total_profit < 0)), 4),
+        irr_percentiles=_percentiles(irrs, scale=100),
+        irr_mean=round(float(finite_irr.mean() * 100), 2) if finite_irr.size else None,
+        irr_undefined_share=round(1 - finite_irr.size / paths, 4),
+        year1_cash_flow_percentiles=_percentiles(cash_flow[:, 0], decimals=0),
+        worst_year_cash_flow_percentiles=_percentiles(cash_flow.min(axis=1), decimals=0),
+        total_profit_percentiles=_percentiles(total_profit, decimals=0),
+        assumptions=describe_assumptions(a),
+        duration_ms=round((time.perf_counter() - started) * 1000, 2)
+    )
+
+
+def describe_assumptions(assumptions: RiskAssumptions) -> Dict[str, Any]:
+    """Human-readable assumptions (for reports and prompts)"""
+    return {
+        "rent_growth_pct": assumptions.rent_growth.describe(),
+        "expense_growth_pct": assumptions.expense_growth.describe(),
+        "vacancy_pct": assumptions.vacancy.describe(),
+        "rate_change_points": (
+            f"{assumptions.rate_change.describe()} at year {assumptions.rate_reset_year}"
+            if assumptions.rate_reset_year is not None else "fixed rate"
+        ),
+        "capex_shock": f"{assumptions.capex_probability:.0%}/yr, {assumptions.capex_cost.describe()}% of price",
+        "appreciation_pct": assumptions.appreciation.describe(),
+        "selling_costs_pct": assumptions.selling_costs_percent
+    }
+
+
+def assumptions_for_horizon(horizon: Optional[str], **overrides) -> RiskAssumptions:
+    """
+    Assumptions for an advisor investment horizon ("short", "medium", "long")
+
+    Args:
+        horizon: Investor profile horizon (free text; matched on its first word)
+        **overrides: Any RiskAssumptions field
+    """
+    text = (horizon or "").lower()
+    years = 3 if text.startswith("short") else 10 if text.startswith("long") else 5
+    return replace(RiskAssumptions(horizon_years=years), **overrides)
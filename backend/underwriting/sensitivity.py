@@ -0,0 +1,397 @@
+"""
+Sensitivity grids for PropIQ underwriting
+
+Evaluates one deal over a full grid of assumptions (e.g. price x rate x rent
+x vacancy, tens of thousands of cells) in a single broadcasted call to
+calculate_all_metrics: each axis gets its own array dimension, so there is no
+per-cell Python loop.
+
+From the grid:
+- heatmap(): a 2-D slice (x by y, other axes held at the base case)
+- break_even(): where a metric crosses a level (e.g. cash flow = 0) along one
+  axis, for every combination of the others
+- heatmap_rows() / heatmap_csv(): spreadsheet tables (utils.excel_exporter
+  writes them to the Sensitivity sheet)
+
+Usage:
+    from underwriting.sensitivity import sensitivity_grid, default_axes
+
+    grid = sensitivity_grid(deal, default_axes(deal))
+    grid.cells                                           # 52,479
+    grid.heatmap("monthly_cash_flow", x="interest_rate", y="purchase_price")
+    grid.break_even("monthly_rent")                      # break-even rent surface
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+import csv
+import io
+
+import numpy as np
+
+from underwriting.metrics import (
+    DEAL_FIELDS,
+    calculate_all_metrics,
+    deal_columns,
+    to_records
+)
+
+# Vacancy as a percent of rent (the calculator itself takes a monthly amount)
+VACANCY_RATE = "vacancy_rate"
+
+SENSITIVITY_FIELDS = tuple(DEAL_FIELDS) + (VACANCY_RATE,)
+
+DEFAULT_GRID_METRICS = (
+    "monthly_cash_flow",
+    "cash_on_cash_return",
+    "cap_rate",
+    "debt_coverage_ratio",
+    "deal_score"
+)
+
+# Conservative / realistic / optimistic (replaces the LLM inventing them)
+SCENARIOS: Dict[str, Dict[str, float]] = {
+    "conservative": {"rent_change_percent": -10, "rate_change": 1.0, VACANCY_RATE: 10},
+    "realistic": {"rent_change_percent": 0, "rate_change": 0.0, VACANCY_RATE: 5},
+    "optimistic": {"rent_change_percent": 5, "rate_change": -0.5, VACANCY_RATE: 3}
+}
+
+
+# ============================================================================
+# AXES
+# ============================================================================
+
+def axis_values(spec: Any) -> np.ndarray:
+    """
+    Values for one axis
+
+    Args:
+        spec: A list of values, or {"start", "stop", "steps"} (inclusive)
+    """
+    if isinstance(spec, Mapping):
+        steps = int(spec.get("steps", 11))
+        if steps < 2:
+            raise ValueError("An axis range needs at least 2 steps")
+        values = np.linspace(float(spec["start"]), float(spec["stop"]), steps)
+    else:
+        values = np.asarray(spec, dtype=np.float64).ravel()
+    if values.size == 0:
+        raise ValueError("An axis needs at least one value")
+    return values
+
+
+def grid_cells(axes: Mapping[str, Any]) -> int:
+    """Cell count for axis specs, without building the grid"""
+    return int(np.prod([
+        int(spec.get("steps", 11)) if isinstance(spec, Mapping) else len(spec)
+        for spec in axes.values()
+    ]))
+
+
+def default_axes(deal: Mapping[str, Any]) -> Dict[str, np.ndarray]:
+    """
+    Price and rent +/-20% (21 steps), rate +/-2 points (0.25 steps), and
+    vacancy 0-15% of rent: 52,479 cells
+    """
+    base = base_inputs(deal)
+    price, rent, rate = base["purchase_price"], base["monthly_rent"], base["interest_rate"]
+    return {
+        "purchase_price": np.linspace(price * 0.8, price * 1.2, 21),
+        "interest_rate": np.clip(np.linspace(rate - 2, rate + 2, 17), 0, None),
+        "monthly_rent": np.linspace(rent * 0.8, rent * 1.2, 21),
+        VACANCY_RATE: np.linspace(0, 15, 7)
+    }
+
+
+def base_inputs(deal: Mapping[str, Any], defaults: Optional[Mapping[str, Any]] = None) -> Dict[str, float]:
+    """The deal's inputs as scalars (snake_case), plus its vacancy_rate"""
+    base = {field: float(values[0]) for field, values in deal_columns([deal], defaults).items()}
+    rent = base["monthly_rent"]
+    base[VACANCY_RATE] = base["monthly_vacancy"] / rent * 100 if rent else 0.0
+    return base
+
+
+def _grid_inputs(base: Mapping[str, float], axes: Mapping[str, np.ndarray]) -> Dict[str, Any]:
+    """Base scalars with each axis reshaped to its own dimension"""
+    inputs: Dict[str, Any] = {field: base[field] for field in DEAL_FIELDS}
+    ndim = len(axes)
+    for position, (field, values) in enumerate(axes.items()):
+        shape = [1] * ndim
+        shape[position] = -1
+        inputs[field] = values.reshape(shape)
+
+    if VACANCY_RATE in axes:
+        inputs["monthly_vacancy"] = inputs["monthly_rent"] * inputs.pop(VACANCY_RATE) / 100
+    return inputs
+
+
+# ============================================================================
+# KERNELS
+# ============================================================================
+
+def crossing(values: np.ndarray, axis_points: np.ndarray, level: float = 0.0) -> np.ndarray:
+    """
+    Where values cross level along the last axis, by linear interpolation
+
+    Args:
+        values: (..., n) metric values, ordered like axis_points
+        axis_points: (n,) axis values
+        level: The level to cross (0 = break-even)
+
+    Returns:
+        (...) axis value at the first crossing, NaN where it never crosses
+    """
+    above = values - level
+    if above.shape[-1] < 2:
+        return np.full(above.shape[:-1], np.nan)
+
+    changes = np.signbit(above[..., :-1]) != np.signbit(above[..., 1:])
+    first = np.argmax(changes, axis=-1)[..., None]
+    y0 = np.take_along_axis(above, first, axis=-1)[..., 0]
+    y1 = np.take_along_axis(above, first + 1, axis=-1)[..., 0]
+    x0, x1 = axis_points[first[..., 0]], axis_points[first[..., 0] + 1]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        point = np.where(y0 == y1, x0, x0 + (x1 - x0) * y0 / (y0 - y1))
+    return np.where(changes.any(axis=-1), point, np.nan)
+
+
+# ============================================================================
+# GRID
+# ============================================================================
+
+@dataclass
+class SensitivityGrid:
+    """Metrics for every combination of the axis values (one array dimension per axis)"""
+    base: Dict[str, float]
+    axes: Dict[str, np.ndarray]
+    metrics: Dict[str, np.ndarray]
+
+    @property
+    def shape(self) -> tuple:
+        return tuple(len(values) for values in self.axes.values())
+
+    @property
+    def cells(self) -> int:
+        return int(np.prod(self.shape))
+
+    def _position(self, field: str) -> int:
+        if field not in self.axes:
+            raise ValueError(f"'{field}' is not an axis of this grid (axes: {', '.join(self.axes)})")
+        return list(self.axes).index(field)
+
+    def _metric(self, metric: str) -> np.ndarray:
+        if metric not in self.metrics:
+            raise ValueError(f"Unknown grid metric: {metric}")
+        return self.metrics[metric]
+
+    def nearest_index(self, field: str, value: float) -> int:
+        return int(np.abs(self.axes[field] - value).argmin())
+
+    def _held(self, free: Sequence[str], fixed: Optional[Mapping[str, float]]) -> Dict[str, int]:
+        """Index for each axis not in free: the fixed value, else the base case"""
+        fixed = fixed or {}
+        return {
+            field: self.nearest_index(field, fixed.get(field, self.base[field]))
+            for field in self.axes if field not in free
+        }
+
+    def _slice(self, metric: str, free: Sequence[str], fixed: Optional[Mapping[str, float]]) -> np.ndarray:
+        """The metric over the free axes (in the given order), other axes held"""
+        held = self._held(free, fixed)
+        index = tuple(held.get(field, slice(None)) for field in self.axes)
+        values = self._metric(metric)[index]
+        remaining = [field for field in self.axes if field not in held]
+        return np.moveaxis(values, [remaining.index(field) for field in free], range(len(free)))
+
+    def heatmap(
+        self,
+        metric: str,
+        x: str,
+        y: str,
+        fixed: Optional[Mapping[str, float]] = None,
+        decimals: int = 2
+    ) -> Dict[str, Any]:
+        """
+        2-D slice of a metric, ready for a heatmap
+
+        Args:
+            metric: Grid metric
+            x: Axis across columns
+            y: Axis down rows
+            fixed: Values for the other axes (default: the deal's own inputs)
+
+        Returns:
+            {"metric", "x": {"field", "values"}, "y": {...}, "z": rows (len(y) x len(x)),
+             "held": {field: value}, "break_even": x where z crosses 0, per row}
+        """
+        if x == y:
+            raise ValueError("Heatmap axes must differ")
+        for field in (x, y):
+            self._position(field)
+        z = self._slice(metric, (y, x), fixed)
+        held = self._held((x, y), fixed)
+        return {
+            "metric": metric,
+            "x": {"field": x, "values": np.round(self.axes[x], decimals).tolist()},
+            "y": {"field": y, "values": np.round(self.axes[y], decimals).tolist()},
+            "z": np.round(z, decimals).tolist(),
+            "held": {field: round(float(self.axes[field][i]), decimals) for field, i in held.items()},
+            "break_even": json_floats(crossing(z, self.axes[x]), decimals)
+        }
+
+    def break_even(self, along: str, metric: str = "monthly_cash_flow", level: float = 0.0) -> np.ndarray:
+        """
+        Break-even contour: the value of one axis where the metric crosses level
+
+        Args:
+            along: Axis to solve for (e.g. "monthly_rent" for break-even rent)
+            metric: Grid metric
+            level: Target level (0 = break-even cash flow)
+
+        Returns:
+            Array over the other axes (in grid order), NaN where the
+            crossing lies outside the axis range
+        """
+        position = self._position(along)
+        values = np.moveaxis(self._metric(metric), position, -1)
+        return crossing(values, self.axes[along], level)
+
+    def summary(self) -> Dict[str, Any]:
+        """Headline numbers across the whole grid"""
+        result: Dict[str, Any] = {"cells": self.cells, "shape": list(self.shape)}
+        if "monthly_cash_flow" in self.metrics:
+            cash_flow = self.metrics["monthly_cash_flow"]
+            result["positive_cash_flow_share"] = round(float((cash_flow > 0).mean()), 4)
+            result["monthly_cash_flow_range"] = [round(float(cash_flow.min()), 2), round(float(cash_flow.max()), 2)]
+        return result
+
+
+def sensitivity_grid(
+    deal: Mapping[str, Any],
+    axes: Optional[Mapping[str, Any]] = None,
+    metrics: Sequence[str] = DEFAULT_GRID_METRICS,
+    defaults: Optional[Mapping[str, Any]] = None
+) -> SensitivityGrid:
+    """
+    Evaluate a deal over every combination of the axis values
+
+    Args:
+        deal: Base deal inputs (snake_case or camelCase)
+        axes: {field: values or {"start", "stop", "steps"}}, in grid order;
+            fields from SENSITIVITY_FIELDS (default: default_axes)
+        metrics: calculate_all_metrics outputs to keep
+        defaults: Assumptions for fields the deal leaves empty
+
+    Returns:
+        SensitivityGrid
+    """
+    base = base_inputs(deal, defaults)
+    if axes is None:
+        axes = default_axes(deal)
+    unknown = [field for field in axes if field not in SENSITIVITY_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown sensitivity axes: {', '.join(unknown)}")
+    if VACANCY_RATE in axes and "monthly_vacancy" in axes:
+        raise ValueError("Use either vacancy_rate or monthly_vacancy as an axis, not both")
+    grid_axes = {field: axis_values(spec) for field, spec in axes.items()}
+
+    computed = calculate_all_metrics(_grid_inputs(base, grid_axes))
+    shape = tuple(len(values) for values in grid_axes.values())
+    kept = {}
+    for metric in metrics:
+        if metric not in computed:
+            raise ValueError(f"Unknown grid metric: {metric}")
+        kept[metric] = np.broadcast_to(computed[metric], shape)
+    return SensitivityGrid(base=base, axes=grid_axes, metrics=kept)
+
+
+# ============================================================================
+# SCENARIOS
+# ============================================================================
+
+def scenario_matrix(
+    deal: Mapping[str, Any],
+    scenarios: Mapping[str, Mapping[str, float]] = SCENARIOS
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Calculator metrics for each named scenario, in one vectorized call
+
+    Args:
+        deal: Base deal inputs
+        scenarios: {name: {"rent_change_percent", "rate_change", "vacancy_rate"}}
+
+    Returns:
+        {name: metrics record (see to_records), plus the scenario's inputs}
+    """
+    base = base_inputs(deal)
+    names = list(scenarios)
+    rent_change = np.array([scenarios[n].get("rent_change_percent", 0) for n in names], dtype=np.float64)
+    rate_change = np.array([scenarios[n].get("rate_change", 0) for n in names], dtype=np.float64)
+    vacancy = np.array([scenarios[n].get(VACANCY_RATE, base[VACANCY_RATE]) for n in names], dtype=np.float64)
+
+    inputs: Dict[str, Any] = {field: base[field] for field in DEAL_FIELDS}
+    inputs["monthly_rent"] = base["monthly_rent"] * (1 + rent_change / 100)
+    inputs["interest_rate"] = np.clip(base["interest_rate"] + rate_change, 0, None)
+    inputs["monthly_vacancy"] = inputs["monthly_rent"] * vacancy / 100
+
+    records = to_records(calculate_all_metrics(inputs))
+    return {
+        name: {
+            "monthly_rent": round(float(inputs["monthly_rent"][i]), 2),
+            "interest_rate": round(float(inputs["interest_rate"][i]), 3),
+            VACANCY_RATE: float(vacancy[i]),
+            **records[i]
+        }
+        for i, name in enumerate(names)
+    }
+
+
+def scenario_summary(scenarios: Mapping[str, Mapping[str, Any]]) -> str:
+    """Compact scenario table for agent prompts"""
+    lines = ["scenario: rent, rate, vacancy -> monthly CF, CoC, cap rate, DSCR, score"]
+    for name, s in scenarios.items():
+        lines.append(
+            f"{name}: ${s['monthly_rent']:,.0f}, {s['interest_rate']}%, {s[VACANCY_RATE]:g}% -> "
+            f"${s['monthly_cash_flow']:,.0f}/mo, {s['cash_on_cash_return']}%, {s['cap_rate']}%, "
+            f"{s['debt_coverage_ratio']}, {s['deal_score']}/100 ({s['deal_rating']})"
+        )
+    return "\n".join(lines)
+
+
+# ============================================================================
+# EXPORT
+# ============================================================================
+
+def json_floats(values: np.ndarray, decimals: int = 2) -> List[Any]:
+    """Rounded nested lists with NaN as None (JSON has no NaN)"""
+    rounded = np.round(values, decimals).astype(object)
+    rounded[np.isnan(values)] = None
+    return rounded.tolist()
+
+
+def heatmap_rows(heatmap: Mapping[str, Any]) -> List[List[Any]]:
+    """
+    A heatmap as a spreadsheet table: header row of x values, then one row
+    per y value, then the break-even x per row as the last column
+    """
+    x, y = heatmap["x"], heatmap["y"]
+    rows: List[List[Any]] = [
+        [f"{heatmap['metric']}: {y['field']} \\ {x['field']}", *x["values"], f"break_even_{x['field']}"]
+    ]
+    for y_value, z_row, be in zip(y["values"], heatmap["z"], heatmap["break_even"]):
+        rows.append([y_value, *z_row, "" if be is None else be])
+    return rows
+
+
+def heatmap_csv(heatmaps: Sequence[Mapping[str, Any]]) -> str:
+    """One or more heatmap tables as CSV (blank line between tables; opens in Excel)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for i, heatmap in enumerate(heatmaps):
+        if i:
+            writer.writerow([])
+        if heatmap.get("held"):
+            writer.writerow(["held"] + [f"{field}={value}" for field, value in heatmap["held"].items()])
+        writer.writerows(heatmap_rows(heatmap))
+    return buffer.getvalue()
@@ -14,11 +14,18 @@ Usage:
     @cached(ttl=3600, key_prefix="user")
     def get_user(user_id: str):
         return database.get_user(user_id)
+
+    # Two-tier (in-process L1 + Redis L2) for hot per-user data
+    from utils.cache import two_tier_cache
+    ctx = two_tier_cache.get_or_set(f"user:{user_id}:support_context", load, ttl=300)
 """
 
 import json
 import os
-from typing import Any, Optional, Callable
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Callable, Tuple
 from functools import wraps
 import hashlib
 from config.logging_config import get_logger
@@ -275,6 +282,116 @@ class Cache:
 cache = Cache()
 
 
+class TwoTierCache:
+    """
+    In-process LRU (L1) in front of the Redis cache (L2)
+
+    L1 answers repeated reads within one worker without a network round trip;
+    L2 shares values across workers. L1 entries live at most `l1_ttl` seconds,
+    which bounds how long another worker's invalidation can go unseen.
+
+    Features:
+    - Works without Redis (L1 only)
+    - Bounded L1 size (least recently used evicted)
+    - Hit/miss counters per tier
+    - Cached values are shared: treat them as read-only
+    """
+
+    def __init__(self, l2: Optional[Cache] = None, l1_max_size: int = 1024, l1_ttl: int = 15):
+        self.l2 = l2 if l2 is not None else cache
+        self.l1_max_size = l1_max_size
+        self.l1_ttl = l1_ttl
+        self._l1: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0}
+
+    def _l1_get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._l1[key]
+                return None
+            self._l1.move_to_end(key)
+            return value
+
+    def _l1_set(self, key: str, value: Any, ttl: int):
+        with self._lock:
+            self._l1[key] = (value, time.monotonic() + min(ttl, self.l1_ttl))
+            self._l1.move_to_end(key)
+            while len(self._l1) > self.l1_max_size:
+                self._l1.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get value from L1, then L2 (promoting L2 hits into L1)"""
+        value = self._l1_get(key)
+        if value is not None:
+            self._stats["l1_hits"] += 1
+            return value
+
+        value = self.l2.get(key)
+        if value is not None:
+            self._stats["l2_hits"] += 1
+            self._l1_set(key, value, self.l1_ttl)
+            return value
+
+        self._stats["misses"] += 1
+        return None
+
+    def set(self, key: str, value: Any, ttl: int = 3600) -> bool:
+        """Write value to both tiers"""
+        self._l1_set(key, value, ttl)
+        return self.l2.set(key, value, ttl=ttl)
+
+    def delete(self, key: str) -> bool:
+        """Remove value from both tiers"""
+        with self._lock:
+            self._l1.pop(key, None)
+        return self.l2.delete(key)
+
+    def get_or_set(self, key: str, loader: Callable[[], Any], ttl: int = 3600) -> Any:
+        """
+        Get cached value or compute, store and return it
+
+        Args:
+            key: Cache key
+            loader: Called on a miss; None results are not cached
+            ttl: Time-to-live in seconds for L2 (L1 capped at l1_ttl)
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        value = loader()
+        if value is not None:
+            self.set(key, value, ttl=ttl)
+        return value
+
+    def clear_local(self):
+        """Drop every L1 entry in this process"""
+        with self._lock:
+            self._l1.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and L1 size"""
+        with self._lock:
+            size = len(self._l1)
+        lookups = sum(self._stats.values())
+        hits = self._stats["l1_hits"] + self._stats["l2_hits"]
+        return {
+            **self._stats,
+            "l1_size": size,
+            "l1_max_size": self.l1_max_size,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0
+        }
+
+
+# Global two-tier cache instance
+two_tier_cache = TwoTierCache(l1_ttl=int(os.getenv("CACHE_L1_TTL", "15")))
+
+
 def cached(ttl: int = 3600, key_prefix: str = ""):
     """
     Decorator to cache function results
@@ -368,9 +485,29 @@ CACHE_TTL = {
     "user_analyses_list": 300,  # 5 minutes (frequently updated)
     "subscription_info": 1800,  # 30 minutes
     "support_conversation": 60,  # 1 minute (real-time chat)
+    "support_context": 300,  # 5 minutes (invalidated on subscription/usage/analysis changes)
 }
 
 
+def support_context_key(user_id: str) -> str:
+    """Cache key for a user's support chat context (profile + rendered prompt)"""
+    return f"user:{user_id}:support_context"
+
+
+def invalidate_user_context(user_id: Optional[str]):
+    """
+    Drop cached per-user context after a write that changes it
+
+    Call after subscription, usage, analysis or credit changes.
+    """
+    if not user_id:
+        return
+    try:
+        two_tier_cache.delete(support_context_key(str(user_id)))
+    except Exception as e:
+        logger.warning(f"Failed to invalidate context cache for user {user_id}: {e}")
+
+
 # Example usage in endpoints:
 """
 from utils.cache import cache, cached, cache_invalidate, CACHE_TTL
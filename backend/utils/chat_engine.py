@@ -0,0 +1,661 @@
+"""
+Support chat engine shared by the PropIQ chat routers
+
+routers/support_chat.py and routers/support_chat_enhanced.py each loaded
+history, built prompts, called the model and saved messages their own way,
+with their own client and database handles. ChatEngine does one turn of
+support chat; features are plugged in per router:
+
+- context_loader: per-user context prepended to the system prompt
+- context_window: token-budgeted history with a running summary
+- tool_executor: function calling (concurrent, memoized tools)
+- faq_cache: curated answers served without a model call
+- analytics: buffered analytics rows and metrics
+
+Turns respect the request deadline (utils.deadline): context loading, history
+reads, model calls and tools are bounded by the time left, and a turn that
+runs out of time is answered with what it has (partial=True). Model calls are
+accounted to the route, user and tier (utils.usage_accounting); a user over
+their daily budget gets BUDGET_MESSAGE instead of a model reply.
+
+Both routers share one LLM gateway (connection pool), one ChatStore, one
+analytics sink and one context window.
+
+Usage:
+    from utils.chat_engine import (
+        ChatEngine, get_chat_store, get_context_window, get_analytics_sink
+    )
+
+    engine = ChatEngine(
+        "basic",
+        SUPPORT_AGENT_PROMPT,
+        store=get_chat_store(),
+        context_window=get_context_window(),
+        analytics=get_analytics_sink()
+    )
+
+    turn = await engine.respond(user_id, user_email, message, conversation_id)
+
+    async for event in engine.stream(user_id, user_email, message, conversation_id):
+        ...  # {"type": "start" | "delta" | "tool" | "done", ...}
+"""
+
+import asyncio
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from fastapi.responses import StreamingResponse
+
+from config.logging_config import get_logger
+from utils.chat_store import ChatStore
+from utils.context_window import ContextResult, ContextWindow, llm_summarizer
+from utils.deadline import DeadlineExceeded, within_deadline
+from utils.faq_cache import FaqCache, FaqMatch
+from utils.llm_gateway import LLMGateway, llm_gateway
+from utils.prompt_registry import CompiledPrompt, prompt_registry
+from utils.telemetry import CollectionBackend, TelemetrySink, WandbBackend
+from utils.tokens import count_message_tokens
+from utils.tool_executor import ToolExecutor
+from utils.usage_accounting import BudgetExceeded
+
+logger = get_logger(__name__)
+
+# Analytics event types (rows -> support_analytics, metrics -> W&B)
+SUPPORT_ANALYTICS_EVENT = "support_analytics"
+SUPPORT_METRICS_EVENT = "support_chat_turn"
+
+# Overall time for one chat turn (model calls, tools and database reads)
+CHAT_DEADLINE_SECONDS = float(os.getenv("CHAT_DEADLINE_SECONDS", "30"))
+
+MAX_TOOL_ITERATIONS_MESSAGE = (
+    "I'm having trouble processing your request. "
+    "Let me create a support ticket for human assistance."
+)
+
+DEADLINE_MESSAGE = (
+    "I'm sorry, this is taking longer than expected. "
+    "Please try again in a moment, or ask me to create a support ticket."
+)
+
+BUDGET_MESSAGE = (
+    "You've reached today's AI assistant limit for your plan. "
+    "It resets at midnight UTC - or ask me to create a support ticket and our team will follow up."
+)
+
+# (user_id, user_email) -> (user_context, global_context prompt)
+ContextLoader = Callable[[str, str], Awaitable[Tuple[Dict[str, Any], str]]]
+
+
+# ============================================================================
+# SHARED RESOURCES
+# ============================================================================
+
+@lru_cache(maxsize=1)
+def get_support_db():
+    """Database handle shared by the support routers (None if unavailable)"""
+    try:
+        from database_supabase import get_database
+        return get_database()
+    except Exception as e:
+        logger.warning(f"Database not available for support chat: {e}")
+        return None
+
+
+@lru_cache(maxsize=1)
+def get_chat_store() -> Optional[ChatStore]:
+    """Conversation store shared by the support routers (None if unavailable)"""
+    db = get_support_db()
+    if db is None:
+        return None
+    try:
+        store = ChatStore(db["support_chats"], db["support_chat_messages"])
+    except Exception as e:
+        logger.warning(f"Support chat collections not available: {e}")
+        return None
+
+    try:
+        store.ensure_indexes()
+    except Exception as e:
+        logger.warning(f"Could not create support chat indexes: {e}")
+    return store
+
+
+@lru_cache(maxsize=1)
+def get_analytics_sink() -> TelemetrySink:
+    """Buffered analytics for every chat turn (support_analytics rows + W&B metrics)"""
+    backends = []
+
+    db = get_support_db()
+    if db is not None:
+        try:
+            backends.append(CollectionBackend(db["support_analytics"], event_types={SUPPORT_ANALYTICS_EVENT}))
+        except Exception as e:
+            logger.warning(f"support_analytics collection not available: {e}")
+
+    try:
+        import wandb
+        if wandb.api.api_key is not None:
+            backends.append(WandbBackend(
+                os.getenv("WANDB_PROJECT", "propiq-analysis"),
+                event_types={SUPPORT_METRICS_EVENT}
+            ))
+    except Exception:
+        pass
+
+    return TelemetrySink(backends, name="support-analytics")
+
+
+@lru_cache(maxsize=1)
+def get_context_window() -> ContextWindow:
+    """Token-budgeted history shared by the support routers"""
+    client = llm_gateway.client
+    return ContextWindow(summarizer=llm_summarizer(client) if client else None)
+
+
+# ============================================================================
+# ENGINE
+# ============================================================================
+
+def _tool_call_message(content: Optional[str], tool_calls: List[Any]) -> Dict[str, Any]:
+    """Assistant message that requested tool calls, as a plain dict"""
+    return {
+        "role": "assistant",
+        "content": content,
+        "tool_calls": [
+            {
+                "id": call.id,
+                "type": "function",
+                "function": {"name": call.function.name, "arguments": call.function.arguments}
+            }
+            for call in tool_calls
+        ]
+    }
+
+
+@dataclass
+class ChatTurn:
+    """Result of one chat turn"""
+    conversation_id: str
+    response: str
+    timestamp: datetime
+    tools_used: List[str] = field(default_factory=list)
+    user_context: Dict[str, Any] = field(default_factory=dict)
+    faq_match: Optional[str] = None
+    prompt_tokens: int = 0
+    history_folded: int = 0
+    duration_ms: int = 0
+    partial: bool = False
+
+
+@dataclass
+class _PreparedTurn:
+    conversation_id: str
+    user_context: Dict[str, Any]
+    started: datetime
+    messages: List[Any] = field(default_factory=list)
+    faq_match: Optional[FaqMatch] = None
+    context: Optional[ContextResult] = None
+    out_of_time: bool = False
+
+
+class ChatEngine:
+    """
+    One turn of support chat: context -> history -> model (+ tools) -> persist
+
+    Features:
+    - Pluggable user context, token-budgeted history, tools and FAQ answers
+    - Blocking/streaming modes over the same preparation and persistence
+    - Database work runs off the event loop
+    - FAQ hits skip history loading and the model entirely
+    - Graceful partial replies when the request deadline passes
+    """
+
+    def __init__(
+        self,
+        name: str,
+        instructions: Union[str, CompiledPrompt],
+        gateway: LLMGateway = llm_gateway,
+        store: Optional[ChatStore] = None,
+        context_loader: Optional[ContextLoader] = None,
+        context_window: Optional[ContextWindow] = None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tool_executor: Optional[ToolExecutor] = None,
+        faq_cache: Optional[FaqCache] = None,
+        faq_slots: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+        analytics: Optional[TelemetrySink] = None,
+        model: str = "gpt-4o-mini",
+        temperature: float = 0.7,
+        max_tokens: int = 300,
+        max_tool_iterations: int = 5
+    ):
+        self.name = name
+        self.prompt = (
+            instructions if isinstance(instructions, CompiledPrompt)
+            else prompt_registry.register(f"support.{name}", instructions)
+        )
+        self.gateway = gateway
+        self.store = store
+        self.context_loader = context_loader
+        self.context_window = context_window
+        self.tools = tools if tool_executor else None
+        self.tool_executor = tool_executor
+        self.faq_cache = faq_cache
+        self.faq_slots = faq_slots
+        self.analytics = analytics
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.max_tool_iterations = max_tool_iterations
+
+    @property
+    def available(self) -> bool:
+        return self.gateway.available
+
+    @property
+    def features(self) -> Dict[str, bool]:
+        """Which pluggable features are enabled"""
+        return {
+            "persistence": self.store is not None,
+            "user_context": self.context_loader is not None,
+            "context_window": self.context_window is not None,
+            "function_calling": self.tool_executor is not None,
+            "faq_cache": self.faq_cache is not None,
+            "analytics": bool(self.analytics and self.analytics.backends),
+            "streaming": True
+        }
+
+    async def respond(
+        self,
+        user_id: str,
+        user_email: str,
+        message: str,
+        conversation_id: Optional[str] = None
+    ) -> ChatTurn:
+        """
+        Run one chat turn and return the complete reply
+
+        Args:
+            user_id: Authenticated user
+            user_email: User's email (stored on the conversation header)
+            message: New user message
+            conversation_id: Existing conversation to continue (new one if None)
+
+        Returns:
+            ChatTurn
+        """
+        prepared = await self._prepare(user_id, user_email, message, conversation_id)
+
+        if prepared.faq_match:
+            return await self._finish(prepared, user_id, user_email, message, prepared.faq_match.answer, [])
+        if prepared.out_of_time:
+            return await self._finish(prepared, user_id, user_email, message, DEADLINE_MESSAGE, [], partial=True)
+
+        tools_used: List[str] = []
+        session = self.tool_executor.session() if self.tool_executor else None
+        messages = prepared.messages
+
+        try:
+            for _ in range(self.max_tool_iterations):
+                response = await self.gateway.complete(messages=messages, **self._completion_kwargs(user_id, prepared))
+                usage = getattr(response, "usage", None)
+                prompt_registry.record(
+                    self.prompt.name, usage,
+                    prompt_tokens=None if usage else count_message_tokens(messages, self.model)
+                )
+                assistant_message = response.choices[0].message
+
+                if not assistant_message.tool_calls or session is None:
+                    ai_response = assistant_message.content or ""
+                    break
+
+                messages.append(_tool_call_message(assistant_message.content, assistant_message.tool_calls))
+                for result in await session.run_calls(assistant_message.tool_calls):
+                    if result.known:
+                        tools_used.append(result.name)
+                    # Every tool call needs a response message, even on error
+                    messages.append(result.to_message())
+            else:
+                ai_response = MAX_TOOL_ITERATIONS_MESSAGE
+                tools_used.append("create_support_ticket")
+        except DeadlineExceeded as e:
+            logger.warning(f"Chat turn ({self.name}) cut short: {e}")
+            return await self._finish(prepared, user_id, user_email, message, DEADLINE_MESSAGE, tools_used, partial=True)
+        except BudgetExceeded as e:
+            logger.info(f"Chat turn ({self.name}) refused: {e}")
+            return await self._finish(prepared, user_id, user_email, message, BUDGET_MESSAGE, tools_used)
+
+        return await self._finish(prepared, user_id, user_email, message, ai_response, tools_used)
+
+    async def stream(
+        self,
+        user_id: str,
+        user_email: str,
+        message: str,
+        conversation_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run one chat turn, yielding events as the reply is generated
+
+        Events:
+            {"type": "start", "conversation_id": ..., "faq_match": ...}
+            {"type": "delta", "content": ...}       (text as it arrives)
+            {"type": "tool", "name": ...}           (a tool finished)
+            {"type": "done", ...}                   (ChatTurn fields, after saving)
+
+        If the request deadline passes, text already streamed is kept as the
+        reply (or DEADLINE_MESSAGE is sent if there is none) and "done" has
+        partial=True.
+        """
+        prepared = await self._prepare(user_id, user_email, message, conversation_id)
+        yield {
+            "type": "start",
+            "conversation_id": prepared.conversation_id,
+            "faq_match": prepared.faq_match.entry_id if prepared.faq_match else None
+        }
+
+        tools_used: List[str] = []
+        partial = False
+
+        if prepared.faq_match:
+            ai_response = prepared.faq_match.answer
+            yield {"type": "delta", "content": ai_response}
+        elif prepared.out_of_time:
+            ai_response, partial = DEADLINE_MESSAGE, True
+            yield {"type": "delta", "content": ai_response}
+        else:
+            session = self.tool_executor.session() if self.tool_executor else None
+            messages = prepared.messages
+            parts: List[str] = []
+
+            try:
+                for _ in range(self.max_tool_iterations):
+                    parts = []
+                    calls: Dict[int, Dict[str, str]] = {}
+
+                    prompt_registry.record(self.prompt.name, prompt_tokens=count_message_tokens(messages, self.model))
+                    async for chunk in self.gateway.stream(messages=messages, **self._completion_kwargs(user_id, prepared)):
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta
+                        if delta.content:
+                            parts.append(delta.content)
+                            yield {"type": "delta", "content": delta.content}
+                        # Tool calls arrive as fragments keyed by index
+                        for fragment in delta.tool_calls or []:
+                            call = calls.setdefault(fragment.index, {"id": "", "name": "", "arguments": ""})
+                            if fragment.id:
+                                call["id"] = fragment.id
+                            if fragment.function and fragment.function.name:
+                                call["name"] += fragment.function.name
+                            if fragment.function and fragment.function.arguments:
+                                call["arguments"] += fragment.function.arguments
+
+                    if not calls or session is None:
+                        ai_response = "".join(parts)
+                        break
+
+                    tool_calls = [
+                        SimpleNamespace(id=c["id"], function=SimpleNamespace(name=c["name"], arguments=c["arguments"]))
+                        for c in (calls[index] for index in sorted(calls))
+                    ]
+                    messages.append(_tool_call_message("".join(parts) or None, tool_calls))
+                    parts = []
+                    for result in await session.run_calls(tool_calls):
+                        if result.known:
+                            tools_used.append(result.name)
+                        messages.append(result.to_message())
+                        yield {"type": "tool", "name": result.name}
+                else:
+                    ai_response = MAX_TOOL_ITERATIONS_MESSAGE
+                    tools_used.append("create_support_ticket")
+                    yield {"type": "delta", "content": ai_response}
+            except DeadlineExceeded as e:
+                logger.warning(f"Streaming chat turn ({self.name}) cut short: {e}")
+                partial = True
+                # Keep what the user has already seen
+                ai_response = "".join(parts)
+                if not ai_response:
+                    ai_response = DEADLINE_MESSAGE
+                    yield {"type": "delta", "content": ai_response}
+            except BudgetExceeded as e:
+                logger.info(f"Streaming chat turn ({self.name}) refused: {e}")
+                ai_response = BUDGET_MESSAGE
+                yield {"type": "delta", "content": ai_response}
+
+        turn = await self._finish(prepared, user_id, user_email, message, ai_response, tools_used, partial=partial)
+        yield {
+            "type": "done",
+            "conversation_id": turn.conversation_id,
+            "response": turn.response,
+            "tools_used": turn.tools_used,
+            "faq_match": turn.faq_match,
+            "partial": turn.partial,
+            "timestamp": turn.timestamp.isoformat()
+        }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _completion_kwargs(self, user_id: str, prepared: _PreparedTurn) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {
+            "model": self.model,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "usage_tags": {
+                "route": f"support.{self.name}",
+                "user_id": user_id,
+                "tier": prepared.user_context.get("tier")
+            }
+        }
+        if self.tools:
+            kwargs["tools"] = self.tools
+            kwargs["tool_choice"] = "auto"
+        return kwargs
+
+    async def _prepare(
+        self,
+        user_id: str,
+        user_email: str,
+        message: str,
+        conversation_id: Optional[str]
+    ) -> _PreparedTurn:
+        started = datetime.utcnow()
+
+        existing_conversation = conversation_id
+        if not conversation_id:
+            from bson import ObjectId
+            conversation_id = str(ObjectId())
+
+        prepared = _PreparedTurn(conversation_id, {}, started)
+        try:
+            await self._load(prepared, user_id, user_email, message, existing_conversation)
+        except DeadlineExceeded as e:
+            logger.warning(f"Chat turn ({self.name}) ran out of time while preparing: {e}")
+            prepared.out_of_time = True
+        return prepared
+
+    async def _load(
+        self,
+        prepared: _PreparedTurn,
+        user_id: str,
+        user_email: str,
+        message: str,
+        existing_conversation: Optional[str]
+    ):
+        conversation_id = prepared.conversation_id
+
+        user_context: Dict[str, Any] = {}
+        global_context = ""
+        if self.context_loader:
+            user_context, global_context = await within_deadline(
+                self.context_loader(user_id, user_email), "user context"
+            )
+        prepared.user_context = user_context
+
+        # Common questions need neither history nor the model
+        if self.faq_cache:
+            prepared.faq_match = self.faq_cache.lookup(
+                message,
+                tier=user_context.get("tier", "free"),
+                slots=self.faq_slots(user_context) if self.faq_slots else user_context
+            )
+            if prepared.faq_match:
+                return
+
+        state: Dict[str, Any] = {}
+        history: List[Dict[str, Any]] = []
+        if existing_conversation and self.store:
+            if self.context_window:
+                # Running summary of older turns, then only the messages after it
+                state = await within_deadline(asyncio.to_thread(
+                    self.store.get_header,
+                    conversation_id, user_id, {"summary": 1, "summary_through_seq": 1}
+                ), "conversation header") or {}
+                # Messages after the summary (capped): the window folds what doesn't fit
+                history = await within_deadline(asyncio.to_thread(
+                    self.store.unsummarized_messages,
+                    conversation_id, user_id, state.get("summary_through_seq")
+                ), "conversation history")
+            else:
+                history = await within_deadline(asyncio.to_thread(
+                    self.store.recent_messages, conversation_id, user_id
+                ), "conversation history")
+
+        # Static instructions first (identical bytes every call, so the provider
+        # can reuse the cached prefix); the per-user context goes last
+        if self.context_window:
+            # May call the summarizer (a blocking LLM call)
+            context = await within_deadline(asyncio.to_thread(
+                self.context_window.build,
+                self.prompt.text,
+                history,
+                message,
+                summary=state.get("summary"),
+                summary_through_seq=state.get("summary_through_seq"),
+                dynamic_context=global_context or None
+            ), "context window")
+            prepared.context = context
+            prepared.messages = context.messages
+            if context.summary_updated and self.store:
+                await asyncio.to_thread(
+                    self.store.save_summary,
+                    conversation_id, user_id, context.summary, context.summary_through_seq
+                )
+        else:
+            prepared.messages = (
+                [self.prompt.system_message()]
+                + [{"role": m.get("role"), "content": m.get("content")} for m in history]
+                + ([{"role": "system", "content": global_context}] if global_context else [])
+                + [{"role": "user", "content": message}]
+            )
+
+    async def _finish(
+        self,
+        prepared: _PreparedTurn,
+        user_id: str,
+        user_email: str,
+        message: str,
+        ai_response: str,
+        tools_used: List[str],
+        partial: bool = False
+    ) -> ChatTurn:
+        timestamp = datetime.utcnow()
+        faq_id = prepared.faq_match.entry_id if prepared.faq_match else None
+        turn = ChatTurn(
+            conversation_id=prepared.conversation_id,
+            response=ai_response,
+            timestamp=timestamp,
+            tools_used=tools_used,
+            user_context=prepared.user_context,
+            faq_match=faq_id,
+            prompt_tokens=prepared.context.prompt_tokens if prepared.context else 0,
+            history_folded=prepared.context.history_folded if prepared.context else 0,
+            duration_ms=int((timestamp - prepared.started).total_seconds() * 1000),
+            partial=partial
+        )
+
+        if self.store:
+            assistant_row: Dict[str, Any] = {"role": "assistant", "content": ai_response, "timestamp": timestamp}
+            if self.tool_executor:
+                assistant_row["tools_used"] = tools_used
+            if self.faq_cache:
+                assistant_row["faq_match"] = faq_id
+            if partial:
+                assistant_row["partial"] = True
+
+            # Append-only: two new rows plus a header counter update. Not bounded
+            # by the deadline: a cut-short turn is still saved
+            await asyncio.to_thread(
+                self.store.append_messages,
+                turn.conversation_id,
+                user_id,
+                user_email,
+                [
+                    {"role": "user", "content": message, "timestamp": timestamp},
+                    assistant_row
+                ],
+                timestamp
+            )
+
+        if self.analytics:
+            self._record_analytics(turn, user_id, message)
+
+        return turn
+
+    def _record_analytics(self, turn: ChatTurn, user_id: str, message: str):
+        # Buffered; never blocks the reply
+        tier = turn.user_context.get("tier")
+        self.analytics.record(SUPPORT_ANALYTICS_EVENT, {
+            "engine": self.name,
+            "user_id": user_id,
+            "conversation_id": turn.conversation_id,
+            "query": message,
+            "response": turn.response,
+            "tools_used": turn.tools_used,
+            "faq_match": turn.faq_match,
+            "duration_ms": turn.duration_ms,
+            "partial": turn.partial,
+            "tier": tier,
+            "created_at": turn.timestamp
+        })
+        self.analytics.record(SUPPORT_METRICS_EVENT, {
+            "engine": self.name,
+            "user_tier": tier,
+            "tools_used_count": len(turn.tools_used),
+            "tools": ",".join(turn.tools_used),
+            "duration_ms": turn.duration_ms,
+            "message_length": len(message),
+            "response_length": len(turn.response),
+            "prompt_tokens": turn.prompt_tokens,
+            "history_folded": turn.history_folded,
+            "faq_cache_hit": turn.faq_match is not None,
+            "deadline_exceeded": turn.partial
+        })
+
+
+def sse_response(events: AsyncIterator[Dict[str, Any]]):
+    """
+    Stream chat engine events to the client as Server-Sent Events
+
+    A failure mid-stream is sent as an {"type": "error"} event, since the
+    status code has already gone out.
+    """
+    async def generate():
+        try:
+            async for event in events:
+                yield f"data: {json.dumps(event, default=str)}\n\n"
+        except Exception as e:
+            logger.error(f"Streaming chat failed: {e}", exc_info=True)
+            yield f"data: {json.dumps({'type': 'error', 'detail': 'Support chat failed'})}\n\n"
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,389 @@
+"""
+Append-only support chat storage for PropIQ backend
+
+Conversations used to live in one document with an embedded `messages` array
+that was read in full and rewritten with `$set` on every turn, so each message
+cost O(conversation length) on both read and write. Storage is now split into:
+
+- support_chats           One header per conversation: counters, last message
+                          preview and timestamps (updated with $inc / $set)
+- support_chat_messages   One row per message, keyed by (conversation_id, seq)
+
+History for the model is read as a bounded window of the most recent rows,
+or (with a token-budgeted context window) as every row after the running
+summary.
+Conversations written before this change (embedded `messages`) are still
+readable; new turns are appended as rows and the legacy tail is merged in.
+
+The header doubles as the conversation summary for list views: list pages
+read only the summary fields through a (user_id, updated_at) index.
+
+Usage:
+    from utils.chat_store import ChatStore
+
+    store = ChatStore(db["support_chats"], db["support_chat_messages"])
+    history = store.recent_messages(conversation_id, user_id)
+    store.append_messages(conversation_id, user_id, user_email, [user_msg, ai_msg])
+    page = store.list_summaries(user_id, skip=0, limit=20)
+"""
+
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Most recent messages sent to the model per turn (without a context window)
+CHAT_HISTORY_WINDOW = int(os.getenv("CHAT_HISTORY_WINDOW", "20"))
+
+# Cap on messages read for the token-budgeted context window (which folds
+# what doesn't fit into the summary); bounds reads when nothing gets folded
+CHAT_UNSUMMARIZED_LIMIT = int(os.getenv("CHAT_UNSUMMARIZED_LIMIT", str(CHAT_HISTORY_WINDOW * 5)))
+
+# Characters of the last message kept on the header for list views
+LAST_MESSAGE_PREVIEW_CHARS = 200
+
+# pymongo.ReturnDocument.AFTER
+_RETURN_AFTER = True
+
+# Header fields returned by list views (never the legacy messages array)
+SUMMARY_PROJECTION = {
+    "_id": 0,
+    "conversation_id": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "message_count": 1,
+    "legacy_message_count": 1,
+    "last_message": 1,
+    "last_message_role": 1
+}
+
+
+class ChatStore:
+    """
+    Conversation header + append-only message rows
+
+    Features:
+    - Appending a turn is one header upsert plus one insert_many
+    - Per-conversation sequence numbers allocated atomically with $inc
+    - Bounded history window for prompts, full paging for history views
+    - Reads legacy conversations that still embed a `messages` array
+    - Summary-only list pages (count, preview, updated_at) per user
+    """
+
+    def __init__(
+        self,
+        chats,
+        messages,
+        history_window: int = CHAT_HISTORY_WINDOW,
+        unsummarized_limit: int = CHAT_UNSUMMARIZED_LIMIT
+    ):
+        self.chats = chats
+        self.messages = messages
+        self.history_window = history_window
+        self.unsummarized_limit = unsummarized_limit
+
+    def ensure_indexes(self):
+        """Create the indexes the read/write paths rely on"""
+        self.chats.create_index([("conversation_id", 1), ("user_id", 1)], unique=True)
+        self.messages.create_index([("conversation_id", 1), ("seq", 1)], unique=True)
+        # Conversation list: newest first per user, served from the index
+        self.chats.create_index([("user_id", 1), ("updated_at", -1)])
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def append_messages(
+        self,
+        conversation_id: str,
+        user_id: str,
+        user_email: Optional[str],
+        entries: List[Dict[str, Any]],
+        timestamp: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """
+        Append messages to a conversation (creating it if needed)
+
+        Args:
+            conversation_id: Conversation ID
+            user_id: Owner of the conversation
+            user_email: Owner email (stored on the header)
+            entries: Messages to append, oldest first ({"role", "content", ...})
+            timestamp: Time of the turn (defaults to now)
+
+        Returns:
+            Updated conversation header
+        """
+        if not entries:
+            raise ValueError("append_messages requires at least one message")
+
+        timestamp = timestamp or datetime.utcnow()
+        last_content = entries[-1].get("content") or ""
+
+        # Reserve a contiguous block of sequence numbers for this turn
+        header = self.chats.find_one_and_update(
+            {"conversation_id": conversation_id, "user_id": user_id},
+            {
+                "$inc": {"message_count": len(entries)},
+                "$set": {
+                    "user_email": user_email,
+                    "last_message": last_content[:LAST_MESSAGE_PREVIEW_CHARS],
+                    "last_message_role": entries[-1].get("role"),
+                    "updated_at": timestamp
+                },
+                "$setOnInsert": {"created_at": timestamp}
+            },
+            upsert=True,
+            return_document=_RETURN_AFTER
+        )
+
+        first_seq = header["message_count"] - len(entries)
+        rows = []
+        for offset, entry in enumerate(entries):
+            row = dict(entry)
+            row.setdefault("timestamp", timestamp)
+            row.update({
+                "conversation_id": conversation_id,
+                "user_id": user_id,
+                "seq": first_seq + offset
+            })
+            rows.append(row)
+
+        self.messages.insert_many(rows, ordered=True)
+        return header
+
+    def update_header(self, conversation_id: str, user_id: str, fields: Dict[str, Any]):
+        """Set extra fields on a conversation header"""
+        self.chats.update_one(
+            {"conversation_id": conversation_id, "user_id": user_id},
+            {"$set": fields}
+        )
+
+    def save_summary(self, conversation_id: str, user_id: str, summary: str, through_seq: int):
+        """
+        Store the running summary of older messages on the header
+
+        Args:
+            summary: Summary text
+            through_seq: Last message seq folded into the summary
+                (-1 when only legacy embedded messages were folded)
+        """
+        self.update_header(conversation_id, user_id, {
+            "summary": summary,
+            "summary_through_seq": through_seq
+        })
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def get_header(
+        self,
+        conversation_id: str,
+        user_id: str,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Get a conversation header (None if it does not exist for this user)"""
+        if projection is None:
+            # Never pull a legacy embedded array unless asked to
+            projection = {"messages": 0}
+        return self.chats.find_one(
+            {"conversation_id": conversation_id, "user_id": user_id},
+            projection
+        )
+
+    def recent_messages(
+        self,
+        conversation_id: str,
+        user_id: str,
+        limit: Optional[int] = None,
+        after_seq: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Get the most recent messages of a conversation, oldest first
+
+        Args:
+            conversation_id: Conversation ID
+            user_id: Owner of the conversation
+            limit: Window size (defaults to CHAT_HISTORY_WINDOW)
+            after_seq: Only messages newer than this seq (already-summarized
+                messages are skipped; legacy messages count as summarized)
+
+        Returns:
+            At most `limit` messages
+        """
+        limit = limit or self.history_window
+
+        query: Dict[str, Any] = {"conversation_id": conversation_id, "user_id": user_id}
+        if after_seq is not None:
+            query["seq"] = {"$gt": after_seq}
+
+        rows = list(self.messages.find(
+            query,
+            {"_id": 0},
+            sort=[("seq", -1)],
+            limit=limit
+        ))
+        rows.reverse()
+
+        if len(rows) < limit and after_seq is None:
+            rows = self._legacy_tail(conversation_id, user_id, limit - len(rows)) + rows
+
+        return rows
+
+    def unsummarized_messages(
+        self,
+        conversation_id: str,
+        user_id: str,
+        after_seq: Optional[int] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Messages not yet folded into the running summary, oldest first
+
+        A token-budgeted context window must see each message either verbatim
+        or when it is folded, so this reads well past the history window:
+        normally the window folds whatever doesn't fit and few messages are
+        unsummarized. Without a working summarizer nothing gets folded, so
+        the read is still capped; only messages older than the newest
+        `limit` are then left out (and never summarized).
+
+        Args:
+            conversation_id: Conversation ID
+            user_id: Owner of the conversation
+            after_seq: Last seq covered by the summary (None: nothing
+                summarized yet, so legacy messages are included)
+            limit: Row cap (defaults to CHAT_UNSUMMARIZED_LIMIT)
+
+        Returns:
+            The newest `limit` messages after `after_seq`
+        """
+        return self.recent_messages(
+            conversation_id, user_id, limit=limit or self.unsummarized_limit, after_seq=after_seq
+        )
+
+    def all_messages(
+        self,
+        conversation_id: str,
+        user_id: str,
+        skip: int = 0,
+        limit: int = 0
+    ) -> List[Dict[str, Any]]:
+        """
+        Get messages oldest first, optionally paged (limit=0 means no limit)
+
+        Legacy embedded messages come first, followed by appended rows.
+        """
+        legacy = self._legacy_messages(conversation_id, user_id)
+        if limit and skip + limit <= len(legacy):
+            return legacy[skip:skip + limit]
+
+        row_skip = max(0, skip - len(legacy))
+        row_limit = limit - max(0, len(legacy) - skip) if limit else 0
+
+        rows = list(self.messages.find(
+            {"conversation_id": conversation_id, "user_id": user_id},
+            {"_id": 0},
+            sort=[("seq", 1)],
+            skip=row_skip,
+            limit=row_limit
+        ))
+        return legacy[skip:] + rows
+
+    def count_conversations(self, user_id: str) -> int:
+        """Number of conversations a user has"""
+        return self.chats.count_documents({"user_id": user_id})
+
+    def list_summaries(self, user_id: str, skip: int = 0, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Conversation summaries for a user, most recently updated first
+
+        Only header summary fields are read; message rows and legacy
+        embedded arrays are never transferred.
+
+        Returns:
+            Dicts with conversation_id, created_at, updated_at,
+            message_count (legacy messages included) and last_message
+        """
+        self.backfill_legacy_summaries(user_id)
+
+        headers = self.chats.find(
+            {"user_id": user_id},
+            SUMMARY_PROJECTION,
+            sort=[("updated_at", -1)],
+            skip=skip,
+            limit=limit
+        )
+        return [
+            {
+                "conversation_id": h["conversation_id"],
+                "created_at": h.get("created_at"),
+                "updated_at": h.get("updated_at"),
+                "message_count": h.get("message_count", 0) + h.get("legacy_message_count", 0),
+                "last_message": h.get("last_message") or "",
+                "last_message_role": h.get("last_message_role")
+            }
+            for h in headers
+        ]
+
+    def backfill_legacy_summaries(self, user_id: Optional[str] = None) -> int:
+        """
+        Add summary fields to legacy headers that only have a `messages` array
+
+        Each legacy conversation is read in full once; afterwards the query
+        matches nothing for that user and costs one index lookup.
+
+        Args:
+            user_id: Limit to one user's conversations (all users if None)
+
+        Returns:
+            Number of headers updated
+        """
+        query: Dict[str, Any] = {
+            "messages": {"$exists": True},
+            "legacy_message_count": {"$exists": False}
+        }
+        if user_id is not None:
+            query["user_id"] = user_id
+
+        updated = 0
+        for header in self.chats.find(query, {"conversation_id": 1, "user_id": 1, "messages": 1, "last_message": 1}):
+            messages = header.get("messages") or []
+            fields: Dict[str, Any] = {"legacy_message_count": len(messages)}
+            # Appended turns are newer than the legacy array; keep their preview
+            if not header.get("last_message") and messages:
+                fields["last_message"] = (messages[-1].get("content") or "")[:LAST_MESSAGE_PREVIEW_CHARS]
+                fields["last_message_role"] = messages[-1].get("role")
+            self.update_header(header["conversation_id"], header["user_id"], fields)
+            updated += 1
+
+        if updated:
+            logger.info(f"Backfilled summaries for {updated} legacy conversations")
+        return updated
+
+    def _legacy_tail(self, conversation_id: str, user_id: str, count: int) -> List[Dict[str, Any]]:
+        """Last `count` messages of a pre-migration embedded array"""
+        header = self.chats.find_one(
+            {
+                "conversation_id": conversation_id,
+                "user_id": user_id,
+                "messages": {"$exists": True}
+            },
+            {"messages": {"$slice": -count}}
+        )
+        return list(header.get("messages") or []) if header else []
+
+    def _legacy_messages(self, conversation_id: str, user_id: str) -> List[Dict[str, Any]]:
+        """Full pre-migration embedded array (empty for new conversations)"""
+        header = self.chats.find_one(
+            {
+                "conversation_id": conversation_id,
+                "user_id": user_id,
+                "messages": {"$exists": True}
+            },
+            {"messages": 1}
+        )
+        return list(header.get("messages") or []) if header else []
@@ -0,0 +1,233 @@
+"""
+Token-budgeted conversation context for PropIQ chat
+
+Replaying every prior message makes prompt size (and latency, and cost) grow
+without limit over a conversation. ContextWindow keeps the system prompt, the
+new user message and as many of the most recent turns as fit in a token
+budget. Older turns are folded into a running summary that is stored on the
+conversation header, so each turn only summarizes what newly fell out of the
+window.
+
+Usage:
+    from utils.context_window import ContextWindow, llm_summarizer
+
+    window = ContextWindow(summarizer=llm_summarizer(client))
+    context = window.build(system_prompt, history, user_message,
+                           summary=header.get("summary"),
+                           summary_through_seq=header.get("summary_through_seq"))
+    if context.summary_updated:
+        chat_store.save_summary(conversation_id, user_id,
+                                context.summary, context.summary_through_seq)
+    response = client.chat.completions.create(model=..., messages=context.messages)
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from config.logging_config import get_logger
+from utils.tokens import DEFAULT_MODEL, count_message_tokens, message_tokens
+
+logger = get_logger(__name__)
+
+# Prompt tokens allowed for system prompt + summary + history + new message
+CHAT_CONTEXT_BUDGET_TOKENS = int(os.getenv("CHAT_CONTEXT_BUDGET_TOKENS", "3000"))
+
+# Length cap for the running summary
+CHAT_SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "250"))
+
+# When folding, shrink history to this fraction of the budget so the next few
+# turns fit without summarizing again
+FOLD_TARGET_RATIO = 0.75
+
+SUMMARY_PREFIX = "Summary of the earlier conversation with this user:\n"
+
+# (previous_summary, messages_to_fold) -> new summary
+Summarizer = Callable[[Optional[str], List[Dict[str, Any]]], Optional[str]]
+
+
+@dataclass
+class ContextResult:
+    """Messages to send plus the summary state to persist"""
+    messages: List[Dict[str, Any]]
+    prompt_tokens: int
+    summary: Optional[str]
+    summary_through_seq: Optional[int]
+    summary_updated: bool = False
+    history_included: int = 0
+    history_folded: int = 0
+
+
+class ContextWindow:
+    """
+    Fit a conversation into a prompt token budget
+
+    Features:
+    - Local token counting (tiktoken, or an estimate)
+    - Most recent turns kept verbatim
+    - Older turns folded into a persisted running summary
+    - Hysteresis so summarization runs every few turns, not every turn
+    """
+
+    def __init__(
+        self,
+        budget_tokens: int = CHAT_CONTEXT_BUDGET_TOKENS,
+        summarizer: Optional[Summarizer] = None,
+        fold_target_ratio: float = FOLD_TARGET_RATIO,
+        model: str = DEFAULT_MODEL
+    ):
+        self.budget_tokens = budget_tokens
+        self.summarizer = summarizer
+        self.fold_target_ratio = fold_target_ratio
+        self.model = model
+
+    def build(
+        self,
+        system_prompt: str,
+        history: List[Dict[str, Any]],
+        user_message: str,
+        summary: Optional[str] = None,
+        summary_through_seq: Optional[int] = None,
+        dynamic_context: Optional[str] = None
+    ) -> ContextResult:
+        """
+        Build the message list for one turn
+
+        Args:
+            system_prompt: Static system prompt (always included, sent first so
+                the prefix stays identical across calls)
+            history: Prior messages, oldest first (rows may carry a `seq`)
+            user_message: The new user message (always included)
+            summary: Stored running summary, if any
+            summary_through_seq: Last message seq covered by the summary
+            dynamic_context: Per-request system context (e.g. customer
+                profile), placed just before the new user message
+
+        Returns:
+            ContextResult with messages and (possibly updated) summary state
+        """
+        history = [
+            {"role": m.get("role"), "content": m.get("content"), "seq": m.get("seq")}
+            for m in history
+            if summary_through_seq is None or m.get("seq") is None or m["seq"] > summary_through_seq
+        ]
+        costs = [message_tokens(m, self.model) for m in history]
+
+        if self._fixed_tokens(system_prompt, summary, user_message, dynamic_context) + sum(costs) <= self.budget_tokens:
+            return self._result(system_prompt, summary, history, user_message, dynamic_context,
+                                summary_through_seq, updated=False, folded=0)
+
+        # Over budget: keep the newest turns within the fold target
+        target = int(self.budget_tokens * self.fold_target_ratio)
+        fixed = self._fixed_tokens(system_prompt, summary, user_message, dynamic_context)
+        keep_from = len(history)
+        used = fixed
+        while keep_from > 0 and used + costs[keep_from - 1] <= target:
+            keep_from -= 1
+            used += costs[keep_from]
+
+        overflow, kept = history[:keep_from], history[keep_from:]
+        new_summary, updated = summary, False
+
+        if overflow and self.summarizer is not None:
+            try:
+                folded_summary = self.summarizer(summary, overflow)
+                if folded_summary:
+                    new_summary, updated = folded_summary, True
+            except Exception as e:
+                logger.warning(f"Conversation summarization failed, dropping {len(overflow)} old messages: {e}")
+
+        through_seq = summary_through_seq
+        if updated:
+            seqs = [m["seq"] for m in overflow if m.get("seq") is not None]
+            # -1 marks legacy (unsequenced) messages as folded
+            through_seq = max(seqs) if seqs else max(summary_through_seq or -1, -1)
+
+        # The summary may have grown; trim oldest kept turns until it fits
+        fixed = self._fixed_tokens(system_prompt, new_summary, user_message, dynamic_context)
+        kept_costs = costs[keep_from:]
+        while kept and fixed + sum(kept_costs) > self.budget_tokens:
+            kept.pop(0)
+            kept_costs.pop(0)
+
+        return self._result(system_prompt, new_summary, kept, user_message, dynamic_context,
+                            through_seq, updated=updated, folded=len(overflow))
+
+    def _fixed_tokens(
+        self,
+        system_prompt: str,
+        summary: Optional[str],
+        user_message: str,
+        dynamic_context: Optional[str] = None
+    ) -> int:
+        return count_message_tokens(
+            self._frame(system_prompt, summary, [], user_message, dynamic_context), self.model
+        )
+
+    @staticmethod
+    def _frame(
+        system_prompt: str,
+        summary: Optional[str],
+        history: List[Dict[str, Any]],
+        user_message: str,
+        dynamic_context: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        # Static prompt -> summary -> history form a prefix that only grows
+        # between turns; per-request context goes last
+        messages = [{"role": "system", "content": system_prompt}]
+        if summary:
+            messages.append({"role": "system", "content": SUMMARY_PREFIX + summary})
+        messages.extend({"role": m["role"], "content": m["content"]} for m in history)
+        if dynamic_context:
+            messages.append({"role": "system", "content": dynamic_context})
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+    def _result(self, system_prompt, summary, history, user_message, dynamic_context, through_seq, updated, folded):
+        messages = self._frame(system_prompt, summary, history, user_message, dynamic_context)
+        return ContextResult(
+            messages=messages,
+            prompt_tokens=count_message_tokens(messages, self.model),
+            summary=summary,
+            summary_through_seq=through_seq,
+            summary_updated=updated,
+            history_included=len(history),
+            history_folded=folded
+        )
+
+
+def llm_summarizer(
+    client,
+    model: str = DEFAULT_MODEL,
+    max_tokens: int = CHAT_SUMMARY_MAX_TOKENS
+) -> Summarizer:
+    """
+    Summarizer that folds messages into the running summary with a chat model
+
+    Args:
+        client: OpenAI / AzureOpenAI client
+        model: Deployment to use for summarization
+        max_tokens: Summary length cap
+
+    Returns:
+        Callable suitable for ContextWindow(summarizer=...)
+    """
+    def summarize(previous_summary: Optional[str], messages: List[Dict[str, Any]]) -> Optional[str]:
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages if m.get("content"))
+        prompt = (
+            "Update the running summary of a customer support conversation.\n"
+            "Keep facts the agent needs later: the user's goals, account or billing details "
+            "mentioned, problems reported, actions taken (tickets, credits, demos) and open questions.\n"
+            f"Write at most {max_tokens} tokens, as terse bullet points.\n\n"
+            f"CURRENT SUMMARY:\n{previous_summary or '(none)'}\n\n"
+            f"NEW MESSAGES:\n{transcript}"
+        )
+        response = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0,
+            max_tokens=max_tokens
+        )
+        return (response.choices[0].message.content or "").strip() or None
+
+    return summarize
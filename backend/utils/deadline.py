@@ -0,0 +1,155 @@
+"""
+Request-scoped deadlines for PropIQ backend
+
+A chat turn can make several model calls, each followed by tool calls and
+database reads, and nothing bounded the total. A Deadline is set once per
+request (by a route dependency) and carried in a context variable, so the
+LLM gateway, the tool executor and the chat engine all see the same
+remaining time without passing it through every signature. Work that would
+outlive the deadline is cancelled and the route answers with what it has.
+
+Usage:
+    from utils.deadline import request_deadline, within_deadline, DeadlineExceeded
+
+    @router.post("/chat")
+    async def chat(..., deadline: Deadline = Depends(request_deadline(30))):
+        try:
+            history = await within_deadline(asyncio.to_thread(load_history), "history")
+        except DeadlineExceeded:
+            return partial_response()
+
+    # Deeper layers
+    timeout = remaining_time(default=10)   # min(10, time left), or 10 with no deadline
+"""
+
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Iterator, Optional
+
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+_current_deadline: ContextVar[Optional["Deadline"]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request ran out of time"""
+
+
+class Deadline:
+    """Absolute point in time (monotonic clock) by which a request must finish"""
+
+    def __init__(self, seconds: float, name: str = "request"):
+        self.seconds = seconds
+        self.name = name
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left (never negative)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def cap(self, timeout: Optional[float] = None) -> float:
+        """A timeout no longer than the time left"""
+        remaining = self.remaining()
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def check(self, what: str = "operation"):
+        """Raise DeadlineExceeded if no time is left"""
+        if self.expired:
+            raise DeadlineExceeded(f"{self.name} deadline ({self.seconds}s) exceeded before {what}")
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Deadline of the current request (None outside a deadline scope)"""
+    return _current_deadline.get()
+
+
+def remaining_time(default: Optional[float] = None) -> Optional[float]:
+    """Time left capped at default, or default when there is no deadline"""
+    deadline = current_deadline()
+    return deadline.cap(default) if deadline else default
+
+
+def check_deadline(what: str = "operation"):
+    """Raise DeadlineExceeded if the current request is out of time"""
+    deadline = current_deadline()
+    if deadline:
+        deadline.check(what)
+
+
+@contextmanager
+def deadline_scope(seconds: float, name: str = "request") -> Iterator[Deadline]:
+    """
+    Run a block under a deadline (an enclosing, earlier deadline still wins)
+
+    Usage:
+        with deadline_scope(5, "report"):
+            await build_report()
+    """
+    deadline = Deadline(seconds, name)
+    outer = current_deadline()
+    if outer and outer.expires_at < deadline.expires_at:
+        deadline = outer
+
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+async def within_deadline(awaitable: Awaitable[Any], what: str = "operation", timeout: Optional[float] = None) -> Any:
+    """
+    Await something, giving up when the request deadline (or timeout) passes
+
+    Args:
+        awaitable: Coroutine/future to await (cancelled on deadline)
+        what: Description for the error message
+        timeout: Optional per-operation cap
+
+    Raises:
+        DeadlineExceeded: The request deadline passed
+        asyncio.TimeoutError: Only the per-operation timeout passed
+    """
+    deadline = current_deadline()
+    if deadline is None:
+        return await (asyncio.wait_for(awaitable, timeout) if timeout is not None else awaitable)
+
+    if deadline.expired:
+        # Never started; close it so it is not reported as never awaited
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        deadline.check(what)
+
+    try:
+        return await asyncio.wait_for(awaitable, deadline.cap(timeout))
+    except asyncio.TimeoutError:
+        if deadline.expired:
+            logger.warning(f"{deadline.name} deadline ({deadline.seconds}s) exceeded during {what}")
+            raise DeadlineExceeded(f"{deadline.name} deadline ({deadline.seconds}s) exceeded during {what}") from None
+        raise
+
+
+def request_deadline(seconds: float, name: Optional[str] = None) -> Callable[[], Awaitable[Deadline]]:
+    """
+    Route dependency that starts the request's deadline
+
+    Async on purpose: FastAPI runs async dependencies in the request's own
+    context, so the deadline is visible to the endpoint and everything it awaits.
+
+    Usage:
+        @router.post("/chat", dependencies=[Depends(request_deadline(CHAT_DEADLINE_SECONDS))])
+    """
+    async def dependency() -> Deadline:
+        deadline = Deadline(seconds, name or "request")
+        _current_deadline.set(deadline)
+        return deadline
+
+    return dependency
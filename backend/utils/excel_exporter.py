@@ -18,6 +18,8 @@ except ImportError:
     OPENPYXL_AVAILABLE = False
 
 from config.logging_config import get_logger
+from underwriting.projections import YEARLY_FIELDS
+from underwriting.sensitivity import heatmap_rows
 
 logger = get_logger(__name__)
 
@@ -58,6 +60,15 @@ class ExcelExporter:
             ws_assumptions = wb.create_sheet("Assumptions")
             self._create_assumptions_sheet(ws_assumptions, analysis_data)
 
+            # Sheet 4: Sensitivity heatmaps (underwriting.sensitivity), if provided
+            if analysis_data.get('sensitivity'):
+                ws_sensitivity = wb.create_sheet("Sensitivity")
+                self._create_sensitivity_sheet(ws_sensitivity, analysis_data['sensitivity'])
+
+            # Sheets 5-6: Projections and amortization (underwriting.projections), if provided
+            if analysis_data.get('projections'):
+                self._create_projection_sheets(wb, analysis_data['projections'])
+
             # Save to bytes
             excel_buffer = BytesIO()
             wb.save(excel_buffer)
@@ -177,6 +188,126 @@ class ExcelExporter:
         ws.column_dimensions['B'].width = 20
 
 
+    def _create_sensitivity_sheet(self, ws, heatmaps: List[Dict[str, Any]]):
+        """Create sensitivity sheet: one table per heatmap, blank row between"""
+
+        ws['A1'] = 'Sensitivity Analysis'
+        ws['A1'].font = Font(size=14, bold=True)
+
+        row = 3
+        for heatmap in heatmaps:
+            held = ', '.join(f"{field} = {value}" for field, value in heatmap.get('held', {}).items())
+            ws.cell(row=row, column=1, value=f"Held: {held}" if held else 'Held: none')
+            row += 1
+            for i, values in enumerate(heatmap_rows(heatmap)):
+                for column, value in enumerate(values, start=1):
+                    cell = ws.cell(row=row, column=column, value=value)
+                    if i == 0 or column == 1:
+                        cell.font = Font(bold=True)
+                row += 1
+            row += 1
+
+        ws.column_dimensions['A'].width = 40
+
+    def _create_projection_sheets(self, wb, projections: Dict[str, Any], suffix: str = ''):
+        """Create yearly projection sheet, plus monthly amortization if present"""
+
+        ws = wb.create_sheet(f"Projections{suffix}")
+        ws['A1'] = 'Long-Term Projections'
+        ws['A1'].font = Font(size=14, bold=True)
+
+        summary = projections.get('summary', {})
+        returns = [
+            ('Hold (years)', summary.get('exit_year')),
+            ('IRR %', summary.get('irr')),
+            (f"NPV @ {summary.get('discount_rate', 0)}%", summary.get('npv')),
+            ('Equity Multiple', summary.get('equity_multiple')),
+        ]
+        row = 3
+        for label, value in returns:
+            ws[f'A{row}'] = label
+            ws[f'B{row}'] = value
+            row += 1
+
+        row += 1
+        self._write_table(ws, row, ['year', *YEARLY_FIELDS, 'irr_if_sold'], projections.get('yearly', []))
+        ws.column_dimensions['A'].width = 20
+
+        if projections.get('schedule'):
+            ws_schedule = wb.create_sheet(f"Amortization{suffix}")
+            self._write_table(
+                ws_schedule, 1, ['month', 'payment', 'interest', 'principal', 'balance'], projections['schedule']
+            )
+
+    def _write_table(self, ws, row: int, columns: List[str], records: List[Dict[str, Any]]):
+        """Write records as a table with a bold header row starting at row"""
+        for column, name in enumerate(columns, start=1):
+            ws.cell(row=row, column=column, value=name).font = Font(bold=True)
+        for record in records:
+            row += 1
+            for column, name in enumerate(columns, start=1):
+                ws.cell(row=row, column=column, value=record.get(name))
+
+    def export_projections_to_excel(self, reports: List[Dict[str, Any]]) -> Optional[bytes]:
+        """
+        Export projection reports on their own, one sheet pair per property
+
+        Args:
+            reports: Projection.report() outputs, each with an optional "id"
+
+        Returns:
+            Excel file as bytes, or None if export fails
+        """
+        if not OPENPYXL_AVAILABLE:
+            logger.error("openpyxl not available. Cannot export to Excel.")
+            return None
+
+        try:
+            wb = Workbook()
+            wb.remove(wb.active)
+            for i, report in enumerate(reports):
+                # Sheet titles must be unique and at most 31 characters
+                self._create_projection_sheets(wb, report, suffix=f" {i + 1}")
+
+            excel_buffer = BytesIO()
+            wb.save(excel_buffer)
+            excel_buffer.seek(0)
+            return excel_buffer.getvalue()
+
+        except Exception as e:
+            logger.error(f"Failed to export projections to Excel: {e}", exc_info=True)
+            return None
+
+    def export_sensitivity_to_excel(self, heatmaps: List[Dict[str, Any]]) -> Optional[bytes]:
+        """
+        Export sensitivity heatmaps on their own (no analysis summary)
+
+        Args:
+            heatmaps: SensitivityGrid.heatmap() outputs
+
+        Returns:
+            Excel file as bytes, or None if export fails
+        """
+        if not OPENPYXL_AVAILABLE:
+            logger.error("openpyxl not available. Cannot export to Excel.")
+            return None
+
+        try:
+            wb = Workbook()
+            ws = wb.active
+            ws.title = "Sensitivity"
+            self._create_sensitivity_sheet(ws, heatmaps)
+
+            excel_buffer = BytesIO()
+            wb.save(excel_buffer)
+            excel_buffer.seek(0)
+            return excel_buffer.getvalue()
+
+        except Exception as e:
+            logger.error(f"Failed to export sensitivity to Excel: {e}", exc_info=True)
+            return None
+
+
 class CSVExporter:
     """Export analysis data to CSV format"""
 
@@ -221,6 +352,21 @@ class CSVExporter:
         writer.writerow(['Monthly Insurance', analysis_data.get('monthly_insurance', 0)])
         writer.writerow(['Monthly Maintenance', analysis_data.get('monthly_maintenance', 0)])
 
+        # Sensitivity heatmaps (underwriting.sensitivity), if provided
+        for heatmap in analysis_data.get('sensitivity') or []:
+            writer.writerow([])
+            writer.writerow(['Sensitivity'])
+            writer.writerows(heatmap_rows(heatmap))
+
+        # Yearly projections (underwriting.projections), if provided
+        projections = analysis_data.get('projections') or {}
+        if projections.get('yearly'):
+            writer.writerow([])
+            writer.writerow(['Projections'])
+            writer.writerow(['year', *YEARLY_FIELDS, 'irr_if_sold'])
+            for row in projections['yearly']:
+                writer.writerow([row['year'], *(row[name] for name in YEARLY_FIELDS), row['irr_if_sold']])
+
         logger.info(f"Exported analysis {analysis_data.get('id')} to CSV")
         return output.getvalue()
 
@@ -273,6 +419,16 @@ def export_to_excel(analysis_data: Dict[str, Any]) -> Optional[bytes]:
     return excel_exporter.export_analysis_to_excel(analysis_data)
 
 
+def export_sensitivity_to_excel(heatmaps: List[Dict[str, Any]]) -> Optional[bytes]:
+    """Convenience function to export sensitivity heatmaps to Excel"""
+    return excel_exporter.export_sensitivity_to_excel(heatmaps)
+
+
+def export_projections_to_excel(reports: List[Dict[str, Any]]) -> Optional[bytes]:
+    """Convenience function to export projection reports to Excel"""
+    return excel_exporter.export_projections_to_excel(reports)
+
+
 def export_to_csv(analysis_data: Dict[str, Any]) -> str:
     """Convenience function to export to CSV"""
     return csv_exporter.export_analysis_to_csv(analysis_data)
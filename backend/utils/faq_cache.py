@@ -0,0 +1,280 @@
+"""
+Semantic FAQ answer cache for PropIQ support chat
+
+Most support traffic is the same handful of questions (pricing, limits, how
+to export...) phrased differently, and each one used to cost a full chat
+completion with tools. FaqCache embeds questions locally with a hashed n-gram
+vectorizer (numpy only, no model download), keeps the vectors in an in-memory
+index, and serves an answer directly when a new question is similar enough
+and nearly every word of it is covered by that FAQ's phrasings. Messages that
+report a problem ("download pdf not working") or ask for something else as
+well ("... and I want a refund") never get a canned answer.
+
+Answers are templates with personalization slots ({user_name},
+{analyses_remaining}, ...) filled from the user's context, and can differ per
+subscription tier.
+
+Usage:
+    from utils.faq_cache import FaqCache
+
+    faq = FaqCache(threshold=0.6)
+    faq.add(
+        "pricing",
+        questions=["How much does PropIQ cost?", "What are your plans?"],
+        answers={"*": "Plans start at $29/month...", "elite": "You're on Elite..."}
+    )
+
+    match = faq.lookup("how much is it?", tier="free", slots={"user_name": "Sam"})
+    if match:
+        return match.answer
+"""
+
+import difflib
+import os
+import re
+import string
+import threading
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Cosine similarity required to serve a cached answer
+FAQ_CACHE_THRESHOLD = float(os.getenv("FAQ_CACHE_THRESHOLD", "0.6"))
+
+# Share of the message's content words that must appear in the matched FAQ's
+# phrasings (close spellings count), so extra intents fall through to the model
+FAQ_CACHE_MIN_COVERAGE = float(os.getenv("FAQ_CACHE_MIN_COVERAGE", "0.8"))
+
+# Problem reports, negations and requests that need the model and its tools
+# (tickets, refunds) even when they mention an FAQ topic
+_PROBLEM_RE = re.compile(
+    r"n['\u2019]t\b|\b(?:not|no|never|cannot|cant|wont|doesnt|didnt|isnt|broken|broke|bug|bugs|"
+    r"error|errors|fail|fails|failed|failing|issue|issues|problem|problems|wrong|crash|crashes|"
+    r"crashed|stuck|refund|refunds|charged|cancel|cancelled|canceled)\b"
+)
+
+# Words that carry no intent; excluded so "how do I cancel" and
+# "how do I upgrade" are not near-duplicates
+_STOPWORDS = frozenset("""
+a an the and or but if of to in on for with at by from as is are was were be been being
+i me my we our you your it its this that these those do does did can could would should
+will shall may might must have has had please hi hello hey there what how why when where
+which who whom am so just about any some get got
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9$%]+")
+
+# Tier key meaning "any tier"
+ANY_TIER = "*"
+
+
+class HashingVectorizer:
+    """
+    Stateless text -> unit vector embedding using the hashing trick
+
+    Features are word unigrams, word bigrams and character trigrams (within
+    words, so typos and inflections still overlap). crc32 keeps hashes stable
+    across processes and restarts.
+    """
+
+    def __init__(self, n_features: int = 2 ** 14):
+        self.n_features = n_features
+
+    def tokens(self, text: str) -> List[str]:
+        words = _TOKEN_RE.findall(text.lower())
+        return [w for w in words if w not in _STOPWORDS]
+
+    def features(self, text: str) -> List[str]:
+        words = self.tokens(text)
+        feats = [f"w:{w}" for w in words]
+        feats += [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+        for w in words:
+            padded = f"<{w}>"
+            feats += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+        return feats
+
+    def transform(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.n_features, dtype=np.float32)
+        for feat in self.features(text):
+            h = zlib.crc32(feat.encode("utf-8"))
+            # Word features weigh more than sub-word ones
+            weight = 1.0 if feat[0] == "c" else 2.0
+            vector[h % self.n_features] += weight if (h >> 31) & 1 else -weight
+
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+@dataclass
+class FaqEntry:
+    """One FAQ: several phrasings of the question, answers per tier"""
+    entry_id: str
+    questions: List[str]
+    answers: Dict[str, str]
+    vocabulary: frozenset = frozenset()
+    hits: int = 0
+
+    def answer_for(self, tier: str) -> Optional[str]:
+        return self.answers.get(tier) or self.answers.get(ANY_TIER)
+
+
+@dataclass
+class FaqMatch:
+    """A cache hit"""
+    entry_id: str
+    answer: str
+    score: float
+    matched_question: str
+
+
+class _SlotDict(dict):
+    def __missing__(self, key):
+        raise KeyError(key)
+
+
+class FaqCache:
+    """
+    In-memory vector index of FAQ questions
+
+    Features:
+    - Cosine similarity over hashed n-gram vectors (one matrix-vector product)
+    - Tunable threshold (FAQ_CACHE_THRESHOLD) plus word coverage
+      (FAQ_CACHE_MIN_COVERAGE), so a keyword inside a longer message is a miss
+    - Problem reports and negations always miss
+    - Per-tier answer templates with personalization slots
+    - A template whose slots cannot be filled is a miss, never a broken answer
+    """
+
+    def __init__(
+        self,
+        threshold: float = FAQ_CACHE_THRESHOLD,
+        vectorizer: Optional[HashingVectorizer] = None,
+        min_coverage: float = FAQ_CACHE_MIN_COVERAGE
+    ):
+        self.threshold = threshold
+        self.min_coverage = min_coverage
+        self.vectorizer = vectorizer or HashingVectorizer()
+        self._entries: Dict[str, FaqEntry] = {}
+        self._row_entry: List[str] = []
+        self._row_question: List[str] = []
+        self._matrix = np.zeros((0, self.vectorizer.n_features), dtype=np.float32)
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "hits": 0, "slot_misses": 0, "problem_skips": 0, "coverage_misses": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, entry_id: str, questions: List[str], answers: Dict[str, str]):
+        """
+        Add or replace an FAQ entry
+
+        Args:
+            entry_id: Stable ID (re-adding replaces the entry)
+            questions: Example phrasings of the question
+            answers: Tier -> answer template ("*" for any tier)
+        """
+        if not questions or not answers:
+            raise ValueError("FAQ entry needs at least one question and one answer")
+
+        vectors = np.vstack([self.vectorizer.transform(q) for q in questions])
+
+        with self._lock:
+            if entry_id in self._entries:
+                keep = [i for i, e in enumerate(self._row_entry) if e != entry_id]
+                self._matrix = self._matrix[keep]
+                self._row_entry = [self._row_entry[i] for i in keep]
+                self._row_question = [self._row_question[i] for i in keep]
+
+            vocabulary = frozenset(w for q in questions for w in self.vectorizer.tokens(q))
+            self._entries[entry_id] = FaqEntry(entry_id, list(questions), dict(answers), vocabulary)
+            self._matrix = np.vstack([self._matrix, vectors])
+            self._row_entry += [entry_id] * len(questions)
+            self._row_question += list(questions)
+
+    def lookup(
+        self,
+        question: str,
+        tier: str = "free",
+        slots: Optional[Dict[str, Any]] = None
+    ) -> Optional[FaqMatch]:
+        """
+        Find a cached answer for a question
+
+        Args:
+            question: User's message
+            tier: User's subscription tier (selects the answer template)
+            slots: Values for personalization slots in the template
+
+        Returns:
+            FaqMatch, or None if nothing is similar enough
+        """
+        self._stats["lookups"] += 1
+        if _PROBLEM_RE.search(question.lower()):
+            self._stats["problem_skips"] += 1
+            return None
+
+        query = self.vectorizer.transform(question)
+        if not query.any():
+            return None
+        words = self.vectorizer.tokens(question)
+
+        with self._lock:
+            if not self._row_entry:
+                return None
+            scores = self._matrix @ query
+            order = np.argsort(-scores)
+            row_entry = list(self._row_entry)
+            row_question = list(self._row_question)
+
+        for row in order:
+            score = float(scores[row])
+            if score < self.threshold:
+                break
+
+            entry = self._entries.get(row_entry[row])
+            template = entry.answer_for(tier) if entry else None
+            if template is None:
+                continue
+            if self.coverage(words, entry.vocabulary) < self.min_coverage:
+                self._stats["coverage_misses"] += 1
+                continue
+
+            try:
+                answer = string.Formatter().vformat(template, (), _SlotDict(slots or {}))
+            except (KeyError, IndexError, ValueError):
+                self._stats["slot_misses"] += 1
+                return None
+
+            entry.hits += 1
+            self._stats["hits"] += 1
+            return FaqMatch(entry.entry_id, answer, round(score, 4), row_question[row])
+
+        return None
+
+    @staticmethod
+    def coverage(words: List[str], vocabulary: frozenset) -> float:
+        """Share of words found in an entry's phrasings (close spellings count)"""
+        if not words:
+            return 0.0
+        covered = sum(
+            1 for w in words
+            if w in vocabulary or difflib.get_close_matches(w, vocabulary, n=1, cutoff=0.8)
+        )
+        return covered / len(words)
+
+    def stats(self) -> Dict[str, Any]:
+        """Lookup/hit counters and per-entry hits"""
+        lookups = self._stats["lookups"]
+        return {
+            **self._stats,
+            "entries": len(self._entries),
+            "threshold": self.threshold,
+            "hit_ratio": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            "entry_hits": {e.entry_id: e.hits for e in self._entries.values()}
+        }
@@ -0,0 +1,573 @@
+"""
+Durable background job queue for PropIQ backend
+
+Moves slow side effects (Slack, SendGrid, telemetry) off the request path.
+Request handlers only enqueue; worker coroutines started with the app execute
+the jobs with retries, exponential backoff and dead-lettering.
+
+Jobs are persisted in SQLite (JOB_QUEUE_DB) so they survive a process
+restart; if the database cannot be opened the queue falls back to an
+in-memory store and keeps working (without durability).
+
+Usage:
+    from utils.job_queue import job_queue
+
+    # Register a handler once, at import time
+    @job_queue.handler("slack.notify_new_user")
+    def notify(payload: dict):
+        notify_new_user(**payload)
+
+    # In a request handler
+    job_queue.enqueue("slack.notify_new_user", {"email": email})
+
+    # App lifecycle (api.py)
+    await job_queue.start()
+    await job_queue.stop()
+
+Handlers receive the JSON payload dict. Sync handlers run in a worker thread;
+async handlers are awaited on the event loop. Raising marks the attempt as
+failed and schedules a retry until max_attempts is reached, after which the
+job is dead-lettered.
+"""
+
+import asyncio
+import heapq
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+JOB_QUEUE_DB = os.getenv("JOB_QUEUE_DB", "/tmp/propiq_jobs.sqlite3")
+JOB_QUEUE_WORKERS = int(os.getenv("JOB_QUEUE_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+ADVISOR_JOB_WORKERS = int(os.getenv("ADVISOR_JOB_WORKERS", "4"))
+
+JobHandler = Callable[[Dict[str, Any]], Union[Any, Awaitable[Any]]]
+
+# Job statuses
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+DEAD = "dead"
+
+
+@dataclass
+class Job:
+    """A unit of background work"""
+    id: str
+    queue: str
+    name: str
+    payload: Dict[str, Any]
+    attempts: int = 0
+    max_attempts: int = JOB_MAX_ATTEMPTS
+    run_at: float = field(default_factory=time.time)
+    created_at: float = field(default_factory=time.time)
+    status: str = PENDING
+    last_error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "queue": self.queue,
+            "name": self.name,
+            "payload": self.payload,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "status": self.status,
+            "last_error": self.last_error,
+            "created_at": self.created_at
+        }
+
+
+# ============================================================================
+# STORAGE BACKENDS
+# ============================================================================
+
+class MemoryJobStore:
+    """In-process job store (local fallback, not durable)"""
+
+    durable = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+        self._heap: List[tuple] = []  # (run_at, seq, job_id)
+        self._seq = 0
+
+    def add(self, job: Job):
+        with self._lock:
+            self._jobs[job.id] = job
+            self._push(job)
+
+    def _push(self, job: Job):
+        self._seq += 1
+        heapq.heappush(self._heap, (job.run_at, self._seq, job.id))
+
+    def claim(self, queue: str, now: float) -> Optional[Job]:
+        with self._lock:
+            deferred = []
+            claimed = None
+            while self._heap and self._heap[0][0] <= now:
+                entry = heapq.heappop(self._heap)
+                job = self._jobs.get(entry[2])
+                if job is None or job.status != PENDING or job.run_at != entry[0]:
+                    continue
+                if job.queue != queue:
+                    deferred.append(entry)
+                    continue
+                job.status = RUNNING
+                job.attempts += 1
+                claimed = job
+                break
+            for entry in deferred:
+                heapq.heappush(self._heap, entry)
+            return claimed
+
+    def complete(self, job: Job):
+        with self._lock:
+            self._jobs.pop(job.id, None)
+
+    def retry(self, job: Job, run_at: float, error: str):
+        with self._lock:
+            job.status = PENDING
+            job.run_at = run_at
+            job.last_error = error
+            self._push(job)
+
+    def dead_letter(self, job: Job, error: str):
+        with self._lock:
+            job.status = DEAD
+            job.last_error = error
+
+    def recover(self, queue: str) -> int:
+        return 0  # Nothing survives a restart in memory
+
+    def dead_letters(self, queue: str, limit: int) -> List[Job]:
+        with self._lock:
+            dead = [j for j in self._jobs.values() if j.queue == queue and j.status == DEAD]
+            return dead[:limit]
+
+    def requeue(self, job_id: str) -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job.status != DEAD:
+                return False
+            job.status = PENDING
+            job.attempts = 0
+            job.run_at = time.time()
+            self._push(job)
+            return True
+
+    def counts(self, queue: str) -> Dict[str, int]:
+        with self._lock:
+            counts = {PENDING: 0, RUNNING: 0, DEAD: 0}
+            for job in self._jobs.values():
+                if job.queue == queue and job.status in counts:
+                    counts[job.status] += 1
+            return counts
+
+
+class SQLiteJobStore:
+    """SQLite-backed durable job store"""
+
+    durable = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                queue TEXT NOT NULL,
+                name TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                run_at REAL NOT NULL,
+                created_at REAL NOT NULL,
+                last_error TEXT
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (queue, status, run_at)"
+        )
+
+    @staticmethod
+    def _row_to_job(row) -> Job:
+        return Job(
+            id=row[0],
+            queue=row[1],
+            name=row[2],
+            payload=json.loads(row[3]),
+            status=row[4],
+            attempts=row[5],
+            max_attempts=row[6],
+            run_at=row[7],
+            created_at=row[8],
+            last_error=row[9]
+        )
+
+    def add(self, job: Job):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, queue, name, payload, status, attempts, max_attempts, "
+                "run_at, created_at, last_error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.queue, job.name, json.dumps(job.payload, default=str),
+                 job.status, job.attempts, job.max_attempts, job.run_at,
+                 job.created_at, job.last_error)
+            )
+
+    def claim(self, queue: str, now: float) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, queue, name, payload, status, attempts, max_attempts, run_at, "
+                "created_at, last_error FROM jobs "
+                "WHERE queue = ? AND status = ? AND run_at <= ? ORDER BY run_at LIMIT 1",
+                (queue, PENDING, now)
+            ).fetchone()
+            if row is None:
+                return None
+
+            job = self._row_to_job(row)
+            job.status = RUNNING
+            job.attempts += 1
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = ? WHERE id = ?",
+                (RUNNING, job.attempts, job.id)
+            )
+            return job
+
+    def complete(self, job: Job):
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job.id,))
+
+    def retry(self, job: Job, run_at: float, error: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, run_at = ?, last_error = ? WHERE id = ?",
+                (PENDING, run_at, error, job.id)
+            )
+
+    def dead_letter(self, job: Job, error: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, last_error = ? WHERE id = ?",
+                (DEAD, error, job.id)
+            )
+
+    def recover(self, queue: str) -> int:
+        """Return jobs left RUNNING by a crashed process to the queue"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ? WHERE queue = ? AND status = ?",
+                (PENDING, queue, RUNNING)
+            )
+            return cursor.rowcount
+
+    def dead_letters(self, queue: str, limit: int) -> List[Job]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, queue, name, payload, status, attempts, max_attempts, run_at, "
+                "created_at, last_error FROM jobs WHERE queue = ? AND status = ? "
+                "ORDER BY created_at DESC LIMIT ?",
+                (queue, DEAD, limit)
+            ).fetchall()
+            return [self._row_to_job(row) for row in rows]
+
+    def requeue(self, job_id: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = 0, run_at = ? WHERE id = ? AND status = ?",
+                (PENDING, time.time(), job_id, DEAD)
+            )
+            return cursor.rowcount > 0
+
+    def counts(self, queue: str) -> Dict[str, int]:
+        with self._lock:
+            counts = {PENDING: 0, RUNNING: 0, DEAD: 0}
+            for status, count in self._conn.execute(
+                "SELECT status, COUNT(*) FROM jobs WHERE queue = ? GROUP BY status", (queue,)
+            ):
+                counts[status] = count
+            return counts
+
+
+def create_job_store(path: Optional[str] = JOB_QUEUE_DB):
+    """Open the SQLite store, falling back to memory if it is unavailable"""
+    if path:
+        try:
+            return SQLiteJobStore(path)
+        except Exception as e:
+            logger.warning(f"Job queue database unavailable ({e}), using in-memory queue")
+    return MemoryJobStore()
+
+
+# ============================================================================
+# QUEUE & WORKERS
+# ============================================================================
+
+class JobQueue:
+    """
+    Named job queue with worker coroutines
+
+    Features:
+    - Durable storage (SQLite) with in-memory fallback
+    - Bounded concurrency (one coroutine per worker)
+    - Retries with exponential backoff, then dead-lettering
+    - Per-job-name latency and failure metrics
+    """
+
+    def __init__(
+        self,
+        name: str = "default",
+        store=None,
+        workers: int = JOB_QUEUE_WORKERS,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        retry_backoff: float = 2.0,
+        poll_interval: float = 1.0
+    ):
+        self.name = name
+        self.store = store if store is not None else create_job_store()
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.poll_interval = poll_interval
+
+        self._handlers: Dict[str, JobHandler] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._running = False
+        self._metrics: Dict[str, Dict[str, float]] = {}
+
+    # ------------------------------------------------------------------
+    # Registration & enqueue
+    # ------------------------------------------------------------------
+
+    def register(self, job_name: str, handler: JobHandler):
+        """Register the handler for a job name"""
+        self._handlers[job_name] = handler
+
+    def handler(self, job_name: str) -> Callable[[JobHandler], JobHandler]:
+        """Decorator form of register()"""
+        def decorator(func: JobHandler) -> JobHandler:
+            self.register(job_name, func)
+            return func
+        return decorator
+
+    def enqueue(
+        self,
+        job_name: str,
+        payload: Optional[Dict[str, Any]] = None,
+        delay_seconds: float = 0,
+        max_attempts: Optional[int] = None
+    ) -> str:
+        """
+        Persist a job for background execution
+
+        Args:
+            job_name: Registered handler name
+            payload: JSON-serializable arguments for the handler
+            delay_seconds: Earliest start, relative to now
+            max_attempts: Override the queue's retry limit
+
+        Returns:
+            Job ID
+        """
+        now = time.time()
+        job = Job(
+            id=uuid.uuid4().hex,
+            queue=self.name,
+            name=job_name,
+            payload=payload or {},
+            max_attempts=max_attempts or self.max_attempts,
+            run_at=now + delay_seconds,
+            created_at=now
+        )
+        self.store.add(job)
+        self._wake()
+        return job.id
+
+    def _wake(self):
+        """Nudge idle workers (safe from any thread)"""
+        if self._loop is not None and self._wakeup is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def start(self):
+        """Start worker coroutines on the running event loop"""
+        if self._running:
+            return
+
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._running = True
+
+        recovered = self.store.recover(self.name)
+        if recovered:
+            logger.info(f"Job queue '{self.name}': recovered {recovered} interrupted job(s)")
+
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"jobs-{self.name}-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(
+            f"Job queue '{self.name}' started "
+            f"({self.workers} workers, {'sqlite' if self.store.durable else 'memory'})"
+        )
+
+    async def stop(self, timeout: float = 10.0):
+        """Stop workers, letting in-flight jobs finish within timeout"""
+        if not self._running:
+            return
+
+        self._running = False
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+        done, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        self._tasks = []
+        logger.info(f"Job queue '{self.name}' stopped")
+
+    async def _worker(self, worker_id: int):
+        while self._running:
+            job = self.store.claim(self.name, time.time())
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._execute(job)
+
+    async def _execute(self, job: Job):
+        handler = self._handlers.get(job.name)
+        started_at = time.time()
+        wait_ms = max(0.0, (started_at - job.run_at) * 1000)
+
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for job '{job.name}'")
+
+            if asyncio.iscoroutinefunction(handler):
+                await handler(job.payload)
+            else:
+                await asyncio.to_thread(handler, job.payload)
+
+        except Exception as e:
+            run_ms = (time.time() - started_at) * 1000
+            error = f"{type(e).__name__}: {e}"
+            self._record(job.name, wait_ms, run_ms, failed=True)
+
+            if job.attempts >= job.max_attempts or handler is None:
+                self.store.dead_letter(job, error)
+                self._record_dead(job.name)
+                logger.error(
+                    f"Job {job.name} ({job.id}) dead-lettered after {job.attempts} attempt(s): {error}"
+                )
+            else:
+                delay = self.retry_backoff ** job.attempts
+                self.store.retry(job, time.time() + delay, error)
+                logger.warning(
+                    f"Job {job.name} ({job.id}) failed (attempt {job.attempts}/{job.max_attempts}), "
+                    f"retrying in {delay:.0f}s: {error}"
+                )
+            return
+
+        run_ms = (time.time() - started_at) * 1000
+        self.store.complete(job)
+        self._record(job.name, wait_ms, run_ms, failed=False)
+
+    # ------------------------------------------------------------------
+    # Metrics & dead letters
+    # ------------------------------------------------------------------
+
+    def _metric(self, job_name: str) -> Dict[str, float]:
+        return self._metrics.setdefault(job_name, {
+            "runs": 0, "failures": 0, "dead_lettered": 0,
+            "total_wait_ms": 0.0, "total_run_ms": 0.0, "max_run_ms": 0.0
+        })
+
+    def _record(self, job_name: str, wait_ms: float, run_ms: float, failed: bool):
+        m = self._metric(job_name)
+        m["runs"] += 1
+        m["failures"] += 1 if failed else 0
+        m["total_wait_ms"] += wait_ms
+        m["total_run_ms"] += run_ms
+        m["max_run_ms"] = max(m["max_run_ms"], run_ms)
+
+    def _record_dead(self, job_name: str):
+        self._metric(job_name)["dead_lettered"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Queue depth and per-job latency metrics
+
+        Returns:
+            {
+                "queue": str,
+                "durable": bool,
+                "workers": int,
+                "counts": {"pending": int, "running": int, "dead": int},
+                "jobs": {job_name: {"runs", "failures", "dead_lettered",
+                                    "avg_wait_ms", "avg_run_ms", "max_run_ms"}}
+            }
+        """
+        jobs = {}
+        for job_name, m in self._metrics.items():
+            runs = m["runs"] or 1
+            jobs[job_name] = {
+                "runs": int(m["runs"]),
+                "failures": int(m["failures"]),
+                "dead_lettered": int(m["dead_lettered"]),
+                "avg_wait_ms": round(m["total_wait_ms"] / runs, 2),
+                "avg_run_ms": round(m["total_run_ms"] / runs, 2),
+                "max_run_ms": round(m["max_run_ms"], 2)
+            }
+
+        return {
+            "queue": self.name,
+            "durable": self.store.durable,
+            "workers": self.workers,
+            "counts": self.store.counts(self.name),
+            "jobs": jobs
+        }
+
+    def dead_letters(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """List dead-lettered jobs (most recent first)"""
+        return [job.to_dict() for job in self.store.dead_letters(self.name, limit)]
+
+    def requeue_dead(self, job_id: str) -> bool:
+        """Move a dead-lettered job back to pending with a fresh attempt budget"""
+        requeued = self.store.requeue(job_id)
+        if requeued:
+            self._wake()
+        return requeued
+
+
+# Global queue for request side effects
+job_queue = JobQueue("default")
+
+# Multi-agent advisor runs (minutes of model calls each): own workers, so they
+# cap advisor concurrency and never delay the side effects above
+advisor_queue = JobQueue("advisor", workers=ADVISOR_JOB_WORKERS)
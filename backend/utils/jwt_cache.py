@@ -0,0 +1,178 @@
+"""
+Verified JWT cache for PropIQ backend
+
+Every authenticated request used to re-run HMAC signature verification and
+claim validation on the same bearer token. Tokens live for days, so the result
+of a successful verification is cached in a small in-process LRU keyed by a
+SHA-256 of the token, and reused until the token's `exp`.
+
+Usage:
+    from utils.jwt_cache import TokenVerifier
+
+    verifier = TokenVerifier(secret, "HS256", previous_secrets=[old_secret])
+    claims = verifier.verify(token)  # raises jwt.InvalidTokenError subclasses
+
+    # Key rotation: old tokens keep working until they expire
+    verifier.rotate(new_secret, previous_secrets=[secret])
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import jwt
+
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class VerifiedTokenCache:
+    """
+    Thread-safe LRU of verified token claims
+
+    Entries are keyed by a hash of the raw token (the token itself is never
+    stored) and expire at the token's own `exp` claim.
+    """
+
+    def __init__(self, max_size: int = 2048):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for(token: str) -> str:
+        """Cache key for a raw token"""
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """Return cached claims, or None if missing or expired"""
+        key = self.key_for(token)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            claims, expires_at = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return claims
+
+    def put(self, token: str, claims: Dict[str, Any]):
+        """Cache claims until the token's `exp` (tokens without exp are not cached)"""
+        expires_at = claims.get("exp")
+        if not isinstance(expires_at, (int, float)) or expires_at <= time.time():
+            return
+
+        key = self.key_for(token)
+        with self._lock:
+            self._entries[key] = (claims, float(expires_at))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every cached entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache size and hit ratio"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+class TokenVerifier:
+    """
+    JWT verification with caching and key rotation
+
+    The current secret signs new tokens; previous secrets are still accepted
+    for verification so users are not logged out when the secret rotates.
+    """
+
+    def __init__(
+        self,
+        secret: str,
+        algorithm: str = "HS256",
+        previous_secrets: Optional[Iterable[str]] = None,
+        cache_size: int = 2048
+    ):
+        self.algorithm = algorithm
+        self.cache = VerifiedTokenCache(max_size=cache_size)
+        self._secrets: List[str] = []
+        self._set_secrets(secret, previous_secrets)
+
+    def _set_secrets(self, secret: str, previous_secrets: Optional[Iterable[str]]):
+        previous = [s for s in (previous_secrets or []) if s and s != secret]
+        self._secrets = [secret] + previous
+
+    @property
+    def signing_secret(self) -> str:
+        """Secret used to sign new tokens"""
+        return self._secrets[0]
+
+    def rotate(self, new_secret: str, previous_secrets: Optional[Iterable[str]] = None):
+        """
+        Switch to a new signing secret
+
+        Args:
+            new_secret: Secret for signing new tokens
+            previous_secrets: Secrets still accepted for verification
+                (defaults to the secrets accepted before this call)
+        """
+        if previous_secrets is None:
+            previous_secrets = self._secrets
+
+        self._set_secrets(new_secret, previous_secrets)
+
+        # Claims verified under a secret that may now be retired must be re-checked
+        self.cache.clear()
+        logger.info(f"JWT secret rotated ({len(self._secrets) - 1} previous secret(s) accepted)")
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """
+        Verify a token, using the cache when possible
+
+        Returns:
+            Decoded claims
+
+        Raises:
+            jwt.ExpiredSignatureError: Token expired
+            jwt.InvalidTokenError: Signature or claims invalid under every accepted secret
+        """
+        claims = self.cache.get(token)
+        if claims is not None:
+            return claims
+
+        last_error: Optional[Exception] = None
+        for secret in self._secrets:
+            try:
+                claims = jwt.decode(token, secret, algorithms=[self.algorithm])
+                break
+            except jwt.InvalidSignatureError as e:
+                # Try the next (older) secret
+                last_error = e
+        else:
+            raise last_error or jwt.InvalidTokenError("No signing secret configured")
+
+        self.cache.put(token, claims)
+        return claims
@@ -0,0 +1,260 @@
+"""
+Shared Azure OpenAI clients for PropIQ
+
+Every router used to construct its own AzureOpenAI client at import time, so
+each one had its own HTTP connection pool, paid its own TLS warm-up, and
+called the blocking client from async endpoints. LLMGateway builds one sync
+and one async client per process (sharing a connection pool each) and keeps
+call metrics in one place.
+
+Usage:
+    from utils.llm_gateway import llm_gateway
+
+    if llm_gateway.available:
+        response = await llm_gateway.complete(model="gpt-4o-mini", messages=messages)
+
+        async for chunk in llm_gateway.stream(model="gpt-4o-mini", messages=messages):
+            ...
+
+    # Sync code (background jobs, summarizers)
+    client = llm_gateway.client
+
+Calls made inside a request deadline (utils.deadline) are bounded by the time
+left and raise DeadlineExceeded instead of running past it.
+
+Every call's token usage and cost is accounted (utils.usage_accounting) under
+the tags of the enclosing usage_scope() plus the call's own usage_tags, and
+checked against the user's daily budget first (BudgetExceeded when spent):
+
+    response = await llm_gateway.complete(..., usage_tags={"route": "analyses.batch"})
+"""
+
+import os
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from config.logging_config import get_logger
+from utils.deadline import DeadlineExceeded, current_deadline, within_deadline
+from utils.tokens import DEFAULT_MODEL, count_message_tokens, count_tokens
+from utils.usage_accounting import usage_accountant, usage_counts, usage_tags
+
+logger = get_logger(__name__)
+
+AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
+
+# Connection pool size shared by every chat/advisor request in the process
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+
+
+class LLMGateway:
+    """
+    Process-wide Azure OpenAI clients
+
+    Features:
+    - One sync and one async client (lazy, thread-safe)
+    - Bounded, shared HTTP connection pools
+    - Request, error, latency and token counters
+    - Per-call timeouts capped by the request deadline
+    - Per-route/stage/user/tier cost accounting and budget checks
+    """
+
+    def __init__(
+        self,
+        endpoint: Optional[str] = None,
+        api_key: Optional[str] = None,
+        api_version: str = AZURE_OPENAI_API_VERSION,
+        max_connections: int = LLM_MAX_CONNECTIONS,
+        timeout: float = LLM_TIMEOUT_SECONDS
+    ):
+        self.endpoint = endpoint if endpoint is not None else os.getenv("AZURE_OPENAI_ENDPOINT")
+        self.api_key = api_key if api_key is not None else os.getenv("AZURE_OPENAI_KEY")
+        self.api_version = api_version
+        self.max_connections = max_connections
+        self.timeout = timeout
+
+        self._client = None
+        self._async_client = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "streams": 0,
+            "errors": 0,
+            "deadline_exceeded": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_latency_ms": 0.0
+        }
+
+    @property
+    def available(self) -> bool:
+        return bool(self.endpoint and self.api_key)
+
+    @property
+    def client(self):
+        """Shared sync AzureOpenAI client (None if not configured)"""
+        if self._client is None and self.available:
+            with self._lock:
+                if self._client is None:
+                    import httpx
+                    from openai import AzureOpenAI
+
+                    self._client = AzureOpenAI(
+                        azure_endpoint=self.endpoint,
+                        api_key=self.api_key,
+                        api_version=self.api_version,
+                        timeout=self.timeout,
+                        http_client=httpx.Client(limits=self._limits(httpx))
+                    )
+        return self._client
+
+    @property
+    def async_client(self):
+        """Shared AsyncAzureOpenAI client (None if not configured)"""
+        if self._async_client is None and self.available:
+            with self._lock:
+                if self._async_client is None:
+                    import httpx
+                    from openai import AsyncAzureOpenAI
+
+                    self._async_client = AsyncAzureOpenAI(
+                        azure_endpoint=self.endpoint,
+                        api_key=self.api_key,
+                        api_version=self.api_version,
+                        timeout=self.timeout,
+                        http_client=httpx.AsyncClient(limits=self._limits(httpx))
+                    )
+        return self._async_client
+
+    def _bounded(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Cap the HTTP timeout at the time left on the request deadline"""
+        deadline = current_deadline()
+        if deadline is not None and "timeout" not in kwargs:
+            deadline.check("LLM call")
+            kwargs = {**kwargs, "timeout": deadline.cap(self.timeout)}
+        return kwargs
+
+    def _admit(self, kwargs: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Split off the call's usage tags and apply the budget (may downgrade the model)"""
+        kwargs = dict(kwargs)
+        tags = usage_tags(kwargs.pop("usage_tags", None))
+        if kwargs.get("model"):
+            kwargs["model"] = usage_accountant.admit(kwargs["model"], tags)
+        return kwargs, tags
+
+    def _limits(self, httpx):
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_connections
+        )
+
+    async def complete(self, **kwargs) -> Any:
+        """
+        Non-streaming chat completion on the shared async client
+
+        Args:
+            **kwargs: Passed to chat.completions.create (model, messages, tools...)
+
+        Returns:
+            ChatCompletion
+
+        Raises:
+            DeadlineExceeded: The request deadline passed before a response
+            BudgetExceeded: The user's daily budget is spent (no call made)
+        """
+        kwargs, tags = self._admit(kwargs)
+        started = time.perf_counter()
+        try:
+            kwargs = self._bounded(kwargs)
+            response = await within_deadline(self.async_client.chat.completions.create(**kwargs), "LLM call")
+        except DeadlineExceeded:
+            self._stats["deadline_exceeded"] += 1
+            raise
+        except Exception:
+            self._stats["errors"] += 1
+            raise
+        finally:
+            self._stats["requests"] += 1
+            self._stats["total_latency_ms"] += (time.perf_counter() - started) * 1000
+
+        self.record_usage(getattr(response, "usage", None), kwargs.get("model"), tags)
+        return response
+
+    async def stream(self, **kwargs) -> AsyncIterator[Any]:
+        """
+        Streaming chat completion; yields ChatCompletionChunk objects
+
+        Args:
+            **kwargs: Passed to chat.completions.create (stream=True is implied)
+
+        Raises:
+            DeadlineExceeded: The request deadline passed mid-stream (chunks
+                already yielded stay valid)
+            BudgetExceeded: The user's daily budget is spent (no call made)
+        """
+        kwargs, tags = self._admit(kwargs)
+        started = time.perf_counter()
+        self._stats["requests"] += 1
+        self._stats["streams"] += 1
+        stream = None
+        usage = None
+        content: List[str] = []
+        try:
+            kwargs = self._bounded(kwargs)
+            stream = await within_deadline(
+                self.async_client.chat.completions.create(stream=True, **kwargs), "LLM stream"
+            )
+            iterator = stream.__aiter__()
+            while True:
+                try:
+                    chunk = await within_deadline(iterator.__anext__(), "LLM stream")
+                except StopAsyncIteration:
+                    break
+                usage = getattr(chunk, "usage", None) or usage
+                if chunk.choices and getattr(chunk.choices[0].delta, "content", None):
+                    content.append(chunk.choices[0].delta.content)
+                yield chunk
+        except DeadlineExceeded:
+            self._stats["deadline_exceeded"] += 1
+            if stream is not None:
+                await stream.close()
+            raise
+        except Exception:
+            self._stats["errors"] += 1
+            raise
+        finally:
+            self._stats["total_latency_ms"] += (time.perf_counter() - started) * 1000
+            if stream is not None:
+                # Streams rarely report usage; estimate it from what was sent and received
+                model = kwargs.get("model") or DEFAULT_MODEL
+                usage = usage or SimpleNamespace(
+                    prompt_tokens=count_message_tokens(kwargs.get("messages", []), model),
+                    completion_tokens=count_tokens("".join(content), model)
+                )
+                self.record_usage(usage, kwargs.get("model"), tags)
+
+    def record_usage(self, usage: Any, model: Optional[str] = None, tags: Optional[Dict[str, Any]] = None):
+        """Add a response's token usage to the counters and the usage accounting"""
+        if usage is None:
+            return
+        prompt_tokens, cached_tokens, completion_tokens = usage_counts(usage)
+        self._stats["prompt_tokens"] += prompt_tokens
+        self._stats["completion_tokens"] += completion_tokens
+        usage_accountant.record(model, prompt_tokens, completion_tokens, cached_tokens, tags)
+
+    def stats(self) -> Dict[str, Any]:
+        """Call counters"""
+        requests = self._stats["requests"]
+        return {
+            **self._stats,
+            "total_latency_ms": round(self._stats["total_latency_ms"], 2),
+            "avg_latency_ms": round(self._stats["total_latency_ms"] / requests, 2) if requests else 0.0,
+            "configured": self.available,
+            "max_connections": self.max_connections
+        }
+
+
+# Global gateway shared by all routers
+llm_gateway = LLMGateway()
@@ -0,0 +1,221 @@
+"""
+Password hashing worker pool for PropIQ backend
+
+bcrypt at cost 12 burns roughly 200ms of CPU per call. Running it inline in an
+async handler blocks the event loop, so a burst of logins stalls every other
+request on the worker. This module runs all hashing and verification on a
+dedicated, bounded thread pool (bcrypt releases the GIL while it works).
+
+Usage:
+    from utils.password_hashing import password_hasher
+
+    password_hash = await password_hasher.hash(password)
+
+    if await password_hasher.verify(password, user["password_hash"]):
+        if password_hasher.needs_rehash(user["password_hash"]):
+            new_hash = await password_hasher.hash(password)
+"""
+
+import asyncio
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+import bcrypt
+
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Cost factor for new hashes. Existing hashes with a different cost are
+# upgraded transparently on the next successful login (see needs_rehash).
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# Pool sizing: bcrypt is CPU-bound, so more threads than cores only adds
+# queueing inside the OS scheduler instead of inside our own queue.
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Maximum jobs queued or running before new work is rejected.
+BCRYPT_MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING", "64"))
+
+_BCRYPT_COST_RE = re.compile(r"^\$2[abxy]?\$(\d{2})\$")
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue is full and the job was not accepted"""
+
+
+class PasswordHasher:
+    """
+    Bounded thread pool for bcrypt hashing and verification
+
+    Features:
+    - Keeps bcrypt off the event loop
+    - Bounded queue depth (rejects instead of growing without limit)
+    - Queue-wait and run-time metrics
+    - Cost-factor upgrade detection for rehash-on-login
+    """
+
+    def __init__(
+        self,
+        rounds: int = BCRYPT_ROUNDS,
+        max_workers: int = BCRYPT_WORKERS,
+        max_pending: int = BCRYPT_MAX_PENDING
+    ):
+        self.rounds = rounds
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._pending = 0
+        self._peak_pending = 0
+        self._submitted = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_wait_ms = 0.0
+        self._total_run_ms = 0.0
+
+    # ------------------------------------------------------------------
+    # Synchronous primitives (run inside the pool, or in scripts)
+    # ------------------------------------------------------------------
+
+    def hash_sync(self, password: str) -> str:
+        """Hash password with bcrypt at the configured cost"""
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+
+    def verify_sync(self, password: str, hashed_password: str) -> bool:
+        """Verify password against bcrypt hash"""
+        try:
+            return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+        except Exception:
+            return False
+
+    def needs_rehash(self, hashed_password: Optional[str]) -> bool:
+        """
+        Check whether a stored hash was created with a different cost factor
+
+        Args:
+            hashed_password: bcrypt hash from the database
+
+        Returns:
+            True if the hash should be replaced with one at the current cost
+        """
+        if not hashed_password:
+            return False
+
+        match = _BCRYPT_COST_RE.match(hashed_password)
+        if not match:
+            return False
+
+        return int(match.group(1)) != self.rounds
+
+    # ------------------------------------------------------------------
+    # Async API
+    # ------------------------------------------------------------------
+
+    async def hash(self, password: str) -> str:
+        """Hash password on the worker pool"""
+        return await self._submit(self.hash_sync, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """Verify password on the worker pool"""
+        return await self._submit(self.verify_sync, password, hashed_password)
+
+    async def _submit(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run func on the pool, enforcing the queue-depth limit"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise PasswordHasherBusy(
+                    f"Password hashing queue full ({self._pending}/{self.max_pending})"
+                )
+            self._pending += 1
+            self._submitted += 1
+            self._peak_pending = max(self._peak_pending, self._pending)
+
+        queued_at = time.perf_counter()
+        loop = asyncio.get_running_loop()
+
+        try:
+            return await loop.run_in_executor(
+                self._get_executor(), self._timed, func, args, queued_at
+            )
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _timed(self, func: Callable[..., Any], args: tuple, queued_at: float) -> Any:
+        """Execute func inside a pool thread and record timings"""
+        started_at = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            finished_at = time.perf_counter()
+            with self._lock:
+                self._completed += 1
+                self._total_wait_ms += (started_at - queued_at) * 1000
+                self._total_run_ms += (finished_at - started_at) * 1000
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Create the pool lazily so importing this module starts no threads"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="bcrypt"
+                    )
+        return self._executor
+
+    # ------------------------------------------------------------------
+    # Metrics & lifecycle
+    # ------------------------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get pool metrics
+
+        Returns:
+            {
+                "rounds": int,
+                "workers": int,
+                "queue_depth": int,       # jobs queued or running now
+                "peak_queue_depth": int,
+                "max_pending": int,
+                "submitted": int,
+                "completed": int,
+                "rejected": int,
+                "avg_wait_ms": float,     # time spent waiting for a thread
+                "avg_run_ms": float       # time spent inside bcrypt
+            }
+        """
+        with self._lock:
+            completed = self._completed or 1
+            return {
+                "rounds": self.rounds,
+                "workers": self.max_workers,
+                "queue_depth": self._pending,
+                "peak_queue_depth": self._peak_pending,
+                "max_pending": self.max_pending,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "avg_wait_ms": round(self._total_wait_ms / completed, 2),
+                "avg_run_ms": round(self._total_run_ms / completed, 2)
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Stop the worker threads"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+# Global hasher instance
+password_hasher = PasswordHasher()
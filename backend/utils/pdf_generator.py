@@ -27,6 +27,7 @@ except ImportError:
     print("   Install with: pip install weasyprint")
 
 from config.logging_config import get_logger
+from underwriting.projections import highlight_rows
 
 logger = get_logger(__name__)
 
@@ -338,12 +339,78 @@ class PDFGenerator:
                     <div class="page-number">Page 3</div>
                 </div>
             </div>
+            {self._generate_projection_page(data.get('projections'), timestamp)}
         </body>
         </html>
         """
 
         return html
 
+    def _generate_projection_page(self, projections: Optional[Dict[str, Any]], timestamp: str) -> str:
+        """Page 4: long-term projections (underwriting.projections report), if provided"""
+        if not projections or not projections.get('yearly'):
+            return ''
+
+        summary = projections.get('summary', {})
+        irr = summary.get('irr')
+        rows = ''.join(
+            f"""
+                    <tr>
+                        <td>{row['year']}</td>
+                        <td class="value">${row['monthly_cash_flow']:,.0f}</td>
+                        <td class="value">${row['loan_balance']:,.0f}</td>
+                        <td class="value">${row['property_value']:,.0f}</td>
+                        <td class="value">${row['equity']:,.0f}</td>
+                        <td class="value">${row['total_return']:,.0f}</td>
+                    </tr>"""
+            for row in highlight_rows(projections['yearly'])
+        )
+
+        return f"""
+            <!-- Page 4: Long-Term Projections -->
+            <div class="page">
+                <div class="header">
+                    <div class="brand">{self.brand_name}</div>
+                    <div class="header-text">Long-Term Projections</div>
+                </div>
+
+                <div class="watermark">{self.brand_name}</div>
+
+                <h2>Returns ({summary.get('exit_year', len(projections['yearly']))}-Year Hold)</h2>
+                <table class="data-table">
+                    <tr>
+                        <td class="label">IRR</td>
+                        <td class="value">{'N/A' if irr is None else f'{irr:.2f}%'}</td>
+                    </tr>
+                    <tr>
+                        <td class="label">NPV @ {summary.get('discount_rate', 0):g}%</td>
+                        <td class="value">${summary.get('npv', 0):,.0f}</td>
+                    </tr>
+                    <tr>
+                        <td class="label">Equity Multiple</td>
+                        <td class="value">{summary.get('equity_multiple', 0):.2f}x</td>
+                    </tr>
+                </table>
+
+                <h2>Cash Flow & Equity</h2>
+                <table class="data-table projection-table">
+                    <tr>
+                        <th>Year</th>
+                        <th>Monthly Cash Flow</th>
+                        <th>Loan Balance</th>
+                        <th>Property Value</th>
+                        <th>Equity</th>
+                        <th>Total Return</th>
+                    </tr>{rows}
+                </table>
+
+                <div class="footer">
+                    <div>Generated by {self.brand_name} | {timestamp}</div>
+                    <div class="page-number">Page 4</div>
+                </div>
+            </div>
+        """
+
     def _generate_css(self) -> str:
         """Generate CSS for PDF styling"""
 
@@ -586,6 +653,17 @@ class PDFGenerator:
             width: 40%;
         }}
 
+        .projection-table th {{
+            padding: 8px;
+            text-align: right;
+            font-size: 11px;
+            color: #6b7280;
+        }}
+
+        .projection-table .value {{
+            width: auto;
+        }}
+
         .data-table .total-row {{
             background: #f9fafb;
             border-top: 2px solid #d1d5db;
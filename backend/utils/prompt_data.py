@@ -0,0 +1,90 @@
+"""
+Compact, canonical rendering of structured data for prompts
+
+Agent prompts used to embed upstream results with json.dumps(..., indent=2),
+which spends tokens on whitespace, nulls and float noise. canonical_json()
+renders the same data deterministically (sorted keys, no whitespace, empty
+values dropped, floats rounded), so equal data always yields identical text.
+
+Usage:
+    from utils.prompt_data import canonical_json, pick, compare_tokens
+
+    text = canonical_json({"cap_rate": 7.2999999, "notes": None})  # {"cap_rate":7.3}
+    digest = pick(market_analysis, ("neighborhood_score", "market_momentum"))
+    report = compare_tokens(verbose_text, text)
+"""
+
+from typing import Any, Dict, Iterable, Mapping
+import json
+import math
+
+from utils.tokens import count_tokens, DEFAULT_MODEL
+
+
+def canonicalize(value: Any, decimals: int = 2) -> Any:
+    """
+    Normalize data for canonical rendering
+
+    - floats rounded to decimals; integral floats become ints (300000.0 -> 300000)
+    - None, empty strings/lists/dicts dropped from dicts and lists
+    - non-finite floats become None (and are then dropped)
+    - other non-JSON values (datetimes, ObjectIds) become strings
+    """
+    if isinstance(value, bool) or value is None or isinstance(value, (int, str)):
+        return value
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            return None
+        rounded = round(value, decimals)
+        return int(rounded) if rounded.is_integer() else rounded
+    if isinstance(value, Mapping):
+        result = {}
+        for key, item in value.items():
+            item = canonicalize(item, decimals)
+            if not _is_empty(item):
+                result[str(key)] = item
+        return result
+    if isinstance(value, (list, tuple)):
+        return [item for item in (canonicalize(v, decimals) for v in value) if not _is_empty(item)]
+    # numpy scalars expose item()
+    if hasattr(value, "item"):
+        return canonicalize(value.item(), decimals)
+    return str(value)
+
+
+def _is_empty(value: Any) -> bool:
+    """None or an empty string/list/dict (0 and False are kept)"""
+    return value is None or (isinstance(value, (str, list, dict)) and not value)
+
+
+def canonical_json(value: Any, decimals: int = 2) -> str:
+    """Deterministic compact JSON (sorted keys, no whitespace, empties dropped)"""
+    return json.dumps(
+        canonicalize(value, decimals),
+        separators=(",", ":"),
+        sort_keys=True,
+        ensure_ascii=False
+    )
+
+
+def pick(data: Mapping[str, Any], fields: Iterable[str]) -> Dict[str, Any]:
+    """The given fields of a dict, skipping missing ones"""
+    return {field: data[field] for field in fields if field in data}
+
+
+def compare_tokens(before: str, after: str, model: str = DEFAULT_MODEL) -> Dict[str, Any]:
+    """
+    Token counts for two renderings of the same data
+
+    Returns:
+        {"before", "after", "saved", "saved_percent"}
+    """
+    before_tokens = count_tokens(before, model)
+    after_tokens = count_tokens(after, model)
+    saved = before_tokens - after_tokens
+    return {
+        "before": before_tokens,
+        "after": after_tokens,
+        "saved": saved,
+        "saved_percent": round(saved / before_tokens * 100, 1) if before_tokens else 0.0
+    }
@@ -0,0 +1,172 @@
+"""
+Prompt registry for PropIQ LLM calls
+
+Providers cache the longest previously-seen prompt prefix (Azure OpenAI /
+OpenAI: prompts of 1024+ tokens, in 128-token steps) and bill and serve the
+cached part faster. That only works when the start of the prompt is
+byte-identical across calls. The chat routers used to put per-user context
+ahead of the static instructions, and the advisor agents mixed fixed task text
+into per-request messages, so no two prompts shared a prefix.
+
+The registry compiles each static prompt once (normalized text + token
+count), and builds messages as static prefix first, per-request data last.
+It also tracks how much of each prompt is cache-eligible and, when the
+provider reports it, how much was actually served from cache.
+
+Usage:
+    from utils.prompt_registry import prompt_registry
+
+    MARKET = prompt_registry.register("advisor.market", MARKET_ANALYST_PROMPT)
+
+    messages = MARKET.messages(f"Address: {address}")   # [system static, user dynamic]
+    response = await llm_gateway.complete(model=..., messages=messages)
+    prompt_registry.record(MARKET.name, response.usage)
+
+    prompt_registry.stats()   # per-prompt token counts and cache ratios
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from config.logging_config import get_logger
+from utils.tokens import DEFAULT_MODEL, count_message_tokens
+
+logger = get_logger(__name__)
+
+# Provider prompt caching: minimum cacheable prompt, and cache granularity
+PROMPT_CACHE_MIN_TOKENS = 1024
+PROMPT_CACHE_INCREMENT = 128
+
+
+def cacheable_prefix_tokens(prefix_tokens: int) -> int:
+    """Tokens of a static prefix the provider can serve from its prompt cache"""
+    if prefix_tokens < PROMPT_CACHE_MIN_TOKENS:
+        return 0
+    return prefix_tokens - prefix_tokens % PROMPT_CACHE_INCREMENT
+
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    """A static prompt, normalized once, with its precomputed token count"""
+    name: str
+    text: str
+    tokens: int
+    model: str = DEFAULT_MODEL
+
+    @property
+    def cacheable_tokens(self) -> int:
+        return cacheable_prefix_tokens(self.tokens)
+
+    def system_message(self) -> Dict[str, str]:
+        return {"role": "system", "content": self.text}
+
+    def messages(self, dynamic: Optional[str] = None, role: str = "user") -> List[Dict[str, str]]:
+        """
+        Messages for one call: static system prompt first, request data last
+
+        Args:
+            dynamic: Per-request content (omitted if None)
+            role: Role of the dynamic message
+        """
+        messages = [self.system_message()]
+        if dynamic is not None:
+            messages.append({"role": role, "content": dynamic})
+        return messages
+
+
+class PromptRegistry:
+    """
+    Named static prompts plus prefix-cache accounting
+
+    Features:
+    - Static text normalized once, so every call sends identical bytes
+    - Token counts computed at registration, not per call
+    - Per-prompt cache-eligible and observed cached token ratios
+    """
+
+    def __init__(self):
+        self._prompts: Dict[str, CompiledPrompt] = {}
+        self._usage: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, text: str, model: str = DEFAULT_MODEL) -> CompiledPrompt:
+        """
+        Compile and register a static prompt (re-registering replaces it)
+
+        Args:
+            name: Stable prompt name, e.g. "support.enhanced"
+            text: Static prompt text (must not contain per-request data)
+            model: Model used for token counting
+
+        Returns:
+            CompiledPrompt
+        """
+        text = "\n".join(line.rstrip() for line in text.strip().splitlines())
+        prompt = CompiledPrompt(name, text, count_message_tokens([{"role": "system", "content": text}], model), model)
+
+        with self._lock:
+            self._prompts[name] = prompt
+            self._usage.setdefault(name, {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "reported_cached": 0})
+        return prompt
+
+    def get(self, name: str) -> CompiledPrompt:
+        return self._prompts[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._prompts
+
+    def record(self, name: str, usage: Any = None, prompt_tokens: Optional[int] = None):
+        """
+        Record one call made with a registered prompt
+
+        Args:
+            name: Prompt name
+            usage: Response usage object (prompt_tokens, prompt_tokens_details.cached_tokens)
+            prompt_tokens: Local prompt token count when usage is not available
+        """
+        total = getattr(usage, "prompt_tokens", None) or prompt_tokens or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) if details is not None else None
+
+        with self._lock:
+            counters = self._usage.get(name)
+            if counters is None:
+                return
+            counters["calls"] += 1
+            counters["prompt_tokens"] += total
+            if cached is not None:
+                counters["cached_tokens"] += cached
+                counters["reported_cached"] += 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-prompt report
+
+        static_ratio: share of prompt tokens that are the static prefix
+        cache_eligible_ratio: share the provider could serve from cache
+        cached_ratio: share actually served from cache (when reported)
+        """
+        report = {}
+        with self._lock:
+            for name, prompt in self._prompts.items():
+                usage = self._usage[name]
+                calls = usage["calls"]
+                avg_prompt = usage["prompt_tokens"] / calls if calls else float(prompt.tokens)
+                report[name] = {
+                    "static_tokens": prompt.tokens,
+                    "cacheable_tokens": prompt.cacheable_tokens,
+                    "calls": calls,
+                    "avg_prompt_tokens": round(avg_prompt, 1),
+                    "static_ratio": round(min(1.0, prompt.tokens / avg_prompt), 4) if avg_prompt else 0.0,
+                    "cache_eligible_ratio": round(min(1.0, prompt.cacheable_tokens / avg_prompt), 4) if avg_prompt else 0.0,
+                    "cached_ratio": (
+                        round(usage["cached_tokens"] / usage["prompt_tokens"], 4)
+                        if usage["reported_cached"] and usage["prompt_tokens"] else None
+                    )
+                }
+        return report
+
+
+# Global registry shared by all routers
+prompt_registry = PromptRegistry()
@@ -0,0 +1,222 @@
+"""
+Structured (JSON) model output: parse, validate, repair
+
+Agent replies used to go straight through json.loads(), so one malformed or
+truncated reply (max_tokens hit mid-object, a code fence, trailing prose)
+failed the whole request. parse_structured() validates replies against a
+Pydantic schema in one pass (pydantic-core parses the JSON itself), and on
+invalid JSON runs repair_json(): a single scan that strips fences and prose,
+closes a truncated string, drops a dangling key or partial value, and closes
+open brackets. Only if that still fails does the caller need a "continue"
+call (see continuation_messages()).
+
+Uses orjson when installed and falls back to the json module otherwise.
+
+Usage:
+    from utils.structured_output import StructuredOutputError, parse_structured
+
+    class MarketOutput(BaseModel):
+        model_config = ConfigDict(extra="allow")
+        neighborhood_score: float
+
+    try:
+        result = parse_structured(reply_text, MarketOutput)
+        result.data       # validated dict (extra fields kept)
+        result.repaired   # True if the reply needed repair
+    except SchemaMismatchError:
+        ...  # complete JSON of the wrong shape: give up
+    except StructuredOutputError:
+        ...  # ask the model to continue, then parse partial + continuation
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    import json
+    ORJSON_AVAILABLE = False
+
+CLOSERS = {"{": "}", "[": "]"}
+
+# ```json ... ``` around the reply
+FENCE = re.compile(r"^\s*```[a-zA-Z]*\s*|\s*```\s*$")
+
+# Incomplete \uXXXX escape at the end of a truncated string
+PARTIAL_UNICODE = re.compile(r"\\u[0-9a-fA-F]{0,3}$")
+
+CONTINUE_INSTRUCTION = (
+    "Your previous reply was cut off. Continue it exactly where it stopped: "
+    "output only the remaining JSON, without repeating anything."
+)
+
+
+class StructuredOutputError(ValueError):
+    """A reply that is not (and cannot be repaired into) valid output for its schema"""
+
+
+class SchemaMismatchError(StructuredOutputError):
+    """A reply that is complete, valid JSON of the wrong shape (continuing it won't help)"""
+
+
+@dataclass
+class ParsedOutput:
+    """A validated reply"""
+    data: Dict[str, Any]
+    repaired: bool = False
+
+
+def loads(text: str) -> Any:
+    """Parse JSON (orjson when available)"""
+    return orjson.loads(text) if ORJSON_AVAILABLE else json.loads(text)
+
+
+def repair_json(text: str) -> Optional[str]:
+    """
+    Best-effort repair of a malformed or truncated JSON object/array
+
+    Keeps the first top-level value (dropping fences and surrounding prose).
+    If the text ends mid-value, a string value is closed where it stopped;
+    anything else incomplete (a key without a value, a partial number or
+    literal) is cut back to the last complete value. Open brackets are then
+    closed.
+
+    Returns:
+        Repaired JSON text, or None if nothing parseable is left
+    """
+    text = FENCE.sub("", text)
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return None
+    start = min(starts)
+
+    stack: List[str] = []
+    in_string = escape = is_key = False
+    prev = ""  # Last structural character outside strings
+    in_scalar = False  # Inside a number/literal
+    complete: Optional[tuple] = None  # (end index, open brackets) after the last complete value
+
+    for i in range(start, len(text)):
+        c = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+                prev = '"'
+                if not is_key:
+                    complete = (i + 1, tuple(stack))
+            continue
+
+        if in_scalar and (c.isspace() or c in ",}]"):
+            in_scalar = False
+            complete = (i, tuple(stack))
+
+        if c == '"':
+            in_string = True
+            is_key = bool(stack) and stack[-1] == "{" and prev in ("{", ",")
+        elif c in CLOSERS:
+            stack.append(c)
+            prev = c
+            complete = (i + 1, tuple(stack))  # An empty container is complete
+        elif c in "}]":
+            if not stack or CLOSERS[stack[-1]] != c:
+                return None
+            stack.pop()
+            prev = c
+            complete = (i + 1, tuple(stack))
+            if not stack:
+                return text[start:i + 1]
+        elif c in ",:":
+            prev = c
+        elif not c.isspace():
+            in_scalar = True
+            prev = c
+
+    # Truncated: close a string value where it stopped, else cut to the last complete value
+    if in_string and not is_key:
+        body = text[start:-1] if escape else text[start:]
+        body = PARTIAL_UNICODE.sub("", body) + '"'
+        open_brackets = tuple(stack)
+    elif complete is not None:
+        body = text[start:complete[0]]
+        open_brackets = complete[1]
+    else:
+        return None
+
+    body = body.rstrip().rstrip(",")
+    return body + "".join(CLOSERS[b] for b in reversed(open_brackets))
+
+
+def _is_json_error(error: ValidationError) -> bool:
+    return any(e["type"] == "json_invalid" for e in error.errors())
+
+
+def parse_structured(text: Optional[str], schema: Type[BaseModel]) -> ParsedOutput:
+    """
+    Validate a reply against a schema, repairing invalid JSON if needed
+
+    Args:
+        text: Model reply
+        schema: Pydantic model for the reply
+
+    Returns:
+        ParsedOutput (data is the validated dict, including extra fields)
+
+    Raises:
+        SchemaMismatchError: Valid JSON of the wrong shape
+        StructuredOutputError: Invalid JSON even after repair
+    """
+    if not text:
+        raise StructuredOutputError("Empty reply")
+
+    try:
+        # pydantic-core parses and validates in one pass
+        model = schema.model_validate_json(text)
+        return ParsedOutput(model.model_dump(exclude_unset=True))
+    except ValidationError as e:
+        if not _is_json_error(e):
+            raise SchemaMismatchError(f"Reply does not match {schema.__name__}: {e}") from None
+
+    repaired = repair_json(text)
+    if repaired is None:
+        raise StructuredOutputError("Reply is not JSON")
+    try:
+        model = schema.model_validate(loads(repaired))
+    except (ValueError, ValidationError) as e:
+        raise StructuredOutputError(f"Repaired reply is still invalid for {schema.__name__}: {e}") from None
+
+    logger.info(f"Repaired malformed {schema.__name__} reply ({len(text)} chars)")
+    return ParsedOutput(model.model_dump(exclude_unset=True), repaired=True)
+
+
+def continuation_messages(messages: List[Dict[str, str]], partial: str) -> List[Dict[str, str]]:
+    """Messages asking the model to finish a cut-off reply"""
+    return [
+        *messages,
+        {"role": "assistant", "content": partial},
+        {"role": "user", "content": CONTINUE_INSTRUCTION}
+    ]
+
+
+def parse_continued(partial: str, continuation: Optional[str], schema: Type[BaseModel]) -> ParsedOutput:
+    """
+    Parse a cut-off reply joined with its continuation
+
+    Falls back to the continuation alone, in case the model started over.
+    """
+    try:
+        return parse_structured(partial + (continuation or ""), schema)
+    except StructuredOutputError:
+        return parse_structured(continuation, schema)
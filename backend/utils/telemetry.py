@@ -0,0 +1,430 @@
+"""
+Batched telemetry sink for PropIQ backend
+
+Auth events used to create a brand-new Comet experiment per event, write a
+temp JSON file to /tmp, upload it and end the experiment - all inline on the
+request. The sink instead buffers events in memory and a background thread
+flushes them in batches to one or more long-lived backends (Comet, W&B, a
+database collection, a Supabase table or a local JSONL file).
+
+Backends may set ``event_types`` to receive only some events, so one sink
+can write analytics rows to a collection and metrics to W&B.
+
+Usage:
+    from utils.telemetry import telemetry
+
+    telemetry.record("user_login", {"user_id": user_id, "success": True})
+
+    # Dedicated sink for a router
+    analytics = TelemetrySink(
+        [CollectionBackend(db["support_analytics"], event_types={"support_analytics"})],
+        name="support-analytics"
+    )
+
+Configuration (environment):
+    TELEMETRY_BACKENDS       Comma-separated: comet, wandb, jsonl
+                             (default: comet if COMET_API_KEY is set, plus
+                             jsonl if TELEMETRY_JSONL_PATH is set)
+    TELEMETRY_JSONL_PATH     File for the jsonl backend
+    TELEMETRY_BATCH_SIZE     Flush as soon as this many events are buffered
+    TELEMETRY_FLUSH_SECONDS  Flush at least this often
+    TELEMETRY_MAX_BUFFER     Oldest events are dropped beyond this many
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+TELEMETRY_BATCH_SIZE = int(os.getenv("TELEMETRY_BATCH_SIZE", "100"))
+TELEMETRY_FLUSH_SECONDS = float(os.getenv("TELEMETRY_FLUSH_SECONDS", "10"))
+TELEMETRY_MAX_BUFFER = int(os.getenv("TELEMETRY_MAX_BUFFER", "10000"))
+
+
+# ============================================================================
+# BACKENDS
+# ============================================================================
+
+class JsonlBackend:
+    """Append events to a local JSON Lines file"""
+
+    name = "jsonl"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write_batch(self, events: List[Dict[str, Any]]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(event, default=str) + "\n")
+
+    def close(self):
+        pass
+
+
+class CollectionBackend:
+    """Bulk-insert events into a database collection (one insert_many per batch)"""
+
+    name = "collection"
+
+    def __init__(self, collection, event_types: Optional[Set[str]] = None, keep_event_type: bool = False):
+        self.collection = collection
+        self.event_types = event_types
+        self.keep_event_type = keep_event_type
+
+    def write_batch(self, events: List[Dict[str, Any]]):
+        rows = [
+            event if self.keep_event_type else {k: v for k, v in event.items() if k != "event"}
+            for event in events
+        ]
+        # Unordered: one bad row does not stop the rest of the batch
+        self.collection.insert_many(rows, ordered=False)
+
+    def close(self):
+        pass
+
+
+class SupabaseTableBackend:
+    """Bulk-insert events into a Supabase table (one insert per batch)"""
+
+    name = "supabase"
+
+    def __init__(self, client, table: str, event_types: Optional[Set[str]] = None):
+        self.client = client
+        self.table = table
+        self.event_types = event_types
+
+    def write_batch(self, events: List[Dict[str, Any]]):
+        rows = [{k: v for k, v in event.items() if k != "event"} for event in events]
+        self.client.table(self.table).insert(rows).execute()
+
+    def close(self):
+        pass
+
+
+class CometBackend:
+    """Log batches to a single long-lived Comet ML experiment"""
+
+    name = "comet"
+
+    def __init__(self, api_key: str, workspace: str, project: str):
+        self.api_key = api_key
+        self.workspace = workspace
+        self.project = project
+        self._experiment = None
+        self._batches = 0
+
+    def _get_experiment(self):
+        if self._experiment is None:
+            from comet_ml import Experiment
+
+            self._experiment = Experiment(
+                api_key=self.api_key,
+                workspace=self.workspace,
+                project_name=self.project,
+                log_code=False,
+                auto_output_logging=False
+            )
+            self._experiment.set_name(f"Backend telemetry - {datetime.now().isoformat()}")
+            self._experiment.add_tags(["telemetry", "auth", "supabase"])
+        return self._experiment
+
+    def write_batch(self, events: List[Dict[str, Any]]):
+        experiment = self._get_experiment()
+        self._batches += 1
+
+        counts: Dict[str, int] = {}
+        for event in events:
+            counts[event["event"]] = counts.get(event["event"], 0) + 1
+
+        experiment.log_asset_data(events, name=f"events_{self._batches:06d}.json")
+        experiment.log_metrics(
+            {f"{event_type}_count": count for event_type, count in counts.items()},
+            step=self._batches
+        )
+
+    def close(self):
+        if self._experiment is not None:
+            self._experiment.end()
+            self._experiment = None
+
+
+class WandbBackend:
+    """Log batches to a single long-lived W&B run"""
+
+    name = "wandb"
+
+    def __init__(self, project: str, event_types: Optional[Set[str]] = None):
+        self.project = project
+        self.event_types = event_types
+        self._run = None
+
+    def _get_run(self):
+        if self._run is None:
+            import wandb
+
+            # Reuse the process-wide run if something else already started one
+            self._run = wandb.run or wandb.init(
+                project=self.project,
+                job_type="backend-telemetry",
+                reinit=False
+            )
+        return self._run
+
+    def write_batch(self, events: List[Dict[str, Any]]):
+        import wandb
+
+        run = self._get_run()
+        by_type: Dict[str, List[Dict[str, Any]]] = {}
+        for event in events:
+            by_type.setdefault(event["event"], []).append(event)
+
+        payload: Dict[str, Any] = {}
+        for event_type, rows in by_type.items():
+            columns = sorted({key for row in rows for key in row})
+            payload[f"telemetry/{event_type}"] = wandb.Table(
+                columns=columns,
+                data=[[_scalar(row.get(col)) for col in columns] for row in rows]
+            )
+            payload[f"telemetry/{event_type}_count"] = len(rows)
+        run.log(payload)
+
+    def close(self):
+        pass
+
+
+def _scalar(value: Any) -> Any:
+    """W&B tables only accept scalar cells"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return json.dumps(value, default=str)
+
+
+def _accepts(backend: Any, event: Dict[str, Any]) -> bool:
+    event_types = getattr(backend, "event_types", None)
+    return event_types is None or event["event"] in event_types
+
+
+def create_backends_from_env() -> List[Any]:
+    """Build the backend list from TELEMETRY_* / COMET_* / WANDB_* settings"""
+    comet_key = os.getenv("COMET_API_KEY")
+    jsonl_path = os.getenv("TELEMETRY_JSONL_PATH")
+
+    names = os.getenv("TELEMETRY_BACKENDS")
+    if names:
+        selected = [n.strip().lower() for n in names.split(",") if n.strip()]
+    else:
+        selected = (["comet"] if comet_key else []) + (["jsonl"] if jsonl_path else [])
+
+    backends = []
+    for name in selected:
+        if name == "comet":
+            try:
+                import comet_ml  # noqa: F401
+            except ImportError:
+                logger.info("Comet ML not installed, skipping comet telemetry backend")
+                continue
+            if not comet_key:
+                logger.warning("COMET_API_KEY not set, skipping comet telemetry backend")
+                continue
+            backends.append(CometBackend(
+                comet_key,
+                os.getenv("COMET_WORKSPACE", "luntra-ai"),
+                os.getenv("COMET_PROJECT", "luntra-backend")
+            ))
+        elif name == "wandb":
+            try:
+                import wandb  # noqa: F401
+            except ImportError:
+                logger.info("wandb not installed, skipping wandb telemetry backend")
+                continue
+            backends.append(WandbBackend(os.getenv("WANDB_PROJECT", "propiq-analysis")))
+        elif name == "jsonl":
+            backends.append(JsonlBackend(jsonl_path or "/tmp/propiq_telemetry.jsonl"))
+        else:
+            logger.warning(f"Unknown telemetry backend: {name}")
+
+    return backends
+
+
+# ============================================================================
+# SINK
+# ============================================================================
+
+class TelemetrySink:
+    """
+    In-memory event buffer with background batch flushing
+
+    Features:
+    - record() is O(1), never blocks and never does I/O
+    - Backpressure: bounded memory (oldest events dropped, with a counter
+      and a warning) and an early flush once batch_size events are waiting
+    - Flush on batch size or time interval, whichever comes first
+    - Flush on shutdown (stop() and atexit)
+    - One backend failing does not affect the others
+    """
+
+    def __init__(
+        self,
+        backends: Optional[List[Any]] = None,
+        batch_size: int = TELEMETRY_BATCH_SIZE,
+        flush_interval: float = TELEMETRY_FLUSH_SECONDS,
+        max_buffer: int = TELEMETRY_MAX_BUFFER,
+        name: str = "telemetry"
+    ):
+        self.backends = backends if backends is not None else []
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.name = name
+
+        self._buffer: Deque[Dict[str, Any]] = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Metrics
+        self._recorded = 0
+        self._dropped = 0
+        self._flushed = 0
+        self._batches = 0
+        self._backend_errors: Dict[str, int] = {}
+        self._last_flush_ms = 0.0
+        self._dropped_reported = 0
+
+        _SINKS.add(self)
+
+    def record(self, event_type: str, data: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Buffer an event for the next flush
+
+        Returns:
+            False if the sink has no backends (event discarded), True otherwise
+        """
+        if not self.backends:
+            return False
+
+        event = {"event": event_type, "recorded_at": datetime.utcnow().isoformat()}
+        if data:
+            event.update(data)
+
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer:
+                self._buffer.popleft()
+                self._dropped += 1
+            self._buffer.append(event)
+            self._recorded += 1
+            should_flush = len(self._buffer) >= self.batch_size
+
+        self._ensure_started()
+        if should_flush:
+            self._wakeup.set()
+        return True
+
+    def flush(self) -> int:
+        """Write everything buffered so far; returns the number of events flushed"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._buffer:
+                    return 0
+                batch = list(self._buffer)
+                self._buffer.clear()
+
+            dropped = self._dropped - self._dropped_reported
+            if dropped:
+                self._dropped_reported = self._dropped
+                logger.warning(f"{self.name}: buffer full, dropped {dropped} oldest events")
+
+            started = time.perf_counter()
+            for backend in self.backends:
+                events = [e for e in batch if _accepts(backend, e)]
+                if not events:
+                    continue
+                try:
+                    backend.write_batch(events)
+                except Exception as e:
+                    name = getattr(backend, "name", type(backend).__name__)
+                    self._backend_errors[name] = self._backend_errors.get(name, 0) + 1
+                    logger.warning(f"{self.name}: {name} backend failed to write {len(events)} events: {e}")
+
+            self._last_flush_ms = (time.perf_counter() - started) * 1000
+            self._flushed += len(batch)
+            self._batches += 1
+            return len(batch)
+
+    def start(self):
+        """Start the background flush thread"""
+        self._ensure_started()
+
+    def _ensure_started(self):
+        if self._thread is not None or self._stopping.is_set():
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"{self.name}-flush", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(timeout=self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def stop(self, timeout: float = 10.0):
+        """Flush remaining events and close backends"""
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        self.flush()
+        for backend in self.backends:
+            try:
+                backend.close()
+            except Exception as e:
+                logger.warning(f"{self.name}: failed to close {getattr(backend, 'name', backend)}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Buffer and flush metrics"""
+        with self._lock:
+            buffered = len(self._buffer)
+        return {
+            "backends": [getattr(b, "name", type(b).__name__) for b in self.backends],
+            "buffered": buffered,
+            "max_buffer": self.max_buffer,
+            "recorded": self._recorded,
+            "dropped": self._dropped,
+            "flushed": self._flushed,
+            "batches": self._batches,
+            "backend_errors": dict(self._backend_errors),
+            "last_flush_ms": round(self._last_flush_ms, 2)
+        }
+
+
+# Every sink created in this process, so shutdown can flush them all
+_SINKS: "weakref.WeakSet[TelemetrySink]" = weakref.WeakSet()
+
+
+def stop_all_sinks(timeout: float = 10.0):
+    """Flush and stop every sink (application shutdown hook)"""
+    for sink in list(_SINKS):
+        sink.stop(timeout=timeout)
+
+
+# Global sink for backend events (auth, etc.)
+telemetry = TelemetrySink(create_backends_from_env())
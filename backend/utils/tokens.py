@@ -0,0 +1,99 @@
+"""
+Token counting for PropIQ backend
+
+Uses tiktoken when installed (tokenization runs locally) and falls back to a
+character-based estimate otherwise, so callers never need to guard the import.
+
+Usage:
+    from utils.tokens import count_tokens, count_message_tokens
+
+    n = count_tokens("How do I upgrade?")
+    prompt_tokens = count_message_tokens(messages)
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, List
+
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# Chat format overhead (OpenAI cookbook): per message, plus reply priming
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+# Fallback estimate for English text
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str):
+    if not TIKTOKEN_AVAILABLE:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            # Newer models share the gpt-4o encoding
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # BPE files are fetched once then cached (TIKTOKEN_CACHE_DIR); offline
+        # hosts without a warm cache fall back to the estimate
+        logger.warning(f"tiktoken encoding unavailable, estimating tokens: {e}")
+        return None
+
+
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+    """
+    Count tokens in a string
+
+    Args:
+        text: Text to count
+        model: Model whose tokenizer to use
+
+    Returns:
+        Exact count with tiktoken, otherwise a conservative estimate
+    """
+    if not text:
+        return 0
+
+    encoding = _get_encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def count_message_tokens(messages: List[Dict[str, Any]], model: str = DEFAULT_MODEL) -> int:
+    """
+    Count prompt tokens for a chat completion request
+
+    Args:
+        messages: OpenAI-style messages ({"role", "content", ...})
+        model: Model whose tokenizer to use
+
+    Returns:
+        Prompt token count including chat format overhead
+    """
+    total = TOKENS_PER_REPLY
+    for message in messages:
+        total += message_tokens(message, model)
+    return total
+
+
+def message_tokens(message: Dict[str, Any], model: str = DEFAULT_MODEL) -> int:
+    """Token count of a single chat message including its format overhead"""
+    total = TOKENS_PER_MESSAGE
+    total += count_tokens(str(message.get("role") or ""), model)
+    total += count_tokens(str(message.get("content") or ""), model)
+    if message.get("name"):
+        total += count_tokens(str(message["name"]), model) + 1
+    return total
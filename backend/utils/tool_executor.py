@@ -0,0 +1,204 @@
+"""
+Async tool executor for PropIQ chat function calling
+
+The support chat used to run every tool call from an assistant turn one after
+another, synchronously, on the event loop - several of them database reads.
+ToolExecutor runs all tool calls of a turn concurrently in worker threads,
+bounds each one with a timeout, and memoizes read-only tools for the lifetime
+of a request (the model often asks for check_subscription_status twice).
+
+A timed-out call keeps running in its worker thread. Read-only and
+idempotent tools report a retryable timeout; any other tool (tickets,
+credits) reports that it is still processing and must not be retried, so a
+retry cannot create a duplicate.
+
+Usage:
+    from utils.tool_executor import ToolExecutor
+
+    executor = ToolExecutor(
+        TOOL_FUNCTIONS,
+        read_only={"check_subscription_status", "get_analysis_history"},
+        timeouts={"create_support_ticket": 10}
+    )
+
+    session = executor.session()          # one per request
+    results = await session.run_calls(assistant_message.tool_calls)
+    messages.extend(r.to_message() for r in results)
+"""
+
+import asyncio
+import inspect
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from config.logging_config import get_logger
+from utils.deadline import remaining_time
+
+logger = get_logger(__name__)
+
+# Default per-tool timeout (seconds)
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "5"))
+
+
+@dataclass
+class ToolResult:
+    """Outcome of one tool call"""
+    tool_call_id: str
+    name: str
+    content: Dict[str, Any]
+    known: bool = True
+    cached: bool = False
+    timed_out: bool = False
+    duration_ms: float = 0.0
+
+    def to_message(self) -> Dict[str, Any]:
+        """Tool message for the next chat completion request"""
+        return {
+            "role": "tool",
+            "tool_call_id": self.tool_call_id,
+            "name": self.name,
+            "content": json.dumps(self.content, default=str)
+        }
+
+
+class ToolExecutor:
+    """
+    Registry of callable tools plus execution policy
+
+    Features:
+    - Concurrent execution of independent calls from one assistant turn
+    - Per-tool timeouts (a slow tool returns an error instead of stalling),
+      capped by the request deadline
+    - Request-scoped memoization of read-only tools
+    - No retry invitation after a timeout for non-idempotent tools
+    """
+
+    def __init__(
+        self,
+        tools: Dict[str, Callable[..., Dict[str, Any]]],
+        read_only: Iterable[str] = (),
+        timeouts: Optional[Dict[str, float]] = None,
+        default_timeout: float = TOOL_TIMEOUT_SECONDS,
+        idempotent: Iterable[str] = ()
+    ):
+        self.tools = tools
+        self.read_only = set(read_only)
+        # Safe to call again with the same arguments (read-only tools always are)
+        self.idempotent = self.read_only | set(idempotent)
+        self.timeouts = timeouts or {}
+        self.default_timeout = default_timeout
+
+    def timeout_for(self, name: str) -> float:
+        return self.timeouts.get(name, self.default_timeout)
+
+    def session(self) -> "ToolSession":
+        """Start a request-scoped execution session (fresh memo)"""
+        return ToolSession(self)
+
+
+@dataclass
+class ToolSession:
+    """Per-request state: memoized read-only results"""
+    executor: ToolExecutor
+    _memo: Dict[Tuple[str, str], "asyncio.Future"] = field(default_factory=dict)
+
+    async def run_calls(self, tool_calls: Iterable[Any]) -> List[ToolResult]:
+        """
+        Run the tool calls of one assistant turn concurrently
+
+        Args:
+            tool_calls: OpenAI tool call objects (id, function.name, function.arguments)
+
+        Returns:
+            Results in the same order as tool_calls
+        """
+        calls = list(tool_calls)
+        results = await asyncio.gather(*(
+            self.run(call.id, call.function.name, call.function.arguments)
+            for call in calls
+        ))
+
+        # A write in this turn may change what read-only tools would return
+        if any(r.name not in self.executor.read_only and r.known for r in results):
+            self._memo.clear()
+
+        return list(results)
+
+    async def run(self, tool_call_id: str, name: str, raw_arguments: Any) -> ToolResult:
+        """Run a single tool call (arguments as JSON string or dict)"""
+        started = time.perf_counter()
+
+        func = self.executor.tools.get(name)
+        if func is None:
+            return ToolResult(tool_call_id, name, {"error": f"Unknown tool: {name}"}, known=False)
+
+        try:
+            args = json.loads(raw_arguments) if isinstance(raw_arguments, str) else dict(raw_arguments or {})
+            _bind(func, args)
+        except (TypeError, ValueError) as e:
+            # Not JSON, or arguments the function does not accept
+            return ToolResult(tool_call_id, name, {"error": f"Invalid arguments for {name}: {e}"})
+
+        if name in self.executor.read_only:
+            key = (name, json.dumps(args, sort_keys=True, default=str))
+            future = self._memo.get(key)
+            cached = future is not None
+            if future is None:
+                future = asyncio.ensure_future(self._execute(name, func, args))
+                self._memo[key] = future
+            content, timed_out = await asyncio.shield(future)
+            if timed_out:
+                # Do not keep serving a timeout for the rest of the request
+                self._memo.pop(key, None)
+        else:
+            cached = False
+            content, timed_out = await self._execute(name, func, args)
+
+        return ToolResult(
+            tool_call_id,
+            name,
+            content,
+            cached=cached,
+            timed_out=timed_out,
+            duration_ms=round((time.perf_counter() - started) * 1000, 2)
+        )
+
+    async def _execute(
+        self,
+        name: str,
+        func: Callable[..., Dict[str, Any]],
+        args: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], bool]:
+        timeout = remaining_time(self.executor.timeout_for(name))
+        if timeout <= 0:
+            return {"error": f"{name} skipped, the request ran out of time"}, True
+        try:
+            return await asyncio.wait_for(asyncio.to_thread(func, **args), timeout=timeout), False
+        except asyncio.TimeoutError:
+            logger.warning(f"Tool {name} timed out after {timeout}s")
+            if name in self.executor.idempotent:
+                return {"error": f"{name} timed out, please try again", "retryable": True}, True
+            # The call is still running and may yet succeed: a retry could duplicate it
+            return {
+                "status": "processing",
+                "retryable": False,
+                "error": (
+                    f"{name} is still processing. Do not call it again; tell the user "
+                    "it is being handled and will be confirmed shortly."
+                )
+            }, True
+        except Exception as e:
+            logger.error(f"Tool {name} failed: {e}")
+            return {"error": str(e)}, False
+
+
+def _bind(func: Callable[..., Any], args: Dict[str, Any]):
+    """Check arguments against the tool's signature (TypeError if they don't fit)"""
+    try:
+        signature = inspect.signature(func)
+    except (TypeError, ValueError):
+        return  # No introspectable signature; let the call decide
+    signature.bind(**args)
@@ -0,0 +1,380 @@
+"""
+LLM token and cost accounting for PropIQ backend
+
+Routers used to drop response.usage (only the offline simulation estimated
+costs), so there was no way to see what a route, an advisor stage or an
+Elite user actually costs. The LLM gateway now reports every call here with
+its attribution tags; usage is aggregated in memory, written out in batches
+(one row per user/route/stage/tier/model per flush, via a TelemetrySink, to
+the Supabase llm_usage table from supabase_migration_llm_usage.sql), and
+exposed on /metrics.
+
+The same numbers drive a per-user daily budget: past LLM_BUDGET_DOWNGRADE_AT
+of the tier's budget, calls fall back to a cheaper model where one exists;
+at the budget, calls are refused with BudgetExceeded. Spend is tracked per
+process, so with several workers the effective budget is per worker.
+
+Usage:
+    from utils.usage_accounting import usage_accountant, usage_scope
+
+    # Attribute every model call in a block (request handler, job)
+    with usage_scope(route="advisor", user_id=user_id, tier=tier):
+        response = await llm_gateway.complete(..., usage_tags={"stage": "market_analysis"})
+
+    usage_accountant.snapshot()       # aggregates for /metrics?format=json
+    usage_accountant.prometheus()     # Prometheus text exposition
+    usage_accountant.user_usage(user_id, tier)
+
+Configuration (environment):
+    LLM_DAILY_BUDGETS_USD     Per-tier daily budget, "tier:usd,..." (tiers not listed are
+                              unlimited; unset means no budgets)
+    LLM_BUDGET_DOWNGRADE_AT   Fraction of the budget after which models are downgraded
+    LLM_USAGE_FLUSH_SECONDS   Write aggregated usage at least this often
+    LLM_USAGE_FLUSH_ROWS      ...or as soon as this many rows are pending
+    LLM_USAGE_JSONL_PATH      Also append usage rows to this file
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from config.logging_config import get_logger
+from utils.telemetry import JsonlBackend, SupabaseTableBackend, TelemetrySink
+
+logger = get_logger(__name__)
+
+
+def parse_budgets(value: str) -> Dict[str, float]:
+    """Parse 'free:0.02,elite:2' into {"free": 0.02, "elite": 2.0}"""
+    budgets = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        tier, _, amount = item.partition(":")
+        budgets[tier.strip()] = float(amount)
+    return budgets
+
+
+# Opt-in: no budgets unless configured (see .env.example for suggested values)
+LLM_DAILY_BUDGETS_USD = parse_budgets(os.getenv("LLM_DAILY_BUDGETS_USD", ""))
+LLM_BUDGET_DOWNGRADE_AT = float(os.getenv("LLM_BUDGET_DOWNGRADE_AT", "0.8"))
+LLM_USAGE_FLUSH_SECONDS = float(os.getenv("LLM_USAGE_FLUSH_SECONDS", "60"))
+LLM_USAGE_FLUSH_ROWS = int(os.getenv("LLM_USAGE_FLUSH_ROWS", "500"))
+
+# USD per 1K tokens: (input, cached input, output). Azure deployment names
+# with a version suffix match by prefix; unknown models are priced as the default.
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.00015, 0.000075, 0.0006),
+    "gpt-4o": (0.0025, 0.00125, 0.01)
+}
+DEFAULT_PRICED_MODEL = "gpt-4o-mini"
+
+# Cheaper model to fall back to when a user nears their budget
+MODEL_DOWNGRADES = {"gpt-4o": "gpt-4o-mini"}
+
+USAGE_EVENT = "llm_usage"
+TAGS = ("route", "stage", "user_id", "tier")
+
+_usage_tags: ContextVar[Dict[str, Any]] = ContextVar("llm_usage_tags", default={})
+
+
+class BudgetExceeded(Exception):
+    """The user has spent their tier's daily LLM budget"""
+
+    def __init__(self, user_id: str, tier: str, spent: float, budget: float):
+        self.user_id = user_id
+        self.tier = tier
+        self.spent = spent
+        self.budget = budget
+        super().__init__(f"Daily AI usage limit reached for the {tier} plan")
+
+
+# ============================================================================
+# ATTRIBUTION & PRICING
+# ============================================================================
+
+@contextmanager
+def usage_scope(**tags) -> Iterator[Dict[str, Any]]:
+    """Attribute model calls in a block (nested scopes add to / override outer tags)"""
+    merged = {**_usage_tags.get(), **{k: v for k, v in tags.items() if v is not None}}
+    token = _usage_tags.set(merged)
+    try:
+        yield merged
+    finally:
+        _usage_tags.reset(token)
+
+
+def usage_tags(extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Tags of the current scope, plus per-call tags"""
+    tags = dict(_usage_tags.get())
+    if extra:
+        tags.update({k: v for k, v in extra.items() if v is not None})
+    return tags
+
+
+def model_price(model: Optional[str]) -> Tuple[float, float, float]:
+    """Per-1K-token prices for a model (longest matching name prefix)"""
+    if model:
+        for name in sorted(MODEL_PRICES, key=len, reverse=True):
+            if model.startswith(name):
+                return MODEL_PRICES[name]
+    return MODEL_PRICES[DEFAULT_PRICED_MODEL]
+
+
+def token_cost(model: Optional[str], prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """USD cost of one call (cached prompt tokens billed at the cached rate)"""
+    input_price, cached_price, output_price = model_price(model)
+    uncached = max(0, prompt_tokens - cached_tokens)
+    return (uncached * input_price + cached_tokens * cached_price + completion_tokens * output_price) / 1000
+
+
+def usage_counts(usage: Any) -> Tuple[int, int, int]:
+    """(prompt, cached prompt, completion) tokens from an OpenAI usage object"""
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", 0) or 0
+    return prompt_tokens, cached_tokens, completion_tokens
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+def _empty() -> Dict[str, float]:
+    return {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+
+
+def _add(totals: Dict[str, float], prompt_tokens: int, cached_tokens: int, completion_tokens: int, cost: float):
+    totals["calls"] += 1
+    totals["prompt_tokens"] += prompt_tokens
+    totals["cached_tokens"] += cached_tokens
+    totals["completion_tokens"] += completion_tokens
+    totals["cost_usd"] += cost
+
+
+@lru_cache(maxsize=1)
+def get_usage_sink() -> TelemetrySink:
+    """Batched writer for usage rows (llm_usage table and/or a JSONL file)"""
+    backends = []
+    try:
+        from database_supabase import get_database
+        client = get_database()
+        if client is not None:
+            backends.append(SupabaseTableBackend(client, "llm_usage", event_types={USAGE_EVENT}))
+    except Exception as e:
+        logger.warning(f"llm_usage table not available: {e}")
+
+    jsonl_path = os.getenv("LLM_USAGE_JSONL_PATH")
+    if jsonl_path:
+        backends.append(JsonlBackend(jsonl_path))
+
+    return TelemetrySink(backends, name="llm-usage")
+
+
+# ============================================================================
+# ACCOUNTANT
+# ============================================================================
+
+class UsageAccountant:
+    """
+    In-memory LLM usage aggregates, batched usage rows, per-user budgets
+
+    Features:
+    - Totals by (route, stage, tier, model) since start, for /metrics
+    - Per-user spend for the current UTC day, for budgets
+    - Pending rows (one per user/route/stage/tier/model) flushed in batches
+    """
+
+    def __init__(
+        self,
+        budgets: Optional[Dict[str, float]] = None,
+        downgrade_at: float = LLM_BUDGET_DOWNGRADE_AT,
+        sink: Optional[TelemetrySink] = None,
+        flush_interval: float = LLM_USAGE_FLUSH_SECONDS,
+        flush_rows: int = LLM_USAGE_FLUSH_ROWS
+    ):
+        self.budgets = budgets if budgets is not None else LLM_DAILY_BUDGETS_USD
+        self.downgrade_at = downgrade_at
+        self.sink = sink
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+
+        self._lock = threading.Lock()
+        self._totals: Dict[Tuple[str, ...], Dict[str, float]] = {}
+        self._pending: Dict[Tuple[str, ...], Dict[str, float]] = {}
+        self._day = _today()
+        self._spend: Dict[str, Dict[str, float]] = {}  # user_id -> today's totals
+        self._refused = 0
+        self._downgraded = 0
+        self._last_flush = time.monotonic()
+
+    # ------------------------------------------------------------------
+    # Budgets
+    # ------------------------------------------------------------------
+
+    def _user_spend(self, user_id: str) -> float:
+        """Today's spend (caller holds the lock)"""
+        day = _today()
+        if day != self._day:
+            self._day = day
+            self._spend = {}
+        return self._spend.get(user_id, {}).get("cost_usd", 0.0)
+
+    def admit(self, model: Optional[str], tags: Dict[str, Any]) -> Optional[str]:
+        """
+        Check a call against the user's budget before it is made
+
+        Returns:
+            The model to use (downgraded near the budget)
+
+        Raises:
+            BudgetExceeded: The user's daily budget is spent
+        """
+        user_id, tier = tags.get("user_id"), tags.get("tier")
+        budget = self.budgets.get(tier) if user_id else None
+        if budget is None:
+            return model
+
+        with self._lock:
+            spent = self._user_spend(user_id)
+            if spent >= budget:
+                self._refused += 1
+                raise BudgetExceeded(user_id, tier, spent, budget)
+            if spent >= budget * self.downgrade_at and model in MODEL_DOWNGRADES:
+                self._downgraded += 1
+                return MODEL_DOWNGRADES[model]
+        return model
+
+    def user_usage(self, user_id: str, tier: Optional[str] = None) -> Dict[str, Any]:
+        """Today's usage and remaining budget for a user"""
+        budget = self.budgets.get(tier)
+        with self._lock:
+            self._user_spend(user_id)
+            totals = dict(self._spend.get(user_id) or _empty())
+            day = self._day
+        return {
+            "day": day,
+            "tier": tier,
+            **totals,
+            "cost_usd": round(totals["cost_usd"], 6),
+            "budget_usd": budget,
+            "remaining_usd": None if budget is None else round(max(0.0, budget - totals["cost_usd"]), 6)
+        }
+
+    # ------------------------------------------------------------------
+    # Recording & flushing
+    # ------------------------------------------------------------------
+
+    def record(
+        self,
+        model: Optional[str],
+        prompt_tokens: int,
+        completion_tokens: int,
+        cached_tokens: int = 0,
+        tags: Optional[Dict[str, Any]] = None
+    ) -> float:
+        """
+        Account one model call
+
+        Returns:
+            The call's cost in USD
+        """
+        tags = tags or {}
+        model = model or "unknown"
+        cost = token_cost(model, prompt_tokens, completion_tokens, cached_tokens)
+        route, stage, user_id, tier = (str(tags.get(tag) or "") for tag in TAGS)
+
+        with self._lock:
+            _add(self._totals.setdefault((route, stage, tier, model), _empty()),
+                 prompt_tokens, cached_tokens, completion_tokens, cost)
+            _add(self._pending.setdefault((user_id, route, stage, tier, model), _empty()),
+                 prompt_tokens, cached_tokens, completion_tokens, cost)
+            if user_id:
+                self._user_spend(user_id)
+                _add(self._spend.setdefault(user_id, _empty()), prompt_tokens, cached_tokens, completion_tokens, cost)
+            due = (
+                len(self._pending) >= self.flush_rows
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+
+        if due:
+            self.flush()
+        return cost
+
+    def flush(self) -> int:
+        """Hand pending usage rows to the sink; returns the number of rows"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        sink = self.sink if self.sink is not None else get_usage_sink()
+        for (user_id, route, stage, tier, model), totals in pending.items():
+            sink.record(USAGE_EVENT, {
+                "user_id": user_id or None,
+                "route": route,
+                "stage": stage,
+                "tier": tier or None,
+                "model": model,
+                **totals,
+                "cost_usd": round(totals["cost_usd"], 8)
+            })
+        return len(pending)
+
+    # ------------------------------------------------------------------
+    # Exposure
+    # ------------------------------------------------------------------
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Aggregates since start (no per-user data)"""
+        with self._lock:
+            rows = [
+                {"route": route, "stage": stage, "tier": tier, "model": model,
+                 **totals, "cost_usd": round(totals["cost_usd"], 6)}
+                for (route, stage, tier, model), totals in sorted(self._totals.items())
+            ]
+            budget = {"refused": self._refused, "downgraded": self._downgraded, "users_today": len(self._spend)}
+        return {
+            "usage": rows,
+            "total_cost_usd": round(sum(row["cost_usd"] for row in rows), 6),
+            "budget": budget,
+            "budgets_usd": self.budgets
+        }
+
+    def prometheus(self) -> str:
+        """Aggregates in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines: List[str] = []
+        counters = (
+            ("calls", "propiq_llm_calls_total", "Model calls"),
+            ("prompt_tokens", "propiq_llm_prompt_tokens_total", "Prompt tokens"),
+            ("cached_tokens", "propiq_llm_cached_prompt_tokens_total", "Prompt tokens served from the provider cache"),
+            ("completion_tokens", "propiq_llm_completion_tokens_total", "Completion tokens"),
+            ("cost_usd", "propiq_llm_cost_usd_total", "Estimated model cost in USD")
+        )
+        for field, metric, help_text in counters:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for row in snapshot["usage"]:
+                labels = ",".join(f'{tag}="{_escape(row[tag])}"' for tag in ("route", "stage", "tier", "model"))
+                lines.append(f"{metric}{{{labels}}} {row[field]}")
+        for name, help_text in (("refused", "Calls refused by the daily budget"),
+                                ("downgraded", "Calls moved to a cheaper model near the budget")):
+            metric = f"propiq_llm_budget_{name}_total"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {snapshot['budget'][name]}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Global accountant fed by the LLM gateway
+usage_accountant = UsageAccountant()
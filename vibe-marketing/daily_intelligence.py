@@ -15,6 +15,10 @@ from typing import Dict, Any, Optional
 # Configuration from environment variables
 STRIPE_KEY = os.getenv("STRIPE_SECRET_KEY")
 MONGODB_URI = os.getenv("MONGODB_URI")
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
+# Dashboard counts may be this many seconds old (see backend/supabase_migration_dashboard_stats.sql)
+DASHBOARD_STATS_MAX_AGE = int(os.getenv("DASHBOARD_STATS_MAX_AGE", "300"))
 WANDB_KEY = os.getenv("WANDB_API_KEY")
 WANDB_PROJECT = os.getenv("WANDB_PROJECT", "propiq-analysis")
 SLACK_WEBHOOK = os.getenv("SLACK_WEBHOOK_URL")
@@ -54,6 +58,43 @@ def fetch_stripe_data() -> Dict[str, Any]:
         return {"error": str(e), "total_revenue": 0, "num_charges": 0}
 
 
+def fetch_dashboard_stats() -> Dict[str, Any]:
+    """Fetch all user/analysis counts from the Supabase stats view in one call"""
+    print("📊 Fetching dashboard stats...")
+
+    try:
+        response = requests.post(
+            f"{SUPABASE_URL}/rest/v1/rpc/get_dashboard_stats",
+            headers={
+                "apikey": SUPABASE_KEY,
+                "Authorization": f"Bearer {SUPABASE_KEY}",
+                "Content-Type": "application/json"
+            },
+            json={"max_age_seconds": DASHBOARD_STATS_MAX_AGE},
+            timeout=30
+        )
+        response.raise_for_status()
+        rows = response.json()
+        row = rows[0] if rows else {}
+
+        return {
+            "new_users": row.get("new_users_24h", 0),
+            "analyses": row.get("analyses_24h", 0),
+            "total_users": row.get("total_users", 0),
+            "support_chats": row.get("support_chats_24h", 0),
+            "refreshed_at": row.get("refreshed_at")
+        }
+    except Exception as e:
+        print(f"⚠️  Supabase stats error: {e}")
+        return {
+            "error": str(e),
+            "new_users": 0,
+            "analyses": 0,
+            "total_users": 0,
+            "support_chats": 0
+        }
+
+
 def fetch_mongodb_data() -> Dict[str, Any]:
     """Fetch user and analysis data from MongoDB"""
     print("📊 Fetching MongoDB data...")
@@ -65,30 +106,29 @@ def fetch_mongodb_data() -> Dict[str, Any]:
         db = client.get_database()  # Uses database from URI
 
         yesterday = datetime.now() - timedelta(days=1)
-
-        # Count new users
-        new_users = db.users.count_documents({
-            "created_at": {"$gte": yesterday}
-        })
-
-        # Count property analyses
-        analyses = db.property_analyses.count_documents({
-            "created_at": {"$gte": yesterday}
-        })
-
-        # Count total active users
-        total_users = db.users.count_documents({})
-
-        # Count support chats
-        support_chats = db.support_chats.count_documents({
-            "created_at": {"$gte": yesterday}
-        }) if "support_chats" in db.list_collection_names() else 0
+        recent = {"$match": {"created_at": {"$gte": yesterday}}}
+
+        # Last-24h counts for every collection in one aggregation
+        # ($unionWith, MongoDB 4.4+) instead of one count_documents per collection
+        pipeline = [
+            recent,
+            {"$project": {"_id": 0, "source": {"$literal": "new_users"}}}
+        ]
+        for collection, key in (("property_analyses", "analyses"), ("support_chats", "support_chats")):
+            pipeline.append({"$unionWith": {
+                "coll": collection,
+                "pipeline": [recent, {"$project": {"_id": 0, "source": {"$literal": key}}}]
+            }})
+        pipeline.append({"$group": {"_id": "$source", "count": {"$sum": 1}}})
+
+        counts = {doc["_id"]: doc["count"] for doc in db.users.aggregate(pipeline)}
 
         return {
-            "new_users": new_users,
-            "analyses": analyses,
-            "total_users": total_users,
-            "support_chats": support_chats
+            "new_users": counts.get("new_users", 0),
+            "analyses": counts.get("analyses", 0),
+            # Collection metadata, not a scan
+            "total_users": db.users.estimated_document_count(),
+            "support_chats": counts.get("support_chats", 0)
         }
     except Exception as e:
         print(f"⚠️  MongoDB error: {e}")
@@ -264,8 +304,8 @@ def main():
     missing_vars = []
     if not STRIPE_KEY:
         missing_vars.append("STRIPE_SECRET_KEY")
-    if not MONGODB_URI:
-        missing_vars.append("MONGODB_URI")
+    if not MONGODB_URI and not (SUPABASE_URL and SUPABASE_KEY):
+        missing_vars.append("SUPABASE_URL/SUPABASE_SERVICE_KEY or MONGODB_URI")
     if not CLAUDE_KEY:
         missing_vars.append("ANTHROPIC_API_KEY")
     if not SLACK_WEBHOOK:
@@ -283,7 +323,7 @@ def main():
 
     # Fetch data from all sources
     stripe_data = fetch_stripe_data()
-    mongo_data = fetch_mongodb_data()
+    mongo_data = fetch_dashboard_stats() if SUPABASE_URL and SUPABASE_KEY else fetch_mongodb_data()
     wandb_data = fetch_wandb_data()
 
     # Generate report